@@ -0,0 +1,241 @@
+"""This module holds running-moment (Welford) accumulators for table
+columns. Each accumulator keeps the count, mean and sum of squared
+deviations (M2) of a column, and can add, remove or replace a single
+value in constant time. The t-test, z-test and ANOVA statistics can be
+worked out from the accumulators without going back over the data.
+Histogram accumulators do the same for the bin counts of a column with
+fixed bin edges."""
+
+import math
+import numpy as np
+from ztest import ztest_from_stats
+
+
+class RunningMoments:
+    """
+    Running count, mean and M2 of a column of numbers.
+
+    Args:
+        - fill_value (float): Value used in place of NaN (missing) entries.
+            If None, NaN entries are skipped.
+    """
+
+    def __init__(self, fill_value=None):
+        self.fill_value = fill_value
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def __repr__(self):
+        return f"RunningMoments(count={self.count}, mean={self.mean}, m2={self.m2})"
+
+    @classmethod
+    def from_values(cls, values, fill_value=None):
+        """
+        Makes an accumulator from a whole column at once.
+
+        Args:
+            - values (array-like): The column values.
+            - fill_value (float): Value used in place of NaN entries.
+                If None, NaN entries are skipped.
+
+        Returns:
+            - RunningMoments: The accumulator for the column.
+        """
+        moments = cls(fill_value)
+        values = np.asarray(values, dtype=float)
+        if fill_value is None:
+            values = values[~np.isnan(values)]
+        else:
+            values = np.where(np.isnan(values), fill_value, values)
+        if len(values):
+            moments.count = len(values)
+            moments.mean = float(values.mean())
+            moments.m2 = float(((values - moments.mean) ** 2).sum())
+        return moments
+
+    def _clean(self, value):
+        """Returns the value to use for `value`, or None to skip it."""
+        value = float(value)
+        if math.isnan(value):
+            return self.fill_value
+        return value
+
+    def add(self, value):
+        """Adds one value to the column."""
+        value = self._clean(value)
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value):
+        """Removes one value that was previously added to the column."""
+        value = self._clean(value)
+        if value is None or self.count == 0:
+            return
+        if self.count == 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.count -= 1
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        # Rounding can leave M2 slightly negative when the spread goes to zero
+        self.m2 = max(self.m2 - delta * (value - self.mean), 0.0)
+
+    def replace(self, old_value, new_value):
+        """Replaces one value in the column with another."""
+        self.remove(old_value)
+        self.add(new_value)
+
+    @property
+    def variance(self):
+        """The sample variance (ddof=1), or NaN with fewer than two values."""
+        if self.count < 2:
+            return float('nan')
+        return self.m2 / (self.count - 1)
+
+    def has_variance(self):
+        """
+        Checks whether the column has any spread, allowing for rounding
+        left over from removed values.
+
+        Returns:
+            - bool: True if there are two or more distinct values.
+        """
+        if self.count < 2:
+            return False
+        return self.variance > 1e-12 * max(1.0, self.mean ** 2)
+
+
+
+class RunningHistogram:
+    """
+    Running bin counts of a column for a fixed set of bin edges.
+
+    Values are binned as in `np.histogram`: each bin holds its left edge,
+    the last bin also holds the right edge, and NaN values or values
+    outside the edges are not counted.
+
+    Args:
+        - edges (array-like): The increasing bin edges.
+    """
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+
+    def __repr__(self):
+        return f"RunningHistogram(bins={len(self.counts)}, total={int(self.counts.sum())})"
+
+    @classmethod
+    def from_values(cls, values, edges):
+        """
+        Makes an accumulator from a whole column at once.
+
+        Args:
+            - values (array-like): The column values.
+            - edges (array-like): The increasing bin edges.
+
+        Returns:
+            - RunningHistogram: The accumulator for the column.
+        """
+        histogram = cls(edges)
+        histogram.update(added=values)
+        return histogram
+
+    def has_edges(self, edges):
+        """Checks whether the accumulator counts into exactly these bin edges."""
+        return np.array_equal(self.edges, edges)
+
+    def update(self, removed=(), added=()):
+        """
+        Removes and adds a batch of values, touching only their bins.
+
+        Args:
+            - removed (array-like): Values that were previously added.
+            - added (array-like): New values.
+        """
+        for values, sign in ((removed, -1), (added, 1)):
+            values = np.asarray(values, dtype=float)
+            if values.size:
+                values = values[~np.isnan(values)]
+                self.counts += sign * np.histogram(values, bins=self.edges)[0]
+
+    def add(self, value):
+        """Adds one value to the column."""
+        self.update(added=[value])
+
+    def remove(self, value):
+        """Removes one value that was previously added to the column."""
+        self.update(removed=[value])
+
+    def replace(self, old_value, new_value):
+        """Replaces one value in the column with another."""
+        self.update(removed=[old_value], added=[new_value])
+
+def welch_ttest(moments1, moments2):
+    """
+    Calculates Welch's t-test from two accumulators.
+
+    Args:
+        - moments1 (RunningMoments): Accumulator for population 1.
+        - moments2 (RunningMoments): Accumulator for population 2.
+
+    Returns:
+        - float: The t-statistic.
+        - float: The two-sided p-value. Both are NaN (as from scipy) when
+            a group has fewer than two values or neither group varies.
+    """
+    from scipy import stats
+    count1, count2 = np.float64(moments1.count), np.float64(moments2.count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se1 = moments1.variance / count1
+        se2 = moments2.variance / count2
+        t_stat = (moments1.mean - moments2.mean) / np.sqrt(se1 + se2)
+        df = (se1 + se2) ** 2 / (se1 ** 2 / (count1 - 1) + se2 ** 2 / (count2 - 1))
+    return float(t_stat), float(2 * stats.t.sf(abs(t_stat), df))
+
+
+def ztest(moments1, moments2):
+    """
+    Calculates the two-sample z-test (pooled variance, as in statsmodels'
+    `ztest`) from two accumulators.
+
+    Args:
+        - moments1 (RunningMoments): Accumulator for population 1.
+        - moments2 (RunningMoments): Accumulator for population 2.
+
+    Returns:
+        - float: The z-statistic.
+        - float: The two-sided p-value.
+    """
+    z_stat, p_value = ztest_from_stats(
+        moments1.mean, math.sqrt(moments1.variance), moments1.count,
+        moments2.mean, math.sqrt(moments2.variance), moments2.count, usevar='pooled')
+    return float(z_stat), float(p_value)
+
+
+def one_way_anova(*moments):
+    """
+    Calculates the one-way ANOVA F-test from one accumulator per group.
+
+    Args:
+        - *moments (RunningMoments): One accumulator per group.
+
+    Returns:
+        - float: The F-statistic.
+        - float: The p-value.
+    """
+    from scipy import stats
+    total = sum(group.count for group in moments)
+    grand_mean = sum(group.count * group.mean for group in moments) / total
+    between = sum(group.count * (group.mean - grand_mean) ** 2 for group in moments)
+    within = sum(group.m2 for group in moments)
+    df_between = len(moments) - 1
+    df_within = total - len(moments)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = np.float64(between / df_between) / np.float64(within / df_within)
+    return float(f_stat), float(stats.f.sf(f_stat, df_between, df_within))
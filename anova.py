@@ -0,0 +1,266 @@
+"""This module runs one-way ANOVA on long-format data (one group label and
+one value per row) with any number of groups, and the Tukey HSD post-hoc
+comparisons of every pair of groups.
+
+The group labels are turned into integer codes once, and the group counts,
+sums and squared deviations are then each a single `np.bincount` over the
+rows, so the work grows with the number of rows rather than rows times
+groups. The Tukey HSD differences, standard errors, q statistics, p-values
+and confidence limits are k x k matrices built by broadcasting the group
+means and counts against each other."""
+
+import numpy as np
+import pandas as pd
+
+# Confidence level of the Tukey HSD intervals (the family-wise level)
+DEFAULT_LEVEL = 0.95
+
+# Most distinct q statistics whose p-values are worked out one by one; with
+# more (many groups), the p-value curve is worked out at this many points
+# and interpolated
+TUKEY_EXACT_POINTS = 64
+
+
+def factorize_groups(groups, values):
+    """
+    Turns long-format data into integer group codes.
+
+    Args:
+        - groups (array-like): The group label of each row (strings or numbers).
+        - values (array-like): The value of each row.
+
+    Returns:
+        - np.ndarray: The group code of each kept row (0 to k - 1).
+        - np.ndarray: The k group labels, sorted; code i is labels[i].
+        - np.ndarray: The kept values (float). Rows with a missing value
+            or group label are dropped.
+
+    Raises:
+        ValueError: If `groups` and `values` are not the same length.
+    """
+    groups = np.asarray(groups).ravel()
+    values = np.asarray(values, dtype=float).ravel()
+    if len(groups) != len(values):
+        raise ValueError("Each value needs a group label")
+    valid = ~np.isnan(values)
+    codes, labels = pd.factorize(groups[valid], sort=True)
+    values = values[valid]
+    if (codes < 0).any():
+        # Missing group labels
+        values = values[codes >= 0]
+        codes = codes[codes >= 0]
+    return codes.astype(np.intp, copy=False), np.asarray(labels), values
+
+
+def group_names(labels):
+    """
+    Display names of group labels, with whole numbers shown without a
+    decimal point (so numeric groups read from a file show as '1', not '1.0').
+
+    Args:
+        - labels (array-like): The group labels.
+
+    Returns:
+        - list of str: The name of each group.
+    """
+    names = []
+    for label in labels:
+        if isinstance(label, (float, np.floating)) and float(label).is_integer():
+            label = int(label)
+        names.append(str(label))
+    return names
+
+
+def group_statistics(codes, values, count=None):
+    """
+    Counts, means and sums of squared deviations of every group.
+
+    Args:
+        - codes (np.ndarray): The group code of each value.
+        - values (np.ndarray): The values.
+        - count (int): The number of groups. Defaults to the largest code plus 1.
+
+    Returns:
+        - np.ndarray: The number of values in each group.
+        - np.ndarray: The mean of each group (NaN for empty groups).
+        - np.ndarray: The sum of squared deviations from the mean of each group.
+    """
+    if count is None:
+        count = int(codes.max()) + 1 if len(codes) else 0
+    counts = np.bincount(codes, minlength=count)
+    sums = np.bincount(codes, weights=values, minlength=count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+    # Deviations from the group mean, rather than the sum of squares,
+    # keep the result accurate for large values with little spread
+    deviations = values - means[codes]
+    m2 = np.bincount(codes, weights=deviations * deviations, minlength=count)
+    return counts, means, m2
+
+
+def one_way_anova(counts, means, m2):
+    """
+    Calculates the one-way ANOVA F-test from group statistics.
+
+    Args:
+        - counts (array-like): The number of values in each group.
+        - means (array-like): The mean of each group.
+        - m2 (array-like): The sum of squared deviations of each group.
+
+    Returns:
+        - dict: 'f_stat', 'p_value', 'df_between', 'df_within' and 'mse'
+            (the within-group mean square).
+
+    Raises:
+        ValueError: If there are fewer than two groups or no more values than groups.
+    """
+    from scipy import stats
+    counts = np.asarray(counts, dtype=float)
+    means = np.asarray(means, dtype=float)
+    groups, total = len(counts), counts.sum()
+    if groups < 2 or total <= groups:
+        raise ValueError("ANOVA needs at least two groups and more values than groups")
+
+    grand_mean = (counts * means).sum() / total
+    between = (counts * (means - grand_mean) ** 2).sum()
+    df_between, df_within = groups - 1, int(total) - groups
+    mse = float(np.sum(m2)) / df_within
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = np.float64(between / df_between) / np.float64(mse)
+    return {
+        'f_stat': float(f_stat),
+        'p_value': float(stats.f.sf(f_stat, df_between, df_within)),
+        'df_between': df_between,
+        'df_within': df_within,
+        'mse': mse,
+    }
+
+
+def long_format_anova(groups, values):
+    """
+    One-way ANOVA of long-format data.
+
+    Args:
+        - groups (array-like): The group label of each row.
+        - values (array-like): The value of each row (rows with a missing
+            value or label are dropped).
+
+    Returns:
+        - dict: As from `one_way_anova`, plus 'labels', 'counts', 'means'
+            and 'm2' of the groups (in label order).
+
+    Raises:
+        ValueError: If the data does not have at least two groups and
+            more values than groups.
+    """
+    codes, labels, values = factorize_groups(groups, values)
+    counts, means, m2 = group_statistics(codes, values, len(labels))
+    result = one_way_anova(counts, means, m2)
+    result.update(labels=labels, counts=counts, means=means, m2=m2)
+    return result
+
+
+def _studentized_range_sf(q_values, groups, df):
+    """
+    Upper tail probabilities of the studentized range distribution.
+
+    scipy integrates each value numerically, which is slow when there are
+    hundreds of groups and so many thousands of pairs. With more than
+    `TUKEY_EXACT_POINTS` distinct values, the log of the tail probability
+    (smooth and decreasing in q) is worked out at that many evenly spaced
+    points and interpolated between them.
+    """
+    import warnings
+    from scipy import integrate, interpolate, stats
+    unique, inverse = np.unique(q_values, return_inverse=True)
+    with warnings.catch_warnings():
+        # Far in the tail the integration hits its accuracy limit
+        warnings.simplefilter('ignore', integrate.IntegrationWarning)
+        if len(unique) <= TUKEY_EXACT_POINTS:
+            tail = stats.studentized_range.sf(unique, groups, df)
+        else:
+            grid = np.linspace(unique[0], unique[-1], TUKEY_EXACT_POINTS)
+            log_tail = np.log(np.maximum(stats.studentized_range.sf(grid, groups, df),
+                                         np.finfo(float).tiny))
+            tail = np.exp(interpolate.PchipInterpolator(grid, log_tail)(unique))
+    return np.clip(tail, 0.0, 1.0)[inverse].reshape(np.shape(q_values))
+
+
+def tukey_hsd(counts, means, mse, df_within, level=DEFAULT_LEVEL):
+    """
+    Tukey HSD (Tukey-Kramer for unequal group sizes) comparisons of every
+    pair of groups.
+
+    Args:
+        - counts (array-like): The number of values in each group.
+        - means (array-like): The mean of each group.
+        - mse (float): The within-group mean square of the ANOVA.
+        - df_within (int): Its degrees of freedom.
+        - level (float): The family-wise confidence level of the intervals.
+
+    Returns:
+        - dict: k x k matrices, where entry (i, j) compares group i with
+            group j: 'difference' (mean i minus mean j), 'standard_error',
+            'q', 'p_value', 'lower' and 'upper' (the confidence limits of
+            the difference) and 'reject' (whether the difference is
+            significant at 1 - level); and 'critical_value', the
+            studentized range quantile the limits use.
+
+    Raises:
+        ValueError: If there are fewer than two groups or the level is invalid.
+    """
+    from scipy import stats
+    counts = np.asarray(counts, dtype=float)
+    means = np.asarray(means, dtype=float)
+    groups = len(counts)
+    if groups < 2:
+        raise ValueError("Tukey HSD needs at least two groups")
+    if not 0 < level < 1:
+        raise ValueError("The confidence level must be between 0 and 1")
+
+    difference = means[:, None] - means[None, :]
+    inverse_counts = 1.0 / counts
+    standard_error = np.sqrt(mse / 2 * (inverse_counts[:, None] + inverse_counts[None, :]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q_values = np.abs(difference) / standard_error
+
+    # Only the upper triangle is worked out; the matrix is symmetric
+    upper = np.triu_indices(groups, k=1)
+    p_value = np.ones((groups, groups))
+    p_value[upper] = _studentized_range_sf(q_values[upper], groups, df_within)
+    p_value.T[upper] = p_value[upper]
+
+    critical_value = float(stats.studentized_range.ppf(level, groups, df_within))
+    margin = critical_value * standard_error
+    return {
+        'difference': difference,
+        'standard_error': standard_error,
+        'q': q_values,
+        'p_value': p_value,
+        'lower': difference - margin,
+        'upper': difference + margin,
+        'reject': q_values > critical_value,
+        'critical_value': critical_value,
+    }
+
+
+def tukey_pairs(tukey, names, limit=None):
+    """
+    Lists the pairs of groups from `tukey_hsd`, most significant first.
+
+    Args:
+        - tukey (dict): The result of `tukey_hsd`.
+        - names (list of str): The name of each group.
+        - limit (int): Most pairs to list. All of them if None.
+
+    Returns:
+        - list of tuple: (name i, name j, difference, p-value, lower, upper)
+            for each pair i < j.
+    """
+    first, second = np.triu_indices(len(names), k=1)
+    order = np.argsort(tukey['p_value'][first, second], kind='stable')[:limit]
+    first, second = first[order], second[order]
+    return [(names[i], names[j], float(tukey['difference'][i, j]),
+             float(tukey['p_value'][i, j]), float(tukey['lower'][i, j]),
+             float(tukey['upper'][i, j]))
+            for i, j in zip(first, second)]
@@ -1,11 +1,21 @@
 """This is the app intialization page."""
 
-from flask import Flask, render_template, redirect, url_for, request #, jsonify
-from waitress import serve
-from dash_apps import create_dash_apps
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+from flask import Flask, Response, abort, jsonify, render_template, redirect, url_for, request
+from lazy_apps import LazyDashApps
+import metrics
+import parallel
+import prefork
+import compression
+import page_cache
 
 # Intialize Flask App
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
 # List of Pages -> make sure if page name is changed, the html file matches
 pages = ["home", "about", "ttest", "z_test_page", "distributions_page",
@@ -20,7 +30,46 @@ options = {
     "Regressions": pages[6]
 }
 
-create_dash_apps(app)
+# The dash apps are built on their first request, so the pages
+# below can be served without waiting for dash/scipy to load
+app.wsgi_app = LazyDashApps(app.wsgi_app, configure_server=compression.init_app)
+
+# Record the latency, payload size and errors of every route
+# (the dash apps record their own callbacks when they are built)
+metrics.instrument_flask(app)
+
+# Compress responses and add ETags and caching headers
+compression.init_app(app)
+
+# Only serve /metrics to requests from this machine
+app.config.setdefault("METRICS_LOCAL_ONLY", True)
+LOCAL_ADDRESSES = ("127.0.0.1", "::1")
+
+def render_page(template, **context):
+    """This function renders a template page the first
+    time it is requested and serves the saved copy after
+    that. The copy has an ETag, so browsers that already
+    have the page get an empty 304 reply.
+
+    Args:
+        template (str): the template file name
+        **context: the values used in the template
+
+    Returns: The page response
+    """
+    if app.debug: # Show template edits straight away while developing
+        return render_template(template, **context)
+    key = (template, repr(sorted(context.items())))
+    page = page_cache.PAGES.get_or_render(key, lambda: render_template(template, **context))
+    return page.response()
+
+def prerender_pages():
+    """This function renders every template page ahead
+    of the first visit, so no visitor waits for it."""
+    with app.test_request_context():
+        for view in (home, about, ttest, z_test_page, distributions_page,
+                     anova, regressions, example_page):
+            view()
 
 # App Routes
 @app.route("/")  # Home Page
@@ -29,7 +78,7 @@ def home(options_list=options):
 
     Returns: Creates the home page
     """
-    return render_template(f"{pages[0]}.html", options=options_list)
+    return render_page(f"{pages[0]}.html", options=options_list)
 
 @app.route("/about")  # About Page
 def about():
@@ -37,7 +86,7 @@ def about():
 
     Returns: Creates the about page
     """
-    return render_template(f"{pages[1]}.html")
+    return render_page(f"{pages[1]}.html")
 
 
 # Routing for Clicking on a button
@@ -56,7 +105,7 @@ def submit(options_list=options):
 @app.route(f"/{pages[2]}", methods=['GET', 'POST']) # T-test Page
 def ttest():
     """This function renders the t test page or handles POST requests."""
-    return render_template(f'{pages[2]}.html')
+    return render_page(f'{pages[2]}.html')
 
 @app.route(f"/{pages[3]}") # Z-Test Page
 def z_test_page():
@@ -64,7 +113,7 @@ def z_test_page():
 
     Returns: Creates the z test page
     """
-    return render_template(f'{pages[3]}.html')
+    return render_page(f'{pages[3]}.html')
 
 @app.route(f"/{pages[4]}") # Distributions Page
 def distributions_page():
@@ -72,7 +121,7 @@ def distributions_page():
 
     Returns: Creates the Data Distributions page
     """
-    return render_template(f'{pages[4]}.html')
+    return render_page(f'{pages[4]}.html')
 
 @app.route(f"/{pages[5]}") # ANOVA Page
 def anova():
@@ -80,7 +129,7 @@ def anova():
 
     Returns: Creates the ANOVA page
     """
-    return render_template(f'{pages[5]}.html')
+    return render_page(f'{pages[5]}.html')
 
 @app.route(f"/{pages[6]}") # Regressions Page
 def regressions():
@@ -88,7 +137,7 @@ def regressions():
 
     Returns: Creates the regressions page
     """
-    return render_template(f'{pages[6]}.html')
+    return render_page(f'{pages[6]}.html')
 
 @app.route(f"/{pages[7]}") # Example page
 def example_page():
@@ -99,9 +148,72 @@ def example_page():
 
     Returns: Creates the interactive page
     """
-    return render_template(f"{pages[7]}.html")
+    return render_page(f"{pages[7]}.html")
+
+@app.route("/metrics") # Prometheus metrics
+def metrics_page():
+    """This function serves the request metrics of the
+    app and the dash apps in the Prometheus text format.
+
+    Returns: The metrics text (404 for non-local requests)
+    """
+    if app.config["METRICS_LOCAL_ONLY"] and request.remote_addr not in LOCAL_ADDRESSES:
+        abort(404)
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def is_dash_callback(environ):
+    """This function tells the Dash callback requests apart.
+    The dataset store, figure caches, figure patches and edit
+    ordering they use are kept in memory, so with several
+    worker processes they are all served by the same worker.
+
+    Args:
+        environ (dict): the request's WSGI environ
+
+    Returns: True for a Dash callback request
+    """
+    return environ.get('PATH_INFO', '').endswith('/_dash-update-component')
+
+@app.route("/healthz") # Health check
+def healthz():
+    """This function reports that the worker serving
+    the request is up, for load balancers and monitors.
+
+    Returns: The status and the worker's process id
+    """
+    return jsonify(status="ok", pid=os.getpid())
 
 # Change this port # below if the terminal says that the Address is already in use.
 # If you change port #, update the README Usage instrcutions to reflect the new number
 if __name__ == "__main__":
-    serve(app, host="0.0.0.0", port=1000) # port number
+    parser = argparse.ArgumentParser(description="Run the BioStat Academy web app.")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=1000, help="Port to listen on") # port number
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes (0 for one per CPU core). Dash "
+                             "callbacks are all served by one of them")
+    parser.add_argument("--threads", type=int, default=prefork.DEFAULT_THREADS,
+                        help="Request threads in each worker")
+    parser.add_argument("--resample-workers", type=int, default=None,
+                        help="Processes used for permutation tests and bootstrap "
+                             "intervals (default: one per CPU core)")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    compression.precompress_static(app.static_folder)
+    prerender_pages()
+    workers = arguments.workers or os.cpu_count() or 1
+    # Only the worker that serves the Dash callbacks resamples
+    parallel.RESAMPLE_WORKERS = arguments.resample_workers or parallel.RESAMPLE_WORKERS
+    if workers == 1:
+        prefork.serve(app, host=arguments.host, port=arguments.port,
+                      workers=1, threads=arguments.threads)
+    else:
+        # Each worker saves its metrics here, and /metrics adds them up
+        metrics.REGISTRY.directory = tempfile.mkdtemp(prefix='statsapp-metrics-')
+        try:
+            prefork.serve(app, host=arguments.host, port=arguments.port, workers=workers,
+                          threads=arguments.threads,
+                          on_heartbeat=metrics.REGISTRY.write_snapshot,
+                          pinned=is_dash_callback)
+        finally:
+            shutil.rmtree(metrics.REGISTRY.directory, ignore_errors=True)
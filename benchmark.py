@@ -0,0 +1,337 @@
+"""This module benchmarks the engines in the plots module across data
+sizes, from a handful of table rows up to millions of uploaded values.
+For each engine and size it records the total time, the time spent on
+the statistic and on building the figure, and the peak memory used.
+Results are written as JSON, and a later run can be compared against a
+stored baseline to flag engines that have become slower.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --sizes 10 1000 100000 --baseline bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import numpy as np
+import plots
+import stats_cache
+
+# Data sizes benchmarked by default: 10 up to 10^7 values
+DEFAULT_SIZES = tuple(10 ** power for power in range(1, 8))
+
+# Timed runs per engine and size (the median is reported)
+DEFAULT_REPEAT = 3
+
+# A metric more than this many times its baseline is a regression
+DEFAULT_THRESHOLD = 1.25
+
+# Changes smaller than these are treated as noise when comparing
+MIN_SLOWDOWN_SECONDS = 0.001
+MIN_MEMORY_GROWTH_BYTES = 1024 * 1024
+
+# The metrics compared against the baseline
+TIME_METRICS = ('total_seconds', 'stat_seconds', 'figure_seconds')
+MEMORY_METRICS = ('peak_bytes',)
+
+
+class TimingCache:
+    """
+    Stand-in for the shared caches in stats_cache that never returns a
+    cached value and adds up the time spent computing. The plots engines
+    compute their statistics through `stats_cache.RESULTS` and build their
+    figures through `stats_cache.FIGURES`, so this splits the two apart.
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def get_or_compute(self, key, compute):
+        """Runs `compute` and times it, ignoring the key."""
+        start = time.perf_counter()
+        value = compute()
+        self.seconds += time.perf_counter() - start
+        return value
+
+
+@contextlib.contextmanager
+def timing_caches():
+    """
+    Swaps the shared result and figure caches for TimingCaches.
+
+    Yields:
+        - TimingCache: Times the statistics.
+        - TimingCache: Times the figures.
+    """
+    saved = stats_cache.RESULTS, stats_cache.FIGURES
+    stats_cache.RESULTS, stats_cache.FIGURES = TimingCache(), TimingCache()
+    try:
+        yield stats_cache.RESULTS, stats_cache.FIGURES
+    finally:
+        stats_cache.RESULTS, stats_cache.FIGURES = saved
+
+
+def _two_samples(size, rng):
+    return rng.normal(90, 5, size), rng.normal(91, 5, size)
+
+
+def _three_samples(size, rng):
+    return rng.normal(90, 5, size), rng.normal(91, 5, size), rng.normal(92, 5, size)
+
+
+def _distribution_stat(data):
+    """The binning done by generate_distribution_plot, timed on its own."""
+    values = data['Values']
+    return np.histogram(values, bins=plots.histogram_bin_edges(values))
+
+
+def _regression_data(size, rng):
+    x_values = rng.uniform(0, 100, size)
+    return ({'X Values': x_values, 'Y Values': 2 * x_values + 1 + rng.normal(0, 10, size)},)
+
+
+# Engine name -> (make the arguments from a size and random generator,
+#                 run the engine, time the statistic separately or None).
+# Engines that do not go through stats_cache have their statistic timed
+# with a separate call, and the figure time is the rest of the total.
+ENGINES = {
+    'initialize_ttest_data': (lambda size, rng: (size,), plots.initialize_ttest_data, None),
+    'initialize_random_data': (lambda size, rng: (size,), plots.initialize_random_data, None),
+    'initialize_anova_data': (lambda size, rng: (size,), plots.initialize_anova_data, None),
+    'initialize_linear_data': (lambda size, rng: (size,), plots.initialize_linear_data, None),
+    'generate_ttest_plot': (_two_samples, plots.generate_ttest_plot, None),
+    'generate_ztest_plot': (_two_samples, plots.generate_ztest_plot, None),
+    'generate_distribution_plot': (lambda size, rng: ({'Values': rng.normal(0, 1, size)},),
+                                   plots.generate_distribution_plot, _distribution_stat),
+    'generate_anova_plot': (_three_samples, plots.generate_anova_plot, None),
+    'generate_linear_regression_plot': (_regression_data, plots.generate_linear_regression_plot,
+                                        None),
+}
+
+# Engines that only build data and have no statistic or figure
+INITIALIZERS = tuple(name for name in ENGINES if name.startswith('initialize_'))
+
+
+def time_engine(name, args):
+    """
+    Runs an engine once and times it.
+
+    Args:
+        - name (str): The engine name (a key of ENGINES).
+        - args (tuple): The arguments to call it with.
+
+    Returns:
+        - dict: 'total_seconds', 'stat_seconds' and 'figure_seconds'.
+    """
+    _, run, run_stat = ENGINES[name]
+    with timing_caches() as (results, figures):
+        start = time.perf_counter()
+        run(*args)
+        total = time.perf_counter() - start
+
+    if name in INITIALIZERS:
+        return {'total_seconds': total, 'stat_seconds': 0.0, 'figure_seconds': 0.0}
+    if run_stat is not None:
+        start = time.perf_counter()
+        run_stat(*args)
+        stat = time.perf_counter() - start
+        return {'total_seconds': total, 'stat_seconds': stat,
+                'figure_seconds': max(total - stat, 0.0)}
+    return {'total_seconds': total, 'stat_seconds': results.seconds,
+            'figure_seconds': figures.seconds}
+
+
+def peak_memory(name, args):
+    """
+    Measures the most memory an engine allocates while it runs.
+
+    Args:
+        - name (str): The engine name (a key of ENGINES).
+        - args (tuple): The arguments to call it with.
+
+    Returns:
+        - int: The peak number of bytes allocated above what was in use before.
+    """
+    _, run, _ = ENGINES[name]
+    with timing_caches():
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            run(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return max(peak - before, 0)
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, engines=None, repeat=DEFAULT_REPEAT, seed=0,
+                   report=None):
+    """
+    Benchmarks the engines at each data size.
+
+    Args:
+        - sizes (iterable of int): The data sizes (values per group).
+        - engines (iterable of str): The engines to run (default all of ENGINES).
+        - repeat (int): Timed runs per engine and size; the median is kept.
+        - seed (int): Seed for the random test data.
+        - report (callable): Called with each result as it is made.
+
+    Returns:
+        - list of dict: One result per engine and size, with 'engine', 'n',
+            'repeat', the TIME_METRICS (medians) and 'peak_bytes'.
+
+    Raises:
+        ValueError: If an engine name is unknown.
+    """
+    engines = list(ENGINES) if engines is None else list(engines)
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        raise ValueError(f"Unknown engine(s): {', '.join(unknown)}")
+
+    # Run each engine once on a little data first, so one-off costs such as
+    # importing scipy are not counted against the first size
+    for name in engines:
+        time_engine(name, ENGINES[name][0](10, np.random.default_rng(seed)))
+
+    results = []
+    for size in sizes:
+        for name in engines:
+            args = ENGINES[name][0](size, np.random.default_rng(seed))
+            runs = [time_engine(name, args) for _ in range(repeat)]
+            result = {'engine': name, 'n': size, 'repeat': repeat}
+            for metric in TIME_METRICS:
+                result[metric] = statistics.median(run[metric] for run in runs)
+            result['peak_bytes'] = peak_memory(name, args)
+            results.append(result)
+            if report is not None:
+                report(result)
+    return results
+
+
+def write_results(path, results):
+    """
+    Writes benchmark results, with details of the machine, as JSON.
+
+    Args:
+        - path (str): The file to write.
+        - results (list of dict): The results from `run_benchmarks`.
+    """
+    document = {
+        'machine': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(document, file, indent=2)
+
+
+def read_results(path):
+    """
+    Reads results written by `write_results`.
+
+    Args:
+        - path (str): The file to read.
+
+    Returns:
+        - list of dict: The results.
+    """
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Finds the metrics that have grown past `threshold` times their baseline.
+    Results are matched to the baseline by engine and size; ones missing
+    from the baseline are skipped. Small absolute changes (under
+    MIN_SLOWDOWN_SECONDS or MIN_MEMORY_GROWTH_BYTES) are ignored as noise.
+
+    Args:
+        - results (list of dict): The new results.
+        - baseline (list of dict): The stored results to compare against.
+        - threshold (float): The allowed ratio of new to baseline.
+
+    Returns:
+        - list of dict: One entry per regression, with 'engine', 'n',
+            'metric', 'baseline', 'current' and 'ratio'.
+    """
+    stored = {(result['engine'], result['n']): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = stored.get((result['engine'], result['n']))
+        if previous is None:
+            continue
+        for metric in TIME_METRICS + MEMORY_METRICS:
+            old, new = previous.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            noise = MIN_MEMORY_GROWTH_BYTES if metric in MEMORY_METRICS else MIN_SLOWDOWN_SECONDS
+            if new - old < noise:
+                continue
+            ratio = new / old if old > 0 else float('inf')
+            if ratio > threshold:
+                regressions.append({'engine': result['engine'], 'n': result['n'],
+                                    'metric': metric, 'baseline': old, 'current': new,
+                                    'ratio': ratio})
+    return regressions
+
+
+def format_result(result):
+    """Formats one result as a line of the report."""
+    return (f"{result['engine']:<34}{result['n']:>10,}"
+            f"{result['total_seconds'] * 1000:>12.2f}{result['stat_seconds'] * 1000:>12.2f}"
+            f"{result['figure_seconds'] * 1000:>12.2f}{result['peak_bytes'] / 2 ** 20:>12.1f}")
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks from the command line.
+
+    Returns:
+        - int: The exit code (1 if any regressions were found).
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Data sizes to run (default 10 up to 10^7)")
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES),
+                        help="Engines to run (default all)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="Timed runs per engine and size")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the test data")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against results stored in this JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Ratio to the baseline counted as a regression")
+    options = parser.parse_args(argv)
+
+    print(f"{'engine':<34}{'n':>10}{'total ms':>12}{'stat ms':>12}{'figure ms':>12}"
+          f"{'peak MiB':>12}")
+    results = run_benchmarks(options.sizes, options.engines, options.repeat, options.seed,
+                             report=lambda result: print(format_result(result), flush=True))
+    if options.output:
+        write_results(options.output, results)
+
+    if not options.baseline:
+        return 0
+    regressions = compare_results(results, read_results(options.baseline), options.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression['engine']} n={regression['n']:,} {regression['metric']}: "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g} "
+              f"({regression['ratio']:.2f}x)")
+    if not regressions:
+        print(f"No regressions against {options.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
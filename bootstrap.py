@@ -0,0 +1,278 @@
+"""This module works out bootstrap confidence intervals for a mean, the
+difference of two means, and the slope and intercept of a simple linear
+regression.
+
+The resamples are drawn in blocks: a block is a matrix of random row
+indices, one resample per row, and the statistic of every row is taken
+at once (for the regression, the closed-form least-squares fit from the
+resample's sums, rather than refitting a model per resample). Blocks are
+sized to a memory budget and can be spread over a pool of worker
+processes (see the parallel module); each has its own random stream, so
+the intervals only depend on the seed.
+
+Intervals are percentile or BCa (bias-corrected and accelerated). The
+acceleration comes from the jackknife, which also has a closed form for
+these statistics."""
+
+from statistics import NormalDist
+import numpy as np
+import parallel
+
+# Ways of turning the resamples into an interval
+METHODS = ('percentile', 'bca')
+
+# Resamples drawn by default
+DEFAULT_RESAMPLES = 10000
+
+# Confidence level used when none is given
+DEFAULT_LEVEL = 0.95
+
+# Seed used when none is given, so repeated runs give the same interval
+DEFAULT_SEED = 0
+
+# Bytes a block of resamples may use (indices and gathered values)
+MEMORY_BUDGET = 64 * 1024 * 1024
+BYTES_PER_CELL = 24
+
+
+def _mean_blocks(values, blocks):
+    """Means of the resamples of each block (run in the worker processes)."""
+    results = []
+    for rows, seed in blocks:
+        indices = np.random.default_rng(seed).integers(0, len(values), size=(rows, len(values)))
+        results.append(values[indices].mean(axis=1))
+    return results
+
+
+def _mean_difference_blocks(values1, values2, blocks):
+    """Differences of the resampled means of each block (run in the worker processes)."""
+    results = []
+    for rows, seed in blocks:
+        rng = np.random.default_rng(seed)
+        indices1 = rng.integers(0, len(values1), size=(rows, len(values1)))
+        indices2 = rng.integers(0, len(values2), size=(rows, len(values2)))
+        results.append(values1[indices1].mean(axis=1) - values2[indices2].mean(axis=1))
+    return results
+
+
+def _regression_blocks(x_values, y_values, blocks):
+    """
+    Least-squares slope and intercept of each resampled (x, y) pair set
+    of each block (run in the worker processes). The values are expected
+    to be centered, so the intercept is at the mean of x and y.
+    """
+    results = []
+    count = len(x_values)
+    for rows, seed in blocks:
+        indices = np.random.default_rng(seed).integers(0, count, size=(rows, count))
+        x_sample, y_sample = x_values[indices], y_values[indices]
+        x_mean, y_mean = x_sample.mean(axis=1), y_sample.mean(axis=1)
+        sxx = np.einsum('ij,ij->i', x_sample, x_sample) / count - x_mean ** 2
+        sxy = np.einsum('ij,ij->i', x_sample, y_sample) / count - x_mean * y_mean
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = sxy / sxx  # NaN for a resample whose x values are all the same
+        results.append(np.column_stack([slope, y_mean - slope * x_mean]))
+    return results
+
+
+def _resample(function, arrays, resamples, seed, workers, memory_budget):
+    """Draws the resamples with `function` and returns them in one array."""
+    cells = sum(len(values) for values in arrays)
+    blocks = parallel.seeded_blocks(resamples, memory_budget // (cells * BYTES_PER_CELL), seed)
+    return np.concatenate(parallel.map_blocks(function, arrays, blocks, workers))
+
+
+def _acceleration(jackknife):
+    """
+    BCa acceleration from the jackknife estimates of each sample.
+
+    Args:
+        - jackknife (list of np.ndarray): For each sample, the statistic
+            with each of its values left out in turn.
+
+    Returns:
+        - float: The acceleration.
+    """
+    numerator = denominator = 0.0
+    for estimates in jackknife:
+        estimates = estimates[~np.isnan(estimates)]
+        count = len(estimates)
+        influence = (count - 1) * (estimates.mean() - estimates)
+        numerator += (influence ** 3).sum() / count ** 3
+        denominator += (influence ** 2).sum() / count ** 2
+    if denominator == 0:
+        return 0.0
+    return float(numerator / (6 * denominator ** 1.5))
+
+
+def confidence_interval(distribution, estimate, jackknife=None, level=DEFAULT_LEVEL,
+                        method='bca'):
+    """
+    Turns a bootstrap distribution into a confidence interval.
+
+    Args:
+        - distribution (np.ndarray): The statistic of each resample (NaNs,
+            from resamples where it is undefined, are dropped).
+        - estimate (float): The statistic of the original data.
+        - jackknife (list of np.ndarray): Jackknife estimates of each sample
+            (see `_acceleration`); needed for 'bca'.
+        - level (float): The confidence level, between 0 and 1.
+        - method (str): 'percentile' or 'bca'. If every resample falls on
+            one side of the estimate, BCa is not defined and the
+            percentile interval is returned.
+
+    Returns:
+        - float: The lower limit.
+        - float: The upper limit.
+
+    Raises:
+        ValueError: If the method or level is invalid.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown interval method '{method}'")
+    if not 0 < level < 1:
+        raise ValueError("The confidence level must be between 0 and 1")
+    distribution = distribution[~np.isnan(distribution)]
+    if not len(distribution):
+        return float('nan'), float('nan')
+
+    alpha = (1 - level) / 2
+    probabilities = [alpha, 1 - alpha]
+    if method == 'bca':
+        below = (np.count_nonzero(distribution < estimate)
+                 + 0.5 * np.count_nonzero(distribution == estimate)) / len(distribution)
+        if 0 < below < 1:
+            normal = NormalDist()
+            bias = normal.inv_cdf(below)
+            acceleration = _acceleration(jackknife)
+            probabilities = []
+            for z_value in (normal.inv_cdf(alpha), normal.inv_cdf(1 - alpha)):
+                shifted = bias + z_value
+                probabilities.append(normal.cdf(bias + shifted / (1 - acceleration * shifted)))
+    low, high = np.quantile(distribution, probabilities)
+    return float(low), float(high)
+
+
+def _clean(values):
+    values = np.asarray(values, dtype=float).ravel()
+    return values[~np.isnan(values)]
+
+
+def bootstrap_mean(values, level=DEFAULT_LEVEL, method='bca', resamples=DEFAULT_RESAMPLES,
+                   seed=DEFAULT_SEED, workers=1, memory_budget=MEMORY_BUDGET):
+    """
+    Bootstrap confidence interval for a mean.
+
+    Args:
+        - values (array-like): The sample (NaNs are dropped).
+        - level (float): The confidence level.
+        - method (str): 'percentile' or 'bca'.
+        - resamples (int): The number of resamples.
+        - seed (int): Seed of the resamples.
+        - workers (int): Worker processes to spread the resamples over
+            (None for one per CPU). With 1, they are drawn in this process.
+        - memory_budget (int): Most bytes used by one block of resamples.
+
+    Returns:
+        - float: The sample mean.
+        - float: The lower limit.
+        - float: The upper limit.
+
+    Raises:
+        ValueError: If there are fewer than two values.
+    """
+    values = _clean(values)
+    if len(values) < 2:
+        raise ValueError("A bootstrap interval needs at least two values")
+    estimate = float(values.mean())
+    distribution = _resample(_mean_blocks, (values,), resamples, seed, workers, memory_budget)
+    jackknife = [(values.sum() - values) / (len(values) - 1)]
+    return (estimate,) + confidence_interval(distribution, estimate, jackknife, level, method)
+
+
+def bootstrap_mean_difference(values1, values2, level=DEFAULT_LEVEL, method='bca',
+                              resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED, workers=1,
+                              memory_budget=MEMORY_BUDGET):
+    """
+    Bootstrap confidence interval for the difference of two means
+    (sample 1 minus sample 2), resampling each sample on its own.
+
+    Args:
+        - values1 (array-like): Sample 1 (NaNs are dropped).
+        - values2 (array-like): Sample 2 (NaNs are dropped).
+        - level, method, resamples, seed, workers, memory_budget: As for
+            `bootstrap_mean`.
+
+    Returns:
+        - float: The difference of the sample means.
+        - float: The lower limit.
+        - float: The upper limit.
+
+    Raises:
+        ValueError: If either sample has fewer than two values.
+    """
+    values1, values2 = _clean(values1), _clean(values2)
+    if len(values1) < 2 or len(values2) < 2:
+        raise ValueError("A bootstrap interval needs at least two values in each sample")
+    mean1, mean2 = values1.mean(), values2.mean()
+    estimate = float(mean1 - mean2)
+    distribution = _resample(_mean_difference_blocks, (values1, values2), resamples, seed,
+                             workers, memory_budget)
+    jackknife = [(values1.sum() - values1) / (len(values1) - 1) - mean2,
+                 mean1 - (values2.sum() - values2) / (len(values2) - 1)]
+    return (estimate,) + confidence_interval(distribution, estimate, jackknife, level, method)
+
+
+def bootstrap_regression(x_values, y_values, level=DEFAULT_LEVEL, method='bca',
+                         resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED, workers=1,
+                         memory_budget=MEMORY_BUDGET):
+    """
+    Bootstrap confidence intervals for the slope and intercept of a simple
+    linear regression, resampling (x, y) pairs.
+
+    Args:
+        - x_values (array-like): The X values.
+        - y_values (array-like): The Y values (pairs with a NaN are dropped).
+        - level, method, resamples, seed, workers, memory_budget: As for
+            `bootstrap_mean`.
+
+    Returns:
+        - dict: 'slope' and 'intercept', each (estimate, lower limit, upper limit).
+
+    Raises:
+        ValueError: If there are fewer than three pairs or x does not vary.
+    """
+    x_values = np.asarray(x_values, dtype=float).ravel()
+    y_values = np.asarray(y_values, dtype=float).ravel()
+    valid = ~(np.isnan(x_values) | np.isnan(y_values))
+    x_values, y_values = x_values[valid], y_values[valid]
+    count = len(x_values)
+    if count < 3 or np.ptp(x_values) == 0:
+        raise ValueError("A regression interval needs at least three pairs and varying X values")
+
+    # Centering keeps the sums accurate; the intercept is moved back at the end
+    x_mean, y_mean = x_values.mean(), y_values.mean()
+    x_centered, y_centered = x_values - x_mean, y_values - y_mean
+    sxx, sxy = (x_centered ** 2).sum(), (x_centered * y_centered).sum()
+    slope = sxy / sxx
+    intercept = y_mean - slope * x_mean
+
+    distribution = _resample(_regression_blocks, (x_centered, y_centered), resamples, seed,
+                             workers, memory_budget)
+    slopes = distribution[:, 0]
+    intercepts = y_mean + distribution[:, 1] - slopes * x_mean
+
+    # Leave-one-out fits, from the sums with each pair taken out
+    rest = count - 1
+    sum_x, sum_y = -x_centered, -y_centered  # The centered sums are 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loo_sxx = (sxx - x_centered ** 2) - sum_x ** 2 / rest
+        loo_sxy = (sxy - x_centered * y_centered) - sum_x * sum_y / rest
+        loo_slopes = loo_sxy / loo_sxx
+    loo_intercepts = y_mean + (sum_y - loo_slopes * sum_x) / rest - loo_slopes * x_mean
+    return {
+        'slope': (float(slope),) + confidence_interval(
+            slopes, slope, [loo_slopes], level, method),
+        'intercept': (float(intercept),) + confidence_interval(
+            intercepts, intercept, [loo_intercepts], level, method),
+    }
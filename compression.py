@@ -0,0 +1,254 @@
+"""This module compresses responses and sets their caching headers.
+
+Responses from the app and the Dash apps (callback JSON, layouts, the
+Dash component bundles) are gzip or brotli compressed when the browser
+accepts it and they are big enough to be worth it. Responses with a
+strong ETag are compressed once and the result is reused, so the large
+Dash bundles are only compressed on their first request.
+
+Files under static/ get .gz/.br copies made ahead of time (see
+`precompress_static`), a strong content-hash ETag, and a fingerprint in
+their URL; a request carrying the current fingerprint is cached by the
+browser for a year as immutable."""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+import stats_cache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+MIN_SIZE = 1024
+
+# Compression levels for responses compressed on the fly
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Compression levels for static files compressed ahead of time
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+# Content types worth compressing (images such as PNG/JPEG already are)
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'application/xml', 'image/svg+xml')
+
+# File extension of each precompressed variant
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Cache lifetime of fingerprinted (immutable) files, in seconds
+IMMUTABLE_MAX_AGE = 31536000
+
+# Query parameter holding a static file's fingerprint
+FINGERPRINT_ARG = 'v'
+
+# Compressed bodies of responses with strong ETags, by (ETag, encoding)
+_COMPRESSED = stats_cache.LRUCache(max_entries=64)
+
+# Content hashes of static files, by (path, modification time, size)
+_FILE_HASHES = stats_cache.LRUCache(max_entries=1024)
+
+
+def accepted_encodings():
+    """
+    Lists the encodings the current request accepts, best first.
+
+    Returns:
+        - list of str: 'br' (if the brotli package is installed) and/or 'gzip'.
+    """
+    encodings = []
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings.quality(encoding) > 0:
+            encodings.append(encoding)
+    return encodings
+
+
+def compress(data, encoding, level=None):
+    """
+    Compresses bytes with gzip or brotli.
+
+    Args:
+        - data (bytes): The data.
+        - encoding (str): 'gzip' or 'br'.
+        - level (int): The gzip level or brotli quality (defaults to the
+            on-the-fly levels).
+
+    Returns:
+        - bytes: The compressed data.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 keeps the output (and so the ETag) the same for the same data
+    return gzip.compress(data, GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def is_compressible(mimetype):
+    """Checks whether a content type is worth compressing."""
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def finish_response(response):
+    """
+    Compresses a response and sets its caching headers. Used as an
+    `after_request` hook (see `init_app`).
+
+    Args:
+        - response (flask.Response): The response.
+
+    Returns:
+        - flask.Response: The same response, possibly compressed or
+            turned into a 304.
+    """
+    # Files sent straight from disk (static files) have their own handler
+    if response.direct_passthrough or response.is_streamed:
+        return response
+
+    if response.cache_control.max_age and response.cache_control.max_age >= IMMUTABLE_MAX_AGE:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+
+    cacheable = request.method in ('GET', 'HEAD') and response.status_code == 200
+    if cacheable and response.get_etag()[0] is None:
+        response.add_etag()  # A strong ETag from the content
+
+    if (response.status_code == 200 and 'Content-Encoding' not in response.headers
+            and is_compressible(response.mimetype)):
+        response.vary.add('Accept-Encoding')
+        encodings = accepted_encodings()
+        data = response.get_data()
+        if encodings and len(data) >= MIN_SIZE:
+            encoding = encodings[0]
+            etag, weak = response.get_etag()
+            if etag is not None and not weak:
+                body = _COMPRESSED.get_or_compute((etag, encoding),
+                                                  lambda: compress(data, encoding))
+                response.set_etag(f'{etag}-{encoding}')
+            else:
+                body = compress(data, encoding)
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+
+    if cacheable:
+        response.make_conditional(request)
+    return response
+
+
+def file_hash(path):
+    """
+    Returns the content hash of a file, cached until the file changes.
+
+    Args:
+        - path (str): The file.
+
+    Returns:
+        - str: A hex digest of the contents.
+    """
+    status = os.stat(path)
+    key = (path, status.st_mtime_ns, status.st_size)
+
+    def hash_file():
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    return _FILE_HASHES.get_or_compute(key, hash_file)
+
+
+def precompress_static(folder):
+    """
+    Writes .gz (and, with brotli installed, .br) copies of the compressible
+    files in a folder, skipping copies that are already up to date. Run at
+    startup, or ahead of time as a build step.
+
+    Args:
+        - folder (str): The static folder.
+
+    Returns:
+        - int: The number of copies written.
+    """
+    written = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.endswith(tuple(ENCODING_SUFFIXES.values())):
+                continue
+            path = os.path.join(root, name)
+            if not is_compressible(mimetypes.guess_type(name)[0]):
+                continue
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                if encoding == 'br' and brotli is None:
+                    continue
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                with open(path, 'rb') as file:
+                    data = file.read()
+                level = STATIC_BROTLI_QUALITY if encoding == 'br' else STATIC_GZIP_LEVEL
+                with open(target, 'wb') as file:
+                    file.write(compress(data, encoding, level))
+                written += 1
+    return written
+
+
+def init_app(server):
+    """
+    Adds compression, ETags and caching headers to a Flask server, and
+    serves its static files with precompressed copies and fingerprints.
+
+    Args:
+        - server (Flask): The server.
+    """
+    server.after_request(finish_response)
+    if not server.has_static_folder:
+        return
+    static_folder = server.static_folder
+
+    def serve_static(filename):
+        path = safe_join(static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        fingerprint = file_hash(path)
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+        sent_path, encoding = path, None
+        if is_compressible(mimetype):
+            for accepted in accepted_encodings():
+                candidate = path + ENCODING_SUFFIXES[accepted]
+                if os.path.isfile(candidate) and \
+                        os.path.getmtime(candidate) >= os.path.getmtime(path):
+                    sent_path, encoding = candidate, accepted
+                    break
+
+        etag = fingerprint if encoding is None else f'{fingerprint}-{encoding}'
+        response = send_file(sent_path, mimetype=mimetype, etag=etag, conditional=True)
+        if is_compressible(mimetype):
+            response.vary.add('Accept-Encoding')
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if request.args.get(FINGERPRINT_ARG) == fingerprint[:12]:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True  # Always check the ETag
+        return response
+
+    server.view_functions['static'] = serve_static
+
+    @server.url_defaults
+    def add_fingerprint(endpoint, values):
+        if endpoint != 'static' or FINGERPRINT_ARG in values:
+            return
+        path = safe_join(static_folder, values.get('filename', ''))
+        if path is not None and os.path.isfile(path):
+            values[FINGERPRINT_ARG] = file_hash(path)[:12]
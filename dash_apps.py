@@ -1,19 +1,58 @@
 """This module initalizes the plots so they can be
 viewed in the web app. It uses dash to do so."""
 
+import json
+import os
+import threading
+import time
+import dash
 from dash import Dash, dcc, html, dash_table
 from dash.dependencies import Input, Output, State
 import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
 import plots
+import permutation
+import bootstrap
+import power
+import anova
+import differential
+import datastore
+import upload
+import metrics
+import page_cache
+import serialization
+import stats_cache
+import ztest
+
+# Message shown when a table's data is no longer held in the dataset store
+DATASET_MISSING_TEXT = ("Data is not available on the server. The table is being sent "
+                        "again; press the button once more.")
+
+# Blank figure shown before a plot is requested. Every figure a callback
+# returns goes through serialization.pack_figure, which sends the numeric
+# arrays as typed arrays.
+EMPTY_FIGURE = serialization.pack_figure(go.Figure())
+
+# Quiet time (ms) a table must have before a burst of edits is sent on
+EDIT_DEBOUNCE_MS = 300
+
+# How often (ms) the t-test page asks how far a genome-wide run has got
+VOLCANO_POLL_MS = 500
+
+# Newest debounced edit seen from each page, so the results of older
+# edits still queued or being worked out can be dropped
+_LATEST_EDITS = stats_cache.LRUCache(max_entries=1024)
+_LATEST_EDITS_LOCK = threading.Lock()
 
 def create_dash_apps(flask_app):
     """This decorator creates the dash app
     so the plots can be interactive and viewed
     on the web app. The functions in this decorator
     change the plots as needed and ensure everything
-    is formatted correctly.
+    is formatted correctly. All the apps are built
+    at once; app.py builds each one on its first
+    request instead (see lazy_apps).
 
     Args:
         flask_app (flash_app): This function need an
@@ -24,6 +63,19 @@ def create_dash_apps(flask_app):
         contains the information needs for the dash apps
         to start up.
     """
+    return {name: build_dash_app(name, flask_app) for name in DASH_APP_BUILDERS}
+
+def create_test_app(flask_app):
+    """This function creates the dash app for
+    the example plot on the reference page.
+
+    Args:
+        flask_app (Flask): the flask server the dash app
+        is added to
+
+    Returns:
+        Dash: the dash app
+    """
     # Test Graph for the Reference Page
     dash_test_app = Dash(__name__, server=flask_app, routes_pathname_prefix="/dash_test/")
     dash_test_app.layout = html.Div(
@@ -49,15 +101,28 @@ def create_dash_apps(flask_app):
         x = ["x", "x^2", "x^3"]
         y = [value, value**2, value**3]
 
-        return {
+        return serialization.pack_figure({
             "data": [go.Bar(x=x, y=y)],
             "layout": {
                 "title": "Dataset Visualization",
                 "xaxis": {"title": "Functions"},
                 "yaxis": {"title": "Values"},
             },
-        }
+        })
 
+    return dash_test_app
+
+def create_ttest_app(flask_app):
+    """This function creates the dash app for
+    the t-test page.
+
+    Args:
+        flask_app (Flask): the flask server the dash app
+        is added to
+
+    Returns:
+        Dash: the dash app
+    """
     # Making the T-test figures
     dash_ttest_app = Dash(__name__, server=flask_app, routes_pathname_prefix="/dash_ttest/")
     tdf1, tdf2 = plots.initialize_ttest_data(10)
@@ -69,56 +134,218 @@ def create_dash_apps(flask_app):
         html.Div([
             html.H3("Enter Data for Population 1"),
             create_data_table_two_col('ttest-data-table1', tdf1, 'Population 1'),
+            *create_dataset_stores('ttest-data-table1-token'),
             html.Button("Add Row to Population 1", id="ttest-add-row-btn1", n_clicks=0),
         ]),
         html.Div([
             html.H3("Enter Data for Population 2"),
             create_data_table_two_col('ttest-data-table2', tdf2, 'Population 2'),
+            *create_dataset_stores('ttest-data-table2-token'),
             html.Button("Add Row to Population 2", id="ttest-add-row-btn2", n_clicks=0),
         ]),
+        html.H3("Or Upload a CSV/TSV File"),
+        create_upload_section('ttest-upload'),
+        dcc.Checklist(id='ttest-permutation',
+                      options=[{'label': ' Also run a permutation test', 'value': 'on'}],
+                      value=[]),
+        dcc.Checklist(id='ttest-bootstrap',
+                      options=[{'label': ' Bootstrap confidence interval for the difference',
+                                'value': 'on'}],
+                      value=[]),
         html.Button("Update Box Plot and T-Test", id="ttest-update-plot-btn", n_clicks=0),
         dcc.Graph(id='ttest-box-plot'),
+        dcc.Store(id='ttest-box-plot-shown'),
         html.H3("T-Test Result"),
         html.Div(id='ttest-result', style={'marginTop': '20px'}),
+        create_power_section('ttest', 'ttest'),
+
+        # Expression matrices are too large to upload, so they are read
+        # from the server's data directory
+        html.H3("Genome-Wide Differential Testing"),
+        html.P("Test every feature (e.g. gene) of an expression matrix in the data "
+               "directory: one row per feature, one column per sample."),
+        html.Label("Matrix File"),
+        dcc.Dropdown(id='ttest-matrix-file'),
+        html.Button("Refresh File List", id="ttest-matrix-refresh", n_clicks=0),
+        html.Label("Group 1 Samples (names or patterns such as control_*, separated by commas)"),
+        dcc.Input(id='ttest-matrix-group1', type='text'),
+        html.Label("Group 2 Samples"),
+        dcc.Input(id='ttest-matrix-group2', type='text'),
+        dcc.RadioItems(id='ttest-matrix-test',
+                       options=[{'label': ' Welch t-test', 'value': 'welch'},
+                                {'label': ' Z-test', 'value': 'ztest'}],
+                       value='welch'),
+        dcc.RadioItems(id='ttest-matrix-correction',
+                       options=[{'label': ' Benjamini-Hochberg (FDR)', 'value': 'bh'},
+                                {'label': ' Bonferroni', 'value': 'bonferroni'}],
+                       value='bh'),
+        html.Button("Run Tests and Update Volcano Plot", id="ttest-matrix-btn", n_clicks=0),
+        # The tests run on the server in the background; the page polls for progress
+        dcc.Store(id='ttest-matrix-job'),
+        dcc.Interval(id='ttest-matrix-poll', interval=VOLCANO_POLL_MS, disabled=True),
+        dcc.Graph(id='ttest-volcano-plot'),
+        html.Div(id='ttest-matrix-result'),
     ])
 
-    # T-test Plot
-    # Callback to add rows to Population 1
+    # Add rows in the browser, with a random value like the starting rows
+    register_add_row(dash_ttest_app, 'ttest-add-row-btn1', 'ttest-data-table1',
+                     {'Population 1': (80, 100)})
+    register_add_row(dash_ttest_app, 'ttest-add-row-btn2', 'ttest-data-table2',
+                     {'Population 2': (80, 100)})
+
+    # Keep the server-side copies of the tables up to date
+    register_dataset_sync(dash_ttest_app, 'ttest-data-table1', 'ttest-data-table1-token',
+                          ['X Values', 'Population 1'])
+    register_dataset_sync(dash_ttest_app, 'ttest-data-table2', 'ttest-data-table2-token',
+                          ['X Values', 'Population 2'])
+    register_upload(dash_ttest_app, 'ttest-upload',
+                    [('ttest-data-table1-token', ['Population 1']),
+                     ('ttest-data-table2-token', ['Population 2'])])
+
+    # Callback to update the T-Test Plot and Results
     @dash_ttest_app.callback(
-        Output('ttest-data-table1', 'data'),
-        Input('ttest-add-row-btn1', 'n_clicks'),
-        State('ttest-data-table1', 'data')
+        Output('ttest-box-plot', 'figure'),
+        Output('ttest-box-plot-shown', 'data'),
+        Output('ttest-result', 'children'),
+        Output('ttest-data-table1-token-pending', 'data', allow_duplicate=True),
+        Output('ttest-data-table1-token-resend', 'data', allow_duplicate=True),
+        Output('ttest-data-table2-token-pending', 'data', allow_duplicate=True),
+        Output('ttest-data-table2-token-resend', 'data', allow_duplicate=True),
+        Input('ttest-update-plot-btn', 'n_clicks'),
+        State('ttest-data-table1-token', 'data'),
+        State('ttest-data-table2-token', 'data'),
+        State('ttest-data-table1-token-pending', 'data'),
+        State('ttest-data-table2-token-pending', 'data'),
+        State('ttest-permutation', 'value'),
+        State('ttest-bootstrap', 'value'),
+        State('ttest-box-plot-shown', 'data'),
+        prevent_initial_call='initial_duplicate'
     )
-    def add_row_ttest_population1(n_clicks, data1):
+    def update_ttest_plot(n_clicks, token1, token2, pending1, pending2, permutation_test,
+                          bootstrap_interval, shown):
         if n_clicks > 0:
-            data1.append({'X Values': len(data1) + 1, 'Population 1': np.random.randint(80, 101)})
-        return data1
+            # Rows added since the tables were last sent are written first
+            tables = flush_tables((token1, pending1), (token2, pending2))
+            values1 = datastore.STORE.get_column(token1, 'Population 1')
+            values2 = datastore.STORE.get_column(token2, 'Population 2')
+            moments = (datastore.STORE.get_moments(token1, 'Population 1'),
+                       datastore.STORE.get_moments(token2, 'Population 2'))
+            if values1 is None or values2 is None or None in moments:
+                return EMPTY_FIGURE, None, DATASET_MISSING_TEXT, *tables
+            permutations = permutation.DEFAULT_PERMUTATIONS if permutation_test else 0
+            resamples = bootstrap.DEFAULT_RESAMPLES if bootstrap_interval else 0
+            figure, t_test_result_text = plots.generate_ttest_plot(
+                values1, values2, moments=moments, permutations=permutations,
+                bootstrap_resamples=resamples)
+            # Only the parts of the figure that changed are sent
+            figure, shown = serialization.figure_update(figure, shown)
+            return figure, shown, t_test_result_text, *tables
+        return EMPTY_FIGURE, None, "No updates requested.", *[dash.no_update] * 4
+
+    register_power(dash_ttest_app, 'ttest', 'ttest')
+
+    # List the matrix files when the page loads
+    @dash_ttest_app.callback(
+        Output('ttest-matrix-file', 'options'),
+        Input('ttest-matrix-refresh', 'n_clicks')
+    )
+    def list_matrix_files(n_clicks):
+        return differential.list_matrix_files()
 
-    # Callback to add rows to Population 2
+    # Genome-wide tests, started in the background
     @dash_ttest_app.callback(
-        Output('ttest-data-table2', 'data'),
-        Input('ttest-add-row-btn2', 'n_clicks'),
-        State('ttest-data-table2', 'data')
+        Output('ttest-matrix-job', 'data'),
+        Output('ttest-matrix-result', 'children', allow_duplicate=True),
+        Output('ttest-matrix-poll', 'disabled', allow_duplicate=True),
+        Input('ttest-matrix-btn', 'n_clicks'),
+        State('ttest-matrix-file', 'value'),
+        State('ttest-matrix-group1', 'value'),
+        State('ttest-matrix-group2', 'value'),
+        State('ttest-matrix-test', 'value'),
+        prevent_initial_call=True
     )
-    def add_row_ttest_population2(n_clicks, data2):
-        if n_clicks > 0:
-            data2.append({'X Values': len(data2) + 1, 'Population 2': np.random.randint(80, 101)})
-        return data2
+    def start_volcano_job(n_clicks, filename, group1, group2, test):
+        """
+        Starts testing every feature of a matrix file in the data directory
+        (or reusing the results of an earlier run) on a background thread.
 
-    # Callback to update the T-Test Plot and Results
+        Args:
+            - n_clicks (int): Click count for the run button.
+            - filename (str): The matrix file, from the file list.
+            - group1 (str): Group 1 sample names or patterns.
+            - group2 (str): Group 2 sample names or patterns.
+            - test (str): 'welch' or 'ztest'.
+
+        Returns:
+            - job (str): The id of the run.
+            - volcano_text (str): The status of the run.
+            - disabled (bool): False to start polling the run.
+        """
+        # Only files listed in the data directory can be read
+        if filename not in differential.list_matrix_files() or not group1 or not group2:
+            return (dash.no_update, "Choose a matrix file and the samples of both groups.",
+                    True)
+        path = os.path.join(differential.DATA_DIRECTORY, filename)
+        try:
+            job = differential.JOBS.start(path, group1, group2, test)
+        except OSError as error:
+            return dash.no_update, f"Could not test {filename}: {error}", True
+        return job, f"Testing {filename}...", False
+
+    # Progress of the run, then the volcano plot once it is done
     @dash_ttest_app.callback(
-        Output('ttest-box-plot', 'figure'),
-        Output('ttest-result', 'children'),
-        Input('ttest-update-plot-btn', 'n_clicks'),
-        State('ttest-data-table1', 'data'),
-        State('ttest-data-table2', 'data')
+        Output('ttest-volcano-plot', 'figure'),
+        Output('ttest-matrix-result', 'children'),
+        Output('ttest-matrix-poll', 'disabled'),
+        Input('ttest-matrix-poll', 'n_intervals'),
+        Input('ttest-matrix-job', 'data'),
+        Input('ttest-matrix-correction', 'value')
     )
-    def update_ttest_plot(n_clicks, data1, data2):
-        if n_clicks > 0:
-            figure, t_test_result_text = plots.generate_ttest_plot(data1, data2)
-            return figure, t_test_result_text
-        return go.Figure(), "No updates requested."
+    def update_volcano_plot(n_intervals, job_id, correction):
+        """
+        Shows how far along the run is, and draws the volcano plot once
+        its results are ready.
+
+        Args:
+            - n_intervals (int): Number of polls so far.
+            - job_id (str): The id of the run.
+            - correction (str): 'bh' or 'bonferroni'.
+
+        Returns:
+            - figure (plotly.graph_objs.Figure): The volcano plot.
+            - volcano_text (str): The progress, or the number of significant features.
+            - disabled (bool): True once polling can stop.
+        """
+        if not job_id:
+            return EMPTY_FIGURE, "", True
+        job = differential.JOBS.get(job_id)
+        if job is None:
+            return EMPTY_FIGURE, "The run is no longer on the server; run the tests again.", True
+        if not job['done']:
+            return (dash.no_update,
+                    f"Testing {job['source']}: {job['rows']:,} features tested...", False)
+        if job['error'] is not None:
+            return EMPTY_FIGURE, f"Could not test {job['source']}: {job['error']}", True
+        try:
+            points = differential.volcano_points(job['output'], correction)
+        except OSError as error:
+            return EMPTY_FIGURE, f"Could not read the results of {job['source']}: {error}", True
+        figure, volcano_text = plots.generate_volcano_plot(points, job['summary'], correction)
+        return serialization.pack_figure(figure), volcano_text, True
+
+    return dash_ttest_app
+
+def create_ztest_app(flask_app):
+    """This function creates the dash app for
+    the z-test page.
+
+    Args:
+        flask_app (Flask): the flask server the dash app
+        is added to
 
+    Returns:
+        Dash: the dash app
+    """
     # Z-Test Figures
     dash_ztest_app = Dash(__name__, server=flask_app, routes_pathname_prefix='/dash_ztest/')
     zdf1, zdf2 = plots.initialize_random_data(30)
@@ -129,79 +356,81 @@ def create_dash_apps(flask_app):
         html.Div([ 
             html.H3("Enter Data for Population 1"), # Sub-Header
             create_data_table_two_col('data-table1', zdf1, 'Population 1'), # Table 1
+            *create_dataset_stores('data-table1-token'), # Server-side copy of Table 1
             html.Button("Add Row to Population 1", id="add-row-btn1", n_clicks=0), # Updating
         ]),
         html.Div([
             html.H3("Enter Data for Population 2"), # Sub-Header
             create_data_table_two_col('data-table2', zdf2, 'Population 2'), # Table 2
+            *create_dataset_stores('data-table2-token'), # Server-side copy of Table 2
             html.Button("Add Row to Population 2", id="add-row-btn2", n_clicks=0), # Updating
         ]),
+        html.H3("Or Upload a CSV/TSV File"), # Sub-Header
+        create_upload_section('ztest-upload'), # Reading a file
+        dcc.Checklist(id='ztest-bootstrap',
+                      options=[{'label': ' Bootstrap confidence interval for the difference',
+                                'value': 'on'}],
+                      value=[]),
         html.Button("Update Box Plot and Z-Statistic", id="update-plot-btn", n_clicks=0),
         dcc.Graph(id='box-plot'), # Creating the box-plot
+        dcc.Store(id='box-plot-shown'), # Key of the figure shown
         html.H3("Z-Statistic Result"), # Sub-header
-        html.Div(id='z-test-result') # Styling
+        html.Div(id='z-test-result'), # Styling
+
+        # One sample mean against a known population mean
+        html.H3("Compare a Sample Mean to a Known Population Mean"), # Sub-header
+        html.Label("Sample Mean"),
+        dcc.Input(id='ztest-summary-mean', type='number', value=92),
+        html.Label("Sample Size"),
+        dcc.Input(id='ztest-summary-n', type='number', min=1, step=1, value=30),
+        html.Label("Population Mean"),
+        dcc.Input(id='ztest-summary-mu', type='number', value=90),
+        html.Label("Population Standard Deviation"),
+        dcc.Input(id='ztest-summary-sigma', type='number', min=0, value=5),
+        dcc.Dropdown(id='ztest-summary-alternative',
+                     options=[{'label': 'Two-sided', 'value': 'two-sided'},
+                              {'label': 'Sample mean is larger', 'value': 'larger'},
+                              {'label': 'Sample mean is smaller', 'value': 'smaller'}],
+                     value='two-sided', clearable=False, style={'width': '250px'}),
+        html.Button("Calculate Z-Statistic", id='ztest-summary-btn', n_clicks=0),
+        html.Div(id='ztest-summary-result'), # Text Result
+        create_power_section('ztest', 'ztest'), # Power and sample size
     ])
 
-    # Updating the Z-test Population 1 Data Table
-    @dash_ztest_app.callback(
-        Output('data-table1', 'data'), # Making Table
-        Input('add-row-btn1', 'n_clicks'), # Adding rows to the table
-        State('data-table1', 'data') # Updating the table
-    )
-    def add_row_population1(n_clicks, data1):
-        """
-        Adds a new row with default values to the Population 1 data table 
-        when the "Add Row to Population 1" button is clicked.
-
-        Args:
-            - n_clicks (int): The number of times the add row button has been clicked.
-            - data1 (list of dict): Current data for Population 1, where each
-                dictionary represents a row with 'X Values' and 'Z Values' keys.
-
-        Returns:
-            list of dict: Updated data1 list with a new row appended if `n_clicks` > 0.
-                        The new row has an incremented 'X Values' and a 'Z Values' 
-                        initialized to 0.
-        """
-        if n_clicks > 0:
-            data1.append({'X Values': len(data1) + 1, 'Z Values': 0})
-        return data1
-
-    # Updating the Z-test Population 1 Data Table
-    @dash_ztest_app.callback(
-        Output('data-table2', 'data'), # Making the Table
-        Input('add-row-btn2', 'n_clicks'), # Adding rows to the table
-        State('data-table2', 'data') # Updating the table
-    )
-    def add_row_population2(n_clicks, data2):
-        """
-        Adds a new row with default values to the Population 2 data table 
-        when the "Add Row to Population 2" button is clicked.
+    # Add rows to the Z-test data tables in the browser
+    register_add_row(dash_ztest_app, 'add-row-btn1', 'data-table1', {'Population 1': 0})
+    register_add_row(dash_ztest_app, 'add-row-btn2', 'data-table2', {'Population 2': 0})
 
-        Args:
-            - n_clicks (int): The number of times the add row button has been clicked.
-            - data2 (list of dict): Current data for Population 2, where each
-                dictionary represents a row with 'X Values' and 'Z Values' keys.
-
-        Returns:
-            list of dict: Updated data2 list with a new row appended if `n_clicks` > 0.
-                        The new row has an incremented 'X Values' and a 'Z Values' 
-                        initialized to 0.
-        """
-        if n_clicks > 0:
-            data2.append({'X Values': len(data2) + 1, 'Z Values': 0})
-        return data2
+    # Keep the server-side copies of the tables up to date
+    # (non-numeric cells count as 0 in the z-test)
+    register_dataset_sync(dash_ztest_app, 'data-table1', 'data-table1-token',
+                          ['X Values', 'Population 1'], fill_value=0.0)
+    register_dataset_sync(dash_ztest_app, 'data-table2', 'data-table2-token',
+                          ['X Values', 'Population 2'], fill_value=0.0)
+    register_upload(dash_ztest_app, 'ztest-upload',
+                    [('data-table1-token', ['Population 1']),
+                     ('data-table2-token', ['Population 2'])], fill_value=0.0)
 
     # Z-test Plot
     @dash_ztest_app.callback(
         Output('box-plot', 'figure'), # Making the Box-plot
+        Output('box-plot-shown', 'data'), # Key of the figure shown
         Output('z-test-result', 'children'), # Text Result
+        Output('data-table1-token-pending', 'data', allow_duplicate=True), # Rows added to Table 1
+        Output('data-table1-token-resend', 'data', allow_duplicate=True), # Resend Table 1
+        Output('data-table2-token-pending', 'data', allow_duplicate=True), # Rows added to Table 2
+        Output('data-table2-token-resend', 'data', allow_duplicate=True), # Resend Table 2
         Input('update-plot-btn', 'n_clicks'), # Adding Rows
-        State('data-table1', 'data'), # Updating Dataset 1
-        State('data-table2', 'data') # Updating Dataset 2
+        State('data-table1-token', 'data'), # Token for Dataset 1
+        State('data-table2-token', 'data'), # Token for Dataset 2
+        State('data-table1-token-pending', 'data'), # Rows not sent yet
+        State('data-table2-token-pending', 'data'), # Rows not sent yet
+        State('ztest-bootstrap', 'value'), # Bootstrap interval requested
+        State('box-plot-shown', 'data'), # Key of the figure shown
+        prevent_initial_call='initial_duplicate'
     )
 
-    def update_ztest_plot(n_clicks, data1, data2):
+    def update_ztest_plot(n_clicks, token1, token2, pending1, pending2, bootstrap_interval, shown):
         """
         Updates the box plot and calculates the z-statistic for 
         two populations when the "Update Box Plot and Z-Statistic" 
@@ -210,33 +439,99 @@ def create_dash_apps(flask_app):
         Args:
             - n_clicks (int): Click count for the update button, 
                 triggering the update.
-            - data1 (list of dict): Data for Population 1, from the 
-                interactive table, with 'X Values' and 'Population 1' keys.
-            - data2 (list of dict): Data for Population 2, from the interactive 
-                table, with 'X Values' and 'Population 2' keys.
+            - token1 (str): Dataset store token for the Population 1 table.
+            - token2 (str): Dataset store token for the Population 2 table.
+            - pending1, pending2 (dict): Rows added to each table that
+                have not been sent to the server yet.
+            - bootstrap_interval (list): ['on'] if a bootstrap confidence
+                interval for the difference of the means should be shown.
+            - shown (str): Key of the figure the browser is showing.
 
         Returns:
             - figure (plotly.graph_objs.Figure): Box plot comparing 
-                the distributions of Population 1 and Population 2.
+                the distributions of Population 1 and Population 2,
+                or a Patch of the changes to the figure shown.
+            - shown (str): Key of the new figure.
             - z_test_result_text (str): Calculated z-statistic and 
                 p-value or a message if data variance is insufficient.
+            - pending1, resend1, pending2, resend2: Clears the rows
+                written to the server, and asks the page to send a
+                table again if the server no longer has it.
         """
         print("update button clicked:", n_clicks) # Debug statement
 
         if n_clicks > 0:
-            # Convert data to numeric, ignoring non-numeric values
-            data_frame1 = pd.DataFrame(data1).apply(pd.to_numeric, errors='coerce').fillna(0)
-            data_frame2 = pd.DataFrame(data2).apply(pd.to_numeric, errors='coerce').fillna(0)
+            # Write the rows added since the tables were last sent, then
+            # read the numeric columns from the dataset store
+            tables = flush_tables((token1, pending1), (token2, pending2))
+            values1 = datastore.STORE.get_column(token1, 'Population 1')
+            values2 = datastore.STORE.get_column(token2, 'Population 2')
+            moments = (datastore.STORE.get_moments(token1, 'Population 1'),
+                       datastore.STORE.get_moments(token2, 'Population 2'))
+            if values1 is None or values2 is None or None in moments:
+                return EMPTY_FIGURE, None, DATASET_MISSING_TEXT, *tables
+
+            resamples = bootstrap.DEFAULT_RESAMPLES if bootstrap_interval else 0
+            figure, z_test_result_text = plots.generate_ztest_plot(
+                values1, values2, moments=moments, bootstrap_resamples=resamples)
+            # Only the parts of the figure that changed are sent
+            figure, shown = serialization.figure_update(figure, shown)
+            return figure, shown, z_test_result_text, *tables
+        return EMPTY_FIGURE, None, "No update requested.", *[dash.no_update] * 4
+
+    # One-sample z-test from summary statistics
+    @dash_ztest_app.callback(
+        Output('ztest-summary-result', 'children'), # Text Result
+        Input('ztest-summary-btn', 'n_clicks'), # Calculating
+        State('ztest-summary-mean', 'value'), # Sample mean
+        State('ztest-summary-n', 'value'), # Sample size
+        State('ztest-summary-mu', 'value'), # Population mean
+        State('ztest-summary-sigma', 'value'), # Population standard deviation
+        State('ztest-summary-alternative', 'value') # Alternative hypothesis
+    )
+
+    def update_summary_ztest(n_clicks, mean, n, mu, sigma, alternative):
+        """
+        Compares a sample mean to a known population mean with a
+        one-sample z-test when the "Calculate Z-Statistic" button
+        is clicked. Only the summary statistics are needed.
+
+        Args:
+            - n_clicks (int): Click count for the calculate button.
+            - mean (float): The sample mean.
+            - n (int): The sample size.
+            - mu (float): The population mean under the null hypothesis.
+            - sigma (float): The known population standard deviation.
+            - alternative (str): 'two-sided', 'larger' or 'smaller'.
+
+        Returns:
+            - str: The z-statistic and p-value, or a message if an
+                input is missing or out of range.
+        """
+        if not n_clicks:
+            return ""
+        if None in (mean, n, mu, sigma) or n < 1 or sigma <= 0:
+            return ("Enter the sample mean, a sample size of at least 1 and a positive "
+                    "population standard deviation.")
+        z_stat, p_value = ztest.ztest_from_stats(mean, sigma, n, value=mu,
+                                                 alternative=alternative)
+        return f"Z-Statistic: {z_stat:.2f}, P-value: {p_value:.4f}"
 
-             # Check data values before proceeding (debugging)
-            print("Data Frame 1:\n", data_frame1)
-            print("Data Frame 2:\n", data_frame2)
+    register_power(dash_ztest_app, 'ztest', 'ztest')
 
-            figure, z_test_result_text = plots.generate_ztest_plot(data_frame1.to_dict('records'),
-                                                                   data_frame2.to_dict('records'))
-            return figure, z_test_result_text
-        return go.Figure(), "No update requested."
+    return dash_ztest_app
+
+def create_distribution_app(flask_app):
+    """This function creates the dash app for
+    the data distributions page.
+
+    Args:
+        flask_app (Flask): the flask server the dash app
+        is added to
 
+    Returns:
+        Dash: the dash app
+    """
     # Making the Distribution Page figures
     dash_distribution_app = Dash(__name__, server=flask_app,
                                  routes_pathname_prefix="/dash_distribution/")
@@ -246,28 +541,116 @@ def create_dash_apps(flask_app):
     dash_distribution_app.layout = html.Div([
         html.H1("Data for Distribution Plot"),
         create_data_table_one_col('Distribution Data', dist_data, 'Values'),
+        # The table after each burst of edits, and the token of its stored copy
+        dcc.Store(id='dist-data-debounced',
+                  data={'client': None, 'seq': 0, 'data': dist_data.to_dict('records')}),
+        dcc.Store(id='dist-data-token'),
+        html.H3("Or Upload a CSV/TSV File"),
+        create_upload_section('dist-upload'),
+        dcc.Store(id='dist-upload-token'),
+        html.Div([
+            html.Label("Bin Rule"),
+            dcc.Dropdown(
+                id='dist-bin-rule',
+                options=[{'label': label, 'value': rule}
+                         for rule, label in plots.BIN_RULES.items()],
+                value='sturges',
+                clearable=False,
+                style={'width': '250px'}
+            ),
+            html.Label("Bin Width (for fixed width)"),
+            dcc.Input(id='dist-bin-width', type='number', value=1, min=0, debounce=True),
+        ], style={'marginTop': '10px'}),
         dcc.Graph(id='hist-chart', style={'width': '60%', 'margin': '10 auto'})
     ])
+    register_upload(dash_distribution_app, 'dist-upload', [('dist-upload-token', ['Values'])])
+
+    # Collapse bursts of table edits (e.g. pasting a column) into one update
+    register_debounce(dash_distribution_app, 'Distribution Data', 'dist-data-debounced')
+
+    # Editing the table switches the histogram back to the table values
+    dash_distribution_app.clientside_callback(
+        "function(edit) { return null; }",
+        Output('dist-upload-token', 'data', allow_duplicate=True),
+        Input('dist-data-debounced', 'data'),
+        prevent_initial_call=True
+    )
 
     # Distribution Plot
     @dash_distribution_app.callback(
         Output('hist-chart', 'figure'),
-        Input('Distribution Data', 'data')
+        Output('dist-data-token', 'data'),
+        Input('dist-data-debounced', 'data'),
+        Input('dist-upload-token', 'data'),
+        Input('dist-bin-rule', 'value'),
+        Input('dist-bin-width', 'value'),
+        State('dist-data-token', 'data')
     )
 
-    def update_distribution_plot(dist_data1):
+    def update_distribution_plot(edit, upload_token, bin_rule, bin_width, token):
         """This function generates a histogram based on a
         user-provided input values. As the user changes
         the inputted values, the plot will change. 
+        After a file upload the histogram shows the uploaded
+        values until the table is edited again. The values
+        are binned on the server with the chosen bin rule.
+
+        Table edits arrive once per burst (see register_debounce),
+        and the result of an edit is dropped if a newer edit
+        from the same page has reached the server meanwhile.
+        The table is kept in the dataset store, so the bin counts
+        are updated from the cells that changed and are only
+        worked out again when the bin edges move.
 
         Args:
-            data1: Web app user inputted numbers
+            edit: the table after the last burst of edits
+            upload_token: dataset store token of the uploaded file
+            bin_rule: 'sturges', 'fd' or 'fixed'
+            bin_width: bin width for the 'fixed' rule
+            token: dataset store token of the table values
 
         Returns:
             figure: the new updated plot is outputted.
+            token: dataset store token of the table values
         """
-        return plots.generate_distribution_plot(dist_data1)
+        if bin_rule == 'fixed' and not (bin_width and bin_width > 0):
+            raise dash.exceptions.PreventUpdate  # Wait for a usable width
+        if not record_edit(edit):
+            raise dash.exceptions.PreventUpdate  # A newer edit is on its way
+
+        source = upload_token
+        if source is None or datastore.STORE.get_column(source, 'Values') is None:
+            values = plots.distribution_values(edit['data'])
+            try:
+                token = source = datastore.STORE.update_columns(token, {'Values': values})
+            except ValueError:
+                # Too large to keep on the server
+                return serialization.pack_figure(
+                    plots.generate_distribution_plot(edit['data'], bin_rule, bin_width)), None
+
+        values = datastore.STORE.get_column(source, 'Values')
+        values = values[~np.isnan(values)]
+        edges, counts = np.array([]), np.array([], dtype=int)
+        if len(values):
+            edges = plots.histogram_bin_edges(values, bin_rule, bin_width)
+            counts = datastore.STORE.get_histogram(source, 'Values', edges)
+        if is_stale_edit(edit):
+            raise dash.exceptions.PreventUpdate  # Superseded while it was worked out
+        return serialization.pack_figure(plots.histogram_figure(edges, counts)), token
+
+    return dash_distribution_app
+
+def create_anova_app(flask_app):
+    """This function creates the dash app for
+    the ANOVA page.
+
+    Args:
+        flask_app (Flask): the flask server the dash app
+        is added to
 
+    Returns:
+        Dash: the dash app
+    """
     # ANOVA Test Figures
     dash_anova_app = Dash(__name__, server=flask_app, routes_pathname_prefix='/dash_anova/')
 
@@ -329,51 +712,62 @@ def create_dash_apps(flask_app):
         html.Div([
             html.H3("Enter Data for All Populations"),
             create_data_table_three_col('data-table1', anova_df),  # Just use one DataFrame now
+            *create_dataset_stores('data-table1-token'),
             html.Button("Add Row", id="add-row-btn1", n_clicks=0),
         ]),
+        html.H3("Or Upload a CSV/TSV File"),
+        create_upload_section('anova-upload'),
 
+        dcc.Checklist(id='anova-permutation',
+                      options=[{'label': ' Also run a permutation test', 'value': 'on'}],
+                      value=[]),
         html.Button("Update Box Plot and ANOVA Test", id="update-plot-btn", n_clicks=0),
         dcc.Graph(id='box-plot'),
+        dcc.Store(id='box-plot-shown'),
         html.H3("ANOVA Test Result"),
-        html.Div(id='anova-test-result')
+        html.Div(id='anova-test-result'),
+
+        # Any number of groups, from a long-format file
+        html.H3("Compare Any Number of Groups"),
+        html.P("Upload a CSV/TSV file with a Group column and a Value column, "
+               "one row per value, to compare every group and each pair of groups."),
+        create_upload_section('anova-group-upload'),
+        dcc.Store(id='anova-group-token'),
+        dcc.Store(id='anova-group-names'),
+        html.Button("Update Group Box Plot and Tukey HSD", id="anova-group-btn", n_clicks=0),
+        dcc.Graph(id='anova-group-plot'),
+        html.Div(id='anova-group-result', style={'whiteSpace': 'pre-line'}),
+        create_power_section('anova', 'anova'),
     ])
 
-    # Updating the ANOVA Data Table
-    @dash_anova_app.callback(
-        Output('data-table1', 'data'),
-        Input('add-row-btn1', 'n_clicks'),
-        State('data-table1', 'data')
-    )
-    def add_row_to_all_populations(n_clicks, data):
-        """
-        Adds a new row with default values to the consolidated data table
-        when the "Add Row" button is clicked.
+    # Add rows to the ANOVA data table in the browser
+    register_add_row(dash_anova_app, 'add-row-btn1', 'data-table1',
+                     {'Population 1': 0, 'Population 2': 0, 'Population 3': 0})
 
-        Args:
-            - n_clicks (int): The number of times the add row button has been clicked.
-            - data (list of dict): Current data for all populations, where each dictionary is a
-                row with 'X Values', 'Population 1', 'Population 2', and 'Population 3' keys.
-
-        Returns:
-            list of dict: Updated data list with a new row appended if `n_clicks` > 0.
-                The new row has an incremented 'X Values' and initialized population values.
-        """
-        if n_clicks > 0:
-            next_x_value = len(data) + 1
-            data.append({'X Values': next_x_value,
-                         'Population 1': 0,
-                         'Population 2': 0,
-                         'Population 3': 0})
-        return data
+    # Keep the server-side copy of the table up to date
+    # (non-numeric cells count as 0 in the ANOVA test)
+    register_dataset_sync(dash_anova_app, 'data-table1', 'data-table1-token',
+                          ['X Values', 'Population 1', 'Population 2', 'Population 3'],
+                          fill_value=0.0)
+    register_upload(dash_anova_app, 'anova-upload',
+                    [('data-table1-token', ['Population 1', 'Population 2', 'Population 3'])],
+                    fill_value=0.0)
 
     # ANOVA Plot
     @dash_anova_app.callback(
         Output('box-plot', 'figure'),
+        Output('box-plot-shown', 'data'),
         Output('anova-test-result', 'children'),
+        Output('data-table1-token-pending', 'data', allow_duplicate=True),
+        Output('data-table1-token-resend', 'data', allow_duplicate=True),
         Input('update-plot-btn', 'n_clicks'),
-        State('data-table1', 'data')
+        State('data-table1-token', 'data'),
+        State('data-table1-token-pending', 'data'),
+        State('anova-permutation', 'value'),
+        State('box-plot-shown', 'data'),
+        prevent_initial_call='initial_duplicate'
     )
-    def update_anova_plot(n_clicks, data):
+    def update_anova_plot(n_clicks, token, pending, permutation_test, shown):
         """
         Updates the box plot and calculates the ANOVA test statistic for 
         three populations when the "Update Box Plot and ANOVA Test" 
@@ -382,34 +776,103 @@ def create_dash_apps(flask_app):
         Args:
             - n_clicks (int): Click count for the update button, 
                 triggering the update.
-            - data (list of dict): Data for all populations, from the interactive table,
-                 with 'X Values', 'Population 1', 'Population 2', and 'Population 3' keys.
+            - token (str): Dataset store token for the table of all populations.
+            - pending (dict): Rows added to the table that have not been
+                sent to the server yet.
+            - permutation_test (list): ['on'] if a permutation test should
+                also be run.
+            - shown (str): Key of the figure the browser is showing.
 
         Returns:
             - figure (plotly.graph_objs.Figure): Box plot comparing 
-                the distributions of Population 1, Population 2, and Population 3.
+                the distributions of Population 1, Population 2, and Population 3,
+                or a Patch of the changes to the figure shown.
+            - shown (str): Key of the new figure.
             - anova_result_text (str): Calculated ANOVA F-statistic and 
                 p-value or a message if data variance is insufficient.
+            - pending, resend: Clears the rows written to the server, and
+                asks the page to send the table again if the server no
+                longer has it.
         """
         print("update button clicked:", n_clicks)  # Debug statement
 
         if n_clicks > 0:
-            # Convert data to numeric, ignoring non-numeric values
-            data_frame = pd.DataFrame(data).apply(pd.to_numeric, errors='coerce').fillna(0)
-
-            # Check data values before proceeding (debugging)
-            print("Data Frame:\n", data_frame)
+            # Rows added since the table was last sent are written first
+            table = flush_tables((token, pending))
+            dataset = datastore.STORE.get(token)
+            columns = ['Population 1', 'Population 2', 'Population 3']
+            moments = tuple(datastore.STORE.get_moments(token, column) for column in columns)
+            if dataset is None or None in moments:
+                return EMPTY_FIGURE, None, DATASET_MISSING_TEXT, *table
 
             # Separate the populations
-            pop1 = data_frame['Population 1']
-            pop2 = data_frame['Population 2']
-            pop3 = data_frame['Population 3']
+            pop1 = dataset['Population 1']
+            pop2 = dataset['Population 2']
+            pop3 = dataset['Population 3']
+
+            permutations = permutation.DEFAULT_PERMUTATIONS if permutation_test else 0
+            figure, anova_result_text = plots.generate_anova_plot(pop1, pop2, pop3,
+                                                                  moments=moments,
+                                                                  permutations=permutations)
+            # Only the parts of the figure that changed are sent
+            figure, shown = serialization.figure_update(figure, shown)
+            return figure, shown, anova_result_text, *table
+
+        return EMPTY_FIGURE, None, "No update requested.", dash.no_update, dash.no_update
+
+    register_group_upload(dash_anova_app, 'anova-group-upload', 'anova-group-token',
+                          'anova-group-names')
+
+    # Long-format ANOVA and Tukey HSD
+    @dash_anova_app.callback(
+        Output('anova-group-plot', 'figure'),
+        Output('anova-group-result', 'children'),
+        Input('anova-group-btn', 'n_clicks'),
+        State('anova-group-token', 'data'),
+        State('anova-group-names', 'data')
+    )
+    def update_group_anova_plot(n_clicks, token, names):
+        """
+        Updates the box plot of every group, the ANOVA test and the
+        Tukey HSD comparisons of an uploaded long-format file.
+
+        Args:
+            - n_clicks (int): Click count for the update button.
+            - token (str): Dataset store token of the group codes and values.
+            - names (list of str): The name of each group code.
+
+        Returns:
+            - figure (plotly.graph_objs.Figure): Box plot of every group.
+            - anova_result_text (str): The ANOVA F-statistic and p-value and
+                the most significant Tukey HSD pairs.
+        """
+        if not n_clicks:
+            return EMPTY_FIGURE, "No update requested."
+        if token is None:
+            return EMPTY_FIGURE, "Upload a file with a group column and a value column first."
+        dataset = datastore.STORE.get(token)
+        if dataset is None:
+            return EMPTY_FIGURE, "Data is not available on the server. Upload the file again."
+
+        figure, anova_result_text = plots.generate_group_anova_plot(
+            dataset['Group'], dataset['Value'], names=names)
+        return serialization.pack_figure(figure), anova_result_text
+
+    register_power(dash_anova_app, 'anova', 'anova', groups=3)
 
-            figure, anova_result_text = plots.generate_anova_plot(pop1, pop2, pop3)
-            return figure, anova_result_text
+    return dash_anova_app
 
-        return go.Figure(), "No update requested."
+def create_regressions_app(flask_app):
+    """This function creates the dash app for
+    the regressions page.
 
+    Args:
+        flask_app (Flask): the flask server the dash app
+        is added to
+
+    Returns:
+        Dash: the dash app
+    """
     dash_regressions_app = Dash(__name__, server=flask_app, routes_pathname_prefix='/dash_regressions/')
 
     linear_df = plots.initialize_linear_data()
@@ -430,82 +893,143 @@ def create_dash_apps(flask_app):
                 row_deletable=False,
                 style_table={'overflowX': 'auto'}
             ),
+            *create_dataset_stores('linear-data-table-token'),
             html.Button("Add Row", id="add-row-btn", n_clicks=0),
         ]),
+        html.H3("Or Upload a CSV/TSV File"),
+        create_upload_section('regression-upload'),
+        html.Label("Point Thinning for Large Data Sets"),
+        dcc.Dropdown(
+            id='regression-decimation',
+            options=[
+                {'label': 'Min/Max per Bucket', 'value': 'minmax'},
+                {'label': 'Largest-Triangle-Three-Buckets', 'value': 'lttb'},
+            ],
+            value='minmax',
+            clearable=False,
+            style={'width': '300px'}
+        ),
+        dcc.Checklist(id='regression-bootstrap',
+                      options=[{'label': ' Bootstrap confidence intervals for the slope and intercept',
+                                'value': 'on'}],
+                      value=[]),
         html.Button("Update Plot", id="update-regression-plot-btn", n_clicks=0),
         dcc.Graph(id='linear-regression-plot'),
+        dcc.Store(id='linear-regression-plot-shown'),
         html.H3("Linear Regression Equation"),
         html.Div(id='linear-regression-equation', style={'fontSize': '18px', 'marginTop': '20px'}),
         html.H3("R² Value"),
         html.Div(id='linear-regression-r2', style={'fontSize': '18px', 'marginTop': '10px'}),
     ])
 
-    # Callback to update regressions data table
-    @dash_regressions_app.callback(
-        Output('linear-data-table', 'data'),
-        Input('add-row-btn', 'n_clicks'),
-        State('linear-data-table', 'data')
-    )
-
-    def add_row(n_clicks, current_data):
-        """
-        Adds a new row to the linear regression data table when the "Add Row" button is clicked.
-
-        Args:
-            n_clicks (int): Number of times the button has been clicked.
-            current_data (list of dict): Current data in the data table.
+    # Add rows to the regressions data table in the browser
+    register_add_row(dash_regressions_app, 'add-row-btn', 'linear-data-table', {'Y Values': 0})
 
-        Returns:
-            list of dict: Updated data with a new row appended.
-        """
-        if n_clicks > 0:
-            next_x_value = len(current_data) + 1  # Increment X Value
-            current_data.append({'X Values': next_x_value, 'Y Values': 0})  # Add new row
-        return current_data
+    # Keep the server-side copy of the table up to date
+    register_dataset_sync(dash_regressions_app, 'linear-data-table', 'linear-data-table-token',
+                          ['X Values', 'Y Values'])
+    register_upload(dash_regressions_app, 'regression-upload',
+                    [('linear-data-table-token', ['X Values', 'Y Values'])])
 
     # Callback to update the plot and display the regression equation
     @dash_regressions_app.callback(
         [Output('linear-regression-plot', 'figure'),
+         Output('linear-regression-plot-shown', 'data'),
          Output('linear-regression-equation', 'children'),
-         Output('linear-regression-r2', 'children')],
+         Output('linear-regression-r2', 'children'),
+         Output('linear-data-table-token-pending', 'data', allow_duplicate=True),
+         Output('linear-data-table-token-resend', 'data', allow_duplicate=True)],
         [Input('update-regression-plot-btn', 'n_clicks')],
-        [State('linear-data-table', 'data')]
+        [State('linear-data-table-token', 'data'),
+         State('linear-data-table-token-pending', 'data'),
+         State('regression-decimation', 'value'),
+         State('regression-bootstrap', 'value'),
+         State('linear-regression-plot-shown', 'data')],
+        prevent_initial_call='initial_duplicate'
     )
 
-    def update_linear_regression_plot(n_clicks, data):
+    def update_linear_regression_plot(n_clicks, token, pending, method, bootstrap_interval, shown):
         """
         Updates the linear regression plot and displays the equation and R² value 
         when the "Update Plot" button is clicked.
 
         Args:
             n_clicks (int): Number of times the update button has been clicked.
-            data (list of dict): Data for the regression table.
+            token (str): Dataset store token for the regression table.
+            pending (dict): Rows added to the table that have not been
+                sent to the server yet.
+            method (str): How to thin out the points drawn ('minmax' or 'lttb').
+            bootstrap_interval (list): ['on'] if bootstrap confidence intervals
+                for the slope and intercept should be shown.
+            shown (str): Key of the figure the browser is showing.
 
         Returns:
-            - plotly.graph_objs.Figure: The updated regression plot.
+            - plotly.graph_objs.Figure: The updated regression plot, or a
+                Patch of the changes to the plot shown.
+            - str: Key of the new figure.
             - str: The linear regression equation or a placeholder message.
             - str: The R² value or a placeholder message.
+            - dict: Clears the rows written to the server.
+            - float: Asks the page to send the table again if the server
+                no longer has it.
         """
         if n_clicks and n_clicks > 0:
+            # Rows added since the table was last sent are written first
+            table = flush_tables((token, pending))
+            dataset = datastore.STORE.get(token)
+            if dataset is None:
+                return EMPTY_FIGURE, None, DATASET_MISSING_TEXT, DATASET_MISSING_TEXT, *table
+
             # Generate the plot, equation, and R² value
-            figure, equation, r2_value = plots.generate_linear_regression_plot(data)
+            resamples = bootstrap.DEFAULT_RESAMPLES if bootstrap_interval else 0
+            figure, equation, r2_value = plots.generate_linear_regression_plot(
+                dataset, method=method, bootstrap_resamples=resamples)
+            # Only the parts of the figure that changed are sent
+            figure, shown = serialization.figure_update(figure, shown)
             return (
                 figure,
+                shown,
                 f"Linear Regression Equation: {equation}",
-                f"R² Value: {r2_value:.4f}"
+                f"R² Value: {r2_value:.4f}",
+                *table
             )
         
         # Default state before updates
-        return go.Figure(), "No updates requested.", "No updates requested."
+        return (EMPTY_FIGURE, None, "No updates requested.", "No updates requested.",
+                dash.no_update, dash.no_update)
+
+    return dash_regressions_app
+
+# Builders for each dash app, keyed by its route prefix
+DASH_APP_BUILDERS = {
+    'dash_test': create_test_app,
+    'dash_ttest': create_ttest_app,
+    'dash_ztest': create_ztest_app,
+    'dash_distribution': create_distribution_app,
+    'dash_anova': create_anova_app,
+    'dash_regressions': create_regressions_app,
+}
+
+def build_dash_app(name, flask_app):
+    """This function builds one of the dash apps,
+    records the latency, payload size and errors of
+    its callbacks (see metrics) and serves its layout
+    and callback list from memory (see page_cache).
+
+    Args:
+        name (str): the app's route prefix, a key of
+        DASH_APP_BUILDERS
+        flask_app (Flask): the flask server the dash app
+        is added to
+
+    Returns:
+        Dash: the dash app
+    """
+    dash_app = DASH_APP_BUILDERS[name](flask_app)
+    metrics.instrument_dash(dash_app)
+    page_cache.cache_dash_responses(dash_app)
+    return dash_app
 
-    return {
-        'dash_test': dash_test_app,
-        'dash_ttest': dash_ttest_app,
-        'dash_ztest': dash_ztest_app,
-        'dash_distribution': dash_distribution_app,
-        'dash_anova': dash_anova_app,
-        'dash_regressions': dash_regressions_app
-    }
 
 def create_data_table_two_col(table_id, data, value_col):
     """This function creates the table of data with two columns of data for the 
@@ -566,3 +1090,504 @@ def create_data_table_one_col(table_id, data, value_col):
         },
     )
 
+def register_add_row(dash_app, button_id, table_id, values):
+    """This function registers a clientside callback that
+    adds a row to a table when its button is clicked. The
+    row is added in the browser, so no request is sent to
+    the server (the sync callback holds the new rows in the
+    page until the next edit or statistic, see
+    register_dataset_sync).
+
+    Args:
+        dash_app (Dash): the dash app the table is in
+        button_id (str): id of the "Add Row" button
+        table_id (str): id of the DataTable
+        values (dict): value of each column of the new row
+        other than 'X Values' (which counts the rows); a
+        (low, high) pair gives a random integer from low
+        to high
+    """
+    cells = ['"X Values": rows.length + 1']
+    for column, value in values.items():
+        if isinstance(value, tuple):
+            low, high = value
+            value = f"Math.floor(Math.random() * {high - low + 1}) + {low}"
+        else:
+            value = json.dumps(value)
+        cells.append(f"{json.dumps(column)}: {value}")
+    dash_app.clientside_callback(
+        f"""
+        function(n_clicks, data) {{
+            if (!n_clicks) {{
+                return window.dash_clientside.no_update;
+            }}
+            const rows = (data || []).slice();
+            rows.push({{{', '.join(cells)}}});
+            return rows;
+        }}
+        """,
+        Output(table_id, 'data'),
+        Input(button_id, 'n_clicks'),
+        State(table_id, 'data'),
+        prevent_initial_call=True
+    )
+
+def register_debounce(dash_app, source_id, store_id, delay=EDIT_DEBOUNCE_MS):
+    """This function registers a clientside callback that
+    copies a table's data into a dcc.Store once the table
+    has had no edits for `delay` milliseconds, so a burst of
+    edits sets off one server callback instead of one per
+    cell. Each copy is numbered, with a random id for the
+    page, so the server can tell which edit is the newest
+    (see record_edit).
+
+    Args:
+        dash_app (Dash): the dash app the table is in
+        source_id (str): id of the DataTable
+        store_id (str): id of the dcc.Store that gets the
+        data, as {'client': page id, 'seq': edit number,
+        'data': table rows}
+        delay (int): quiet time in milliseconds
+    """
+    dash_app.clientside_callback(
+        f"""
+        function(data) {{
+            const pages = window.debouncedEdits = window.debouncedEdits || {{}};
+            const page = pages[{json.dumps(store_id)}] = pages[{json.dumps(store_id)}]
+                || {{client: Math.random().toString(36).slice(2), seq: 0}};
+            const seq = ++page.seq;
+            return new Promise(function(resolve) {{
+                setTimeout(function() {{
+                    // Only the last edit of a burst is sent on
+                    resolve(seq === page.seq
+                        ? {{client: page.client, seq: seq, data: data}}
+                        : window.dash_clientside.no_update);
+                }}, {int(delay)});
+            }});
+        }}
+        """,
+        Output(store_id, 'data'),
+        Input(source_id, 'data'),
+        prevent_initial_call=True
+    )
+
+def record_edit(edit):
+    """This function records a debounced edit as the newest
+    one from its page.
+
+    Args:
+        edit (dict): the edit, as made by register_debounce
+
+    Returns:
+        bool: False if a newer edit from the same page has
+        already been seen, so this one can be dropped
+    """
+    if not edit or edit.get('client') is None:
+        return True
+    with _LATEST_EDITS_LOCK:
+        if _LATEST_EDITS.get(edit['client'], -1) > edit['seq']:
+            return False
+        _LATEST_EDITS.put(edit['client'], edit['seq'])
+        return True
+
+def is_stale_edit(edit):
+    """This function checks whether a newer edit from the
+    same page has been recorded since `edit` was.
+
+    Args:
+        edit (dict): the edit, as made by register_debounce
+
+    Returns:
+        bool: True if the result for this edit is out of date
+    """
+    if not edit or edit.get('client') is None:
+        return False
+    return _LATEST_EDITS.get(edit['client'], -1) > edit['seq']
+
+def create_dataset_stores(store_id):
+    """This function creates the dcc.Stores that a table
+    synced by register_dataset_sync needs.
+
+    Args:
+        store_id (str): id of the dcc.Store that holds the token
+
+    Returns:
+        list: the token store, and the stores for the edits sent
+        to the server, the rows added but not sent yet and the
+        server's requests to resend the table
+    """
+    return [
+        dcc.Store(id=store_id),
+        dcc.Store(id=f'{store_id}-edit'),
+        dcc.Store(id=f'{store_id}-pending'),
+        dcc.Store(id=f'{store_id}-resend'),
+    ]
+
+def table_rows_js(table_id, columns):
+    """This function makes the JavaScript, shared by the sync
+    callbacks, that copies a table's rows (only the synced
+    columns) and keeps the copy last sent to the server.
+
+    Args:
+        table_id (str): id of the DataTable
+        columns (list): names of the columns that are synced
+
+    Returns:
+        str: JavaScript that defines `pick` and `sync`
+    """
+    return f"""
+            const tables = window.tableSync = window.tableSync || {{}};
+            const sync = tables[{json.dumps(table_id)}] = tables[{json.dumps(table_id)}]
+                || {{rows: null, seq: 0}};
+            const pick = function(rows) {{
+                return (rows || []).map(function(row) {{
+                    const kept = {{}};
+                    {json.dumps(columns)}.forEach(function(column) {{
+                        kept[column] = row[column] === undefined ? null : row[column];
+                    }});
+                    return kept;
+                }});
+            }};"""
+
+def register_dataset_sync(dash_app, table_id, store_id, columns, fill_value=None):
+    """This function registers the callbacks that keep the
+    dataset store's copy of a table up to date. The browser
+    works out which cells changed since the table was last
+    sent, so only those are sent to the server, and the token
+    of the stored copy is kept in a dcc.Store so the other
+    callbacks can read the numeric columns without sending
+    the table. Rows added at the end (e.g. by "Add Row") are
+    held in the page until the next edit, or until a statistic
+    is asked for (see flush_tables), so adding rows costs no
+    request. If the server no longer has the table (it was
+    evicted, or the server restarted), it asks the page to
+    send the whole table again. The page needs the stores
+    made by create_dataset_stores.
+
+    Args:
+        dash_app (Dash): the dash app the table is in
+        table_id (str): id of the DataTable
+        store_id (str): id of the dcc.Store that holds the token
+        columns (list): names of the numeric columns to keep
+        fill_value (float): value the running moments use for
+        non-numeric cells (None leaves them out)
+    """
+    edit_id = f'{store_id}-edit'
+    pending_id = f'{store_id}-pending'
+    resend_id = f'{store_id}-resend'
+
+    # Work out the changed cells in the browser
+    dash_app.clientside_callback(
+        f"""
+        function(data, token, pending) {{{table_rows_js(table_id, columns)}
+            const no_update = window.dash_clientside.no_update;
+            const rows = pick(data);
+            const previous = sync.rows;
+            sync.rows = rows;
+            if (previous === null || !token) {{
+                return [{{seq: ++sync.seq, rows: rows}}, null];
+            }}
+            const common = Math.min(rows.length, previous.length);
+            const changed = [];
+            for (let index = 0; index < common; index++) {{
+                for (const column in rows[index]) {{
+                    if (rows[index][column] !== previous[index][column]) {{
+                        changed.push([index, column, rows[index][column]]);
+                    }}
+                }}
+            }}
+            const diff = {{
+                changed: changed,
+                appended: rows.slice(common),
+                removed: Math.max(previous.length - rows.length, 0),
+                previous_rows: previous.length
+            }};
+            if (!changed.length && !diff.removed) {{
+                if (!diff.appended.length) {{
+                    return [no_update, no_update];
+                }}
+                // Added rows wait for the next edit or statistic
+                if (pending) {{
+                    diff.appended = pending.appended.concat(diff.appended);
+                    diff.previous_rows = pending.previous_rows;
+                }}
+                return [no_update, diff];
+            }}
+            return [{{seq: ++sync.seq, diffs: pending ? [pending, diff] : [diff]}}, null];
+        }}
+        """,
+        Output(edit_id, 'data'),
+        Output(pending_id, 'data'),
+        Input(table_id, 'data'),
+        State(store_id, 'data'),
+        State(pending_id, 'data')
+    )
+
+    @dash_app.callback(
+        Output(store_id, 'data'),
+        Output(resend_id, 'data'),
+        Input(edit_id, 'data'),
+        State(store_id, 'data'),
+        prevent_initial_call=True
+    )
+    def sync_dataset(edit, token):
+        try:
+            new_token = datastore.STORE.sync_edit(token, edit, columns, fill_value=fill_value)
+        except ValueError:
+            # Too large to keep on the server
+            return None, dash.no_update
+        if new_token is None:
+            # The server no longer has the table, so ask for all of it
+            return dash.no_update, time.time()
+        return new_token, dash.no_update
+
+    # Send the whole table when the server asks for it
+    dash_app.clientside_callback(
+        f"""
+        function(resend, data) {{{table_rows_js(table_id, columns)}
+            if (!resend) {{
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }}
+            sync.rows = pick(data);
+            return [{{seq: ++sync.seq, rows: sync.rows}}, null];
+        }}
+        """,
+        Output(edit_id, 'data', allow_duplicate=True),
+        Output(pending_id, 'data', allow_duplicate=True),
+        Input(resend_id, 'data'),
+        State(table_id, 'data'),
+        prevent_initial_call=True
+    )
+
+def flush_tables(*tables):
+    """This function writes the rows added to tables since
+    they were last sent (held in the page by
+    register_dataset_sync) to the dataset store, before a
+    statistic is worked out from them. The page is asked to
+    send again any table the store does not have.
+
+    Args:
+        *tables (tuple): the token and the pending rows of each table
+
+    Returns:
+        list: the new value of each table's pending store and
+        resend store, in that order
+    """
+    outputs = []
+    for token, pending in tables:
+        cleared = None if pending else dash.no_update
+        stored = token is not None and token in datastore.STORE
+        if stored and (not pending or datastore.STORE.apply_diff(token, pending)):
+            outputs += [cleared, dash.no_update]
+        else:
+            outputs += [cleared, time.time()]
+    return outputs
+
+def create_upload_section(upload_id):
+    """This function creates the file upload area, with a
+    status line that shows the progress of the upload.
+
+    Args:
+        upload_id (str): id of the dcc.Upload component
+
+    Returns:
+        html.Div: the upload area, poll timer and status line
+    """
+    return html.Div([
+        dcc.Upload(
+            id=upload_id,
+            children=html.Div(["Drag and Drop or ", html.A("Select a CSV/TSV File")]),
+            multiple=False,
+            style={
+                'width': '60%',
+                'lineHeight': '50px',
+                'borderWidth': '1px',
+                'borderStyle': 'dashed',
+                'borderRadius': '5px',
+                'textAlign': 'center',
+                'margin': '10px 0',
+            },
+        ),
+        # Polls the parse progress while a file is being read
+        dcc.Interval(id=f'{upload_id}-poll', interval=500, disabled=True),
+        html.Div(id=f'{upload_id}-status'),
+    ])
+
+def register_upload(dash_app, upload_id, targets, fill_value=None):
+    """This function registers the callbacks that read an
+    uploaded file into the dataset store. The file is parsed
+    in chunks straight into numpy columns, and the tokens of
+    the stored columns replace the table tokens, so the page's
+    update callbacks use the uploaded data.
+
+    Args:
+        dash_app (Dash): the dash app the upload is in
+        upload_id (str): id of the dcc.Upload component
+        targets (list): (token store id, column names) pairs;
+        each gets its own dataset with those columns
+        fill_value (float): value the running moments use for
+        empty cells (None leaves them out)
+    """
+    poll_id = f'{upload_id}-poll'
+    status_id = f'{upload_id}-status'
+    wanted = [column for _, columns in targets for column in columns]
+    register_upload_progress(dash_app, upload_id)
+
+    @dash_app.callback(
+        [Output(store_id, 'data', allow_duplicate=True) for store_id, _ in targets]
+        + [Output(status_id, 'children', allow_duplicate=True),
+           Output(poll_id, 'disabled', allow_duplicate=True)],
+        Input(upload_id, 'contents'),
+        State(upload_id, 'filename'),
+        State(upload_id, 'last_modified'),
+        prevent_initial_call=True
+    )
+    def read_upload(contents, filename, last_modified):
+        key = (upload_id, filename, last_modified)
+        try:
+            columns = upload.parse_upload(
+                contents, filename,
+                progress=lambda fraction, rows: upload.PROGRESS.update(key, fraction, rows))
+            selected = upload.select_columns(columns, wanted)
+            tokens = [datastore.STORE.put({column: selected[column] for column in names},
+                                          fill_value=fill_value)
+                      for _, names in targets]
+        except ValueError as error:
+            return [dash.no_update] * len(targets) + [f"Could not read {filename}: {error}", True]
+        finally:
+            upload.PROGRESS.finish(key)
+
+        rows = len(next(iter(selected.values())))
+        return tokens + [f"Loaded {rows:,} rows from {filename}. "
+                         "Results use the file until the table is edited.", True]
+
+def register_upload_progress(dash_app, upload_id):
+    """This function registers the callbacks that show the
+    progress of an upload while the file is being read.
+
+    Args:
+        dash_app (Dash): the dash app the upload is in
+        upload_id (str): id of the dcc.Upload component
+    """
+    poll_id = f'{upload_id}-poll'
+
+    # Start polling for progress as soon as the browser has the file
+    dash_app.clientside_callback(
+        "function(contents) { return !contents; }",
+        Output(poll_id, 'disabled'),
+        Input(upload_id, 'contents'),
+    )
+
+    @dash_app.callback(
+        Output(f'{upload_id}-status', 'children', allow_duplicate=True),
+        Input(poll_id, 'n_intervals'),
+        State(upload_id, 'filename'),
+        State(upload_id, 'last_modified'),
+        prevent_initial_call=True
+    )
+    def show_upload_progress(n_intervals, filename, last_modified):
+        progress = upload.PROGRESS.get((upload_id, filename, last_modified))
+        if progress is None:
+            return f"Reading {filename}..."
+        return (f"Reading {filename}: {progress['fraction']:.0%} "
+                f"({progress['rows']:,} rows)")
+
+def register_group_upload(dash_app, upload_id, token_id, names_id):
+    """This function registers the callbacks that read an
+    uploaded long-format file (a group column and a value
+    column, one row per value) into the dataset store. The
+    group labels are stored as integer codes, and their names
+    are kept in the browser.
+
+    Args:
+        dash_app (Dash): the dash app the upload is in
+        upload_id (str): id of the dcc.Upload component
+        token_id (str): id of the dcc.Store for the dataset token
+        names_id (str): id of the dcc.Store for the group names
+    """
+    status_id = f'{upload_id}-status'
+    register_upload_progress(dash_app, upload_id)
+
+    @dash_app.callback(
+        Output(token_id, 'data'),
+        Output(names_id, 'data'),
+        Output(status_id, 'children', allow_duplicate=True),
+        Output(f'{upload_id}-poll', 'disabled', allow_duplicate=True),
+        Input(upload_id, 'contents'),
+        State(upload_id, 'filename'),
+        State(upload_id, 'last_modified'),
+        prevent_initial_call=True
+    )
+    def read_group_upload(contents, filename, last_modified):
+        key = (upload_id, filename, last_modified)
+        try:
+            columns = upload.parse_upload(
+                contents, filename,
+                progress=lambda fraction, rows: upload.PROGRESS.update(key, fraction, rows))
+            groups, values = upload.select_group_columns(columns)
+            codes, labels, values = anova.factorize_groups(groups, values)
+            token = datastore.STORE.put({'Group': codes, 'Value': values})
+        except ValueError as error:
+            return dash.no_update, dash.no_update, f"Could not read {filename}: {error}", True
+        finally:
+            upload.PROGRESS.finish(key)
+
+        return token, anova.group_names(labels), (
+            f"Loaded {len(values):,} values in {len(labels):,} groups from {filename}."), True
+
+def create_power_section(prefix, test):
+    """This function creates the power and sample size
+    calculator shown under a test's results.
+
+    Args:
+        prefix (str): start of the ids of the section's components
+        test (str): the test the power is for ('ttest', 'ztest' or 'anova')
+
+    Returns:
+        html.Div: the inputs, power curve plot and result line
+    """
+    effect_label = "Effect Size (Cohen's f)" if test == 'anova' else "Effect Size (Cohen's d)"
+    return html.Div([
+        html.H3("Power and Sample Size"),
+        html.Label(effect_label),
+        dcc.Input(id=f'{prefix}-power-effect', type='number', min=0, step=0.05,
+                  value=power.EFFECT_SIZES[test][1]),
+        html.Label("Significance Level"),
+        dcc.Input(id=f'{prefix}-power-alpha', type='number', min=0.001, max=0.5, step=0.01,
+                  value=power.DEFAULT_ALPHA),
+        html.Label("Ratio of Standard Deviations"),
+        dcc.Input(id=f'{prefix}-power-sd-ratio', type='number', min=0.1, step=0.1, value=1),
+        html.Button("Update Power Curves", id=f'{prefix}-power-btn', n_clicks=0),
+        dcc.Graph(id=f'{prefix}-power-plot'),
+        html.Div(id=f'{prefix}-power-result'),
+    ])
+
+def register_power(dash_app, prefix, test, groups=3):
+    """This function registers the callback that draws the
+    power curves of a test and works out the sample size
+    needed for the chosen effect size.
+
+    Args:
+        dash_app (Dash): the dash app the section is in
+        prefix (str): start of the ids of the section's components
+        test (str): 'ttest', 'ztest' or 'anova'
+        groups (int): number of groups (ANOVA only)
+    """
+    @dash_app.callback(
+        Output(f'{prefix}-power-plot', 'figure'),
+        Output(f'{prefix}-power-result', 'children'),
+        Input(f'{prefix}-power-btn', 'n_clicks'),
+        State(f'{prefix}-power-effect', 'value'),
+        State(f'{prefix}-power-alpha', 'value'),
+        State(f'{prefix}-power-sd-ratio', 'value')
+    )
+    def update_power_plot(n_clicks, effect_size, alpha, sd_ratio):
+        if not n_clicks:
+            return EMPTY_FIGURE, ""
+        if effect_size is None or alpha is None or sd_ratio is None \
+                or effect_size <= 0 or not 0 < alpha < 1 or sd_ratio <= 0:
+            return EMPTY_FIGURE, ("Enter an effect size above 0, a significance level "
+                                  "between 0 and 1, and a ratio of standard deviations above 0.")
+        figure, power_result_text = plots.generate_power_plot(test, effect_size, alpha,
+                                                              sd_ratio, groups)
+        return serialization.pack_figure(figure), power_result_text
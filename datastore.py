@@ -0,0 +1,443 @@
+"""This module keeps the data behind the Dash tables on the server.
+Each table is stored as numpy columns under a short token, so the
+callbacks only have to pass the token (and the edits made to the
+table) instead of sending the whole table back and forth. Running
+moments of each column (and the bin counts of any histogram drawn from
+it) are kept next to it, so statistics can be updated from single-cell
+edits."""
+
+import copy
+import secrets
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from accumulators import RunningHistogram, RunningMoments
+
+# Default limits for the shared store
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+# Source of the datasets loaded from a DataTable; only these take table edits
+TABLE_SOURCE = 'table'
+
+
+def to_float(value):
+    """
+    Converts a single table cell to a float.
+
+    Args:
+        - value: The cell value entered in the table.
+
+    Returns:
+        - float: The numeric value, or NaN if the value is not numeric.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def records_to_columns(records, columns):
+    """
+    Converts table rows into numeric numpy columns.
+
+    Args:
+        - records (list of dict): Table rows, as stored by a DataTable.
+        - columns (list of str): Names of the columns to keep.
+
+    Returns:
+        - dict: Column name -> float64 numpy array. Non-numeric or
+            missing cells become NaN.
+    """
+    return {
+        column: pd.to_numeric(pd.Series([row.get(column) for row in records], dtype=object),
+                              errors='coerce').to_numpy(dtype=float)
+        for column in columns
+    }
+
+
+def table_diff(data, data_previous):
+    """
+    Works out what changed between two versions of a DataTable.
+
+    Args:
+        - data (list of dict): The current table rows.
+        - data_previous (list of dict): The table rows before the edit.
+
+    Returns:
+        - dict: A dictionary with the keys
+            'changed' (list of (row index, column, value) tuples),
+            'appended' (list of dict rows added at the end),
+            'removed' (number of rows dropped from the end) and
+            'previous_rows' (number of rows before the edit).
+    """
+    common = min(len(data), len(data_previous))
+    changed = []
+    for index in range(common):
+        row, old_row = data[index], data_previous[index]
+        if row == old_row:
+            continue
+        for column, value in row.items():
+            if old_row.get(column) != value:
+                changed.append((index, column, value))
+    return {
+        'changed': changed,
+        'appended': list(data[common:]),
+        'removed': max(len(data_previous) - len(data), 0),
+        'previous_rows': len(data_previous),
+    }
+
+
+class DatasetStore:
+    """
+    A thread-safe store of numeric datasets keyed by token.
+
+    The least recently used datasets are evicted once the store holds
+    more than `max_entries` datasets or more than `max_bytes` bytes.
+
+    Args:
+        - max_entries (int): The most datasets to keep at once.
+        - max_bytes (int): The most bytes of column data to keep at once.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._datasets = OrderedDict()
+        self._moments = {}
+        self._histograms = {}
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __contains__(self, token):
+        return token in self._datasets
+
+    def put(self, columns, token=None, fill_value=None, source=None):
+        """
+        Adds (or replaces) a dataset.
+
+        Args:
+            - columns (dict): Column name -> array-like of numbers.
+            - token (str): The token to store the dataset under.
+                A new token is made if not given.
+            - fill_value (float): Value the running moments use in place
+                of NaN cells. If None, NaN cells are left out of them.
+            - source (str): Where the columns came from, e.g. TABLE_SOURCE
+                for a DataTable. None for other data, such as uploads.
+
+        Returns:
+            - str: The token of the stored dataset.
+
+        Raises:
+            ValueError: If the dataset alone is larger than the byte budget.
+        """
+        dataset = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        size = sum(values.nbytes for values in dataset.values())
+        if size > self.max_bytes:
+            raise ValueError("Dataset is larger than the store's byte budget")
+        moments = {name: RunningMoments.from_values(values, fill_value)
+                   for name, values in dataset.items()}
+
+        with self._lock:
+            if token is None:
+                token = secrets.token_urlsafe(8)
+            self._remove(token)
+            self._datasets[token] = dataset
+            self._moments[token] = moments
+            self._sources[token] = source
+            self.nbytes += size
+            self._evict()
+        return token
+
+    def get(self, token):
+        """
+        Looks up a dataset and marks it as recently used.
+
+        Args:
+            - token (str): The dataset token.
+
+        Returns:
+            - dict or None: Column name -> numpy array, or None if the
+                token is unknown or the dataset has been evicted.
+        """
+        with self._lock:
+            dataset = self._datasets.get(token)
+            if dataset is not None:
+                self._datasets.move_to_end(token)
+            return dataset
+
+    def get_column(self, token, column):
+        """
+        Looks up a single column of a dataset.
+
+        Args:
+            - token (str): The dataset token.
+            - column (str): The column name.
+
+        Returns:
+            - np.ndarray or None: The column, or None if the dataset is gone.
+
+        Raises:
+            KeyError: If the dataset does not have the column.
+        """
+        dataset = self.get(token)
+        if dataset is None:
+            return None
+        return dataset[column]
+
+    def get_moments(self, token, column):
+        """
+        Looks up the running moments (count, mean, M2) of a column.
+
+        Args:
+            - token (str): The dataset token.
+            - column (str): The column name.
+
+        Returns:
+            - RunningMoments or None: A copy of the column's moments, or
+                None if the dataset is gone.
+
+        Raises:
+            KeyError: If the dataset does not have the column.
+        """
+        with self._lock:
+            moments = self._moments.get(token)
+            if moments is None:
+                return None
+            return copy.copy(moments[column])
+
+    def discard(self, token):
+        """Removes a dataset from the store if it is there."""
+        with self._lock:
+            self._remove(token)
+
+    def apply_diff(self, token, diff, source=TABLE_SOURCE):
+        """
+        Applies the edits from `table_diff` to a stored dataset.
+
+        Args:
+            - token (str): The dataset token.
+            - diff (dict): The edits, as returned by `table_diff`.
+            - source (str): The source the dataset must have been stored
+                with. An uploaded file can share a table's token and row
+                count, but the table's edits do not apply to it.
+
+        Returns:
+            - bool: True if the edits were applied, False if the
+                dataset is no longer in the store or does not match
+                the table the edits were made to.
+        """
+        with self._lock:
+            dataset = self._datasets.get(token)
+            if dataset is None or self._sources.get(token) != source:
+                return False
+            # The stored copy is out of step with the table, so reload it instead
+            if any(len(values) != diff['previous_rows'] for values in dataset.values()):
+                return False
+            old_size = sum(values.nbytes for values in dataset.values())
+            moments = self._moments[token]
+            histograms = self._histograms.get(token, {})
+
+            # Each edit updates the running moments in constant time
+            for index, column, value in diff['changed']:
+                if column in dataset:
+                    new_value = to_float(value)
+                    moments[column].replace(dataset[column][index], new_value)
+                    if column in histograms:
+                        histograms[column].replace(dataset[column][index], new_value)
+                    dataset[column][index] = new_value
+            if diff['removed']:
+                for column, values in dataset.items():
+                    keep = len(values) - diff['removed']
+                    for old_value in values[keep:]:
+                        moments[column].remove(old_value)
+                    if column in histograms:
+                        histograms[column].update(removed=values[keep:])
+                    dataset[column] = values[:keep]
+            if diff['appended']:
+                new_rows = records_to_columns(diff['appended'], dataset.keys())
+                for column, values in dataset.items():
+                    for new_value in new_rows[column]:
+                        moments[column].add(new_value)
+                    if column in histograms:
+                        histograms[column].update(added=new_rows[column])
+                    dataset[column] = np.concatenate([values, new_rows[column]])
+
+            self.nbytes += sum(values.nbytes for values in dataset.values()) - old_size
+            self._datasets.move_to_end(token)
+            self._evict()
+            return True
+
+    def update_columns(self, token, columns, fill_value=None):
+        """
+        Brings a stored dataset up to date with new values for its columns.
+
+        The new columns are compared with the stored ones and only the
+        cells that differ (and rows added or dropped at the end) are
+        written, so the running moments and histograms are updated from
+        the changed cells. This is used when the edits between the two
+        versions are not known, e.g. after a burst of table edits has
+        been collapsed into one update.
+
+        Args:
+            - token (str): The dataset token, or None for a new dataset.
+            - columns (dict): Column name -> array-like of numbers.
+            - fill_value (float): Value the running moments use in place
+                of NaN cells, if the dataset has to be loaded again.
+
+        Returns:
+            - str: The token of the up-to-date dataset.
+
+        Raises:
+            ValueError: If the dataset alone is larger than the byte budget.
+        """
+        columns = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        with self._lock:
+            dataset = self._datasets.get(token) if token is not None else None
+            if dataset is not None and dataset.keys() == columns.keys():
+                old_size = sum(values.nbytes for values in dataset.values())
+                moments = self._moments[token]
+                histograms = self._histograms.get(token, {})
+                for column, new_values in columns.items():
+                    old_values = dataset[column]
+                    common = min(len(old_values), len(new_values))
+                    old_head, new_head = old_values[:common], new_values[:common]
+                    changed = np.flatnonzero((old_head != new_head)
+                                             & ~(np.isnan(old_head) & np.isnan(new_head)))
+                    removed = np.concatenate([old_head[changed], old_values[common:]])
+                    added = np.concatenate([new_head[changed], new_values[common:]])
+                    if len(removed) + len(added) > len(new_values):
+                        # Most of the column changed, so start the moments again
+                        moments[column] = RunningMoments.from_values(
+                            new_values, moments[column].fill_value)
+                    else:
+                        for old_value in removed:
+                            moments[column].remove(old_value)
+                        for new_value in added:
+                            moments[column].add(new_value)
+                    if column in histograms:
+                        histograms[column].update(removed=removed, added=added)
+                    dataset[column] = new_values.copy()
+                self.nbytes += sum(values.nbytes for values in dataset.values()) - old_size
+                self._datasets.move_to_end(token)
+                self._evict()
+                return token
+        return self.put(columns, token=token, fill_value=fill_value)
+
+    def get_histogram(self, token, column, edges):
+        """
+        Looks up the bin counts of a column for a set of bin edges.
+
+        The counts are kept with the dataset and updated from each edit,
+        so they are only worked out from the whole column again when the
+        bin edges change.
+
+        Args:
+            - token (str): The dataset token.
+            - column (str): The column name.
+            - edges (np.ndarray): The increasing bin edges.
+
+        Returns:
+            - np.ndarray or None: The count in each bin, or None if the
+                dataset is gone.
+
+        Raises:
+            KeyError: If the dataset does not have the column.
+        """
+        with self._lock:
+            dataset = self._datasets.get(token)
+            if dataset is None:
+                return None
+            histograms = self._histograms.setdefault(token, {})
+            histogram = histograms.get(column)
+            if histogram is None or not histogram.has_edges(edges):
+                histogram = RunningHistogram.from_values(dataset[column], edges)
+                histograms[column] = histogram
+            return histogram.counts.copy()
+
+    def sync_table(self, token, data, data_previous, columns, fill_value=None):
+        """
+        Brings the stored copy of a DataTable up to date.
+
+        Only the edits between `data_previous` and `data` are applied when
+        the table's dataset is still stored; otherwise (e.g. the token
+        holds an uploaded file) the whole table is loaded.
+
+        Args:
+            - token (str): The dataset token, or None for a new table.
+            - data (list of dict): The current table rows.
+            - data_previous (list of dict): The rows before the last edit.
+            - columns (list of str): The numeric columns to keep.
+            - fill_value (float): Value the running moments use in place
+                of NaN cells. If None, NaN cells are left out of them.
+
+        Returns:
+            - str: The token of the up-to-date dataset.
+        """
+        if token is not None and data_previous is not None:
+            if self.apply_diff(token, table_diff(data or [], data_previous)):
+                return token
+        return self.put(records_to_columns(data or [], columns), token=token,
+                        fill_value=fill_value, source=TABLE_SOURCE)
+
+    def sync_edit(self, token, edit, columns, fill_value=None):
+        """
+        Applies an edit sent by a page to the stored copy of its table.
+
+        The page works out the changed cells itself, so an edit holds
+        either the whole table (the first time, or when the server asked
+        for it) or only the changes since the table was last sent.
+
+        Args:
+            - token (str): The dataset token, or None for a new table.
+            - edit (dict): Either 'rows' (the table rows, as from a
+                DataTable) or 'diffs' (a list of edits in the form made by
+                `table_diff`, applied in order).
+            - columns (list of str): The numeric columns to keep.
+            - fill_value (float): Value the running moments use in place
+                of NaN cells. If None, NaN cells are left out of them.
+
+        Returns:
+            - str or None: The token of the up-to-date dataset, or None if
+                the edits cannot be applied (the table is no longer stored,
+                or the token holds other data) and the page has to send
+                the whole table.
+
+        Raises:
+            ValueError: If the table alone is larger than the byte budget.
+        """
+        if edit.get('rows') is not None:
+            return self.put(records_to_columns(edit['rows'], columns), token=token,
+                            fill_value=fill_value, source=TABLE_SOURCE)
+        if token is None:
+            return None
+        for diff in edit.get('diffs') or []:
+            if not self.apply_diff(token, diff):
+                return None
+        return token
+
+    def _remove(self, token):
+        dataset = self._datasets.pop(token, None)
+        self._moments.pop(token, None)
+        self._histograms.pop(token, None)
+        self._sources.pop(token, None)
+        if dataset is not None:
+            self.nbytes -= sum(values.nbytes for values in dataset.values())
+
+    def _evict(self):
+        while self._datasets and (len(self._datasets) > self.max_entries
+                                  or self.nbytes > self.max_bytes):
+            token, dataset = self._datasets.popitem(last=False)
+            del self._moments[token]
+            self._histograms.pop(token, None)
+            self._sources.pop(token, None)
+            self.nbytes -= sum(values.nbytes for values in dataset.values())
+
+
+# Store shared by all the Dash apps
+STORE = DatasetStore()
@@ -0,0 +1,698 @@
+"""This module tests every feature (e.g. gene) of a large expression
+matrix for a difference between two groups of samples, without ever
+holding the matrix in memory.
+
+The matrix (features x samples) is read a block of rows at a time, from
+a delimited text file (first column the feature ids, header row the
+sample names) or a 2-D .npy file (memory mapped). Each block gets a
+vectorized Welch t-test, or the pooled two-sample z-test of the z-test
+page, and the results are appended to compact float32 files in a
+results directory: the difference of the group means, the test
+statistic and -log10 of the p-value (which, unlike the p-value itself,
+keeps its precision for very small p-values in 4 bytes). A second pass
+adds the Benjamini-Hochberg and Bonferroni adjusted p-values.
+
+Memory use is set by the block size, whatever the size of the file; only
+the second pass needs memory in proportion to the number of features
+(16 bytes each, to sort the p-values).
+
+Usage:
+    python differential.py matrix.tsv --group1 'control_*' --group2 'treated_*' --output results
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import plots
+import ztest
+
+# Tests that can be run on each feature
+TESTS = ('welch', 'ztest')
+
+# Significance level counted in the summary
+DEFAULT_ALPHA = 0.05
+
+# Bytes a block of rows may use while it is parsed and tested
+MEMORY_BUDGET = 64 * 1024 * 1024
+BYTES_PER_CELL = 48
+
+# Features handled at a time by the second pass
+ADJUST_ROWS = 1_000_000
+
+# Directory the web app reads matrices from, and where it keeps results
+DATA_DIRECTORY = os.environ.get('BIOSTAT_DATA_DIR',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+RESULTS_DIRECTORY = os.path.join(DATA_DIRECTORY, '.results')
+
+# Matrix file types that can be read
+MATRIX_EXTENSIONS = ('.csv', '.tsv', '.txt', '.npy')
+
+# Result arrays, each stored as little-endian float32 in '<name>.f4'
+ARRAYS = ('difference', 'statistic', 'neg_log10_p', 'neg_log10_bh', 'neg_log10_bonferroni')
+FEATURES_FILE = 'features.txt'
+SUMMARY_FILE = 'summary.json'
+
+# Most points drawn in a volcano plot, and the number of top features listed
+MAX_VOLCANO_POINTS = 20000
+TOP_FEATURES = 10
+
+_LOG10 = np.log(10.0)
+
+# One lock per results directory, so runs in this process that share a
+# directory take turns and the later ones reuse the results
+_OUTPUT_LOCKS = {}
+_OUTPUT_LOCKS_LOCK = threading.Lock()
+
+
+def list_matrix_files(directory=DATA_DIRECTORY):
+    """
+    Lists the matrix files in a directory.
+
+    Args:
+        - directory (str): The directory to look in.
+
+    Returns:
+        - list of str: The names of the files that can be read, sorted.
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if name.lower().endswith(MATRIX_EXTENSIONS)
+                  and os.path.isfile(os.path.join(directory, name)))
+
+
+def read_sample_names(path):
+    """
+    Reads the sample (column) names of a matrix file.
+
+    Args:
+        - path (str): The matrix file.
+
+    Returns:
+        - list of str: The sample names. Columns of a .npy file are named
+            by their position ('0', '1', ...).
+    """
+    if path.lower().endswith('.npy'):
+        matrix = np.load(path, mmap_mode='r')
+        if matrix.ndim != 2:
+            raise ValueError("The matrix must be 2-D (features x samples)")
+        return [str(column) for column in range(matrix.shape[1])]
+    header = pd.read_csv(path, sep=_separator(path), nrows=0, index_col=0)
+    return [str(name).strip() for name in header.columns]
+
+
+def resolve_samples(names, patterns):
+    """
+    Finds the columns of a group of samples.
+
+    Args:
+        - names (list of str): The sample names of the matrix.
+        - patterns (str or list of str): Sample names, or shell-style
+            patterns such as 'control_*'. A string is split on commas.
+
+    Returns:
+        - list of int: The positions of the matching columns, in file order.
+
+    Raises:
+        ValueError: If a pattern matches no sample.
+    """
+    if isinstance(patterns, str):
+        patterns = patterns.split(',')
+    positions = set()
+    for pattern in (pattern.strip() for pattern in patterns):
+        if not pattern:
+            continue
+        matches = [position for position, name in enumerate(names)
+                   if fnmatch.fnmatchcase(name, pattern)]
+        if not matches:
+            raise ValueError(f"No sample matches '{pattern}'")
+        positions.update(matches)
+    return sorted(positions)
+
+
+def _separator(path):
+    return ',' if path.lower().endswith('.csv') else '\t'
+
+
+def _read_blocks(path, columns, rows):
+    """
+    Yields (feature ids, block) pairs of a matrix file, `rows` features at a
+    time, with only the given sample columns.
+    """
+    if path.lower().endswith('.npy'):
+        matrix = np.load(path, mmap_mode='r')
+        for start in range(0, matrix.shape[0], rows):
+            block = np.asarray(matrix[start:start + rows, columns], dtype=float)
+            yield None, block
+        return
+    reader = pd.read_csv(path, sep=_separator(path), index_col=0, chunksize=rows,
+                         usecols=[0] + [column + 1 for column in columns])
+    # usecols keeps the file's column order, so put the columns back in the order asked for
+    file_order = sorted(columns)
+    order = [file_order.index(column) for column in columns]
+    for chunk in reader:
+        if all(dtype.kind in 'biuf' for dtype in chunk.dtypes):
+            block = chunk.to_numpy(dtype=float)
+        else:
+            # Cells that are not numbers (e.g. 'NA') are missing values
+            block = chunk.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        yield chunk.index.astype(str), block[:, order]
+
+
+def welch_test(matrix1, matrix2):
+    """
+    Welch t-test of every row of two blocks of samples.
+
+    Args:
+        - matrix1 (np.ndarray): Group 1 values, shape (features, samples1).
+        - matrix2 (np.ndarray): Group 2 values, shape (features, samples2).
+
+    Returns:
+        - np.ndarray: The difference of the means (group 1 minus group 2).
+        - np.ndarray: The t-statistic.
+        - np.ndarray: -log10 of the two-sided p-value. Rows with fewer
+            than two values in a group get NaN.
+    """
+    from scipy import stats
+    counts1, means1, variances1 = plots.row_moments(matrix1)
+    counts2, means2, variances2 = plots.row_moments(matrix2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se1, se2 = variances1 / counts1, variances2 / counts2
+        t_stats = (means1 - means2) / np.sqrt(se1 + se2)
+        dfs = (se1 + se2) ** 2 / (se1 ** 2 / (counts1 - 1) + se2 ** 2 / (counts2 - 1))
+    log_p = np.log(2) + stats.t.logsf(np.abs(t_stats), dfs)
+    return means1 - means2, t_stats, np.maximum(-log_p / _LOG10, 0.0)
+
+
+def z_test(matrix1, matrix2):
+    """
+    Pooled-variance two-sample z-test of every row of two blocks of samples
+    (the test of the z-test page).
+
+    Args and Returns are as for `welch_test`, with the z-statistic.
+    """
+    from scipy import stats
+    counts1, means1, variances1 = plots.row_moments(matrix1)
+    counts2, means2, variances2 = plots.row_moments(matrix2)
+    z_stats = ztest.z_statistic(means1, np.sqrt(variances1), counts1,
+                                means2, np.sqrt(variances2), counts2, usevar='pooled')
+    log_p = np.log(2) + stats.norm.logsf(np.abs(z_stats))
+    return means1 - means2, z_stats, np.maximum(-log_p / _LOG10, 0.0)
+
+
+def score_matrix(path, group1, group2, output, test='welch', memory_budget=MEMORY_BUDGET,
+                 progress=None):
+    """
+    First pass: tests every feature of a matrix file and writes the
+    results to a directory (which is replaced if it exists).
+
+    Args:
+        - path (str): The matrix file (.csv, .tsv/.txt or .npy).
+        - group1 (str or list of str): The group 1 samples (see `resolve_samples`).
+        - group2 (str or list of str): The group 2 samples.
+        - output (str): The results directory.
+        - test (str): 'welch' or 'ztest'.
+        - memory_budget (int): Most bytes used by one block of rows.
+        - progress (callable): Called after each block with the number of
+            features tested so far.
+
+    Returns:
+        - dict: The summary also written to the directory's summary.json.
+
+    Raises:
+        ValueError: If the test is unknown, a group matches no samples,
+            or the two groups share samples.
+    """
+    if test not in TESTS:
+        raise ValueError(f"Unknown test '{test}'")
+    names = read_sample_names(path)
+    columns1, columns2 = resolve_samples(names, group1), resolve_samples(names, group2)
+    if set(columns1) & set(columns2):
+        raise ValueError("The two groups must not share samples")
+    columns = columns1 + columns2
+    rows = max(1, memory_budget // (len(columns) * BYTES_PER_CELL))
+    run = welch_test if test == 'welch' else z_test
+
+    # Results are written to a new directory that replaces the old one at
+    # the end, so an interrupted run never leaves a mix of old and new files
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.partial-', dir=parent)
+    features = 0
+    try:
+        handles = {name: open(os.path.join(staging, f'{name}.f4'), 'wb')
+                   for name in ARRAYS[:3]}
+        ids = None if path.lower().endswith('.npy') else open(
+            os.path.join(staging, FEATURES_FILE), 'w', encoding='utf-8')
+        try:
+            for block_ids, block in _read_blocks(path, columns, rows):
+                results = run(block[:, :len(columns1)], block[:, len(columns1):])
+                for name, values in zip(ARRAYS[:3], results):
+                    values.astype('<f4').tofile(handles[name])
+                if ids is not None:
+                    ids.writelines(f'{feature}\n' for feature in block_ids)
+                features += len(block)
+                if progress is not None:
+                    progress(features)
+        finally:
+            for handle in handles.values():
+                handle.close()
+            if ids is not None:
+                ids.close()
+
+        summary = {
+            'source': os.path.basename(path),
+            'test': test,
+            'features': features,
+            'group1': [names[column] for column in columns1],
+            'group2': [names[column] for column in columns2],
+            'has_feature_ids': ids is not None,
+        }
+        _write_summary(staging, summary)
+        _replace_directory(staging, output)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return summary
+
+
+def _replace_directory(staging, output):
+    """
+    Moves a finished results directory into place. The old directory is
+    renamed out of the way before it is deleted, so the swap is safe when
+    another process runs the same test; if that run puts its results in
+    place first, they are kept and `staging` is deleted.
+    """
+    parent = os.path.dirname(os.path.abspath(output))
+    old = tempfile.mkdtemp(prefix='.old-', dir=parent)
+    try:
+        try:
+            os.replace(output, os.path.join(old, 'results'))
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(staging, output)
+        except OSError:
+            if not os.path.isdir(output):
+                raise
+            # Another run finished first
+            shutil.rmtree(staging, ignore_errors=True)
+    finally:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _write_summary(directory, summary):
+    with open(os.path.join(directory, SUMMARY_FILE), 'w', encoding='utf-8') as handle:
+        json.dump(summary, handle, indent=2)
+
+
+def read_summary(directory):
+    """
+    Reads the summary of a results directory.
+
+    Args:
+        - directory (str): The results directory.
+
+    Returns:
+        - dict or None: The summary, or None if the directory has no results.
+    """
+    try:
+        with open(os.path.join(directory, SUMMARY_FILE), encoding='utf-8') as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def load_array(directory, name):
+    """
+    Memory maps one result array of a results directory.
+
+    Args:
+        - directory (str): The results directory.
+        - name (str): One of `ARRAYS`.
+
+    Returns:
+        - np.memmap: The float32 values, one per feature.
+    """
+    path = os.path.join(directory, f'{name}.f4')
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype='<f4')
+    return np.memmap(path, dtype='<f4', mode='r')
+
+
+def adjust_p_values(directory, alpha=DEFAULT_ALPHA, chunk_rows=ADJUST_ROWS):
+    """
+    Second pass: adds the Benjamini-Hochberg (false discovery rate) and
+    Bonferroni adjusted p-values, as -log10, to a results directory.
+
+    Features without a p-value (too few values) are left out of the
+    number of tests and get NaN.
+
+    Args:
+        - directory (str): A results directory from `score_matrix`.
+        - alpha (float): Significance level counted in the summary.
+        - chunk_rows (int): Features read and written at a time.
+
+    Returns:
+        - dict: The updated summary, with the number of tests and the
+            number of features significant at `alpha` by each measure.
+    """
+    summary = read_summary(directory)
+    scores = load_array(directory, 'neg_log10_p')
+
+    # The sorted scores and their step-up BH values are the only arrays
+    # the size of the whole feature set. Everything stays in -log10 so
+    # p-values below the smallest double (about 1e-308) keep their size:
+    # -log10 q = -log10 p - log10(tests / rank), with the ranks counted
+    # from the smallest p-value, i.e. the largest score.
+    sorted_scores = np.sort(np.asarray(scores[~np.isnan(scores)], dtype=float))
+    tests = len(sorted_scores)
+    ranks = np.arange(tests, 0, -1, dtype=float)
+    step_up = np.maximum.accumulate(sorted_scores - np.log10(tests / ranks))
+    step_up = np.maximum(step_up, 0.0)
+    del ranks
+
+    threshold = -np.log10(alpha)
+    significant = {'p': 0, 'bh': 0, 'bonferroni': 0}
+    with open(os.path.join(directory, 'neg_log10_bh.f4'), 'wb') as bh_file, \
+            open(os.path.join(directory, 'neg_log10_bonferroni.f4'), 'wb') as bonferroni_file:
+        for start in range(0, len(scores), chunk_rows):
+            chunk = np.asarray(scores[start:start + chunk_rows], dtype=float)
+            valid = ~np.isnan(chunk)
+            # Tied p-values share the value of the last of them (the
+            # first of the tied scores)
+            positions = np.searchsorted(sorted_scores, chunk[valid], side='left')
+            bh = np.full(len(chunk), np.nan)
+            bh[valid] = step_up[positions]
+            bonferroni = np.maximum(chunk - np.log10(max(tests, 1)), 0.0)
+            bh.astype('<f4').tofile(bh_file)
+            bonferroni.astype('<f4').tofile(bonferroni_file)
+            significant['p'] += int(np.count_nonzero(chunk[valid] > threshold))
+            significant['bh'] += int(np.count_nonzero(bh[valid] > threshold))
+            significant['bonferroni'] += int(np.count_nonzero(bonferroni[valid] > threshold))
+
+    summary.update(tests=tests, alpha=alpha, significant=significant)
+    _write_summary(directory, summary)
+    return summary
+
+
+def read_features(directory, indices):
+    """
+    Looks up the ids of some features, reading the id file line by line.
+
+    Args:
+        - directory (str): The results directory.
+        - indices (array-like): Feature positions.
+
+    Returns:
+        - list of str: The id of each feature, in the order of `indices`
+            (the position as text if the matrix had no ids).
+    """
+    indices = np.asarray(indices, dtype=int)
+    summary = read_summary(directory)
+    if not summary.get('has_feature_ids'):
+        return [str(index) for index in indices]
+    wanted = np.unique(indices)
+    found = {}
+    cursor = 0
+    with open(os.path.join(directory, FEATURES_FILE), encoding='utf-8') as handle:
+        for position, line in enumerate(handle):
+            if cursor == len(wanted):
+                break
+            if position == wanted[cursor]:
+                found[position] = line.rstrip('\n')
+                cursor += 1
+    return [found.get(int(index), str(index)) for index in indices]
+
+
+def volcano_points(directory, correction='bh', max_points=MAX_VOLCANO_POINTS, top=TOP_FEATURES):
+    """
+    Picks the features drawn in a volcano plot, reading the result
+    arrays a chunk at a time. All significant features are kept (or an
+    even selection of them, if there are more than half of `max_points`),
+    and the rest are thinned to an evenly spaced selection.
+
+    Args:
+        - directory (str): A results directory from `adjust_p_values`.
+        - correction (str): 'bh' or 'bonferroni'; the adjusted p-value
+            that decides which features are significant.
+        - max_points (int): Most features to keep.
+        - top (int): Number of most significant features to list.
+
+    Returns:
+        - dict: 'index', 'id', 'difference', 'neg_log10_p' and
+            'significant' of the kept features, and 'top', the ids,
+            differences and -log10 p-values of the most significant
+            features, most significant first.
+    """
+    summary = read_summary(directory)
+    threshold = -np.log10(summary['alpha'])
+    difference = load_array(directory, 'difference')
+    scores = load_array(directory, 'neg_log10_p')
+    adjusted = load_array(directory, f'neg_log10_{correction}')
+
+    significant_count = summary['significant'][correction]
+    significant_step = max(1, -(-significant_count // max(max_points // 2, 1)))
+    kept_significant = -(-significant_count // significant_step)
+    other_count = summary['tests'] - significant_count
+    other_step = max(1, -(-other_count // max(max_points - kept_significant, 1)))
+
+    kept, flags = [], []
+    top_index, top_score = np.zeros(0, dtype=int), np.zeros(0)
+    seen_significant = seen_other = 0
+    for start in range(0, len(scores), ADJUST_ROWS):
+        chunk_scores = np.asarray(scores[start:start + ADJUST_ROWS], dtype=float)
+        chunk_adjusted = np.asarray(adjusted[start:start + ADJUST_ROWS], dtype=float)
+        valid = ~np.isnan(chunk_scores)
+        significant = valid & (chunk_adjusted > threshold)
+        other = valid & ~significant
+        # Every step-th feature of each kind, counting across chunks
+        for mask, seen, step, flag in ((significant, seen_significant, significant_step, True),
+                                       (other, seen_other, other_step, False)):
+            positions = np.flatnonzero(mask)
+            chosen = positions[(seen + np.arange(len(positions))) % step == 0]
+            kept.append(start + chosen)
+            flags.append(np.full(len(chosen), flag))
+        seen_significant += int(np.count_nonzero(significant))
+        seen_other += int(np.count_nonzero(other))
+
+        # Running list of the most significant features
+        candidates = np.flatnonzero(valid)
+        if len(candidates) > top:
+            candidates = candidates[np.argpartition(-chunk_scores[candidates], top)[:top]]
+        top_index = np.concatenate([top_index, start + candidates])
+        top_score = np.concatenate([top_score, chunk_scores[candidates]])
+        best = np.argsort(-top_score, kind='stable')[:top]
+        top_index, top_score = top_index[best], top_score[best]
+
+    index = np.concatenate(kept) if kept else np.zeros(0, dtype=int)
+    significant = np.concatenate(flags) if flags else np.zeros(0, dtype=bool)
+    order = np.argsort(index, kind='stable')
+    index, significant = index[order], significant[order]
+    ids = read_features(directory, np.concatenate([index, top_index]))
+    return {
+        'index': index,
+        'id': ids[:len(index)],
+        'difference': np.asarray(difference[index], dtype=float),
+        'neg_log10_p': np.asarray(scores[index], dtype=float),
+        'significant': significant,
+        'top': [(feature, float(difference[position]), float(score))
+                for feature, position, score in zip(ids[len(index):], top_index, top_score)],
+    }
+
+
+def results_directory(path, group1, group2, test, root=RESULTS_DIRECTORY):
+    """
+    The results directory of a run, named by a hash of the matrix file
+    (its path, size and modification time) and the test options, so an
+    unchanged file is not tested again.
+
+    Args:
+        - path (str): The matrix file.
+        - group1, group2 (str or list of str): The sample groups.
+        - test (str): 'welch' or 'ztest'.
+        - root (str): The directory the results directories are kept in.
+
+    Returns:
+        - str: The results directory.
+    """
+    status = os.stat(path)
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(repr((os.path.abspath(path), status.st_size, status.st_mtime_ns,
+                        group1, group2, test)).encode())
+    return os.path.join(root, digest.hexdigest())
+
+
+def run_pipeline(path, group1, group2, test='welch', output=None, alpha=DEFAULT_ALPHA,
+                 memory_budget=MEMORY_BUDGET, progress=None):
+    """
+    Runs both passes on a matrix file, unless its results are already on disk.
+
+    Args:
+        - path (str): The matrix file.
+        - group1, group2 (str or list of str): The sample groups.
+        - test (str): 'welch' or 'ztest'.
+        - output (str): The results directory. Defaults to one named by
+            `results_directory`.
+        - alpha (float): Significance level counted in the summary.
+        - memory_budget (int): Most bytes used by one block of rows.
+        - progress (callable): As for `score_matrix`.
+
+    Returns:
+        - str: The results directory.
+        - dict: The summary.
+
+    Raises:
+        ValueError: As for `score_matrix`, or if the file cannot be parsed.
+        OSError: If the file or the results directory cannot be read or written.
+    """
+    if output is None:
+        output = results_directory(path, group1, group2, test)
+    with _OUTPUT_LOCKS_LOCK:
+        lock = _OUTPUT_LOCKS.setdefault(os.path.abspath(output), threading.Lock())
+    with lock:
+        summary = read_summary(output)
+        if summary is None or summary.get('alpha') != alpha:
+            # Both passes write to a directory of this run's own, which
+            # only replaces the results once they are complete
+            parent = os.path.dirname(os.path.abspath(output))
+            os.makedirs(parent, exist_ok=True)
+            run_directory = tempfile.mkdtemp(prefix='.run-', dir=parent)
+            try:
+                staging = os.path.join(run_directory, 'results')
+                score_matrix(path, group1, group2, staging, test, memory_budget, progress)
+                summary = adjust_p_values(staging, alpha)
+                _replace_directory(staging, output)
+            finally:
+                shutil.rmtree(run_directory, ignore_errors=True)
+    return output, summary
+
+
+class PipelineJobs:
+    """
+    Thread-safe record of pipeline runs started in the background, so a
+    web page can start a run and poll how far along it is. Each job is
+    known by the name of its results directory; starting a run that is
+    already going returns the same job.
+
+    Args:
+        - root (str): The directory the results directories are kept in.
+    """
+
+    def __init__(self, root=RESULTS_DIRECTORY):
+        self.root = root
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, path, group1, group2, test='welch', alpha=DEFAULT_ALPHA):
+        """
+        Starts `run_pipeline` on a thread, unless the same run is going.
+
+        Args:
+            - path (str): The matrix file.
+            - group1, group2 (str or list of str): The sample groups.
+            - test (str): 'welch' or 'ztest'.
+            - alpha (float): Significance level counted in the summary.
+
+        Returns:
+            - str: The job id.
+
+        Raises:
+            OSError: If the matrix file cannot be found.
+        """
+        output = results_directory(path, group1, group2, test, root=self.root)
+        job_id = os.path.basename(output)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job['done']:
+                return job_id
+            job = {'source': os.path.basename(path), 'output': output, 'rows': 0,
+                   'done': False, 'error': None, 'summary': None}
+            self._jobs[job_id] = job
+        thread = threading.Thread(target=self._run, name=f'pipeline-{job_id}', daemon=True,
+                                  args=(job, path, group1, group2, test, alpha))
+        thread.start()
+        return job_id
+
+    def _run(self, job, path, group1, group2, test, alpha):
+        def progress(rows):
+            with self._lock:
+                job['rows'] = rows
+
+        error, summary = None, None
+        try:
+            _, summary = run_pipeline(path, group1, group2, test, output=job['output'],
+                                      alpha=alpha, progress=progress)
+        except (ValueError, OSError) as exception:
+            # Bad groups, unparsable files and I/O errors are shown to the user
+            error = str(exception) or type(exception).__name__
+        finally:
+            if summary is None and error is None:
+                # Any other exception is a bug; it is still raised on this thread
+                error = "The run failed"
+            with self._lock:
+                job['summary'] = summary
+                job['error'] = error
+                job['done'] = True
+
+    def get(self, job_id):
+        """
+        Returns the state of a job.
+
+        Returns:
+            - dict or None: 'source' (the matrix file name), 'output' (the
+                results directory), 'rows' (features tested so far), 'done',
+                'error' (a message, or None) and 'summary' (once done), or
+                None if the job is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+
+# Pipeline runs started from the web app
+JOBS = PipelineJobs()
+
+
+def main(argv=None):
+    """
+    Runs the pipeline from the command line.
+
+    Returns:
+        - int: The exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('matrix', help="Matrix file (.csv, .tsv/.txt or .npy)")
+    parser.add_argument('--group1', required=True,
+                        help="Group 1 sample names or patterns, separated by commas")
+    parser.add_argument('--group2', required=True,
+                        help="Group 2 sample names or patterns, separated by commas")
+    parser.add_argument('--test', choices=TESTS, default='welch', help="Test for each feature")
+    parser.add_argument('--output', required=True, help="Results directory")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                        help="Significance level counted in the summary")
+    parser.add_argument('--memory', type=int, default=MEMORY_BUDGET // 2 ** 20,
+                        help="MiB a block of rows may use")
+    options = parser.parse_args(argv)
+
+    summary = score_matrix(options.matrix, options.group1, options.group2, options.output,
+                          options.test, options.memory * 2 ** 20,
+                          progress=lambda rows: print(f"{rows:,} features tested", flush=True))
+    summary = adjust_p_values(options.output, options.alpha)
+    significant = summary['significant']
+    print(f"{summary['tests']:,} features tested; significant at {options.alpha:g}: "
+          f"{significant['p']:,} unadjusted, {significant['bh']:,} Benjamini-Hochberg, "
+          f"{significant['bonferroni']:,} Bonferroni")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
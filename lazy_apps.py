@@ -0,0 +1,74 @@
+"""This module builds the Dash apps on demand. Each /dash_*/ prefix is
+served by its own Flask server, which is created (along with the Dash
+app's layout and callbacks) the first time that prefix is requested.
+Until then nothing from dash, plotly, pandas or scipy is imported, so
+the plain Flask pages can be served right after the process starts."""
+
+import importlib
+import threading
+from flask import Flask
+
+# Route prefixes of the Dash apps, matching dash_apps.DASH_APP_BUILDERS
+DASH_PREFIXES = ('dash_test', 'dash_ttest', 'dash_ztest', 'dash_distribution',
+                 'dash_anova', 'dash_regressions')
+
+
+class LazyDashApps:
+    """
+    WSGI middleware that sends /dash_*/ requests to Dash apps built on
+    first use and everything else to the wrapped app.
+
+    Args:
+        - wsgi_app (callable): The WSGI app for all other requests
+            (normally the main Flask app's `wsgi_app`).
+        - prefixes (tuple of str): The Dash route prefixes to handle.
+        - configure_server (callable): Called with each new Flask server
+            once its Dash app is built, e.g. to add request hooks (which
+            then run before the Dash app's own after-request hooks).
+    """
+
+    def __init__(self, wsgi_app, prefixes=DASH_PREFIXES, configure_server=None):
+        self.wsgi_app = wsgi_app
+        self.prefixes = prefixes
+        self.configure_server = configure_server
+        self._servers = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        name = environ.get('PATH_INFO', '').lstrip('/').split('/', 1)[0]
+        if name in self.prefixes:
+            return self.get_server(name)(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+    def is_built(self, name):
+        """Checks whether the Dash app for a prefix has been built."""
+        return name in self._servers
+
+    def get_server(self, name):
+        """
+        Returns the Flask server of a Dash app, building it if needed.
+
+        Args:
+            - name (str): The route prefix, e.g. 'dash_ttest'.
+
+        Returns:
+            - Flask: The server the Dash app is attached to.
+        """
+        server = self._servers.get(name)
+        if server is not None:
+            return server
+        with self._lock:
+            server = self._servers.get(name)
+            if server is None:
+                dash_apps = importlib.import_module('dash_apps')
+                server = Flask(dash_apps.__name__)
+                dash_apps.build_dash_app(name, server)
+                if self.configure_server is not None:
+                    self.configure_server(server)
+                self._servers[name] = server
+        return server
+
+    def build_all(self):
+        """Builds every Dash app now, e.g. to warm up a worker process."""
+        for name in self.prefixes:
+            self.get_server(name)
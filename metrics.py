@@ -0,0 +1,377 @@
+"""This module records how long each Flask route and Dash callback takes,
+how many bytes go in and out, how many fail and how many are running,
+and renders the numbers in the Prometheus text format for `/metrics`.
+
+Each route or callback gets its own series with fixed histogram buckets,
+so recording a request is a bucket lookup and a few additions under
+that series' own lock; the registry lock is only taken the first time a
+series is seen.
+
+When the app runs in several worker processes (see prefork), each
+worker has its own registry. Given a shared directory, every worker
+writes a snapshot of its numbers there as <pid>.json, and `/metrics`
+adds up the snapshots of all the workers, as in the Prometheus client's
+multiprocess mode. Counts from workers that have exited are kept, so
+the totals never go down; their in-flight gauges are left out."""
+
+import bisect
+import json
+import os
+import threading
+import time
+from flask import g, request
+
+# Histogram bucket upper bounds (a +Inf bucket is always added)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                 16777216, 67108864)
+
+# Prefix of every metric name
+NAMESPACE = 'statsapp'
+
+# Responses with a status code at or above this count as errors
+ERROR_STATUS = 500
+
+# Label used for requests that match no route, so 404s share one series
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed bucket bounds. Not locked itself;
+    the owning Series holds the lock.
+
+    Args:
+        - bounds (tuple of float): Sorted bucket upper bounds.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        """Adds one value."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def snapshot(self):
+        """
+        Returns the cumulative bucket counts.
+
+        Returns:
+            - list of tuple: (upper bound as a string, count) for each bucket,
+                ending with '+Inf'.
+            - float: The sum of the values.
+            - int: The number of values.
+        """
+        buckets, running = [], 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            running += count
+            buckets.append(('+Inf' if bound == float('inf') else repr(bound), running))
+        return buckets, self.total, running
+
+
+class Series:
+    """
+    The metrics of one route or callback.
+
+    Args:
+        - labels (tuple of tuple): (name, value) label pairs.
+    """
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.request_bytes = Histogram(BYTES_BUCKETS)
+        self.response_bytes = Histogram(BYTES_BUCKETS)
+        self.errors = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Marks a request as started."""
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self):
+        """Marks a request as finished (whether or not it was observed)."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def observe(self, seconds, request_bytes, response_bytes, error):
+        """
+        Records a finished request.
+
+        Args:
+            - seconds (float): How long it took.
+            - request_bytes (int): Size of the request body.
+            - response_bytes (int): Size of the response body.
+            - error (bool): Whether it failed.
+        """
+        with self._lock:
+            self.duration.observe(seconds)
+            self.request_bytes.observe(request_bytes)
+            self.response_bytes.observe(response_bytes)
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        """Returns a consistent copy of the series' numbers."""
+        with self._lock:
+            return {
+                'duration_seconds': self.duration.snapshot(),
+                'request_bytes': self.request_bytes.snapshot(),
+                'response_bytes': self.response_bytes.snapshot(),
+                'errors': self.errors,
+                'in_flight': self.in_flight,
+            }
+
+
+def _format_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """Holds the series of every instrumented route and callback."""
+
+    # Help text of each metric, by suffix
+    HELP = {
+        'duration_seconds': 'Time taken to handle the request.',
+        'request_bytes': 'Size of the request body.',
+        'response_bytes': 'Size of the response body.',
+        'errors_total': 'Requests that failed.',
+        'in_flight': 'Requests being handled now.',
+    }
+
+    def __init__(self, directory=None):
+        self._series = {}
+        self._lock = threading.Lock()
+        self.directory = directory
+
+    def series(self, family, **labels):
+        """
+        Returns the series for a route or callback, creating it if needed.
+
+        Args:
+            - family (str): 'route' or 'callback'.
+            - **labels (str): The labels that identify the series.
+
+        Returns:
+            - Series: The series.
+        """
+        key = (family, tuple(sorted(labels.items())))
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, Series(key[1]))
+        return series
+
+    def clear(self):
+        """Forgets every series."""
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        """
+        Copies the numbers of every series.
+
+        Returns:
+            - list of tuple: (family, labels, snapshot) for each series, where
+                snapshot is as returned by `Series.snapshot`.
+        """
+        with self._lock:
+            items = list(self._series.items())
+        return [(family, labels, series.snapshot()) for (family, labels), series in items]
+
+    def write_snapshot(self):
+        """
+        Writes this process's numbers to <pid>.json in the shared directory
+        (does nothing if no directory is set). The file is replaced in one
+        step, so readers never see a partial snapshot.
+        """
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(path + '.tmp', path)
+
+    def _worker_snapshots(self):
+        """Reads the snapshots the other worker processes have written."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == f'{os.getpid()}.json':
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                continue  # Removed or being replaced
+            alive = _process_alive(int(name[:-len('.json')]))
+            for family, labels, numbers in snapshot:
+                if not alive:
+                    numbers['in_flight'] = 0
+                entries.append((family, tuple(tuple(pair) for pair in labels), numbers))
+        return entries
+
+    def render(self):
+        """
+        Renders every series in the Prometheus text exposition format,
+        added up over all the worker processes if a shared directory is set.
+
+        Returns:
+            - str: The metrics text.
+        """
+        entries = self.snapshot()
+        if self.directory is not None:
+            entries = merge_snapshots(entries + self._worker_snapshots())
+        families = {}
+        for family, labels, snapshot in entries:
+            families.setdefault(family, []).append((labels, snapshot))
+
+        lines = []
+        for family, snapshots in sorted(families.items()):
+            for suffix in ('duration_seconds', 'request_bytes', 'response_bytes'):
+                name = f'{NAMESPACE}_{family}_{suffix}'
+                lines += [f'# HELP {name} {self.HELP[suffix]}', f'# TYPE {name} histogram']
+                for labels, snapshot in snapshots:
+                    buckets, total, count = snapshot[suffix]
+                    for bound, running in buckets:
+                        lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} '
+                                     f'{running}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {total!r}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+            for suffix, key, kind in (('errors_total', 'errors', 'counter'),
+                                      ('in_flight', 'in_flight', 'gauge')):
+                name = f'{NAMESPACE}_{family}_{suffix}'
+                lines += [f'# HELP {name} {self.HELP[suffix]}', f'# TYPE {name} {kind}']
+                for labels, snapshot in snapshots:
+                    lines.append(f'{name}{_format_labels(labels)} {snapshot[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Running, but owned by someone else
+    return True
+
+
+def merge_snapshots(entries):
+    """
+    Adds up the snapshots of the same series from several processes.
+
+    Args:
+        - entries (list of tuple): (family, labels, snapshot) entries, as
+            returned by `MetricsRegistry.snapshot`.
+
+    Returns:
+        - list of tuple: One (family, labels, snapshot) entry per series.
+    """
+    merged = {}
+    for family, labels, snapshot in entries:
+        key = (family, labels)
+        if key not in merged:
+            merged[key] = {
+                name: ([list(bucket) for bucket in value[0]], value[1], value[2])
+                if isinstance(value, (list, tuple)) else value
+                for name, value in snapshot.items()
+            }
+            continue
+        total = merged[key]
+        for name, value in snapshot.items():
+            if isinstance(value, (list, tuple)):
+                buckets, value_sum, count = total[name]
+                for bucket, (_, running) in zip(buckets, value[0]):
+                    bucket[1] += running
+                total[name] = (buckets, value_sum + value[1], count + value[2])
+            else:
+                total[name] += value
+    return [(family, labels, snapshot) for (family, labels), snapshot in merged.items()]
+
+
+# The registry shared by the main app and all the Dash apps
+REGISTRY = MetricsRegistry()
+
+
+def instrument_flask(server, registry=REGISTRY, prefix=None, name_request=None):
+    """
+    Adds request hooks to a Flask server that record every request.
+
+    Args:
+        - server (Flask): The server to instrument.
+        - registry (MetricsRegistry): Where to record the metrics.
+        - prefix (str): Only record requests whose path starts with this.
+        - name_request (callable): Called in the request context; returns
+            (family, labels dict) for the request, or None for the default
+            ('route', {'route': the matched URL rule}).
+    """
+
+    @server.before_request
+    def start_timer():
+        if prefix is not None and not request.path.startswith(prefix):
+            return
+        named = name_request() if name_request is not None else None
+        if named is None:
+            rule = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+            named = ('route', {'route': rule})
+        series = registry.series(named[0], **named[1])
+        series.start()
+        g.metrics_series = series
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        series = g.pop('metrics_series', None)
+        if series is not None:
+            series.observe(time.perf_counter() - g.pop('metrics_start'),
+                           request.content_length or 0,
+                           response.calculate_content_length() or 0,
+                           response.status_code >= ERROR_STATUS)
+            series.finish()
+        return response
+
+    @server.teardown_request
+    def finish_request(error=None):
+        # Only reached with the series still set if after_request never ran
+        series = g.pop('metrics_series', None)
+        if series is not None:
+            series.observe(time.perf_counter() - g.pop('metrics_start'),
+                           request.content_length or 0, 0, True)
+            series.finish()
+
+
+def instrument_dash(dash_app, registry=REGISTRY):
+    """
+    Records the requests to a Dash app. Callback requests are recorded
+    per callback, labelled with the app, the callback function and its
+    outputs; the app's other requests (layout, assets, ...) per route.
+
+    Args:
+        - dash_app (Dash): The Dash app to instrument.
+        - registry (MetricsRegistry): Where to record the metrics.
+    """
+    prefix = dash_app.config.routes_pathname_prefix
+    app_name = prefix.strip('/') or 'dash'
+
+    def name_request():
+        if not request.path.endswith('_dash-update-component'):
+            return None
+        body = request.get_json(silent=True) or {}
+        output = body.get('output', '')
+        callback = dash_app.callback_map.get(output, {}).get('callback')
+        return ('callback', {'app': app_name,
+                             'callback': getattr(callback, '__name__', 'unknown'),
+                             'output': output if callback is not None else 'unknown'})
+
+    instrument_flask(dash_app.server, registry, prefix=prefix, name_request=name_request)
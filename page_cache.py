@@ -0,0 +1,118 @@
+"""This module keeps responses that never change in memory. The template
+pages are rendered on their first request, and each Dash app's layout
+and callback list are serialized on theirs; after that they are served
+from the saved copy with a strong ETag, so a browser that already has
+the page gets an empty 304 reply."""
+
+import functools
+import hashlib
+import threading
+from flask import Response, request
+
+# Dash routes whose responses are the same for every request
+DASH_STATIC_ROUTES = ('_dash-layout', '_dash-dependencies')
+
+
+class CachedPage:
+    """
+    A saved response body and its ETag.
+
+    Args:
+        - body (bytes): The response body.
+        - mimetype (str): The content type.
+    """
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def response(self):
+        """
+        Makes a response for the current request: the saved page, or an
+        empty 304 if the request's If-None-Match has the page's ETag.
+
+        Returns:
+            - flask.Response: The response.
+        """
+        response = Response(self.body, mimetype=self.mimetype)
+        response.set_etag(self.etag)
+        response.cache_control.no_cache = True  # Check the ETag on every visit
+        return response.make_conditional(request)
+
+
+class PageCache:
+    """Thread-safe store of rendered pages, by key."""
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pages)
+
+    def get_or_render(self, key, render, mimetype='text/html'):
+        """
+        Returns the saved page for `key`, rendering it first if needed.
+
+        Args:
+            - key (hashable): Identifies the page.
+            - render (callable): Makes the body (str or bytes) the first time.
+            - mimetype (str): The content type of the body.
+
+        Returns:
+            - CachedPage: The saved page.
+        """
+        page = self._pages.get(key)
+        if page is None:
+            body = render()
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            with self._lock:
+                page = self._pages.setdefault(key, CachedPage(body, mimetype))
+        return page
+
+    def clear(self):
+        """Forgets every saved page (e.g. after the templates change)."""
+        with self._lock:
+            self._pages.clear()
+
+
+# Pages of the main app
+PAGES = PageCache()
+
+
+def cache_dash_responses(dash_app, cache=None):
+    """
+    Serves a Dash app's layout and callback list from memory. A layout
+    given as a function may differ between requests, so it is left alone.
+
+    Args:
+        - dash_app (Dash): The Dash app, with its layout and callbacks set.
+        - cache (PageCache): Where to keep the responses (by default, a
+            cache of the app's own).
+    """
+    cache = PageCache() if cache is None else cache
+    prefix = dash_app.config.routes_pathname_prefix
+    server = dash_app.server
+    for route in DASH_STATIC_ROUTES:
+        if route == '_dash-layout' and callable(dash_app.layout):
+            continue
+        for rule in server.url_map.iter_rules():
+            if rule.rule == prefix + route:
+                server.view_functions[rule.endpoint] = _cached_view(
+                    server.view_functions[rule.endpoint], rule.rule, cache)
+
+
+def _cached_view(view, key, cache):
+    """Wraps a view so its first response is saved and served from then on."""
+
+    @functools.wraps(view)
+    def serve(*args, **kwargs):
+        def render():
+            return view(*args, **kwargs).get_data()
+
+        # Both Dash routes send JSON
+        return cache.get_or_render(key, render, 'application/json').response()
+
+    return serve
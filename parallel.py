@@ -0,0 +1,129 @@
+"""This module spreads blocks of random draws (permutation and bootstrap
+resamples) over a shared pool of worker processes.
+
+Every block gets its own random stream, spawned from one seed with
+`np.random.SeedSequence`, so the results only depend on the seed and the
+block sizes, not on how many workers run the blocks or in which order."""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Most worker processes the web app's resampling uses (only the server
+# worker that serves the Dash callbacks resamples, see app.py)
+RESAMPLE_WORKERS = int(os.environ.get('BIOSTAT_RESAMPLE_WORKERS', 0)) or os.cpu_count() or 1
+
+# Least work (draws x values) worth sending to one worker process; a
+# block this size takes about as long as handing it to the pool, so
+# smaller jobs run in the calling process
+MIN_CELLS_PER_WORKER = 1_000_000
+
+# Shared worker pool, created on first use
+_POOL = None
+_POOL_KEY = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool(workers):
+    """
+    Returns the shared pool of worker processes, starting it if needed.
+
+    Workers are started with 'spawn', which is safe in a process that
+    already runs request threads. A pool inherited through fork (e.g. by
+    a pre-forked server worker) is not reused.
+
+    Args:
+        - workers (int): The number of worker processes.
+
+    Returns:
+        - concurrent.futures.ProcessPoolExecutor: The pool.
+    """
+    global _POOL, _POOL_KEY
+    key = (os.getpid(), workers)
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_KEY != key:
+            if _POOL is not None and _POOL_KEY[0] == os.getpid():
+                _POOL.shutdown(wait=False)
+            _POOL = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _POOL_KEY = key
+        return _POOL
+
+
+def shutdown_pool():
+    """Stops the shared pool of worker processes, if it was started."""
+    global _POOL, _POOL_KEY
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_KEY[0] == os.getpid():
+            _POOL.shutdown()
+        _POOL, _POOL_KEY = None, None
+
+
+def worker_count(draws, values, workers=None):
+    """
+    Picks how many worker processes a resampling job should use: none
+    for small jobs, and more for larger ones up to the limit.
+
+    Args:
+        - draws (int): The number of resamples or permutations.
+        - values (int): The number of values resampled in each draw.
+        - workers (int): Most worker processes to use. Defaults to
+            RESAMPLE_WORKERS.
+
+    Returns:
+        - int: The number of workers to pass to `map_blocks` (1 to run
+            in this process).
+    """
+    workers = RESAMPLE_WORKERS if workers is None else workers
+    return max(1, min(workers, draws * values // MIN_CELLS_PER_WORKER))
+
+
+def seeded_blocks(draws, rows, seed):
+    """
+    Splits a number of draws into blocks, each with its own random stream.
+
+    Args:
+        - draws (int): The total number of draws.
+        - rows (int): Most draws in one block.
+        - seed (int): Seed the block streams are spawned from.
+
+    Returns:
+        - list of tuple: (draws, np.random.SeedSequence) of each block.
+    """
+    rows = max(1, rows)
+    full, rest = divmod(draws, rows)
+    sizes = [rows] * full + ([rest] if rest else [])
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+def map_blocks(function, args, blocks, workers=1):
+    """
+    Runs `function(*args, blocks)` over the blocks, in this process or
+    spread over the worker pool. The function must be defined at module
+    level (so the workers can import it) and return one result per block.
+
+    Each worker gets one task with a contiguous share of the blocks, so
+    `args` (usually the data) is only sent to it once.
+
+    Args:
+        - function (callable): Works out the results of a list of blocks.
+        - args (tuple): Picklable arguments passed before the blocks.
+        - blocks (list of tuple): The blocks (see `seeded_blocks`).
+        - workers (int): Worker processes to use (None for one per CPU).
+            With 1, the blocks run in this process.
+
+    Returns:
+        - list: The result of each block, in block order.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(blocks) <= 1:
+        return list(function(*args, blocks))
+
+    tasks = min(workers, len(blocks))
+    bounds = np.linspace(0, len(blocks), tasks + 1).astype(int)
+    shares = [blocks[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+    results = get_pool(workers).map(function, *zip(*[tuple(args) + (share,) for share in shares]))
+    return [result for share in results for result in share]
@@ -0,0 +1,266 @@
+"""This module runs permutation tests for two-sample and ANOVA comparisons.
+
+A permutation test pools the groups, deals the values out to groups of
+the same sizes again many times, and counts how often the reshuffled
+statistic is at least as extreme as the observed one. Instead of
+shuffling in a Python loop, each block of resamples is a matrix with one
+random arrangement of the pooled values per row (the group of each
+value is picked with `np.argpartition` on a matrix of random keys), and
+the group sums of every row are taken at once. The statistics only need
+per-group sums and sums of squares, so a block costs a gather and a
+couple of row sums.
+
+Blocks are sized to a memory budget, each gets its own random stream
+spawned from the seed, and they can be spread over a pool of worker
+processes (see the parallel module). The result only depends on the
+seed, not on the number of workers."""
+
+import math
+import itertools
+import numpy as np
+import parallel
+
+# Statistics that can be tested
+STATISTICS = ('mean_diff', 'welch_t', 'anova_f')
+
+# Alternative hypotheses of the two-sample statistics (F is always 'greater')
+ALTERNATIVES = ('two-sided', 'greater', 'less')
+
+# Resamples drawn by default
+DEFAULT_PERMUTATIONS = 10000
+
+# Seed used when none is given, so repeated runs give the same p-value
+DEFAULT_SEED = 0
+
+# Bytes a block of resamples may use (random keys, indices and gathered values)
+MEMORY_BUDGET = 64 * 1024 * 1024
+BYTES_PER_CELL = 24
+
+# Relative tolerance for counting a resampled statistic as equal to the
+# observed one (sums taken in a different order differ in the last bits)
+TOLERANCE = 1e-9
+
+def block_rows(n_values, memory_budget=MEMORY_BUDGET):
+    """
+    Returns how many resamples fit in one block of the memory budget.
+
+    Args:
+        - n_values (int): The number of pooled values.
+        - memory_budget (int): Most bytes used by one block.
+
+    Returns:
+        - int: Resamples per block.
+    """
+    return max(1, memory_budget // (n_values * BYTES_PER_CELL))
+
+
+def _group_moments(values, indices, sizes, total, total_sq, squares=True):
+    """
+    Sums and sums of squares of each group, for each arrangement.
+
+    Args:
+        - values (np.ndarray): The pooled (centered) values.
+        - indices (np.ndarray): One arrangement per row; the first sizes[0]
+            columns are group 1, and so on. Columns of the last group may
+            be left out, as its sums are worked out from the totals.
+        - sizes (np.ndarray): The group sizes.
+        - total (float): Sum of all the values.
+        - total_sq (float): Sum of all their squares.
+        - squares (bool): Whether the sums of squares are needed.
+
+    Returns:
+        - np.ndarray: Group sums, one row per arrangement.
+        - np.ndarray: Group sums of squares (None if not needed).
+    """
+    sums = np.empty((len(indices), len(sizes)))
+    sumsq = np.empty_like(sums) if squares else None
+    start = 0
+    for group, size in enumerate(sizes[:-1]):
+        gathered = values[indices[:, start:start + size]]
+        sums[:, group] = gathered.sum(axis=1)
+        if sumsq is not None:
+            sumsq[:, group] = np.einsum('ij,ij->i', gathered, gathered)
+        start += size
+    sums[:, -1] = total - sums[:, :-1].sum(axis=1)
+    if sumsq is not None:
+        sumsq[:, -1] = total_sq - sumsq[:, :-1].sum(axis=1)
+    return sums, sumsq
+
+
+def _statistic(statistic, sums, sumsq, sizes, total_sq):
+    """Works out the statistic of each row from its group sums."""
+    means = sums / sizes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if statistic == 'mean_diff':
+            return means[:, 0] - means[:, 1]
+        if statistic == 'welch_t':
+            variances = (sumsq - sums * means) / (sizes - 1)
+            return (means[:, 0] - means[:, 1]) / np.sqrt(variances[:, 0] / sizes[0]
+                                                         + variances[:, 1] / sizes[1])
+        # anova_f: the total sum of squares is the same for every arrangement
+        count, groups = sizes.sum(), len(sizes)
+        explained = (sums * means).sum(axis=1)
+        between = explained - sums.sum(axis=1) ** 2 / count
+        within = total_sq - explained
+        return (between / (groups - 1)) / (within / (count - groups))
+
+
+def _count_extreme(stats, observed, alternative):
+    """Counts the statistics at least as extreme as the observed one."""
+    tolerance = TOLERANCE * max(1.0, abs(observed))
+    if alternative == 'greater':
+        return int(np.count_nonzero(stats >= observed - tolerance))
+    if alternative == 'less':
+        return int(np.count_nonzero(stats <= observed + tolerance))
+    return int(np.count_nonzero(np.abs(stats) >= abs(observed) - tolerance))
+
+
+def _count_blocks(values, sizes, statistic, alternative, observed, blocks):
+    """
+    Draws blocks of random arrangements and counts the extreme ones.
+    Runs in the worker processes, so it only takes picklable arguments.
+
+    Args:
+        - blocks (list of tuple): (resamples, np.random.SeedSequence) of each block.
+
+    Returns:
+        - list of int: For each block, the number of arrangements at least
+            as extreme as observed.
+    """
+    total, total_sq = values.sum(), (values ** 2).sum()
+    # The smallest sizes[0] keys of a row go to group 1, the next sizes[1] to group 2, ...
+    bounds = np.cumsum(sizes)[:-1]
+    counts = []
+    for rows, seed in blocks:
+        keys = np.random.default_rng(seed).random((rows, len(values)))
+        indices = np.argpartition(keys, bounds, axis=1)[:, :bounds[-1]]
+        del keys
+        sums, sumsq = _group_moments(values, indices, sizes, total, total_sq,
+                                     squares=statistic != 'mean_diff')
+        counts.append(_count_extreme(_statistic(statistic, sums, sumsq, sizes, total_sq),
+                                     observed, alternative))
+    return counts
+
+
+def _count_exact(values, sizes, statistic, alternative, observed, rows):
+    """
+    Goes through every split of two groups and counts the extreme ones.
+
+    Returns:
+        - int: The number of splits at least as extreme as observed.
+        - int: The number of splits.
+    """
+    total, total_sq = values.sum(), (values ** 2).sum()
+    splits = itertools.combinations(range(len(values)), int(sizes[0]))
+    count = seen = 0
+    while True:
+        chunk = np.array(list(itertools.islice(splits, rows)), dtype=np.intp)
+        if not len(chunk):
+            return count, seen
+        sums, sumsq = _group_moments(values, chunk, sizes, total, total_sq,
+                                     squares=statistic != 'mean_diff')
+        stats = _statistic(statistic, sums, sumsq, sizes, total_sq)
+        count += _count_extreme(stats, observed, alternative)
+        seen += len(chunk)
+
+
+def permutation_test(groups, statistic='welch_t', permutations=DEFAULT_PERMUTATIONS,
+                     alternative='two-sided', seed=DEFAULT_SEED, workers=1,
+                     memory_budget=MEMORY_BUDGET):
+    """
+    Runs a permutation test of whether the groups come from the same distribution.
+
+    Two groups with fewer possible splits than `permutations` are tested
+    exactly, over every split. Otherwise the p-value is
+    (extreme + 1) / (permutations + 1), counting the observed arrangement
+    as one of the resamples.
+
+    Args:
+        - groups (list of array-like): The groups' values (NaNs are dropped).
+        - statistic (str): 'mean_diff' or 'welch_t' (two groups), or
+            'anova_f' (two or more groups).
+        - permutations (int): The number of random resamples.
+        - alternative (str): 'two-sided', 'greater' or 'less' (group 1
+            minus group 2). The F-statistic is always tested as 'greater'.
+        - seed (int): Seed of the resamples.
+        - workers (int): Worker processes to spread the blocks over (None for
+            one per CPU). With 1, the blocks run in this process.
+        - memory_budget (int): Most bytes used by one block of resamples.
+
+    Returns:
+        - float: The observed statistic.
+        - float: The permutation p-value.
+
+    Raises:
+        ValueError: If the statistic, alternative or groups are invalid.
+    """
+    if statistic not in STATISTICS:
+        raise ValueError(f"Unknown statistic '{statistic}'")
+    if alternative not in ALTERNATIVES:
+        raise ValueError(f"Unknown alternative '{alternative}'")
+    if permutations < 1:
+        raise ValueError("There must be at least one permutation")
+
+    groups = [np.asarray(group, dtype=float).ravel() for group in groups]
+    groups = [group[~np.isnan(group)] for group in groups]
+    sizes = np.array([len(group) for group in groups])
+    if statistic == 'anova_f':
+        alternative = 'greater'
+        if len(groups) < 2 or sizes.min() < 1 or sizes.sum() <= len(groups):
+            raise ValueError("ANOVA needs at least two groups and more values than groups")
+    elif len(groups) != 2 or sizes.min() < (2 if statistic == 'welch_t' else 1):
+        raise ValueError(f"'{statistic}' needs two groups with enough values")
+
+    # Centering keeps the sums of squares accurate and changes none of the statistics
+    values = np.concatenate(groups)
+    values -= values.mean()
+    total_sq = (values ** 2).sum()
+    observed_groups = np.split(values, np.cumsum(sizes)[:-1])
+    observed_sums = np.array([[group.sum() for group in observed_groups]])
+    observed_sumsq = np.array([[(group ** 2).sum() for group in observed_groups]])
+    observed = float(_statistic(statistic, observed_sums, observed_sumsq, sizes, total_sq)[0])
+    if math.isnan(observed):
+        return observed, float('nan')
+
+    rows = block_rows(len(values), memory_budget)
+    if len(groups) == 2 and math.comb(len(values), int(sizes[0])) <= permutations:
+        count, splits = _count_exact(values, sizes, statistic, alternative, observed, rows)
+        return observed, count / splits
+
+    blocks = parallel.seeded_blocks(permutations, rows, seed)
+    counts = parallel.map_blocks(_count_blocks,
+                                 (values, sizes, statistic, alternative, observed),
+                                 blocks, workers)
+    return observed, (sum(counts) + 1) / (permutations + 1)
+
+
+def two_sample_test(values1, values2, statistic='welch_t', **kwargs):
+    """
+    Permutation test of two samples (see `permutation_test`).
+
+    Args:
+        - values1 (array-like): Sample 1.
+        - values2 (array-like): Sample 2.
+        - statistic (str): 'welch_t' or 'mean_diff'.
+        - **kwargs: Other `permutation_test` arguments.
+
+    Returns:
+        - float: The observed statistic.
+        - float: The permutation p-value.
+    """
+    return permutation_test([values1, values2], statistic=statistic, **kwargs)
+
+
+def anova_test(*groups, **kwargs):
+    """
+    Permutation test of the one-way ANOVA F-statistic (see `permutation_test`).
+
+    Args:
+        - *groups (array-like): The groups' values.
+        - **kwargs: Other `permutation_test` arguments.
+
+    Returns:
+        - float: The observed F-statistic.
+        - float: The permutation p-value.
+    """
+    return permutation_test(list(groups), statistic='anova_f', **kwargs)
@@ -3,12 +3,173 @@ on the app page. It holds the data and information
 about the plots."""
 
 import pandas as pd
-from scipy import stats
-from statsmodels.stats.weightstats import ztest
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
 import plotly.graph_objs as go
 import numpy as np
+import stats_cache
+import accumulators
+import ztest
+import permutation
+import bootstrap
+import parallel
+import power
+import anova
+from regression import SimpleRegression
+
+def numeric_column(data, column, fallback=None):
+    """
+    Extracts one column of table data as a float numpy array.
+
+    Args:
+        - data: The table data. This can be a list of dict rows, a dict of
+            columns, a pandas DataFrame or Series, or a numpy array already
+            read from the dataset store (which is used as it is).
+        - column (str): The name of the column to extract.
+        - fallback (str): Column to use instead if `column` is missing.
+
+    Returns:
+        - np.ndarray: The column values, with non-numeric entries set to NaN.
+
+    Raises:
+        KeyError: If neither `column` nor `fallback` is in the data.
+    """
+    if isinstance(data, np.ndarray):
+        return data.astype(float, copy=False)
+    if isinstance(data, pd.Series):
+        values = data
+    else:
+        data_frame = pd.DataFrame(data)
+        if column not in data_frame.columns and fallback is not None:
+            column = fallback
+        values = data_frame[column]
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+# Most outlier points drawn per box; larger sets are sampled down to this
+MAX_BOX_OUTLIERS = 200
+
+def box_summary(values, max_outliers=MAX_BOX_OUTLIERS):
+    """
+    Calculates the statistics needed to draw a box plot, so the raw
+    values do not have to be sent to the browser.
+
+    Args:
+        - values (array-like): The values of one group (NaN values are ignored).
+        - max_outliers (int): Most outlier points to keep. If there are more,
+            an evenly spaced selection (always including the most extreme
+            points) is kept.
+
+    Returns:
+        - dict: 'q1', 'median', 'q3', 'lowerfence', 'upperfence' (the most
+            extreme values within 1.5 IQR of the box), 'mean', 'n' and
+            'outliers' (np.ndarray). Empty groups give an empty dict.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {}
+
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    outliers = np.sort(values[~inside])
+    if len(outliers) > max_outliers:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, max_outliers).round().astype(int)]
+    return {
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'lowerfence': float(values[inside].min()),
+        'upperfence': float(values[inside].max()),
+        'mean': float(values.mean()),
+        'n': len(values),
+        'outliers': outliers,
+    }
+
+def box_trace(values, name, **kwargs):
+    """
+    Makes a box plot trace from precomputed statistics (see `box_summary`).
+
+    Args:
+        - values (array-like): The values of the group.
+        - name (str): The trace name.
+        - **kwargs: Other go.Box properties, e.g. marker.
+
+    Returns:
+        - plotly.graph_objs.Box: The box trace. Only the summary statistics
+            and the (capped) outliers are included, whatever the group size.
+    """
+    summary = box_summary(values)
+    if not summary:
+        return go.Box(name=name, **kwargs)
+    return go.Box(
+        name=name,
+        x=[name],
+        q1=[summary['q1']],
+        median=[summary['median']],
+        q3=[summary['q3']],
+        lowerfence=[summary['lowerfence']],
+        upperfence=[summary['upperfence']],
+        mean=[summary['mean']],
+        y=[summary['outliers']],
+        boxpoints='outliers',
+        **kwargs
+    )
+
+def group_box_summaries(codes, values, count, max_outliers=MAX_BOX_OUTLIERS):
+    """
+    Calculates the box plot statistics of many groups at once from
+    long-format data, with a single sort of all the values.
+
+    Args:
+        - codes (np.ndarray): The group code (0 to count - 1) of each value.
+        - values (np.ndarray): The values (without NaNs).
+        - count (int): The number of groups. Every group must have a value.
+        - max_outliers (int): Most outlier points to keep per group.
+
+    Returns:
+        - dict: 'q1', 'median', 'q3', 'lowerfence' and 'upperfence' arrays
+            with one entry per group (as in `box_summary`), and 'outliers',
+            a list with an array of the outliers of each group.
+    """
+    # Sort by value, then (stably) by group. With small integer codes the
+    # second sort is a radix sort, much faster than np.lexsort
+    order = np.argsort(values)
+    small_codes = codes[order].astype(np.min_scalar_type(count), copy=False)
+    order = order[np.argsort(small_codes, kind='stable')]
+    ordered, ordered_codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=count)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    def percentile(fraction):
+        # Linear interpolation between order statistics, as np.percentile does
+        position = fraction * (counts - 1)
+        below = np.floor(position).astype(np.intp)
+        above = np.minimum(below + 1, counts - 1)
+        weight = position - below
+        return ordered[starts + below] * (1 - weight) + ordered[starts + above] * weight
+
+    q1, median, q3 = percentile(0.25), percentile(0.5), percentile(0.75)
+    iqr = q3 - q1
+    inside = ((ordered >= (q1 - 1.5 * iqr)[ordered_codes])
+              & (ordered <= (q3 + 1.5 * iqr)[ordered_codes]))
+    lowerfence = np.minimum.reduceat(np.where(inside, ordered, np.inf), starts)
+    upperfence = np.maximum.reduceat(np.where(inside, ordered, -np.inf), starts)
+
+    # The outliers are already sorted by group, then value
+    outside = np.flatnonzero(~inside)
+    bounds = np.searchsorted(ordered_codes[outside], np.arange(1, count))
+    outliers = []
+    for group in np.split(ordered[outside], bounds):
+        if len(group) > max_outliers:
+            group = group[np.linspace(0, len(group) - 1, max_outliers).round().astype(int)]
+        outliers.append(group)
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'lowerfence': lowerfence,
+        'upperfence': upperfence,
+        'outliers': outliers,
+    }
 
 # T-test Table/Plot Information
 def initialize_ttest_data(rows=10):
@@ -42,46 +203,221 @@ def initialize_ttest_data(rows=10):
     data2 = {'X Values': list(range(1, rows + 1)), 'Population 2': np.random.randint(80, 101, rows)}
     return pd.DataFrame(data1), pd.DataFrame(data2)
 
-def generate_ttest_plot(data1, data2):
+def generate_ttest_plot(data1, data2, moments=None, permutations=0, bootstrap_resamples=0):
     """
     Generates a box plot and calculates the t-test statistic for comparing
     the means of two sample populations.
 
     Args:
         - data1 (list of dict): Data for Population 1, with keys such as 'X Values' and 'Population 1'.
+            A numpy array of the values (e.g. from the dataset store) is also accepted.
         - data2 (list of dict): Data for Population 2, with keys such as 'X Values' and 'Population 2'.
+            A numpy array of the values is also accepted.
+        - moments (tuple of accumulators.RunningMoments): Running moments of the two
+            populations, kept up to date as the tables are edited. If given, the
+            t-test is worked out from them instead of from the values.
+        - permutations (int): If above 0, a permutation test of the t-statistic
+            with this many resamples is also run, and its p-value reported.
+        - bootstrap_resamples (int): If above 0, a 95% bootstrap (BCa) confidence
+            interval for the difference of the means is also reported, from
+            this many resamples.
 
     Returns:
         - plotly.graph_objs.Figure: A box plot comparing the distributions of Population 1 and Population 2.
         - str: A formatted string displaying the t-test statistic and p-value.
     """
-    df1 = pd.DataFrame(data1)
-    df2 = pd.DataFrame(data2)
-
     # Extract numeric values for t-test calculations
-    values1 = pd.to_numeric(df1['Population 1'], errors='coerce').dropna()
-    values2 = pd.to_numeric(df2['Population 2'], errors='coerce').dropna()
+    values1 = numeric_column(data1, 'Population 1')
+    values2 = numeric_column(data2, 'Population 2')
+    values1 = values1[~np.isnan(values1)]
+    values2 = values2[~np.isnan(values2)]
 
     # Handle insufficient sample sizes
     if len(values1) < 2 or len(values2) < 2:
         return go.Figure(), "T-Test: Insufficient data for calculation."
 
+    # Results and figures are cached by the content of the cleaned data
+    key = stats_cache.hash_arrays(values1, values2, options=('ttest', 'welch'))
+
+    def run_ttest():
+        from scipy import stats
+        t_stat, p_value = stats.ttest_ind(values1, values2, equal_var=False, nan_policy='omit')
+        return float(t_stat), float(p_value)
+
+    def build_figure():
+        figure = go.Figure()
+        figure.add_trace(box_trace(values1, 'Population 1'))
+        figure.add_trace(box_trace(values2, 'Population 2'))
+        figure.update_layout(
+            title="Box Plot of Sample Populations",
+            yaxis={"title": "Values"}
+        )
+        return figure
+
     # Perform t-test
-    t_stat, p_value = stats.ttest_ind(values1, values2, equal_var=False, nan_policy='omit')
+    if moments is not None:
+        t_stat, p_value = accumulators.welch_ttest(*moments)
+    else:
+        t_stat, p_value = stats_cache.RESULTS.get_or_compute(key, run_ttest)
 
     # Create a box plot
-    figure = go.Figure()
-    figure.add_trace(go.Box(y=values1, name='Population 1'))
-    figure.add_trace(go.Box(y=values2, name='Population 2'))
-    figure.update_layout(
-        title="Box Plot of Sample Populations",
-        yaxis={"title": "Values"}
-    )
+    figure = stats_cache.FIGURES.get_or_compute(('ttest', key), build_figure)
 
     # Format t-test results for display
     t_test_result_text = f"T-Statistic: {t_stat:.2f}, P-Value: {p_value:.4f}"
+    if permutations > 0:
+        permutation_p = stats_cache.RESULTS.get_or_compute(
+            (key, 'permutation', permutations),
+            lambda: permutation.two_sample_test(
+                values1, values2, permutations=permutations,
+                workers=parallel.worker_count(permutations, len(values1) + len(values2)))[1])
+        t_test_result_text += f", Permutation P-Value: {permutation_p:.4f}"
+    if bootstrap_resamples > 0:
+        t_test_result_text += mean_difference_text(values1, values2, key, bootstrap_resamples)
     return figure, t_test_result_text
 
+def mean_difference_text(values1, values2, key, resamples):
+    """
+    Works out a bootstrap confidence interval for the difference of two
+    means and formats it for the t-test and z-test results.
+
+    Args:
+        - values1 (np.ndarray): The cleaned values of Population 1.
+        - values2 (np.ndarray): The cleaned values of Population 2.
+        - key (str): Cache key of the cleaned data.
+        - resamples (int): The number of bootstrap resamples.
+
+    Returns:
+        - str: The difference and its interval, starting with a comma.
+    """
+    difference, low, high = stats_cache.RESULTS.get_or_compute(
+        (key, 'bootstrap', resamples),
+        lambda: bootstrap.bootstrap_mean_difference(
+            values1, values2, resamples=resamples,
+            workers=parallel.worker_count(resamples, len(values1) + len(values2))))
+    level = f"{bootstrap.DEFAULT_LEVEL:.0%}"
+    return f", Mean Difference: {difference:.2f} ({level} CI: {low:.2f} to {high:.2f})"
+
+def row_moments(matrix):
+    """
+    Calculates the count, mean and sample variance of each row of a
+    2-D array in one vectorized pass, ignoring NaN values.
+
+    Args:
+        - matrix (array-like): 2-D array of shape (features, samples).
+
+    Returns:
+        - np.ndarray: Number of non-NaN values in each row.
+        - np.ndarray: Mean of each row (NaN for empty rows).
+        - np.ndarray: Sample variance (ddof=1) of each row
+            (NaN for rows with fewer than two values).
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.ndim != 2:
+        raise ValueError("Input data must be a 2-D array of shape (features, samples)")
+
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=1)
+    filled = np.where(valid, matrix, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = filled.sum(axis=1) / counts
+        deviations = np.where(valid, matrix - means[:, None], 0.0)
+        variances = (deviations ** 2).sum(axis=1) / (counts - 1)
+    variances[counts < 2] = np.nan
+    return counts, means, variances
+
+def batch_ttest(matrix1, matrix2):
+    """
+    Runs a Welch t-test for every row (feature) of two 2-D arrays at once,
+    e.g. one test per gene across the samples of two groups. NaN values
+    are ignored and no figure is built.
+
+    Args:
+        - matrix1 (array-like): Group 1 data, shape (features, samples1).
+        - matrix2 (array-like): Group 2 data, shape (features, samples2).
+
+    Returns:
+        - np.ndarray: The t-statistic of each feature.
+        - np.ndarray: The Welch-Satterthwaite degrees of freedom of each feature.
+        - np.ndarray: The two-sided p-value of each feature.
+        Features with fewer than two values in either group get NaN.
+
+    Raises:
+        ValueError: If the arrays are not 2-D or have different numbers of rows.
+    """
+    counts1, means1, variances1 = row_moments(matrix1)
+    counts2, means2, variances2 = row_moments(matrix2)
+    if counts1.shape != counts2.shape:
+        raise ValueError("Both groups must have the same number of features (rows)")
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        se1 = variances1 / counts1
+        se2 = variances2 / counts2
+        t_stats = (means1 - means2) / np.sqrt(se1 + se2)
+        dfs = (se1 + se2) ** 2 / (se1 ** 2 / (counts1 - 1) + se2 ** 2 / (counts2 - 1))
+    from scipy import stats
+    p_values = 2 * stats.t.sf(np.abs(t_stats), dfs)
+    return t_stats, dfs, p_values
+
+# Names of the tests and corrections of the differential module, for the
+# volcano plot text
+TEST_NAMES = {'welch': 'Welch t-test', 'ztest': 'Z-test'}
+CORRECTION_NAMES = {'bh': 'Benjamini-Hochberg (FDR)', 'bonferroni': 'Bonferroni'}
+
+def generate_volcano_plot(points, summary, correction='bh'):
+    """
+    Generates a volcano plot (difference of the group means against
+    -log10 p-value) of a genome-wide differential test.
+
+    Args:
+        - points (dict): The features to draw, from
+                         `differential.volcano_points`.
+        - summary (dict): The summary of the results directory.
+        - correction (str): 'bh' or 'bonferroni'; the correction the
+                            points were marked significant by.
+
+    Returns:
+        - plotly.graph_objs.Figure: The volcano plot, with significant
+            features colored by the direction of the difference.
+        - str: The number of features tested and found significant, and
+            the most significant features.
+    """
+    difference, scores = points['difference'], points['neg_log10_p']
+    significant, ids = points['significant'], np.asarray(points['id'], dtype=object)
+    scatter = go.Scattergl if len(difference) > WEBGL_THRESHOLD else go.Scatter
+    groups = [
+        ('Not significant', ~significant, 'lightgray'),
+        ('Higher in group 1', significant & (difference > 0), 'red'),
+        ('Higher in group 2', significant & (difference <= 0), 'blue'),
+    ]
+
+    figure = go.Figure()
+    for name, mask, color in groups:
+        figure.add_trace(scatter(
+            x=difference[mask], y=scores[mask], mode='markers', name=name,
+            hovertext=ids[mask], marker=dict(color=color, size=5)))
+    test_name = TEST_NAMES[summary['test']]
+    figure.update_layout(
+        title=f"Volcano Plot: {test_name} of {summary['tests']:,} features",
+        xaxis={'title': 'Mean Difference (Group 1 - Group 2)'},
+        yaxis={'title': '-log10(P-Value)'},
+    )
+
+    counts = summary['significant']
+    alpha = summary['alpha']
+    volcano_text = (f"{test_name} of {summary['tests']:,} features "
+                    f"({len(summary['group1'])} vs {len(summary['group2'])} samples). "
+                    f"Significant at {alpha:g}: {counts['p']:,} unadjusted, "
+                    f"{counts['bh']:,} after {CORRECTION_NAMES['bh']}, "
+                    f"{counts['bonferroni']:,} after {CORRECTION_NAMES['bonferroni']}. "
+                    f"Colored by {CORRECTION_NAMES[correction]}; "
+                    f"{len(difference):,} of {summary['tests']:,} features drawn.")
+    if points['top']:
+        volcano_text += " Most significant: " + ", ".join(
+            f"{feature} (difference {feature_difference:.3g}, P-value {10 ** -score:.3g})"
+            for feature, feature_difference, score in points['top'])
+    return figure, volcano_text
+
 # Z-test Table/Plot Information
 def initialize_random_data(rows=30):
     """
@@ -106,7 +442,7 @@ def initialize_random_data(rows=30):
     data2 = {'X Values': list(range(1, rows + 1)), 'Population 2': np.random.randint(80, 101, rows)}
     return pd.DataFrame(data1), pd.DataFrame(data2)
 
-def generate_ztest_plot(data1, data2):
+def generate_ztest_plot(data1, data2, moments=None, bootstrap_resamples=0):
     """
     Generates a box plot and calculates the z-test statistic for comparing 
     the means of two sample populations.
@@ -118,6 +454,14 @@ def generate_ztest_plot(data1, data2):
         - data2 (list of dict): Data for the second population, where each 
                                 dictionary represents a row with keys such as 
                                 'X Values' and 'Population 2'.
+                                Numpy arrays of the values are also accepted.
+        - moments (tuple of accumulators.RunningMoments): Running moments of the
+                                two populations (with missing values counted as 0),
+                                kept up to date as the tables are edited. If given,
+                                the z-test is worked out from them.
+        - bootstrap_resamples (int): If above 0, a 95% bootstrap (BCa) confidence
+                                interval for the difference of the means is
+                                also reported, from this many resamples.
 
     Returns:
         - plotly.graph_objs.Figure: A box plot comparing the distributions 
@@ -126,38 +470,110 @@ def generate_ztest_plot(data1, data2):
             and p-value. If variance is insufficient, returns a message 
             indicating the z-test could not be performed.
     """
-    data_frame1 = pd.DataFrame(data1)
-    data_frame2 = pd.DataFrame(data2)
-
     # Extract numeric values for z-test calculations
-    if 'Population 1' in data_frame1.columns and 'Population 2' in data_frame2.columns:
-        values1 = pd.to_numeric(data_frame1['Population 1'], errors='coerce').fillna(0)
-        values2 = pd.to_numeric(data_frame2['Population 2'], errors='coerce').fillna(0)
-    else:
-        # Fallback if columns are named differently
-        values1 = data_frame1['Z Values']
-        values2 = data_frame2['Z Values']
+    # (falling back to 'Z Values' if columns are named differently)
+    values1 = np.nan_to_num(numeric_column(data1, 'Population 1', fallback='Z Values'), nan=0.0)
+    values2 = np.nan_to_num(numeric_column(data2, 'Population 2', fallback='Z Values'), nan=0.0)
+
+    # Results and figures are cached by the content of the cleaned data
+    key = stats_cache.hash_arrays(values1, values2, options=('ztest', 'two-sided'))
+
+    def run_ztest():
+        z_stat, p_value = ztest.ztest(values1, values2, alternative='two-sided')
+        return float(z_stat), float(p_value)
+
+    def build_figure():
+        figure = go.Figure()
+        figure.add_trace(box_trace(values1, 'Population 1'))
+        figure.add_trace(box_trace(values2, 'Population 2'))
+        figure.update_layout(
+            title='Box Plot of Sample Populations',
+            yaxis={'title': 'Values'}
+        )
+        return figure
 
     # Handle cases where both columns are zeros or contain insufficient variance
-    if values1.nunique() <= 1 or values2.nunique() <= 1:
+    if moments is not None:
+        enough_variance = moments[0].has_variance() and moments[1].has_variance()
+    else:
+        enough_variance = len(np.unique(values1)) > 1 and len(np.unique(values2)) > 1
+    if not enough_variance:
         z_stat, p_value = float('nan'), float('nan')
         z_test_result_text = "Z-Statistic: Undefined (insufficient variance in data)"
     else:
         # Perform z-test on the input data
-        z_stat, p_value = ztest(values1, values2, alternative='two-sided')
+        if moments is not None:
+            z_stat, p_value = accumulators.ztest(*moments)
+        else:
+            z_stat, p_value = stats_cache.RESULTS.get_or_compute(key, run_ztest)
         z_test_result_text = f"Z-Statistic: {z_stat:.2f}, P-value: {p_value:.4f}"
+        if bootstrap_resamples > 0:
+            z_test_result_text += mean_difference_text(values1, values2, key,
+                                                        bootstrap_resamples)
 
     # Create a box plot for visualization
-    figure = go.Figure()
-    figure.add_trace(go.Box(y=values1, name='Population 1'))
-    figure.add_trace(go.Box(y=values2, name='Population 2'))
-    figure.update_layout(
-        title='Box Plot of Sample Populations',
-        yaxis={'title': 'Values'}
-    )
+    figure = stats_cache.FIGURES.get_or_compute(('ztest', key), build_figure)
 
     return figure, z_test_result_text
 
+# Largest sample size per group on the power curves, and points per curve
+POWER_MAX_SAMPLE_SIZE = 200
+POWER_CURVE_POINTS = 40
+
+def generate_power_plot(test, effect_size, alpha=power.DEFAULT_ALPHA, sd_ratio=1.0, groups=3,
+                        max_sample_size=POWER_MAX_SAMPLE_SIZE):
+    """
+    Draws power curves (power against sample size per group) for the
+    conventional small, medium and large effect sizes and the chosen one,
+    and works out the sample size needed for 80% power.
+
+    Args:
+        - test (str): 'ttest', 'ztest' or 'anova'.
+        - effect_size (float): The chosen effect size (Cohen's d, or
+            Cohen's f for ANOVA).
+        - alpha (float): The significance level.
+        - sd_ratio (float): Ratio of the group standard deviations. Unequal
+            standard deviations are simulated (see the power module).
+        - groups (int): The number of groups (ANOVA only).
+        - max_sample_size (int): Largest sample size per group on the curves.
+
+    Returns:
+        - plotly.graph_objs.Figure: The power curves.
+        - str: The sample size per group needed for 80% power.
+    """
+    effect_sizes = sorted(set(power.EFFECT_SIZES[test]) | {float(effect_size)})
+    sample_sizes = np.unique(np.geomspace(2, max_sample_size, POWER_CURVE_POINTS).astype(int))
+    needed = power.sample_size(test, effect_size, power.DEFAULT_POWER, alpha, groups, sd_ratio)
+
+    def build_figure():
+        grid = power.power_grid(test, effect_sizes, sample_sizes, alpha, groups, sd_ratio)
+        symbol = 'f' if test == 'anova' else 'd'
+        figure = go.Figure()
+        for effect, curve in zip(effect_sizes, grid):
+            chosen = effect == float(effect_size)
+            figure.add_trace(go.Scatter(x=sample_sizes, y=curve, mode='lines',
+                                        name=f"{symbol} = {effect:g}",
+                                        line={'width': 4 if chosen else 2}))
+        figure.add_hline(y=power.DEFAULT_POWER, line_dash='dash', line_color='gray')
+        figure.update_layout(
+            title="Power by Sample Size",
+            xaxis={'title': 'Sample Size per Group', 'type': 'log'},
+            yaxis={'title': 'Power', 'range': [0, 1]},
+        )
+        return figure
+
+    figure = stats_cache.FIGURES.get_or_compute(
+        ('power', test, tuple(effect_sizes), alpha, sd_ratio, groups, max_sample_size),
+        build_figure)
+
+    if needed is None:
+        power_result_text = (f"More than {power.MAX_SAMPLE_SIZE:,} samples per group are needed "
+                             f"for {power.DEFAULT_POWER:.0%} power at effect size {effect_size:g}.")
+    else:
+        power_result_text = (f"Samples per group needed for {power.DEFAULT_POWER:.0%} power at "
+                             f"effect size {effect_size:g} (alpha = {alpha:g}): {needed}")
+    return figure, power_result_text
+
 # Distriubtion Table/Plot Information
 def generate_distribution_data():
     """This function creates the data for the
@@ -172,24 +588,103 @@ def generate_distribution_data():
     }
     return pd.DataFrame(initial_data1)
 
-def generate_distribution_plot(data1):
+# Bin rules offered for the distribution histogram
+BIN_RULES = {
+    'sturges': 'Sturges',
+    'fd': 'Freedman-Diaconis',
+    'fixed': 'Fixed width',
+}
+
+# Upper limit on the number of histogram bins sent to the browser
+MAX_BINS = 500
+
+def histogram_bin_edges(values, rule='sturges', bin_width=None):
     """
-    Generates a dataset for creating a distribution plot.
+    Works out the histogram bin edges for a set of values.
+
+    Args:
+        - values (np.ndarray): The (non-empty, NaN-free) values to bin.
+        - rule (str): 'sturges' (log2(n) + 1 bins), 'fd' (Freedman-Diaconis
+            width of 2 * IQR / n^(1/3)) or 'fixed' (use `bin_width`).
+        - bin_width (float): The bin width for the 'fixed' rule.
 
     Returns:
-        pd.DataFrame: A DataFrame containing a single column 
-        'Values' with 20 evenly spaced values from 1 to 20.
+        - np.ndarray: The bin edges (at most MAX_BINS bins).
+
+    Raises:
+        ValueError: If the rule is unknown or the fixed width is not positive.
+    """
+    if rule not in BIN_RULES:
+        raise ValueError(f"Unknown bin rule '{rule}'")
+    if rule == 'fixed' and (bin_width is None or not bin_width > 0):
+        raise ValueError("A fixed bin width must be a positive number")
+
+    low, high = float(values.min()), float(values.max())
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+
+    width = bin_width if rule == 'fixed' else None
+    if rule == 'fd':
+        q1, q3 = np.percentile(values, [25, 75])
+        width = 2 * (q3 - q1) / len(values) ** (1 / 3)
+        if width <= 0:
+            width = None  # No spread in the middle half, so fall back to Sturges
+    if width is None:
+        bins = int(np.ceil(np.log2(len(values)))) + 1
+    else:
+        bins = max(int(np.ceil((high - low) / width)), 1)
+
+    if rule == 'fixed' and bins <= MAX_BINS:
+        return low + width * np.arange(bins + 1)
+    return np.linspace(low, high, min(bins, MAX_BINS) + 1)
+
+def distribution_values(data1):
     """
+    Reads the numbers to draw in the distribution histogram.
+
+    Args:
+        - data1 (list of dict): The data, with a 'Values' key. A dict with a
+            'Values' numpy array (e.g. from an upload) is also accepted.
+
+    Returns:
+        - np.ndarray: The values as floats (NaN entries of an array left out).
+
+    Raises:
+        KeyError: If there is no 'Values' column.
+        ValueError: If any value is not numeric.
+    """
+    if isinstance(data1, dict) and isinstance(data1.get('Values'), np.ndarray):
+        values = data1['Values']
+        # Check that all elements in 'Values' column are numeric and raise error if not
+        if values.dtype.kind not in 'biuf':
+            raise ValueError("All values in 'Values' must be numeric.")
+        values = values.astype(float, copy=False)
+        return values[~np.isnan(values)]
     data_frame1 = pd.DataFrame(data1)
     # Check that all elements in 'Values' column are numeric and raise error if not
     if not all(isinstance(x, (int, float)) for x in data_frame1['Values']):
         raise ValueError("All values in 'Values' must be numeric.")
-    
-    # Create a histogram for visualization
-    figure = {
+    return data_frame1['Values'].to_numpy(dtype=float)
+
+def histogram_figure(edges, counts):
+    """
+    Draws binned counts as a histogram.
+
+    Args:
+        - edges (np.ndarray): The bin edges (empty when there are no values).
+        - counts (np.ndarray): The count in each bin.
+
+    Returns:
+        dict: The figure, with a bar trace of the bin counts.
+    """
+    return {
         'data': [
-            go.Histogram(
-                    x=data_frame1['Values'],
+            go.Bar(
+                    x=(edges[:-1] + edges[1:]) / 2,
+                    y=counts,
+                    width=np.diff(edges),
+                    customdata=np.column_stack([edges[:-1], edges[1:]]) if len(counts) else [],
+                    hovertemplate="%{customdata[0]:.4g} to %{customdata[1]:.4g}: %{y}<extra></extra>",
                     name="Histogram"
                 ),
         ],
@@ -197,10 +692,41 @@ def generate_distribution_plot(data1):
             'title': 'Histogram of Data',
             'xaxis': {'title': 'Values'},
             'yaxis': {'title': 'Frequency'},
+            'bargap': 0,
         }
     }
 
-    return figure
+def generate_distribution_plot(data1, bin_rule='sturges', bin_width=None):
+    """
+    Generates a histogram of the 'Values' column. The values are binned
+    on the server and only the bin edges and counts are sent as a bar
+    trace, so the size of the figure depends on the number of bins and
+    not on the number of values.
+
+    Args:
+        - data1 (list of dict): The data, with a 'Values' key. A dict with a
+            'Values' numpy array (e.g. from an upload) is also accepted.
+        - bin_rule (str): How to pick the bins ('sturges', 'fd' or 'fixed').
+        - bin_width (float): The bin width when `bin_rule` is 'fixed'.
+
+    Returns:
+        dict: The figure, with a bar trace of the bin counts.
+
+    Raises:
+        KeyError: If there is no 'Values' column.
+        ValueError: If any value is not numeric, or the bin rule is invalid.
+    """
+    values = distribution_values(data1)
+
+    # Bin the values on the server
+    if len(values) == 0:
+        edges, counts = np.array([]), np.array([], dtype=int)
+    else:
+        edges = histogram_bin_edges(values, bin_rule, bin_width)
+        counts, edges = np.histogram(values, bins=edges)
+
+    # Create a histogram for visualization
+    return histogram_figure(edges, counts)
 
 def initialize_anova_data(rows=30):
     """
@@ -229,7 +755,7 @@ def initialize_anova_data(rows=30):
     data3 = {'X Values': list(range(1, rows + 1)), 'Population 3': np.random.randint(80, 101, rows)}
     return pd.DataFrame(data1), pd.DataFrame(data2), pd.DataFrame(data3)
 
-def generate_anova_plot(data1, data2, data3):
+def generate_anova_plot(data1, data2, data3, moments=None, permutations=0):
     """
     Generates a box plot and calculates the ANOVA test statistic for comparing 
     the means of three sample populations.
@@ -244,6 +770,14 @@ def generate_anova_plot(data1, data2, data3):
         - data3 (list of dict): Data for the third population, where each 
                                 dictionary represents a row with keys such as 
                                 'X Values' and 'Population 3'.
+                                Numpy arrays or pandas Series of the values
+                                are also accepted.
+        - moments (tuple of accumulators.RunningMoments): Running moments of the
+                                three populations (with missing values counted
+                                as 0). If given, the F-test is worked out from them.
+        - permutations (int): If above 0, a permutation test of the F-statistic
+                                with this many resamples is also run, and its
+                                p-value reported.
 
     Returns:
         - plotly.graph_objs.Figure: A box plot comparing the distributions 
@@ -251,35 +785,41 @@ def generate_anova_plot(data1, data2, data3):
         - str: A formatted string displaying the calculated ANOVA F-statistic 
             and p-value.
     """
-    data_frame1 = pd.DataFrame(data1)
-    data_frame2 = pd.DataFrame(data2)
-    data_frame3 = pd.DataFrame(data3)
-
     # Extract numeric values for ANOVA calculations
-    if 'Population 1' in data_frame1.columns and 'Population 2' in data_frame2.columns and 'Population 3' in data_frame3.columns:
-        values1 = pd.to_numeric(data_frame1['Population 1'], errors='coerce').fillna(0)
-        values2 = pd.to_numeric(data_frame2['Population 2'], errors='coerce').fillna(0)
-        values3 = pd.to_numeric(data_frame3['Population 3'], errors='coerce').fillna(0)
-    else:
-        # Fallback if columns are named differently
-        values1 = data_frame1['Z Values']
-        values2 = data_frame2['Z Values']
-        values3 = data_frame3['Z Values']
+    # (falling back to 'Z Values' if columns are named differently)
+    values1 = np.nan_to_num(numeric_column(data1, 'Population 1', fallback='Z Values'), nan=0.0)
+    values2 = np.nan_to_num(numeric_column(data2, 'Population 2', fallback='Z Values'), nan=0.0)
+    values3 = np.nan_to_num(numeric_column(data3, 'Population 3', fallback='Z Values'), nan=0.0)
+
+    # Results and figures are cached by the content of the cleaned data
+    key = stats_cache.hash_arrays(values1, values2, values3, options=('anova', 'one-way'))
+
+    def run_anova():
+        from scipy import stats
+        f_stat, p_value = stats.f_oneway(values1, values2, values3)
+        return float(f_stat), float(p_value)
 
     # Perform one-way ANOVA
-    f_stat, p_value = stats.f_oneway(values1, values2, values3)
+    if moments is not None:
+        f_stat, p_value = accumulators.one_way_anova(*moments)
+    else:
+        f_stat, p_value = stats_cache.RESULTS.get_or_compute(key, run_anova)
+
+    def build_figure():
+        figure = go.Figure()
+        figure.add_trace(box_trace(values1, 'Population 1', marker=dict(color='blue')))
+        figure.add_trace(box_trace(values2, 'Population 2', marker=dict(color='green')))
+        figure.add_trace(box_trace(values3, 'Population 3', marker=dict(color='red')))
+        figure.update_layout(
+            title=f"ANOVA Test: F-statistic = {f_stat:.2f}, P-value = {p_value:.4f}",
+            yaxis={'title': 'Values'},
+            xaxis={'title': 'Groups'},
+            showlegend=False
+        )
+        return figure
 
     # Create a box plot for visualization
-    figure = go.Figure()
-    figure.add_trace(go.Box(y=values1, name='Population 1', marker=dict(color='blue')))
-    figure.add_trace(go.Box(y=values2, name='Population 2', marker=dict(color='green')))
-    figure.add_trace(go.Box(y=values3, name='Population 3', marker=dict(color='red')))
-    figure.update_layout(
-        title=f"ANOVA Test: F-statistic = {f_stat:.2f}, P-value = {p_value:.4f}",
-        yaxis={'title': 'Values'},
-        xaxis={'title': 'Groups'},
-        showlegend=False
-    )
+    figure = stats_cache.FIGURES.get_or_compute(('anova', key), build_figure)
 
     # Provide explanation based on p-value
     if p_value < 0.05:
@@ -287,6 +827,105 @@ def generate_anova_plot(data1, data2, data3):
     else:
         anova_result_text = f"ANOVA Test: F-statistic = {f_stat:.2f}, P-value = {p_value:.4f}\nThe p-value is greater than 0.05, indicating that there is no significant difference between the groups."
 
+    if permutations > 0:
+        permutation_p = stats_cache.RESULTS.get_or_compute(
+            (key, 'permutation', permutations),
+            lambda: permutation.anova_test(
+                values1, values2, values3, permutations=permutations,
+                workers=parallel.worker_count(
+                    permutations, len(values1) + len(values2) + len(values3)))[1])
+        anova_result_text += f"\nPermutation test ({permutations:,} resamples): P-value = {permutation_p:.4f}"
+
+    return figure, anova_result_text
+
+# Most Tukey HSD pairs listed under the ANOVA result
+MAX_TUKEY_PAIRS = 10
+
+def generate_group_anova_plot(groups, values, names=None, level=anova.DEFAULT_LEVEL):
+    """
+    Generates a box plot of every group and runs the one-way ANOVA and
+    Tukey HSD comparisons of long-format data, with any number of groups.
+
+    Args:
+        - groups (array-like): The group label of each row. Integer group
+                                codes are also accepted, with `names`.
+        - values (array-like): The value of each row. Rows with a missing
+                                value or group label are left out.
+        - names (list of str): Names of the groups, if `groups` holds codes
+                                (0 to len(names) - 1) rather than labels.
+        - level (float): Family-wise confidence level of the Tukey HSD
+                                intervals.
+
+    Returns:
+        - plotly.graph_objs.Figure: One box per group, drawn from summary
+            statistics (the raw values are not included).
+        - str: The ANOVA F-statistic and p-value, and the most significant
+            Tukey HSD pairs.
+    """
+    codes, labels, values = anova.factorize_groups(groups, values)
+    if names is None:
+        names = anova.group_names(labels)
+    else:
+        names = [names[int(label)] for label in labels]
+    if len(names) < 2 or len(values) <= len(names):
+        return go.Figure(), "ANOVA needs at least two groups and more values than groups."
+
+    # Results and figures are cached by the content of the cleaned data
+    key = stats_cache.hash_arrays(codes, values, options=('anova', 'long', tuple(names), level))
+
+    def run_anova():
+        counts, means, m2 = anova.group_statistics(codes, values, len(names))
+        result = anova.one_way_anova(counts, means, m2)
+        result.update(counts=counts, means=means,
+                      tukey=anova.tukey_hsd(counts, means, result['mse'],
+                                            result['df_within'], level))
+        return result
+
+    result = stats_cache.RESULTS.get_or_compute(key, run_anova)
+    f_stat, p_value = result['f_stat'], result['p_value']
+
+    def build_figure():
+        summary = group_box_summaries(codes, values, len(names))
+        figure = go.Figure(go.Box(
+            x=names,
+            q1=summary['q1'],
+            median=summary['median'],
+            q3=summary['q3'],
+            lowerfence=summary['lowerfence'],
+            upperfence=summary['upperfence'],
+            mean=result['means'],
+            y=summary['outliers'],
+            boxpoints='outliers',
+            marker=dict(color='blue'),
+        ))
+        figure.update_layout(
+            title=f"ANOVA Test ({len(names)} groups): F-statistic = {f_stat:.2f}, P-value = {p_value:.4f}",
+            yaxis={'title': 'Values'},
+            xaxis={'title': 'Groups', 'type': 'category'},
+            showlegend=False
+        )
+        return figure
+
+    figure = stats_cache.FIGURES.get_or_compute(('anova-long', key), build_figure)
+
+    alpha = 1 - level
+    anova_result_text = (f"ANOVA Test ({len(names)} groups, {len(values):,} values): "
+                         f"F-statistic = {f_stat:.2f}, P-value = {p_value:.4f}\n")
+    if p_value < alpha:
+        anova_result_text += f"The p-value is less than {alpha:g}, indicating that there is a significant difference between the groups."
+    else:
+        anova_result_text += f"The p-value is greater than {alpha:g}, indicating that there is no significant difference between the groups."
+
+    tukey = result['tukey']
+    pairs = len(names) * (len(names) - 1) // 2
+    significant = int(np.triu(tukey['reject'], k=1).sum())
+    anova_result_text += (f"\nTukey HSD: {significant:,} of {pairs:,} pairs of groups differ "
+                          f"at the {alpha:g} level")
+    shown = [pair for pair in anova.tukey_pairs(tukey, names, MAX_TUKEY_PAIRS)
+             if pair[3] < alpha]
+    for name1, name2, difference, pair_p, low, high in shown:
+        anova_result_text += (f"\n{name1} vs {name2}: Difference = {difference:.4f} "
+                              f"({level:.0%} CI: {low:.4f} to {high:.4f}), P-value = {pair_p:.4f}")
     return figure, anova_result_text
 
 # Initialize data table for Regressions page
@@ -305,17 +944,153 @@ def initialize_linear_data(rows=10):
     y_values = 2 * x_values + 1 # Initial values should follow a linear regresion model for plotting purposes
     return pd.DataFrame({"X Values": x_values, "Y Values": y_values})
 
+# Most scatter points sent to the browser on the Regressions page
+DEFAULT_MAX_POINTS = 5000
+
+# Scatter plots with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = 2000
+
+# Ways of picking the points to draw
+DECIMATION_METHODS = ('minmax', 'lttb')
+
+def lttb_downsample(x_values, y_values, target):
+    """
+    Picks `target` points that keep the visual shape of the data, using
+    the Largest-Triangle-Three-Buckets method. The points are sorted by x,
+    split into buckets, and from each bucket the point forming the largest
+    triangle with the previously picked point and the average of the next
+    bucket is kept. The first and last points are always kept.
+
+    Each pick depends on the one before it, so the buckets are still
+    visited in order; `minmax_downsample` is the fully vectorized (and
+    much faster) alternative.
+
+    Args:
+        - x_values (np.ndarray): The X values.
+        - y_values (np.ndarray): The Y values.
+        - target (int): The number of points to keep (at least 3).
+
+    Returns:
+        - np.ndarray: The kept X values, sorted.
+        - np.ndarray: The matching Y values.
+    """
+    order = np.argsort(x_values, kind='stable')
+    x_values, y_values = x_values[order], y_values[order]
+    count = len(x_values)
+    if target >= count or target < 3:
+        return x_values, y_values
+
+    # Bucket boundaries for the points between the first and the last
+    # (target < count, so every bucket holds at least one point)
+    edges = np.linspace(1, count - 1, target - 1).astype(int)
+    sizes = np.diff(edges)
+
+    # The average of the bucket after each one (the last point after the last bucket)
+    next_x = np.append(np.add.reduceat(x_values[1:-1], edges[:-1] - 1)[1:] / sizes[1:],
+                       x_values[-1])
+    next_y = np.append(np.add.reduceat(y_values[1:-1], edges[:-1] - 1)[1:] / sizes[1:],
+                       y_values[-1])
+
+    selected = np.empty(target, dtype=int)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(target - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs((x_values[previous] - next_x[bucket]) * (y_values[start:end] - y_values[previous])
+                       - (x_values[previous] - x_values[start:end]) * (next_y[bucket] - y_values[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return x_values[selected], y_values[selected]
+
+def minmax_downsample(x_values, y_values, target):
+    """
+    Splits the x range into `target` / 2 equal-width buckets (like screen
+    pixels) and keeps the points with the smallest and largest y in each.
+    This is fully vectorized and keeps every spike in the data.
+
+    Args:
+        - x_values (np.ndarray): The X values.
+        - y_values (np.ndarray): The Y values.
+        - target (int): The most points to keep.
+
+    Returns:
+        - np.ndarray: The kept X values, sorted.
+        - np.ndarray: The matching Y values.
+    """
+    count = len(x_values)
+    if target >= count or target < 2:
+        order = np.argsort(x_values, kind='stable')
+        return x_values[order], y_values[order]
+
+    buckets = target // 2
+    low, high = x_values.min(), x_values.max()
+    span = (high - low) or 1.0
+    ids = np.minimum(((x_values - low) / span * buckets).astype(int), buckets - 1)
+
+    # The smallest and largest y of each bucket, found in one pass without sorting
+    lowest = np.full(buckets, np.inf)
+    highest = np.full(buckets, -np.inf)
+    np.fmin.at(lowest, ids, y_values)
+    np.fmax.at(highest, ids, y_values)
+
+    # Of equal values, the first minimum and the last maximum are kept
+    positions = np.arange(count)
+    at_lowest = y_values == lowest[ids]
+    at_highest = y_values == highest[ids]
+    first = np.full(buckets, count)
+    last = np.full(buckets, -1)
+    np.minimum.at(first, ids[at_lowest], positions[at_lowest])
+    np.maximum.at(last, ids[at_highest], positions[at_highest])
+    keep = np.unique(np.concatenate([first[first < count], last[last >= 0]]))
+    keep = keep[np.argsort(x_values[keep], kind='stable')]
+    return x_values[keep], y_values[keep]
+
+def decimate(x_values, y_values, target=DEFAULT_MAX_POINTS, method='minmax'):
+    """
+    Reduces a scatter to at most `target` points for drawing.
+
+    Args:
+        - x_values (np.ndarray): The X values.
+        - y_values (np.ndarray): The Y values.
+        - target (int): The most points to keep.
+        - method (str): 'minmax' or 'lttb'.
+
+    Returns:
+        - np.ndarray: The kept X values.
+        - np.ndarray: The matching Y values.
+
+    Raises:
+        ValueError: If the method is unknown.
+    """
+    if method == 'lttb':
+        return lttb_downsample(x_values, y_values, target)
+    if method == 'minmax':
+        return minmax_downsample(x_values, y_values, target)
+    raise ValueError(f"Unknown decimation method '{method}'")
+
 # Generate interactive plot for Regressions page
-def generate_linear_regression_plot(data):
+def generate_linear_regression_plot(data, max_points=DEFAULT_MAX_POINTS, method='minmax',
+                                    bootstrap_resamples=0):
     """
     Generates a scatter plot with a linear regression line based on input data.
 
     Args:
         data (list of dict): Data for the regression, where each dictionary 
                              represents a row with 'X Values' and 'Y Values' keys.
+                             A dict of 'X Values' and 'Y Values' numpy arrays
+                             (as kept in the dataset store) is also accepted.
+        max_points (int): Most data points drawn. Larger data sets are decimated
+                          (see `decimate`) before the figure is built; the
+                          statistics always use all of the data.
+        method (str): Decimation method, 'minmax' or 'lttb'.
+        bootstrap_resamples (int): If above 0, 95% bootstrap (BCa) confidence
+                          intervals for the slope and intercept, from this
+                          many resamples of the (x, y) pairs, are added to
+                          the equation text.
 
     Returns:
-        - plotly.graph_objs.Figure: A scatter plot with a regression line.
+        - plotly.graph_objs.Figure: A scatter plot with a regression line. Above
+            WEBGL_THRESHOLD points the scatter is drawn with WebGL.
         - str: The linear regression equation in the format y = mx + b.
         - float: The R^2 value indicating the goodness of fit.
 
@@ -324,44 +1099,70 @@ def generate_linear_regression_plot(data):
         ValueError: If the input data contains invalid types or inconsistent lengths.
 
     """
+    # Columns read straight from the dataset store are used as they are
+    from_store = isinstance(data, dict) and bool(data) and all(
+        isinstance(values, np.ndarray) for values in data.values())
+
     # Check if the data is a list of dictionaries
-    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+    if not from_store and (not isinstance(data, list)
+                           or not all(isinstance(row, dict) for row in data)):
         raise ValueError("Input data must be a list of dictionaries")
 
-    # Convert input data to a DataFrame
-    df = pd.DataFrame(data)
-
     # Check for required columns
-    if 'X Values' not in df.columns or 'Y Values' not in df.columns:
+    columns = data.keys() if from_store else pd.DataFrame(data).columns
+    if 'X Values' not in columns or 'Y Values' not in columns:
         raise KeyError("Input data must contain 'X Values' and 'Y Values' columns")
 
     # Ensure columns are numeric
-    df = df.apply(pd.to_numeric, errors='coerce').dropna()
-    if df.empty:
+    x_values = numeric_column(data['X Values'] if from_store else data, 'X Values')
+    y_values = numeric_column(data['Y Values'] if from_store else data, 'Y Values')
+    valid = ~(np.isnan(x_values) | np.isnan(y_values))
+    x_values, y_values = x_values[valid], y_values[valid]
+    if len(x_values) == 0:
         raise ValueError("Data contains no valid numeric values after cleaning")
 
+    # Results and figures are cached by the content of the cleaned data
+    key = stats_cache.hash_arrays(x_values, y_values, options=('linear-regression',))
+
+    def fit_regression():
+        model = SimpleRegression.from_arrays(x_values, y_values)
+        return model.slope, model.intercept, model.r_squared
+
     # Perform linear regression
-    X = df['X Values'].values.reshape(-1, 1)
-    Y = df['Y Values'].values
-    model = LinearRegression()
-    model.fit(X, Y)
-    Y_pred = model.predict(X)
+    slope, intercept, r2_value = stats_cache.RESULTS.get_or_compute(key, fit_regression)
 
     # Generate regression equation
-    slope = model.coef_[0]
-    intercept = model.intercept_
-    r2_value = r2_score(Y, Y_pred)
     equation = f"y = {slope:.2f}x + {intercept:.2f}"
+    if bootstrap_resamples > 0 and len(x_values) >= 3 and np.ptp(x_values) > 0:
+        intervals = stats_cache.RESULTS.get_or_compute(
+            (key, 'bootstrap', bootstrap_resamples),
+            lambda: bootstrap.bootstrap_regression(
+                x_values, y_values, resamples=bootstrap_resamples,
+                workers=parallel.worker_count(bootstrap_resamples, 2 * len(x_values))))
+        equation += (f" ({bootstrap.DEFAULT_LEVEL:.0%} CI: slope {intervals['slope'][1]:.2f}"
+                     f" to {intervals['slope'][2]:.2f}, intercept {intervals['intercept'][1]:.2f}"
+                     f" to {intervals['intercept'][2]:.2f})")
+
+    def build_figure():
+        plot_x, plot_y = decimate(x_values, y_values, max_points, method)
+        scatter = go.Scattergl if len(plot_x) > WEBGL_THRESHOLD else go.Scatter
+
+        # The regression line only needs its two end points
+        line_x = np.array([x_values.min(), x_values.max()])
+        Y_pred = slope * line_x + intercept
+        figure = go.Figure()
+        figure.add_trace(scatter(x=plot_x, y=plot_y, mode='markers', name='Data Points'))
+        figure.add_trace(go.Scatter(x=line_x, y=Y_pred, mode='lines', name='Regression Line'))
+        figure.update_layout(
+            title="Linear Regression Plot",
+            xaxis_title="X Values",
+            yaxis_title="Y Values",
+            showlegend=True
+        )
+        return figure
 
     # Create scatter plot with regression line
-    figure = go.Figure()
-    figure.add_trace(go.Scatter(x=df['X Values'], y=df['Y Values'], mode='markers', name='Data Points'))
-    figure.add_trace(go.Scatter(x=df['X Values'], y=Y_pred, mode='lines', name='Regression Line'))
-    figure.update_layout(
-        title="Linear Regression Plot",
-        xaxis_title="X Values",
-        yaxis_title="Y Values",
-        showlegend=True
-    )
+    figure = stats_cache.FIGURES.get_or_compute(('linear-regression', key, max_points, method),
+                                                build_figure)
 
     return figure, equation, r2_value
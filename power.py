@@ -0,0 +1,298 @@
+"""This module works out the power of the t-test, z-test and one-way ANOVA,
+and the sample size needed to reach a given power.
+
+Power is calculated analytically where a closed form exists: the normal
+distribution for the z-test, the noncentral t for the t-test with equal
+standard deviations, and the noncentral F for ANOVA with equal standard
+deviations. Otherwise (Welch's t-test or ANOVA with unequal standard
+deviations) it is estimated by Monte Carlo simulation. For each sample
+size, all the simulated data sets are drawn as one array of group means
+and sums of squares (the statistics the tests need), straight from
+their sampling distributions; because the effect size only shifts the
+group means, the same draws serve every effect size in the grid.
+
+Whole grids of effect sizes and sample sizes are answered in one call,
+and the results are cached per grid."""
+
+import numpy as np
+import stats_cache
+
+# Tests whose power can be worked out
+TESTS = ('ttest', 'ztest', 'anova')
+
+# Ways of working out the power ('auto' uses the closed form where there is one)
+METHODS = ('auto', 'analytic', 'monte_carlo')
+
+# Conventional small, medium and large effect sizes (Cohen's d, or f for ANOVA)
+EFFECT_SIZES = {
+    'ttest': (0.2, 0.5, 0.8),
+    'ztest': (0.2, 0.5, 0.8),
+    'anova': (0.1, 0.25, 0.4),
+}
+
+DEFAULT_ALPHA = 0.05
+DEFAULT_POWER = 0.8
+
+# Simulated data sets per grid point, and the seed they are drawn from
+DEFAULT_SIMULATIONS = 2000
+DEFAULT_SEED = 0
+
+# Largest sample size (per group) that `sample_size` looks at
+MAX_SAMPLE_SIZE = 100000
+
+
+def _check(test, method, groups, sample_sizes):
+    if test not in TESTS:
+        raise ValueError(f"Unknown test '{test}'")
+    if method not in METHODS:
+        raise ValueError(f"Unknown power method '{method}'")
+    if test == 'anova' and groups < 2:
+        raise ValueError("ANOVA needs at least two groups")
+    if np.min(sample_sizes) < 2:
+        raise ValueError("Each group needs at least two values")
+
+
+def has_closed_form(test, sd_ratio=1.0):
+    """
+    Checks whether the power of a test has a closed form.
+
+    Args:
+        - test (str): 'ttest', 'ztest' or 'anova'.
+        - sd_ratio (float): Ratio of the largest to the smallest group
+            standard deviation.
+
+    Returns:
+        - bool: True for the z-test, and for the t-test and ANOVA with
+            equal standard deviations.
+    """
+    return test == 'ztest' or sd_ratio == 1
+
+
+def group_means(effect_size, groups):
+    """
+    Spreads the group means evenly so their standard deviation (Cohen's f)
+    equals the effect size. For two groups the means are -f and f.
+
+    Args:
+        - effect_size (float): Cohen's f.
+        - groups (int): The number of groups.
+
+    Returns:
+        - np.ndarray: The group means.
+    """
+    spread = np.linspace(-1.0, 1.0, groups)
+    return effect_size * spread / spread.std()
+
+
+def analytic_power(test, effect_sizes, sample_sizes, alpha=DEFAULT_ALPHA, groups=3,
+                   sd_ratio=1.0):
+    """
+    Closed-form power over a grid (two-sided tests, equal group sizes).
+
+    Args:
+        - test (str): 'ttest', 'ztest' or 'anova'.
+        - effect_sizes (array-like): Cohen's d (the difference of the means
+            over group 1's standard deviation), or Cohen's f for ANOVA.
+        - sample_sizes (array-like): Sample sizes per group.
+        - alpha (float): The significance level.
+        - groups (int): The number of groups (ANOVA only).
+        - sd_ratio (float): Group 2's standard deviation over group 1's
+            (z-test only; the others need equal standard deviations).
+
+    Returns:
+        - np.ndarray: Power, one row per effect size and one column per sample size.
+    """
+    from scipy import stats
+    effect = np.asarray(effect_sizes, dtype=float)[:, None]
+    count = np.asarray(sample_sizes, dtype=float)[None, :]
+    if test == 'ztest':
+        critical = stats.norm.isf(alpha / 2)
+        shift = effect / np.sqrt((1 + sd_ratio ** 2) / count)
+        return stats.norm.sf(critical - shift) + stats.norm.cdf(-critical - shift)
+    if test == 'ttest':
+        df = 2 * count - 2
+        shift = effect * np.sqrt(count / 2)
+        critical = stats.t.isf(alpha / 2, df)
+        return stats.nct.sf(critical, df, shift) + stats.nct.cdf(-critical, df, shift)
+    df_between, df_within = groups - 1, groups * (count - 1)
+    critical = stats.f.isf(alpha, df_between, df_within)
+    return stats.ncf.sf(critical, df_between, df_within, effect ** 2 * groups * count)
+
+
+def _noise_moments(rng, simulations, count, groups):
+    """
+    Means and sums of squared deviations of standard normal samples of
+    `count` values. They are drawn from their exact distributions (normal
+    means with variance 1 / count, chi-square sums of squares), which
+    is the same as drawing the samples and reducing them, at a cost that
+    does not grow with the sample size.
+
+    Returns:
+        - np.ndarray: Means, shape (groups, simulations).
+        - np.ndarray: Sums of squared deviations, shape (groups, simulations).
+    """
+    means = rng.standard_normal((groups, simulations)) / np.sqrt(count)
+    squares = rng.chisquare(count - 1, (groups, simulations))
+    return means, squares
+
+
+def monte_carlo_power(test, effect_sizes, sample_sizes, alpha=DEFAULT_ALPHA, groups=3,
+                      sd_ratio=1.0, simulations=DEFAULT_SIMULATIONS, seed=DEFAULT_SEED):
+    """
+    Simulated power over a grid, with normal data and equal group sizes.
+    The t-test is Welch's and the z-test uses the pooled standard
+    deviation, as on the app's pages.
+
+    Args:
+        - test, effect_sizes, sample_sizes, alpha, groups: As for `analytic_power`.
+        - sd_ratio (float): Group 2's standard deviation over group 1's; for
+            ANOVA the standard deviations are spread evenly from 1 to this.
+        - simulations (int): Simulated data sets per grid point.
+        - seed (int): Seed of the simulations. Each sample size has its own
+            stream (from the seed and the size), so it gives the same power
+            in any grid.
+
+    Returns:
+        - np.ndarray: Power, one row per effect size and one column per sample size.
+    """
+    from scipy import stats
+    effect = np.asarray(effect_sizes, dtype=float)
+    sample_sizes = np.asarray(sample_sizes, dtype=int)
+    count_groups = groups if test == 'anova' else 2
+    scales = np.linspace(1.0, sd_ratio, count_groups)
+    power = np.empty((len(effect), len(sample_sizes)))
+
+    for column, count in enumerate(sample_sizes):
+        rng = np.random.default_rng(np.random.SeedSequence([seed, int(count)]))
+        means, squares = _noise_moments(rng, simulations, count, count_groups)
+        means = means * scales[:, None]
+        squares = squares * scales[:, None] ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if test == 'anova':
+                # Group means for every effect size: (effects, groups, simulations)
+                centers = np.array([group_means(size, groups) for size in effect])
+                shifted = means[None] + centers[:, :, None]
+                spread = shifted - shifted.mean(axis=1, keepdims=True)
+                between = count * (spread ** 2).sum(axis=1)
+                within = squares.sum(axis=0)
+                f_stat = (between / (groups - 1)) / (within / (groups * (count - 1)))
+                p_values = stats.f.sf(f_stat, groups - 1, groups * (count - 1))
+            else:
+                difference = means[0] - (means[1] + effect[:, None])
+                if test == 'ttest':
+                    se1, se2 = squares / (count - 1) / count
+                    df = (se1 + se2) ** 2 / ((se1 ** 2 + se2 ** 2) / (count - 1))
+                    p_values = 2 * stats.t.sf(np.abs(difference / np.sqrt(se1 + se2)), df)
+                else:
+                    pooled = squares.sum(axis=0) / (2 * count - 2)
+                    p_values = 2 * stats.norm.sf(np.abs(difference / np.sqrt(pooled * 2 / count)))
+        power[:, column] = (p_values < alpha).mean(axis=-1)
+    return power
+
+
+def power_grid(test, effect_sizes, sample_sizes, alpha=DEFAULT_ALPHA, groups=3, sd_ratio=1.0,
+               method='auto', simulations=DEFAULT_SIMULATIONS, seed=DEFAULT_SEED):
+    """
+    Power of a test over a grid of effect sizes and sample sizes, cached
+    per grid.
+
+    Args:
+        - test (str): 'ttest', 'ztest' or 'anova'.
+        - effect_sizes (array-like): Cohen's d, or Cohen's f for ANOVA.
+        - sample_sizes (array-like): Sample sizes per group.
+        - alpha (float): The significance level.
+        - groups (int): The number of groups (ANOVA only).
+        - sd_ratio (float): Ratio of the group standard deviations (see
+            `monte_carlo_power`).
+        - method (str): 'analytic', 'monte_carlo', or 'auto' for the closed
+            form where there is one and simulation otherwise.
+        - simulations (int): Simulated data sets per grid point.
+        - seed (int): Seed of the simulations.
+
+    Returns:
+        - np.ndarray: Power, one row per effect size and one column per sample size.
+
+    Raises:
+        ValueError: If the test or method is unknown, a sample size is below
+            2, or the analytic method is asked for where there is no closed form.
+    """
+    effect_sizes = tuple(float(effect) for effect in np.atleast_1d(effect_sizes))
+    sample_sizes = tuple(int(count) for count in np.atleast_1d(sample_sizes))
+    _check(test, method, groups, sample_sizes)
+    method = _pick_method(test, method, sd_ratio)
+    groups = groups if test == 'anova' else 2
+    key = ('power', test, method, effect_sizes, sample_sizes, alpha, groups, sd_ratio,
+           simulations if method == 'monte_carlo' else None, seed)
+    return stats_cache.RESULTS.get_or_compute(key, lambda: _power(
+        test, method, effect_sizes, sample_sizes, alpha, groups, sd_ratio, simulations,
+        seed)).copy()
+
+
+def _pick_method(test, method, sd_ratio):
+    if method == 'auto':
+        return 'analytic' if has_closed_form(test, sd_ratio) else 'monte_carlo'
+    if method == 'analytic' and not has_closed_form(test, sd_ratio):
+        raise ValueError("There is no closed form for unequal standard deviations")
+    return method
+
+
+def _power(test, method, effect_sizes, sample_sizes, alpha, groups, sd_ratio, simulations,
+           seed):
+    if method == 'analytic':
+        return analytic_power(test, effect_sizes, sample_sizes, alpha, groups, sd_ratio)
+    return monte_carlo_power(test, effect_sizes, sample_sizes, alpha, groups, sd_ratio,
+                             simulations, seed)
+
+
+def sample_size(test, effect_size, power=DEFAULT_POWER, alpha=DEFAULT_ALPHA, groups=3,
+                sd_ratio=1.0, method='auto', simulations=DEFAULT_SIMULATIONS, seed=DEFAULT_SEED):
+    """
+    Finds the smallest sample size per group that reaches a given power.
+
+    Args:
+        - test (str): 'ttest', 'ztest' or 'anova'.
+        - effect_size (float): Cohen's d, or Cohen's f for ANOVA.
+        - power (float): The power to reach, between 0 and 1.
+        - alpha, groups, sd_ratio, method, simulations, seed: As for `power_grid`.
+
+    Returns:
+        - int: The sample size per group, or None if even MAX_SAMPLE_SIZE
+            is not enough (e.g. for an effect size of 0).
+    """
+    _check(test, method, groups, [2])
+    method = _pick_method(test, method, sd_ratio)
+    groups = groups if test == 'anova' else 2
+
+    # Only the grid answers are cached, not the sizes tried on the way
+    def reaches(count):
+        return _power(test, method, [effect_size], [count], alpha, groups, sd_ratio,
+                      simulations, seed)[0, 0] >= power
+
+    low, high = 1, 2
+    if method == 'monte_carlo':
+        # Start from a closed form that needs no more samples than the simulated
+        # test: the z-test with known standard deviations, or ANOVA with every
+        # standard deviation as small as the smallest one. If even that is out of
+        # range, there is no need to simulate.
+        if test == 'anova':
+            bound = sample_size('anova', effect_size / min(1.0, sd_ratio), power, alpha,
+                                groups, 1.0, 'analytic')
+        else:
+            bound = sample_size('ztest', effect_size, power, alpha, groups, sd_ratio,
+                                'analytic')
+        if bound is None:
+            return None
+        low, high = max(1, bound - 1), max(2, bound)
+
+    # Double the sample size until it is enough, then bisect
+    while not reaches(high):
+        if high >= MAX_SAMPLE_SIZE:
+            return None
+        low, high = high, min(2 * high, MAX_SAMPLE_SIZE)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if reaches(middle):
+            high = middle
+        else:
+            low = middle
+    return high
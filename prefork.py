@@ -0,0 +1,436 @@
+"""This module runs the app in several pre-forked worker processes that
+share one listening socket, so CPU-bound callbacks (scipy, plotly) can
+use every core instead of fighting over a single process's GIL.
+
+The master process binds the socket, forks the workers (each a waitress
+server with its own thread pool) and then only watches them: dead or
+unresponsive workers are replaced, SIGHUP replaces every worker with a
+fresh one without dropping the socket, and SIGTERM or SIGINT stop the
+workers gracefully. Where fork is not available, the app is served by a
+single waitress process as before.
+
+A worker's heartbeat is sent by a thread of its own, which asks the
+event loop to touch the heartbeat file. A worker whose loop is stuck
+for longer than the health timeout is replaced, while one whose request
+threads are busy with long requests (permutation tests, bootstrap
+intervals) is left to finish them.
+
+Each worker is a separate process, so anything the app keeps in memory
+(caches, stored datasets, metrics) is per worker. Requests that use
+that state can be pinned to one worker: the other workers pass them on
+to it over a private socket, so they always find the state they need."""
+
+import http.client
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+import waitress
+from waitress import trigger
+from waitress.server import create_server
+from waitress.task import ThreadedTaskDispatcher
+
+logger = logging.getLogger(__name__)
+
+# Threads per worker (waitress' own default)
+DEFAULT_THREADS = 4
+
+# Seconds a worker may go without a heartbeat before it is replaced
+HEALTH_TIMEOUT = 30
+
+# Seconds a stopping worker has to finish its requests before it is killed
+GRACEFUL_TIMEOUT = 30
+
+# Seconds between heartbeats, and between checks by the master
+CHECK_INTERVAL = 1.0
+
+# A worker that exits sooner than this after starting is respawned after a pause
+MIN_WORKER_LIFETIME = 1.0
+
+# Headers that only apply to one connection, so are not passed on to the pinned worker
+HOP_BY_HOP_HEADERS = frozenset(('connection', 'keep-alive', 'proxy-authenticate',
+                                'proxy-authorization', 'te', 'trailers',
+                                'transfer-encoding', 'upgrade'))
+
+
+def create_listener(host, port, backlog=1024):
+    """
+    Binds the listening socket shared by the workers.
+
+    Args:
+        - host (str): The address to listen on.
+        - port (int): The port (0 picks a free one).
+        - backlog (int): Most pending connections queued by the kernel.
+
+    Returns:
+        - socket.socket: The listening socket.
+    """
+    family = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][0]
+    listener = socket.create_server((host, port), family=family, backlog=backlog)
+    listener.set_inheritable(True)
+    return listener
+
+
+class Worker:
+    """
+    A forked worker process, as seen by the master.
+
+    Args:
+        - pid (int): The worker's process id.
+        - heartbeat (str): Path of the file the worker touches while healthy.
+        - pinned (bool): Whether the worker serves the pinned requests.
+    """
+
+    def __init__(self, pid, heartbeat, pinned=False):
+        self.pid = pid
+        self.heartbeat = heartbeat
+        self.pinned = pinned
+        self.started = time.monotonic()
+        self.stopping = None  # When it was asked to stop
+
+    def last_heartbeat(self):
+        """Seconds since the worker last touched its heartbeat file."""
+        try:
+            return time.time() - os.stat(self.heartbeat).st_mtime
+        except OSError:
+            return float('inf')
+
+
+class GracefulDispatcher(ThreadedTaskDispatcher):
+    """
+    waitress' request thread pool, waiting a set time (rather than
+    waitress' fixed 5 seconds) for running requests when it shuts down.
+
+    Args:
+        - timeout (float): Seconds to wait for running requests.
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def shutdown(self, cancel_pending=True, timeout=None):
+        return super().shutdown(cancel_pending, self.timeout if timeout is None else timeout)
+
+
+class PinnedForwarder:
+    """
+    WSGI middleware, used by the workers that are not pinned, that
+    passes the pinned requests on to the pinned worker and serves the
+    rest with the app.
+
+    Args:
+        - app (callable): The WSGI app.
+        - pinned (callable): Given a request's WSGI environ, says whether
+            the pinned worker must serve it.
+        - address (tuple): The (host, port) the pinned worker listens on.
+    """
+
+    def __init__(self, app, pinned, address):
+        self.app = app
+        self.pinned = pinned
+        self.address = address
+
+    def __call__(self, environ, start_response):
+        if not self.pinned(environ):
+            return self.app(environ, start_response)
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        body = environ['wsgi.input'].read(length) if length else None
+        path = quote((environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', ''))
+                     .encode('latin-1'))
+        if environ.get('QUERY_STRING'):
+            path += '?' + environ['QUERY_STRING']
+        headers = {key[5:].replace('_', '-').title(): value for key, value in environ.items()
+                   if key.startswith('HTTP_')
+                   and key[5:].replace('_', '-').lower() not in HOP_BY_HOP_HEADERS}
+        for key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            if environ.get(key):
+                headers[key.replace('_', '-').title()] = environ[key]
+        headers['X-Forwarded-For'] = environ.get('REMOTE_ADDR', '')
+
+        # Long requests (e.g. permutation tests) are waited for, however long they take
+        connection = http.client.HTTPConnection(*self.address)
+        try:
+            connection.request(environ['REQUEST_METHOD'], path, body=body, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            logger.exception("The pinned worker did not answer %s", path)
+            start_response('502 Bad Gateway', [('Content-Type', 'text/plain')])
+            return [b'The request could not be served, please try again.']
+        finally:
+            connection.close()
+        start_response(f'{response.status} {response.reason}',
+                       [(key, value) for key, value in response.getheaders()
+                        if key.lower() not in HOP_BY_HOP_HEADERS])
+        return [content]
+
+
+class PreforkServer:
+    """
+    Master of a group of pre-forked waitress workers.
+
+    Args:
+        - app (callable): The WSGI app. It is imported in the master, so the
+            workers share its memory until they change it.
+        - host (str): The address to listen on.
+        - port (int): The port to listen on.
+        - workers (int): The number of worker processes.
+        - threads (int): Request threads in each worker.
+        - listener (socket.socket): An already bound socket to use instead
+            of binding `host` and `port`.
+        - health_timeout (float): Seconds without a heartbeat before a worker
+            is killed and replaced.
+        - graceful_timeout (float): Seconds a stopping worker is given before
+            it is killed. Its running requests get this long to finish,
+            less one check interval.
+        - on_heartbeat (callable): Called in each worker with every heartbeat
+            (about once per check interval) and once more as it stops, e.g.
+            to save the worker's metrics.
+        - pinned (callable): Given a request's WSGI environ, says whether
+            it must be served by the pinned worker, one worker that every
+            such request is passed on to (e.g. the requests that use state
+            kept in memory). None serves every request where it arrives.
+    """
+
+    def __init__(self, app, host='0.0.0.0', port=1000, workers=2, threads=DEFAULT_THREADS,
+                 listener=None, health_timeout=HEALTH_TIMEOUT,
+                 graceful_timeout=GRACEFUL_TIMEOUT, on_heartbeat=None, pinned=None):
+        if workers < 1:
+            raise ValueError("There must be at least one worker")
+        self.app = app
+        self.workers = workers
+        self.threads = threads
+        self.listener = listener if listener is not None else create_listener(host, port)
+        self.health_timeout = health_timeout
+        self.graceful_timeout = graceful_timeout
+        self.on_heartbeat = on_heartbeat
+        self.pinned = pinned
+        # Only the other workers connect here, so it stays on this machine
+        self.pinned_listener = create_listener('127.0.0.1', 0) if pinned is not None else None
+        self._children = {}
+        self._retiring = {}
+        self._heartbeat_dir = tempfile.mkdtemp(prefix='statsapp-workers-')
+        self._running = False
+        self._reload = False
+
+    @property
+    def address(self):
+        """The (host, port) the workers are listening on."""
+        return self.listener.getsockname()[:2]
+
+    # Master
+
+    def run(self):
+        """Starts the workers and watches them until told to stop."""
+        self._running = True
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        host, port = self.address
+        logger.info("Serving on http://%s:%s with %d workers x %d threads",
+                    host, port, self.workers, self.threads)
+        try:
+            while self._running:
+                self._reap()
+                if self._reload:
+                    self._reload = False
+                    self._restart_workers()
+                self._check_health()
+                self._spawn_missing()
+                time.sleep(CHECK_INTERVAL)
+        finally:
+            self._stop_all()
+            self.listener.close()
+            if self.pinned_listener is not None:
+                self.pinned_listener.close()
+
+    def _handle_stop(self, signum, frame):
+        self._running = False
+
+    def _handle_reload(self, signum, frame):
+        self._reload = True
+
+    def _spawn_missing(self):
+        if self.pinned is not None and self._running and \
+                not any(worker.pinned for worker in self._children.values()):
+            self._spawn(pinned=True)
+        while len(self._children) < self.workers and self._running:
+            self._spawn()
+
+    def _spawn(self, pinned=False):
+        heartbeat = tempfile.mkstemp(dir=self._heartbeat_dir)
+        os.close(heartbeat[0])
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(heartbeat[1], pinned)
+        self._children[pid] = Worker(pid, heartbeat[1], pinned)
+        logger.info("Started %sworker %d", "pinned " if pinned else "", pid)
+
+    def _reap(self):
+        """Collects exited workers and replaces the ones that died."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._children.pop(pid, None) or self._retiring.pop(pid, None)
+            if worker is None:
+                continue
+            self._remove_heartbeat(worker)
+            if worker.stopping is None:
+                logger.warning("Worker %d exited unexpectedly (status %d)", pid, status)
+                if time.monotonic() - worker.started < MIN_WORKER_LIFETIME:
+                    time.sleep(MIN_WORKER_LIFETIME)  # Avoid a tight respawn loop
+
+    def _check_health(self):
+        """Kills workers that have stopped sending heartbeats, and stopping
+        workers that are past their graceful timeout."""
+        now = time.monotonic()
+        for worker in list(self._children.values()):
+            if now - worker.started > self.health_timeout and \
+                    worker.last_heartbeat() > self.health_timeout:
+                logger.warning("Worker %d missed its heartbeat, replacing it", worker.pid)
+                self._kill(worker.pid, signal.SIGKILL)
+        for worker in list(self._retiring.values()):
+            if now - worker.stopping > self.graceful_timeout:
+                self._kill(worker.pid, signal.SIGKILL)
+
+    def _restart_workers(self):
+        """Replaces every worker: the new ones are started first, then the
+        old ones are asked to finish their requests and exit."""
+        logger.info("Restarting workers")
+        old = self._children
+        self._children = {}
+        self._spawn_missing()
+        for worker in old.values():
+            self._retire(worker)
+
+    def _retire(self, worker):
+        worker.stopping = time.monotonic()
+        self._retiring[worker.pid] = worker
+        self._kill(worker.pid, signal.SIGTERM)
+
+    def _stop_all(self):
+        """Stops every worker, killing any still running after the graceful timeout."""
+        for worker in list(self._children.values()):
+            self._retire(worker)
+        self._children = {}
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._retiring and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self._retiring):
+            self._kill(pid, signal.SIGKILL)
+        while self._retiring:
+            self._reap()
+            time.sleep(0.01)
+        try:
+            os.rmdir(self._heartbeat_dir)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _kill(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    @staticmethod
+    def _remove_heartbeat(worker):
+        try:
+            os.remove(worker.heartbeat)
+        except OSError:
+            pass
+
+    # Worker
+
+    def _run_worker(self, heartbeat, pinned=False):
+        """Serves requests in a forked worker. Never returns."""
+        status = 0
+        try:
+            # Ctrl+C and SIGHUP are for the master; it stops the workers with SIGTERM
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            # waitress finishes the running requests when its loop exits with SystemExit
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+            app, sockets = self.app, [self.listener]
+            if pinned:
+                sockets.append(self.pinned_listener)
+            elif self.pinned is not None:
+                app = PinnedForwarder(app, self.pinned, self.pinned_listener.getsockname()[:2])
+            dispatcher = GracefulDispatcher(max(self.graceful_timeout - CHECK_INTERVAL, 0))
+            dispatcher.set_thread_count(self.threads)
+            socket_map = {}
+            server = create_server(app, map=socket_map, sockets=sockets, threads=self.threads,
+                                   _dispatcher=dispatcher)
+            wakeup = trigger.trigger(socket_map)
+
+            def touch(done):
+                try:
+                    os.utime(heartbeat)
+                finally:
+                    done.set()
+
+            def beat():
+                done = threading.Event()
+                while True:
+                    # The event loop touches the file, so a stuck loop misses
+                    # its heartbeats but busy request threads do not
+                    done.clear()
+                    wakeup.pull_trigger(lambda: touch(done))
+                    done.wait()
+                    if self.on_heartbeat is not None:
+                        try:
+                            self.on_heartbeat()
+                        except Exception:  # pylint: disable=broad-except
+                            logger.exception("Worker %d heartbeat callback failed", os.getpid())
+                    time.sleep(CHECK_INTERVAL)
+
+            threading.Thread(target=beat, daemon=True).start()
+            server.run()
+            if self.on_heartbeat is not None:
+                self.on_heartbeat()
+        except SystemExit:
+            pass
+        except BaseException:  # pylint: disable=broad-except
+            logger.exception("Worker %d failed", os.getpid())
+            status = 1
+        finally:
+            os._exit(status)  # Never run the master's cleanup in a worker
+
+
+def serve(app, host='0.0.0.0', port=1000, workers=1, threads=DEFAULT_THREADS,
+          on_heartbeat=None, pinned=None):
+    """
+    Serves the app with one or more worker processes.
+
+    Args:
+        - app (callable): The WSGI app.
+        - host (str): The address to listen on.
+        - port (int): The port to listen on.
+        - workers (int): The number of worker processes (0 for one per CPU).
+            With one worker, or where fork is not available, the app is
+            served by this process.
+        - threads (int): Request threads in each worker.
+        - on_heartbeat (callable): Called in each worker with every
+            heartbeat (see PreforkServer).
+        - pinned (callable): Says which requests must all be served by
+            one worker (see PreforkServer).
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers == 1 or not hasattr(os, 'fork'):
+        waitress.serve(app, host=host, port=port, threads=threads)
+        return
+    PreforkServer(app, host, port, workers=workers, threads=threads,
+                  on_heartbeat=on_heartbeat, pinned=pinned).run()
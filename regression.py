@@ -0,0 +1,209 @@
+"""This module holds the simple linear regression engine used on the
+Regressions page. It keeps only the sufficient statistics of the data
+(n, the means of x and y, and the sums of squared deviations and cross
+products about those means), so points can be added or removed one at
+a time and statistics from separate chunks of data can be merged
+together. The deviations are updated as in Welford's and Chan's
+methods rather than worked out from raw sums of powers, so the fit
+stays accurate when x or y is large compared with its spread (e.g.
+timestamps or genomic positions)."""
+
+import math
+import numpy as np
+
+
+class SimpleRegression:
+    """
+    Least-squares fit of y = slope * x + intercept from sufficient statistics.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.c_xx = 0.0
+        self.c_yy = 0.0
+        self.c_xy = 0.0
+
+    def __repr__(self):
+        return (f"SimpleRegression(n={self.n}, slope={self.slope}, "
+                f"intercept={self.intercept})")
+
+    @classmethod
+    def from_arrays(cls, x_values, y_values):
+        """
+        Makes the sufficient statistics for a chunk of data. Pairs where
+        either value is NaN are left out.
+
+        Args:
+            - x_values (array-like): The X values.
+            - y_values (array-like): The Y values, the same length as `x_values`.
+
+        Returns:
+            - SimpleRegression: The regression for the chunk.
+        """
+        x_values = np.asarray(x_values, dtype=float)
+        y_values = np.asarray(y_values, dtype=float)
+        if x_values.shape != y_values.shape:
+            raise ValueError("X and Y values must have the same length")
+        valid = ~(np.isnan(x_values) | np.isnan(y_values))
+        x_values, y_values = x_values[valid], y_values[valid]
+
+        regression = cls()
+        regression.n = len(x_values)
+        if regression.n:
+            regression.mean_x = float(x_values.mean())
+            regression.mean_y = float(y_values.mean())
+            x_centered = x_values - regression.mean_x
+            y_centered = y_values - regression.mean_y
+            regression.c_xx = float(x_centered @ x_centered)
+            regression.c_yy = float(y_centered @ y_centered)
+            regression.c_xy = float(x_centered @ y_centered)
+        return regression
+
+    def add(self, x_value, y_value):
+        """Adds one (x, y) point."""
+        self.n += 1
+        dx = x_value - self.mean_x
+        dy = y_value - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.c_xx += dx * (x_value - self.mean_x)
+        self.c_yy += dy * (y_value - self.mean_y)
+        self.c_xy += dx * (y_value - self.mean_y)
+
+    def remove(self, x_value, y_value):
+        """Removes one (x, y) point that was previously added."""
+        if self.n <= 1:
+            self.__init__()
+            return
+        self.n -= 1
+        dx = x_value - self.mean_x
+        dy = y_value - self.mean_y
+        self.mean_x -= dx / self.n
+        self.mean_y -= dy / self.n
+        # Rounding can leave the sums of squares slightly negative
+        self.c_xx = max(self.c_xx - dx * (x_value - self.mean_x), 0.0)
+        self.c_yy = max(self.c_yy - dy * (y_value - self.mean_y), 0.0)
+        self.c_xy -= dx * (y_value - self.mean_y)
+
+    def merge(self, other):
+        """
+        Adds the sufficient statistics of another chunk to this one.
+
+        Args:
+            - other (SimpleRegression): The regression for the other chunk.
+
+        Returns:
+            - SimpleRegression: This regression, for chaining.
+        """
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        self.c_xx += other.c_xx + dx * dx * weight
+        self.c_yy += other.c_yy + dy * dy * weight
+        self.c_xy += other.c_xy + dx * dy * weight
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.n = n
+        return self
+
+    def __add__(self, other):
+        return SimpleRegression().merge(self).merge(other)
+
+    # Centred sums of squares and cross products
+    @property
+    def s_xx(self):
+        """Sum of squared deviations of x from its mean."""
+        return self.c_xx if self.n else 0.0
+
+    @property
+    def s_yy(self):
+        """Sum of squared deviations of y from its mean."""
+        return self.c_yy if self.n else 0.0
+
+    @property
+    def s_xy(self):
+        """Sum of cross products of the deviations of x and y."""
+        return self.c_xy if self.n else 0.0
+
+    @property
+    def slope(self):
+        """The fitted slope (0 if all x values are the same)."""
+        s_xx = self.s_xx
+        return self.s_xy / s_xx if s_xx > 0 else 0.0
+
+    @property
+    def intercept(self):
+        """The fitted intercept."""
+        if self.n == 0:
+            return float('nan')
+        return self.mean_y - self.slope * self.mean_x
+
+    @property
+    def sse(self):
+        """The residual sum of squares."""
+        return max(self.s_yy - self.slope * self.s_xy, 0.0)
+
+    @property
+    def r_squared(self):
+        """The coefficient of determination (1.0 if y has no spread and is fit exactly)."""
+        s_yy = self.s_yy
+        if s_yy == 0:
+            return 1.0 if self.sse == 0 else 0.0
+        return 1.0 - self.sse / s_yy
+
+    def predict(self, x_values):
+        """
+        Predicts y for the given x values.
+
+        Args:
+            - x_values (array-like): The X values.
+
+        Returns:
+            - np.ndarray: The fitted Y values.
+        """
+        return self.slope * np.asarray(x_values, dtype=float) + self.intercept
+
+    def summary(self):
+        """
+        Calculates the fit, its standard errors and p-values.
+
+        Standard errors and p-values need at least three points and some
+        spread in x; otherwise they are NaN.
+
+        Returns:
+            - dict: 'n', 'slope', 'intercept', 'r_squared', 'slope_se',
+                'intercept_se', 'slope_p_value' and 'intercept_p_value'.
+        """
+        result = {
+            'n': self.n,
+            'slope': self.slope,
+            'intercept': self.intercept,
+            'r_squared': self.r_squared,
+            'slope_se': float('nan'),
+            'intercept_se': float('nan'),
+            'slope_p_value': float('nan'),
+            'intercept_p_value': float('nan'),
+        }
+        s_xx = self.s_xx
+        if self.n < 3 or s_xx == 0:
+            return result
+
+        from scipy import stats
+        df = self.n - 2
+        residual_variance = self.sse / df
+        result['slope_se'] = math.sqrt(residual_variance / s_xx)
+        result['intercept_se'] = math.sqrt(residual_variance
+                                           * (1 / self.n + self.mean_x ** 2 / s_xx))
+        for name in ('slope', 'intercept'):
+            se = result[f'{name}_se']
+            if se > 0:
+                result[f'{name}_p_value'] = float(2 * stats.t.sf(abs(result[name] / se), df))
+            else:
+                # A perfect fit: the coefficient is known exactly
+                result[f'{name}_p_value'] = 0.0 if result[name] != 0 else 1.0
+        return result
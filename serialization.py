@@ -0,0 +1,229 @@
+"""This module turns plotly figures into plain, JSON-ready dicts for the
+Dash callbacks. Numeric trace arrays are sent as base64 typed arrays
+(plotly.js' {'dtype', 'bdata'} format) instead of lists of numbers, and
+the result holds only dicts, lists, strings and numbers, so Dash's JSON
+encoder (orjson when it is installed) can write it in a single pass
+without walking the plotly objects again.
+
+Packed figures are remembered, so a figure served again from the
+stats_cache figure cache is not packed twice. The figure last sent to
+each graph is also remembered (the page keeps its key in a dcc.Store),
+so the next one can be sent as a Dash Patch with only the trace and
+layout properties that changed."""
+
+import base64
+import numbers
+import secrets
+import numpy as np
+from dash import Patch
+import stats_cache
+
+# Shortest numeric list that is sent as a typed array
+# (for shorter ones the base64 text is no smaller than the JSON)
+MIN_TYPED_LENGTH = 8
+
+# plotly.js typed array names for the numpy dtypes it can read
+TYPED_ARRAY_DTYPES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+
+# Trace keys whose arrays must stay as JSON (plotly.js does not read
+# typed arrays there)
+SKIPPED_KEYS = ('geojson', 'layer', 'layers', 'range')
+
+# Packed versions of recently served figure objects
+_PACKED = stats_cache.LRUCache(max_entries=128)
+
+# Packed figures last sent to the browser, by the key the page keeps for them
+_SENT = stats_cache.LRUCache(max_entries=1024)
+
+
+def typed_array(values):
+    """
+    Encodes a numeric array as a plotly.js typed array.
+
+    64-bit integers (which plotly.js cannot read) are narrowed to the
+    smallest integer type that holds them, or sent as float64.
+
+    Args:
+        - values (array-like): The numbers.
+
+    Returns:
+        - dict: 'dtype' and 'bdata' (and 'shape' for 2-D arrays).
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu' and values.dtype.name not in TYPED_ARRAY_DTYPES:
+        low, high = (int(values.min()), int(values.max())) if values.size else (0, 0)
+        for name in ('uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32'):
+            info = np.iinfo(name)
+            if info.min <= low and high <= info.max:
+                values = values.astype(name)
+                break
+        else:
+            values = values.astype(np.float64)
+    elif values.dtype.name not in TYPED_ARRAY_DTYPES:
+        values = values.astype(np.float64)
+
+    encoded = {
+        'dtype': TYPED_ARRAY_DTYPES[values.dtype.name],
+        'bdata': base64.b64encode(np.ascontiguousarray(values)).decode('ascii'),
+    }
+    if values.ndim > 1:
+        encoded['shape'] = ', '.join(str(size) for size in values.shape)
+    return encoded
+
+
+def _is_numeric_list(values):
+    return (len(values) >= MIN_TYPED_LENGTH
+            and all(isinstance(value, numbers.Real) and not isinstance(value, bool)
+                    for value in values))
+
+
+def _pack_value(value, key=None):
+    """Converts one value of a trace, recursing into dicts and lists."""
+    if hasattr(value, 'to_plotly_json'):
+        value = value.to_plotly_json()
+    if isinstance(value, dict):
+        if 'bdata' in value:
+            return value  # Already a typed array
+        return {name: _pack_value(item, name) for name, item in value.items()}
+    if key in SKIPPED_KEYS:
+        return value.tolist() if isinstance(value, np.ndarray) else value
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind in 'iuf' and value.size and value.ndim <= 2:
+            return typed_array(value)
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        if _is_numeric_list(value):
+            return typed_array(np.asarray(value, dtype=float)
+                               if any(isinstance(item, float) for item in value)
+                               else np.asarray(value))
+        # plotly.js only reads typed arrays as whole attributes, so anything
+        # nested in a list (e.g. the per-box samples of a box trace) stays JSON
+        return _plain(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def pack_figure(figure):
+    """
+    Converts a figure into a plain dict with typed-array trace data.
+
+    Args:
+        - figure (plotly.graph_objs.Figure or dict): The figure. Dict
+            figures may hold plotly trace objects in 'data'.
+
+    Returns:
+        - dict: 'data' (the traces, with numeric arrays as typed arrays)
+            and 'layout', ready to be returned from a Dash callback.
+    """
+    if isinstance(figure, dict):
+        return _pack(figure)
+
+    # Figure objects are kept alive by the cache entry, so their ids stay unique
+    cached = _PACKED.get(id(figure))
+    if cached is not None and cached[0] is figure:
+        return cached[1]
+    packed = _pack(figure.to_plotly_json())
+    _PACKED.put(id(figure), (figure, packed))
+    return packed
+
+
+def _pack(figure):
+    layout = figure.get('layout', {})
+    if hasattr(layout, 'to_plotly_json'):
+        layout = layout.to_plotly_json()
+    packed = {'data': [_pack_value(trace) for trace in figure.get('data', [])],
+              'layout': _plain(layout)}
+    if 'frames' in figure:
+        packed['frames'] = figure['frames']
+    return packed
+
+
+def _plain(value):
+    """Makes a value JSON-ready, keeping its arrays as lists."""
+    if hasattr(value, 'to_plotly_json'):
+        value = value.to_plotly_json()
+    if isinstance(value, dict):
+        return {name: _plain(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _diff(patch, old, new):
+    """Adds the changes from `old` to `new` (two dicts) to a Patch node."""
+    for name, value in new.items():
+        if name not in old:
+            patch[name] = value
+        elif old[name] is value or old[name] == value:
+            continue
+        elif (isinstance(value, dict) and isinstance(old[name], dict)
+              and 'bdata' not in value and 'bdata' not in old[name]):
+            _diff(patch[name], old[name], value)
+        else:
+            patch[name] = value
+    for name in old:
+        if name not in new:
+            del patch[name]
+
+
+def figure_patch(previous, current):
+    """
+    Works out a Dash Patch that turns one packed figure into another.
+
+    Only the trace properties and layout entries that differ are set,
+    e.g. one trace's y array or the title text, so the response grows
+    with what changed rather than with the whole figure.
+
+    Args:
+        - previous (dict): The packed figure the browser has.
+        - current (dict): The packed figure to show.
+
+    Returns:
+        - dash.Patch or None: The patch, or None if the figures have
+            different traces (number or types), so the whole figure
+            should be sent.
+    """
+    old_traces, new_traces = previous.get('data', []), current.get('data', [])
+    if len(old_traces) != len(new_traces) or any(
+            old.get('type') != new.get('type') for old, new in zip(old_traces, new_traces)):
+        return None
+    patch = Patch()
+    for index, (old, new) in enumerate(zip(old_traces, new_traces)):
+        if old is not new:
+            _diff(patch['data'][index], old, new)
+    _diff(patch['layout'], previous.get('layout', {}), current.get('layout', {}))
+    return patch
+
+
+def figure_update(figure, shown=None):
+    """
+    Packs a figure for a Dash callback, as a Patch when the browser
+    already shows a figure with the same traces.
+
+    Args:
+        - figure (plotly.graph_objs.Figure or dict): The figure to show.
+        - shown (str): The key of the figure the graph shows, as returned
+            by the last call for that graph (None if unknown).
+
+    Returns:
+        - dict or dash.Patch: The whole packed figure, or a Patch with
+            only what changed.
+        - str: The key of the new figure, to keep in the page for the
+            next call.
+    """
+    packed = pack_figure(figure)
+    previous = _SENT.get(shown) if shown is not None else None
+    key = secrets.token_urlsafe(8)
+    _SENT.put(key, packed)
+    if previous is None:
+        return packed, key
+    patch = figure_patch(previous, packed)
+    return (packed if patch is None else patch), key
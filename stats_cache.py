@@ -0,0 +1,151 @@
+"""This module memoizes the statistics and figures made in the plots
+module. Results are keyed by a hash of the cleaned numeric data plus
+the test options, so clicking "Update" on a table that has not changed
+(or that many users share) skips both the statistics and the plotly
+figure construction."""
+
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Sentinel for "not in the cache", since None can be a cached value
+_MISSING = object()
+
+
+def hash_arrays(*arrays, options=()):
+    """
+    Makes a content hash of numeric arrays and test options.
+
+    Args:
+        - *arrays (array-like): The cleaned numeric data.
+        - options (tuple): Any test options that change the result.
+
+    Returns:
+        - str: A hex digest that is the same for equal data and options.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(options).encode())
+    for values in arrays:
+        values = np.ascontiguousarray(values, dtype=float)
+        digest.update(str(values.shape).encode())
+        digest.update(values.view(np.uint8))
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded least-recently-used cache that counts
+    its hits, misses and evictions.
+
+    Args:
+        - max_entries (int): The most items to keep at once.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """
+        Looks up a cached value and marks it as recently used.
+
+        Args:
+            - key (hashable): The cache key.
+            - default: Value returned if the key is not cached.
+
+        Returns:
+            - The cached value, or `default`.
+        """
+        with self._lock:
+            value = self._items.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Adds a value, evicting the least recently used items if needed."""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for `key`, computing and caching it first
+        if it is not there. `compute` runs outside the lock, so two threads
+        may both compute a missing value; the results are the same.
+
+        Args:
+            - key (hashable): The cache key.
+            - compute (callable): Function with no arguments that makes the value.
+
+        Returns:
+            - The cached or newly computed value.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Removes all items and resets the counters."""
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            - dict: 'hits', 'misses', 'evictions', 'size' and 'max_entries'.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._items),
+                'max_entries': self.max_entries,
+            }
+
+
+# Test statistics (small tuples of numbers)
+RESULTS = LRUCache(max_entries=1024)
+
+# Built plotly figures (larger, so fewer are kept). Cached figures are
+# shared between callers and should be treated as read-only.
+FIGURES = LRUCache(max_entries=128)
+
+
+def cache_stats():
+    """
+    Returns the counters of the shared caches.
+
+    Returns:
+        - dict: 'results' and 'figures' counters, as from `LRUCache.stats`.
+    """
+    return {'results': RESULTS.stats(), 'figures': FIGURES.stats()}
+
+
+def clear_caches():
+    """Empties the shared caches."""
+    RESULTS.clear()
+    FIGURES.clear()
@@ -0,0 +1,123 @@
+"""This module tests the accumulators module."""
+
+import pytest
+import numpy as np
+from scipy import stats
+from statsmodels.stats.weightstats import ztest
+import accumulators
+
+
+class TestRunningMoments:
+    """Tests for the RunningMoments class."""
+
+    def test_add_matches_numpy(self):
+        """Test that adding values one at a time gives numpy's mean and variance."""
+        values = [3.0, 7.5, 1.0, 9.0, 4.25]
+        moments = accumulators.RunningMoments()
+        for value in values:
+            moments.add(value)
+
+        assert moments.count == 5
+        assert moments.mean == pytest.approx(np.mean(values))
+        assert moments.variance == pytest.approx(np.var(values, ddof=1))
+
+    def test_remove_and_replace(self):
+        """Test that removing and replacing values keeps the moments correct."""
+        moments = accumulators.RunningMoments.from_values([1.0, 2.0, 3.0, 4.0])
+        moments.remove(4.0)
+        moments.replace(1.0, 10.0)
+
+        assert moments.count == 3
+        assert moments.mean == pytest.approx(np.mean([10.0, 2.0, 3.0]))
+        assert moments.variance == pytest.approx(np.var([10.0, 2.0, 3.0], ddof=1))
+
+    def test_nan_handling(self):
+        """Test that NaN values are skipped, or filled when a fill value is set."""
+        skipped = accumulators.RunningMoments.from_values([1.0, np.nan, 3.0])
+        filled = accumulators.RunningMoments.from_values([1.0, np.nan, 3.0], fill_value=0.0)
+        skipped.add(float('nan'))
+
+        assert skipped.count == 2 and skipped.mean == pytest.approx(2.0)
+        assert filled.count == 3 and filled.mean == pytest.approx(4.0 / 3)
+
+    def test_has_variance(self):
+        """Test the zero-spread check, including rounding left by removals."""
+        moments = accumulators.RunningMoments.from_values([5.0, 5.0, 5.0])
+        assert not moments.has_variance()
+        moments.replace(5.0, 5.1)
+        assert moments.has_variance()
+        moments.replace(5.1, 5.0)
+        assert not moments.has_variance()
+
+
+
+class TestRunningHistogram:
+    """Tests for the RunningHistogram class."""
+
+    def test_updates_match_numpy(self):
+        """Test that edited counts match np.histogram of the edited column."""
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=200)
+        edges = np.linspace(-3, 3, 13)
+        histogram = accumulators.RunningHistogram.from_values(values, edges)
+
+        histogram.replace(values[0], 2.9)
+        histogram.remove(values[1])
+        histogram.add(3.0)  # The right edge counts in the last bin
+        histogram.update(removed=values[2:10], added=[np.nan, 5.0, -0.1])
+        edited = np.concatenate([[2.9], values[10:], [3.0, -0.1]])
+
+        assert histogram.counts.tolist() == np.histogram(edited, bins=edges)[0].tolist()
+
+    def test_has_edges(self):
+        """Test that the accumulator recognises its own bin edges."""
+        histogram = accumulators.RunningHistogram([0.0, 1.0, 2.0])
+        assert histogram.has_edges(np.array([0.0, 1.0, 2.0]))
+        assert not histogram.has_edges([0.0, 1.0, 2.5])
+
+class TestStatistics:
+    """Tests that the statistics from accumulators match scipy and statsmodels."""
+
+    values1 = [90.0, 92.0, 88.0, 95.0, 91.0, 87.0]
+    values2 = [80.0, 85.0, 87.0, 84.0, 82.0]
+    values3 = [78.0, 99.0, 85.0, 90.0]
+
+    def test_welch_ttest(self):
+        """Test welch_ttest against scipy's ttest_ind."""
+        t_stat, p_value = accumulators.welch_ttest(
+            accumulators.RunningMoments.from_values(self.values1),
+            accumulators.RunningMoments.from_values(self.values2))
+        expected = stats.ttest_ind(self.values1, self.values2, equal_var=False)
+
+        assert t_stat == pytest.approx(expected.statistic)
+        assert p_value == pytest.approx(expected.pvalue)
+
+    def test_welch_ttest_without_spread(self):
+        """Test that constant and single-value columns give NaN, as scipy does, instead of raising."""
+        constant = accumulators.RunningMoments.from_values([5.0, 5.0, 5.0])
+        single = accumulators.RunningMoments.from_values([1.0])
+        empty = accumulators.RunningMoments()
+
+        for moments in ((constant, constant), (single, constant), (empty, single)):
+            t_stat, p_value = accumulators.welch_ttest(*moments)
+            assert np.isnan(t_stat) and np.isnan(p_value), f"{moments} should give NaN"
+
+    def test_ztest(self):
+        """Test ztest against statsmodels' ztest."""
+        z_stat, p_value = accumulators.ztest(
+            accumulators.RunningMoments.from_values(self.values1),
+            accumulators.RunningMoments.from_values(self.values2))
+        expected_z, expected_p = ztest(self.values1, self.values2)
+
+        assert z_stat == pytest.approx(expected_z)
+        assert p_value == pytest.approx(expected_p)
+
+    def test_one_way_anova(self):
+        """Test one_way_anova against scipy's f_oneway."""
+        f_stat, p_value = accumulators.one_way_anova(
+            *(accumulators.RunningMoments.from_values(values)
+              for values in (self.values1, self.values2, self.values3)))
+        expected = stats.f_oneway(self.values1, self.values2, self.values3)
+
+        assert f_stat == pytest.approx(expected.statistic)
+        assert p_value == pytest.approx(expected.pvalue)
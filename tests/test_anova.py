@@ -0,0 +1,117 @@
+"""This module tests the anova module."""
+
+import pytest
+import numpy as np
+from scipy import stats
+import anova
+
+
+def long_format(groups):
+    """Stacks a list of samples into group labels and values."""
+    labels = np.concatenate([[f'group {index:02d}'] * len(values)
+                             for index, values in enumerate(groups)])
+    return labels, np.concatenate(groups)
+
+
+class TestLongFormatAnova:
+    """Tests for the long_format_anova function."""
+
+    def test_matches_scipy(self):
+        """Test that the F-test of long-format data matches scipy's f_oneway."""
+        rng = np.random.default_rng(1)
+        groups = [rng.normal(mean, 1, size) for mean, size in
+                  [(0.0, 20), (0.3, 35), (0.1, 28), (0.5, 41), (0.2, 17)]]
+        expected = stats.f_oneway(*groups)
+
+        result = anova.long_format_anova(*long_format(groups))
+
+        assert result['f_stat'] == pytest.approx(expected.statistic)
+        assert result['p_value'] == pytest.approx(expected.pvalue)
+        assert result['df_between'] == 4 and result['df_within'] == 136
+        assert result['labels'].tolist() == [f'group {index:02d}' for index in range(5)]
+        assert result['counts'].tolist() == [20, 35, 28, 41, 17]
+
+    def test_missing_values_and_labels_dropped(self):
+        """Test that rows with a missing value or group label are left out."""
+        groups = np.array(['b', 'a', 'b', None, 'a', 'a', 'b'], dtype=object)
+        values = np.array([1.0, 2.0, np.nan, 5.0, 3.0, 4.0, 2.0])
+
+        codes, labels, kept = anova.factorize_groups(groups, values)
+
+        assert labels.tolist() == ['a', 'b'], "Labels should be sorted"
+        assert codes.tolist() == [1, 0, 0, 0, 1]
+        assert kept.tolist() == [1.0, 2.0, 3.0, 4.0, 2.0]
+
+    def test_group_statistics_accurate_for_large_offsets(self):
+        """Test that the squared deviations stay accurate for large values with little spread."""
+        codes = np.array([0, 0, 0, 1, 1])
+        values = np.array([1e9 + 1, 1e9 + 2, 1e9 + 3, 5.0, 7.0])
+
+        counts, means, m2 = anova.group_statistics(codes, values)
+
+        assert counts.tolist() == [3, 2]
+        assert means.tolist() == [1e9 + 2, 6.0]
+        assert m2.tolist() == [2.0, 2.0]
+
+    def test_group_names(self):
+        """Test that whole-number labels are shown without a decimal point."""
+        assert anova.group_names(np.array([1.0, 2.5, 10.0])) == ['1', '2.5', '10']
+        assert anova.group_names(np.array(['a', 'b'])) == ['a', 'b']
+
+    def test_invalid_data(self):
+        """Test that a single group, too few values or mismatched lengths raise errors."""
+        with pytest.raises(ValueError):
+            anova.long_format_anova(['a', 'a', 'a'], [1.0, 2.0, 3.0])
+        with pytest.raises(ValueError):
+            anova.long_format_anova(['a', 'b'], [1.0, 2.0])
+        with pytest.raises(ValueError):
+            anova.long_format_anova(['a', 'b'], [1.0, 2.0, 3.0])
+
+
+class TestTukeyHsd:
+    """Tests for the tukey_hsd and tukey_pairs functions."""
+
+    def test_matches_scipy(self):
+        """Test that the pairwise matrices match scipy's tukey_hsd."""
+        rng = np.random.default_rng(2)
+        groups = [rng.normal(mean, 1, size) for mean, size in
+                  [(0.0, 15), (0.8, 22), (0.2, 18), (1.0, 25)]]
+        expected = stats.tukey_hsd(*groups)
+        interval = expected.confidence_interval()
+
+        result = anova.long_format_anova(*long_format(groups))
+        tukey = anova.tukey_hsd(result['counts'], result['means'], result['mse'],
+                                result['df_within'])
+
+        assert np.allclose(tukey['difference'], expected.statistic)
+        assert np.allclose(tukey['p_value'], expected.pvalue, atol=1e-6)
+        assert np.allclose(tukey['lower'], interval.low)
+        assert np.allclose(tukey['upper'], interval.high)
+        assert (tukey['reject'] == (expected.pvalue < 0.05)).all()
+
+    def test_many_groups_interpolated_p_values(self):
+        """Test that the interpolated p-values for many pairs are close to scipy's."""
+        rng = np.random.default_rng(3)
+        groups = [rng.normal(0.04 * index, 1, 30) for index in range(16)]
+        expected = stats.tukey_hsd(*groups).pvalue
+
+        result = anova.long_format_anova(*long_format(groups))
+        tukey = anova.tukey_hsd(result['counts'], result['means'], result['mse'],
+                                result['df_within'])
+
+        assert len(np.unique(tukey['q'])) > anova.TUKEY_EXACT_POINTS
+        assert np.allclose(tukey['p_value'], expected, rtol=1e-3, atol=1e-4)
+
+    def test_tukey_pairs_sorted_by_p_value(self):
+        """Test that the pairs are listed once each, most significant first."""
+        result = anova.long_format_anova(['a'] * 5 + ['b'] * 5 + ['c'] * 5,
+                                         [1, 2, 3, 2, 1, 9, 8, 9, 8, 9, 2, 3, 2, 3, 2])
+        tukey = anova.tukey_hsd(result['counts'], result['means'], result['mse'],
+                                result['df_within'])
+
+        pairs = anova.tukey_pairs(tukey, ['a', 'b', 'c'])
+
+        assert len(pairs) == 3
+        assert [pair[3] for pair in pairs] == sorted(pair[3] for pair in pairs)
+        assert pairs[-1][:2] == ('a', 'c'), "a and c are the closest groups"
+        assert len(anova.tukey_pairs(tukey, ['a', 'b', 'c'], limit=1)) == 1
@@ -1,10 +1,16 @@
 """This module tests that the app loads correctly.
 The tests check that the pages exist."""
 
+import os
+import subprocess
+import sys
 import pytest
-from app import app
+from app import app, is_dash_callback
 from flask import url_for
 
+# The repository root, where app.py lives
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 @pytest.fixture
 def client():
     """Create a test client for the Flask application."""
@@ -93,3 +99,50 @@ class TestSubmitFunction:
 
         # Assert that the response redirects to the home page (first entry in pages list)
         assert response.status_code == 302  # 302 indicates a redirect
+
+def test_dash_app_built_on_first_request(client):
+    """Test that a dash app is built the first time its page is requested."""
+    response = client.get('/dash_ttest/') # Simulate a GET request to the t-test dash app
+    assert response.status_code == 200 # Page correctly loads
+    assert app.wsgi_app.is_built('dash_ttest') # The app now exists
+    response = client.get('/dash_ttest/_dash-layout') # Later requests reuse the built app
+    assert response.status_code == 200
+
+def test_app_import_skips_dash():
+    """Test that importing the app does not load dash or scipy."""
+    code = "import sys, app; print('dash' in sys.modules or 'scipy' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                            text=True, check=True, cwd=ROOT)
+    assert result.stdout.strip() == 'False' # Heavy packages wait for the first dash request
+
+def test_metrics_page(client):
+    """Test that the metrics page lists the routes that have been requested."""
+    client.get('/about') # Make sure there is a route to report
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'statsapp_route_duration_seconds_count{route="/about"}' in response.data
+
+def test_metrics_page_not_remote(client):
+    """Test that the metrics page is hidden from other machines."""
+    response = client.get('/metrics', environ_base={'REMOTE_ADDR': '192.0.2.1'})
+    assert response.status_code == 404
+
+def test_healthz_page(client):
+    """Test that the health check reports the worker as up."""
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ok'
+
+def test_dash_callbacks_are_pinned():
+    """Test that only the Dash callback requests go to the pinned worker."""
+    assert is_dash_callback({'PATH_INFO': '/dash_ttest/_dash-update-component'})
+    assert not is_dash_callback({'PATH_INFO': '/dash_ttest/'})
+    assert not is_dash_callback({'PATH_INFO': '/dash_ttest/_dash-layout'})
+    assert not is_dash_callback({'PATH_INFO': '/healthz'})
+
+def test_page_not_modified(client):
+    """Test that a page the browser already has is not sent again."""
+    etag = client.get('/anova').headers['ETag']
+    response = client.get('/anova', headers={'If-None-Match': etag})
+    assert response.status_code == 304 # Not modified
+    assert response.data == b''
@@ -0,0 +1,79 @@
+"""This module tests the benchmark module."""
+
+import pytest
+import benchmark
+import stats_cache
+
+
+class TestRunBenchmarks:
+    """Tests for running the benchmarks."""
+
+    def test_run_benchmarks_records_every_engine(self):
+        """Test that each engine and size gets a result with all the metrics."""
+        results = benchmark.run_benchmarks(sizes=[10, 100], repeat=1)
+
+        assert len(results) == 2 * len(benchmark.ENGINES)
+        for result in results:
+            for metric in benchmark.TIME_METRICS + benchmark.MEMORY_METRICS:
+                assert result[metric] >= 0, f"{result['engine']} is missing {metric}"
+
+    def test_stat_and_figure_times_are_split(self):
+        """Test that the statistic and figure times are both measured."""
+        result = benchmark.run_benchmarks(sizes=[1000], engines=['generate_ttest_plot'],
+                                          repeat=1)[0]
+
+        assert result['stat_seconds'] > 0
+        assert result['figure_seconds'] > 0
+        assert result['stat_seconds'] + result['figure_seconds'] <= result['total_seconds']
+
+    def test_shared_caches_are_restored(self):
+        """Test that the benchmark puts the real caches back afterwards."""
+        results_cache, figures_cache = stats_cache.RESULTS, stats_cache.FIGURES
+        benchmark.run_benchmarks(sizes=[10], engines=['generate_ztest_plot'], repeat=1)
+        assert stats_cache.RESULTS is results_cache
+        assert stats_cache.FIGURES is figures_cache
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine name is rejected."""
+        with pytest.raises(ValueError):
+            benchmark.run_benchmarks(sizes=[10], engines=['generate_fake_plot'])
+
+
+class TestCompareResults:
+    """Tests for comparing results against a baseline."""
+
+    @staticmethod
+    def make_result(total, peak=0, engine='generate_ttest_plot', size=1000):
+        """Makes a result with the given total time and peak memory."""
+        return {'engine': engine, 'n': size, 'total_seconds': total,
+                'stat_seconds': 0.0, 'figure_seconds': 0.0, 'peak_bytes': peak}
+
+    def test_slowdown_is_flagged(self):
+        """Test that a metric past the threshold is reported."""
+        regressions = benchmark.compare_results([self.make_result(0.5)],
+                                                [self.make_result(0.2)], threshold=1.25)
+
+        assert len(regressions) == 1
+        assert regressions[0]['metric'] == 'total_seconds'
+        assert regressions[0]['ratio'] == pytest.approx(2.5)
+
+    def test_small_changes_are_ignored(self):
+        """Test that changes within the threshold or below the noise floor are not flagged."""
+        assert not benchmark.compare_results([self.make_result(0.22)], [self.make_result(0.2)])
+        assert not benchmark.compare_results([self.make_result(0.0005)],
+                                             [self.make_result(0.0001)])
+
+    def test_memory_growth_is_flagged(self):
+        """Test that a large increase in peak memory is reported."""
+        regressions = benchmark.compare_results([self.make_result(0.2, peak=50 * 2 ** 20)],
+                                                [self.make_result(0.2, peak=10 * 2 ** 20)])
+        assert [regression['metric'] for regression in regressions] == ['peak_bytes']
+
+    def test_results_round_trip(self, tmp_path):
+        """Test that written results can be read back as a baseline."""
+        path = tmp_path / 'bench.json'
+        results = [self.make_result(0.1), self.make_result(0.3, size=10)]
+        benchmark.write_results(path, results)
+
+        assert benchmark.read_results(path) == results
+        assert not benchmark.compare_results(results, benchmark.read_results(path))
@@ -0,0 +1,93 @@
+"""This module tests the bootstrap module."""
+
+import pytest
+import numpy as np
+from scipy import stats
+import bootstrap
+import parallel
+
+
+def mean_difference(values1, values2, axis=-1):
+    """Difference of the means, in the vectorized form scipy's bootstrap uses."""
+    return values1.mean(axis=axis) - values2.mean(axis=axis)
+
+
+class TestBootstrapIntervals:
+    """Tests for the bootstrap interval functions."""
+
+    @pytest.mark.parametrize('method', ['percentile', 'bca'])
+    def test_mean_matches_scipy(self, method):
+        """Test that the interval for a mean is close to scipy's."""
+        values = np.random.default_rng(1).exponential(2.0, 60)
+        expected = stats.bootstrap((values,), np.mean, method=method, n_resamples=10000,
+                                   random_state=1).confidence_interval
+
+        estimate, low, high = bootstrap.bootstrap_mean(values, method=method)
+
+        assert estimate == pytest.approx(values.mean())
+        assert low == pytest.approx(expected.low, abs=0.05)
+        assert high == pytest.approx(expected.high, abs=0.05)
+
+    @pytest.mark.parametrize('method', ['percentile', 'bca'])
+    def test_mean_difference_matches_scipy(self, method):
+        """Test that the interval for a difference of means is close to scipy's."""
+        rng = np.random.default_rng(2)
+        values1, values2 = rng.exponential(2.0, 60), rng.exponential(1.0, 45)
+        expected = stats.bootstrap((values1, values2), mean_difference, method=method,
+                                   n_resamples=10000, random_state=1).confidence_interval
+
+        estimate, low, high = bootstrap.bootstrap_mean_difference(values1, values2,
+                                                                  method=method)
+
+        assert estimate == pytest.approx(values1.mean() - values2.mean())
+        assert low == pytest.approx(expected.low, abs=0.05)
+        assert high == pytest.approx(expected.high, abs=0.05)
+
+    def test_regression_intervals(self):
+        """Test that the slope and intercept intervals hold the fit and the true values."""
+        rng = np.random.default_rng(3)
+        x_values = rng.uniform(0, 10, 200)
+        y_values = 2 * x_values + 1 + rng.normal(0, 1, 200)
+        fit = stats.linregress(x_values, y_values)
+
+        intervals = bootstrap.bootstrap_regression(x_values, y_values)
+
+        slope, slope_low, slope_high = intervals['slope']
+        intercept, intercept_low, intercept_high = intervals['intercept']
+        assert slope == pytest.approx(fit.slope)
+        assert intercept == pytest.approx(fit.intercept)
+        assert slope_low < 2 < slope_high, "The slope interval should hold the true slope"
+        assert intercept_low < 1 < intercept_high
+        # For well-behaved data the width is close to the normal-theory interval
+        assert slope_high - slope_low == pytest.approx(2 * 1.96 * fit.stderr, rel=0.2)
+
+    def test_deterministic_across_workers(self):
+        """Test that the same seed gives the same interval in one or several processes."""
+        rng = np.random.default_rng(4)
+        values1, values2 = rng.normal(0, 1, 200), rng.normal(0.3, 1, 200)
+        options = {'resamples': 3000, 'memory_budget': 400 * 24 * 500}
+        try:
+            pooled = bootstrap.bootstrap_mean_difference(values1, values2, workers=2, **options)
+        finally:
+            parallel.shutdown_pool()
+
+        assert pooled == bootstrap.bootstrap_mean_difference(values1, values2, **options)
+        assert pooled != bootstrap.bootstrap_mean_difference(values1, values2, seed=1, **options)
+
+    def test_nan_values_dropped(self):
+        """Test that NaN values are left out of the samples."""
+        with_nan = bootstrap.bootstrap_mean([1.0, 2.0, np.nan, 4.0, 8.0], resamples=500)
+        without = bootstrap.bootstrap_mean([1.0, 2.0, 4.0, 8.0], resamples=500)
+
+        assert with_nan == without
+
+    def test_invalid_arguments(self):
+        """Test that too little data and unknown methods raise errors."""
+        with pytest.raises(ValueError):
+            bootstrap.bootstrap_mean([1.0])
+        with pytest.raises(ValueError):
+            bootstrap.bootstrap_regression([1.0, 1.0, 1.0], [1.0, 2.0, 3.0])
+        with pytest.raises(ValueError):
+            bootstrap.bootstrap_mean([1.0, 2.0, 3.0], method='normal')
+        with pytest.raises(ValueError):
+            bootstrap.bootstrap_mean([1.0, 2.0, 3.0], level=95)
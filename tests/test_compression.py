@@ -0,0 +1,128 @@
+"""This module tests the compression module."""
+
+import gzip
+import os
+import pytest
+from flask import Flask
+import compression
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    """A static folder with a stylesheet and an image."""
+    (tmp_path / 'styles').mkdir()
+    (tmp_path / 'styles' / 'style.css').write_text('body { color: black; }\n' * 200)
+    (tmp_path / 'image.png').write_bytes(b'\x89PNG' + bytes(2000))
+    return tmp_path
+
+
+@pytest.fixture
+def client(static_folder):
+    """A test client for a small app with compression enabled."""
+    server = Flask(__name__, static_folder=str(static_folder), static_url_path='/static')
+
+    @server.route('/big')
+    def big():
+        return 'statistics ' * 500
+
+    @server.route('/small')
+    def small():
+        return 'ok'
+
+    @server.route('/json', methods=['POST'])
+    def json_payload():
+        return {'values': list(range(1000))}
+
+    compression.init_app(server)
+    with server.test_client() as test_client:
+        yield test_client
+
+
+class TestCompressResponses:
+    """Tests for compressing responses on the fly."""
+
+    def test_large_response_is_compressed(self, client):
+        """Test that a large response is gzipped for a browser that accepts it."""
+        response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert gzip.decompress(response.data).decode() == 'statistics ' * 500
+
+    def test_brotli_is_preferred(self, client):
+        """Test that brotli is used when it is installed and accepted."""
+        brotli = pytest.importorskip('brotli')
+        response = client.get('/big', headers={'Accept-Encoding': 'gzip, br'})
+
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data).decode() == 'statistics ' * 500
+
+    def test_small_or_unaccepted_responses_are_not_compressed(self, client):
+        """Test the size threshold and the Accept-Encoding check."""
+        assert 'Content-Encoding' not in client.get(
+            '/small', headers={'Accept-Encoding': 'gzip'}).headers
+        assert 'Content-Encoding' not in client.get('/big').headers
+
+    def test_callback_payload_is_compressed(self, client):
+        """Test that POSTed JSON responses (like Dash callbacks) are compressed."""
+        response = client.post('/json', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+
+    def test_etag_gives_not_modified(self, client):
+        """Test that a repeat request with the ETag gets an empty 304."""
+        headers = {'Accept-Encoding': 'gzip'}
+        etag = client.get('/big', headers=headers).headers['ETag']
+        assert etag.endswith('-gzip"'), "Each encoding should have its own ETag"
+
+        response = client.get('/big', headers={**headers, 'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+class TestStaticFiles:
+    """Tests for serving static files."""
+
+    def test_precompress_static(self, static_folder):
+        """Test that only compressible files get compressed copies, once."""
+        written = compression.precompress_static(static_folder)
+
+        assert os.path.exists(static_folder / 'styles' / 'style.css.gz')
+        assert not os.path.exists(static_folder / 'image.png.gz'), "PNGs are already compressed"
+        assert compression.precompress_static(static_folder) == 0, "Up-to-date copies are kept"
+        assert written >= 1
+
+    def test_precompressed_copy_is_served(self, client, static_folder):
+        """Test that the .gz copy is sent to browsers that accept gzip."""
+        compression.precompress_static(static_folder)
+        response = client.get('/static/styles/style.css', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.data) == (static_folder / 'styles' / 'style.css').read_bytes()
+        response.close()
+
+    def test_fingerprinted_url_is_immutable(self, client):
+        """Test that url_for adds a fingerprint that makes the file cacheable for a year."""
+        with client.application.test_request_context():
+            from flask import url_for
+            url = url_for('static', filename='image.png')
+        assert '?v=' in url
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.cache_control.immutable
+        assert response.cache_control.max_age == compression.IMMUTABLE_MAX_AGE
+        response.close()
+
+    def test_plain_url_is_revalidated(self, client):
+        """Test that a file requested without its fingerprint uses its ETag."""
+        response = client.get('/static/image.png')
+        etag = response.headers['ETag']
+        response.close()
+        assert response.cache_control.no_cache
+
+        response = client.get('/static/image.png', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+    def test_path_outside_static_folder(self, client):
+        """Test that paths leaving the static folder are rejected."""
+        assert client.get('/static/../secret.txt').status_code == 404
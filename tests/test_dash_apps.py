@@ -1,11 +1,16 @@
 """This test file tests the dash apps module"""
 import pytest
+import dash
 from dash import Dash, dash_table
 # from dash.testing.application_runners import import_app
 import time
+import json
+import shutil
+import subprocess
 from flask import Flask
 import pandas as pd
 import dash_apps
+import datastore
 
 @pytest.fixture
 def test_app():
@@ -16,6 +21,37 @@ def test_app():
     # Use the Flask app's test client
     return {key: flask_app.test_client() for key in dash_app.keys()}
 
+def first_output(dependency):
+    """Returns the first output of a callback, as listed by _dash-dependencies"""
+    return dependency['output'].strip('.').split('...')[0]
+
+def run_clientside(name, calls):
+    """Runs clientside callbacks of a dash app in node, in order, sharing one window.
+
+    Args:
+        name (str): the app's route prefix
+        calls (list): (first output, arguments) of each call
+
+    Returns:
+        list: what each call returned, with no_update as None
+    """
+    if shutil.which('node') is None:
+        pytest.skip("node is needed to run the clientside callbacks")
+    flask_app = Flask(__name__)
+    dash_app = dash_apps.build_dash_app(name, flask_app)
+    dependencies = flask_app.test_client().get(f'/{name}/_dash-dependencies').get_json()
+    functions = {first_output(dependency): dependency['clientside_function']['function_name']
+                 for dependency in dependencies if dependency['clientside_function']}
+    script = "global.window = {dash_clientside: {no_update: null}};\n"
+    script += "\n".join(dash_app._inline_scripts)
+    script += f"""
+const ns = window.dash_clientside._dashprivate_clientside_funcs;
+const calls = {json.dumps([[functions[output], args] for output, args in calls])};
+console.log(JSON.stringify(calls.map(([name, args]) => ns[name](...args))));
+"""
+    result = subprocess.run(['node', '-e', script], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
 def test_update_plot_test(test_app):
     """Tests that the Dash app correctly handles requests to the /dash_test/"""
     client = test_app['dash_test']
@@ -65,6 +101,18 @@ def test_update_distributions_test(test_app):
     assert response.status_code == 405 # Returns a page error
 
 
+def test_distribution_drops_stale_edits():
+    """Tests that an edit older than the newest one seen from the same page is dropped"""
+    newer = {'client': 'page-a', 'seq': 5, 'data': []}
+    older = {'client': 'page-a', 'seq': 4, 'data': []}
+
+    assert dash_apps.record_edit(older)
+    assert dash_apps.record_edit(newer)
+    assert dash_apps.is_stale_edit(older)
+    assert not dash_apps.record_edit(older), "Older edits should not be worked out"
+    assert not dash_apps.is_stale_edit(newer)
+    assert dash_apps.record_edit({'client': None, 'seq': 0, 'data': []})
+
 # Regressions Tests    
 def test_regressions_add_row(test_app):
     """Tests adding a row to the regression data table."""
@@ -139,3 +187,90 @@ def test_create_dash_apps(test_app):
     # Check for 405 on unsupported methods
     response = test_app['dash_anova'].post('/dash_anova/')  # Simulate a POST to check 405
     assert response.status_code == 405, "Expected 405 Method Not Allowed for POST"
+
+def test_add_row_callbacks_run_in_browser(test_app):
+    """Test that every "Add Row" button is handled by a clientside callback."""
+    tables = {
+        'dash_ttest': ['ttest-data-table1.data', 'ttest-data-table2.data'],
+        'dash_ztest': ['data-table1.data', 'data-table2.data'],
+        'dash_anova': ['data-table1.data'],
+        'dash_regressions': ['linear-data-table.data'],
+    }
+    for name, outputs in tables.items():
+        response = test_app[name].get(f'/{name}/_dash-dependencies')
+        dependencies = {dependency['output']: dependency for dependency in response.get_json()}
+        for output in outputs:
+            assert dependencies[output]['clientside_function'], \
+                f"{output} on {name} should be updated in the browser"
+
+def test_table_sync_sends_changed_cells(test_app):
+    """Test that a table edit sends only the changed cells, and that a resend sends the table"""
+    rows = [{'X Values': 1, 'Population 1': 90}, {'X Values': 2, 'Population 1': 85}]
+    edited = [{'X Values': 1, 'Population 1': 90}, {'X Values': 2, 'Population 1': 99}]
+    # Columns that are not synced are not sent
+    edited_with_notes = [dict(row, Notes='checked') for row in edited]
+    edit = 'ttest-data-table1-token-edit.data'
+    dependencies = test_app['dash_ttest'].get('/dash_ttest/_dash-dependencies').get_json()
+    resend = next(first_output(dependency) for dependency in dependencies
+                  if first_output(dependency).startswith(edit + '@'))
+
+    first, second, unchanged, again = run_clientside('dash_ttest', [
+        (edit, [rows, None, None]), (edit, [edited, 'token', None]),
+        (edit, [edited_with_notes, 'token', None]), (resend, [1.0, edited_with_notes])])
+
+    assert first == [{'seq': 1, 'rows': rows}, None], "A table without a token should be sent whole"
+    assert second == [{'seq': 2, 'diffs': [{'changed': [[1, 'Population 1', 99]], 'appended': [],
+                                            'removed': 0, 'previous_rows': 2}]}, None]
+    assert unchanged == [None, None], "Nothing should be sent if no synced cell changed"
+    assert again == [{'seq': 3, 'rows': edited}, None]
+
+def test_add_row_stays_in_the_page(test_app):
+    """Test that Add Row sends nothing, and that the added row goes with the next edit"""
+    rows = [{'X Values': 1, 'Population 1': 90}]
+    added = rows + [{'X Values': 2, 'Population 1': 80}]
+    edited = [{'X Values': 1, 'Population 1': 95}, {'X Values': 2, 'Population 1': 80}]
+    pending = {'changed': [], 'appended': [{'X Values': 2, 'Population 1': 80}],
+               'removed': 0, 'previous_rows': 1}
+    table = 'ttest-data-table1.data'
+    edit = 'ttest-data-table1-token-edit.data'
+
+    new_rows, on_add, on_edit = run_clientside('dash_ttest', [
+        (edit, [rows, None, None]), (table, [1, rows]), (edit, [added, 'token', None]),
+        (edit, [edited, 'token', pending])])[1:]
+
+    assert len(new_rows) == 2, "Add Row should add a row in the page"
+    assert on_add == [None, pending], "Add Row should not send anything to the server"
+    assert on_edit == [{'seq': 2, 'diffs': [pending, {
+        'changed': [[0, 'Population 1', 95]], 'appended': [], 'removed': 0,
+        'previous_rows': 2}]}, None], "The added row should be sent with the next edit"
+
+def test_add_row_leaves_server_store(test_app):
+    """Test that the server's copy only gets the added row when a statistic is asked for"""
+    token = datastore.STORE.put({'Population 1': [90.0]}, source=datastore.TABLE_SOURCE)
+    pending = {'changed': [], 'appended': [{'X Values': 2, 'Population 1': 80}],
+               'removed': 0, 'previous_rows': 1}
+    assert datastore.STORE.get_column(token, 'Population 1').tolist() == [90.0]
+
+    assert dash_apps.flush_tables((token, pending)) == [None, dash.no_update]
+    assert datastore.STORE.get_column(token, 'Population 1').tolist() == [90.0, 80.0]
+    assert dash_apps.flush_tables(('evicted', pending))[1] > 0, \
+        "A table the server lost should be asked for again"
+
+def test_table_sync_asks_for_missing_table(test_app):
+    """Test that an edit to a table the server no longer has asks the page to send it again"""
+    client = test_app['dash_ttest']
+    edit = {'seq': 2, 'diffs': [{'changed': [[0, 'Population 1', 5]], 'appended': [],
+                                 'removed': 0, 'previous_rows': 1}]}
+    response = client.post('/dash_ttest/_dash-update-component', json={
+        'output': '..ttest-data-table1-token.data...ttest-data-table1-token-resend.data..',
+        'outputs': [{'id': 'ttest-data-table1-token', 'property': 'data'},
+                    {'id': 'ttest-data-table1-token-resend', 'property': 'data'}],
+        'inputs': [{'id': 'ttest-data-table1-token-edit', 'property': 'data', 'value': edit}],
+        'state': [{'id': 'ttest-data-table1-token', 'property': 'data', 'value': 'evicted'}],
+        'changedPropIds': ['ttest-data-table1-token-edit.data'],
+    })
+    result = response.get_json()['response']
+    assert 'ttest-data-table1-token' not in result, "The token should be left as it is"
+    assert result['ttest-data-table1-token-resend']['data'] > 0
+
+    assert not datastore.STORE.sync_edit('evicted', edit, ['Population 1'])
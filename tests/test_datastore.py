@@ -0,0 +1,191 @@
+"""This module tests the datastore module."""
+
+import pytest
+import numpy as np
+import datastore
+
+
+class TestRecordsToColumns:
+    """Tests for the records_to_columns function."""
+
+    def test_records_to_columns_numeric(self):
+        """Test that numeric and non-numeric cells are converted correctly."""
+        records = [{'X Values': 1, 'Population 1': 10},
+                   {'X Values': 2, 'Population 1': 'abc'},
+                   {'X Values': 3}]
+
+        columns = datastore.records_to_columns(records, ['X Values', 'Population 1'])
+
+        assert columns['X Values'].tolist() == [1.0, 2.0, 3.0]
+        assert columns['Population 1'][0] == 10.0
+        assert np.isnan(columns['Population 1'][1]), "Non-numeric cells should become NaN"
+        assert np.isnan(columns['Population 1'][2]), "Missing cells should become NaN"
+
+    def test_records_to_columns_empty(self):
+        """Test that an empty table gives empty columns."""
+        columns = datastore.records_to_columns([], ['Values'])
+        assert len(columns['Values']) == 0
+
+
+class TestTableDiff:
+    """Tests for the table_diff function."""
+
+    def test_table_diff_changed_and_appended(self):
+        """Test that edited cells and appended rows are found."""
+        previous = [{'X Values': 1, 'Y Values': 3}, {'X Values': 2, 'Y Values': 5}]
+        current = [{'X Values': 1, 'Y Values': 3}, {'X Values': 2, 'Y Values': 8},
+                   {'X Values': 3, 'Y Values': 0}]
+
+        diff = datastore.table_diff(current, previous)
+
+        assert diff['changed'] == [(1, 'Y Values', 8)]
+        assert diff['appended'] == [{'X Values': 3, 'Y Values': 0}]
+        assert diff['removed'] == 0
+        assert diff['previous_rows'] == 2
+
+    def test_table_diff_removed(self):
+        """Test that rows dropped from the end are counted."""
+        previous = [{'Values': 1}, {'Values': 2}, {'Values': 3}]
+        diff = datastore.table_diff(previous[:1], previous)
+        assert diff['removed'] == 2
+        assert diff['changed'] == []
+
+
+class TestDatasetStore:
+    """Tests for the DatasetStore class."""
+
+    def test_put_and_get(self):
+        """Test that a stored dataset can be read back by token."""
+        store = datastore.DatasetStore()
+        token = store.put({'Values': [1, 2, 3]})
+
+        assert token in store
+        assert store.get_column(token, 'Values').tolist() == [1.0, 2.0, 3.0]
+        assert store.get('missing-token') is None
+
+    def test_lru_eviction_by_entries(self):
+        """Test that the least recently used dataset is evicted first."""
+        store = datastore.DatasetStore(max_entries=2)
+        first = store.put({'Values': [1]})
+        second = store.put({'Values': [2]})
+        store.get(first)  # first is now the most recently used
+        third = store.put({'Values': [3]})
+
+        assert first in store
+        assert second not in store, "The least recently used dataset should be evicted"
+        assert third in store
+
+    def test_eviction_by_bytes(self):
+        """Test that datasets are evicted to stay within the byte budget."""
+        store = datastore.DatasetStore(max_bytes=8 * 150)
+        first = store.put({'Values': np.zeros(100)})
+        second = store.put({'Values': np.zeros(100)})
+
+        assert first not in store
+        assert second in store
+        assert store.nbytes == 800
+
+    def test_put_too_large(self):
+        """Test that a dataset larger than the whole budget is rejected."""
+        store = datastore.DatasetStore(max_bytes=80)
+        with pytest.raises(ValueError):
+            store.put({'Values': np.zeros(100)})
+
+    def test_sync_table_applies_edits(self):
+        """Test that table edits are applied to the stored copy."""
+        store = datastore.DatasetStore()
+        data = [{'X Values': 1, 'Y Values': 3}, {'X Values': 2, 'Y Values': 5}]
+        token = store.sync_table(None, data, None, ['X Values', 'Y Values'])
+
+        edited = [{'X Values': 1, 'Y Values': 4}, {'X Values': 2, 'Y Values': 5},
+                  {'X Values': 3, 'Y Values': 'x'}]
+        assert store.sync_table(token, edited, data, ['X Values', 'Y Values']) == token
+
+        y_values = store.get_column(token, 'Y Values')
+        assert y_values[:2].tolist() == [4.0, 5.0]
+        assert np.isnan(y_values[2])
+        assert store.nbytes == 2 * 3 * 8
+
+    def test_sync_table_reloads_evicted_dataset(self):
+        """Test that a table is fully reloaded if its dataset was evicted."""
+        store = datastore.DatasetStore()
+        data = [{'Values': 1}, {'Values': 2}]
+        token = store.sync_table(None, data, None, ['Values'])
+        store.discard(token)
+
+        edited = [{'Values': 1}, {'Values': 7}]
+        assert store.sync_table(token, edited, data, ['Values']) == token
+        assert store.get_column(token, 'Values').tolist() == [1.0, 7.0]
+
+    def test_sync_table_reloads_uploaded_dataset(self):
+        """Test that a table edit after an upload with the same row count reloads the table."""
+        store = datastore.DatasetStore()
+        data = [{'X Values': 1, 'Population 1': 3}, {'X Values': 2, 'Population 1': 5}]
+        token = store.sync_table(None, data, None, ['X Values', 'Population 1'])
+        store.put({'Population 1': [10.0, 20.0]}, token=token)
+
+        edited = [{'X Values': 1, 'Population 1': 4}, {'X Values': 2, 'Population 1': 5}]
+        assert store.sync_table(token, edited, data, ['X Values', 'Population 1']) == token
+
+        assert store.get_column(token, 'X Values').tolist() == [1.0, 2.0], \
+            "The table should replace the uploaded columns"
+        assert store.get_column(token, 'Population 1').tolist() == [4.0, 5.0]
+
+    def test_sync_edit_applies_page_diffs(self):
+        """Test that edits worked out by the page are applied, and stale tokens are refused."""
+        store = datastore.DatasetStore()
+        rows = [{'Values': 1}, {'Values': 2}]
+        token = store.sync_edit(None, {'rows': rows}, ['Values'])
+        diffs = [{'changed': [[0, 'Values', '4']], 'appended': [], 'removed': 0,
+                  'previous_rows': 2},
+                 {'changed': [], 'appended': [{'Values': 6}], 'removed': 0, 'previous_rows': 2}]
+
+        assert store.sync_edit(token, {'diffs': diffs}, ['Values']) == token
+        assert store.get_column(token, 'Values').tolist() == [4.0, 2.0, 6.0]
+        assert store.sync_edit('unknown', {'diffs': diffs}, ['Values']) is None
+        assert store.sync_edit(None, {'diffs': diffs}, ['Values']) is None
+        assert store.sync_edit(token, {'diffs': diffs[:1]}, ['Values']) is None, \
+            "An edit to a table of another size should ask for the whole table"
+
+    def test_sync_table_updates_moments(self):
+        """Test that the running moments follow the table edits."""
+        store = datastore.DatasetStore()
+        data = [{'Values': 1}, {'Values': 2}, {'Values': 3}]
+        token = store.sync_table(None, data, None, ['Values'], fill_value=0.0)
+
+        edited = [{'Values': 1}, {'Values': 'abc'}, {'Values': 3}, {'Values': 8}]
+        store.sync_table(token, edited, data, ['Values'])
+        moments = store.get_moments(token, 'Values')
+
+        assert moments.count == 4
+        assert moments.mean == pytest.approx(np.mean([1, 0, 3, 8]))
+        assert moments.variance == pytest.approx(np.var([1, 0, 3, 8], ddof=1))
+
+    def test_update_columns_writes_changed_cells(self):
+        """Test that new column values update the moments and histogram of the stored copy."""
+        store = datastore.DatasetStore()
+        token = store.update_columns(None, {'Values': [1.0, 2.0, 3.0, 4.0]})
+        edges = np.array([0.0, 2.5, 5.0, 7.5])
+        assert store.get_histogram(token, 'Values', edges).tolist() == [2, 2, 0]
+
+        assert store.update_columns(token, {'Values': [1.0, 7.0, 3.0, 4.0, 6.0]}) == token
+        moments = store.get_moments(token, 'Values')
+
+        assert store.get_column(token, 'Values').tolist() == [1.0, 7.0, 3.0, 4.0, 6.0]
+        assert moments.count == 5
+        assert moments.mean == pytest.approx(np.mean([1, 7, 3, 4, 6]))
+        assert store.get_histogram(token, 'Values', edges).tolist() == [1, 2, 2]
+
+    def test_histogram_follows_table_edits(self):
+        """Test that a kept histogram is updated by table edits and rebuilt for new edges."""
+        store = datastore.DatasetStore()
+        data = [{'Values': 1}, {'Values': 2}, {'Values': 3}]
+        token = store.sync_table(None, data, None, ['Values'])
+        store.get_histogram(token, 'Values', np.array([0.0, 2.0, 4.0]))
+
+        edited = [{'Values': 3}, {'Values': 2}]
+        store.sync_table(token, edited, data, ['Values'])
+
+        assert store.get_histogram(token, 'Values', np.array([0.0, 2.0, 4.0])).tolist() == [0, 2]
+        assert store.get_histogram(token, 'Values', np.array([0.0, 1.0, 4.0])).tolist() == [0, 2]
+        assert store.get_histogram('missing', 'Values', np.array([0.0, 1.0])) is None
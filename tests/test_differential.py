@@ -0,0 +1,234 @@
+"""This module tests the differential module."""
+
+import os
+import threading
+import time
+import pytest
+import numpy as np
+import pandas as pd
+from scipy import stats
+from statsmodels.stats.multitest import multipletests
+from statsmodels.stats.weightstats import ztest
+import differential
+
+
+@pytest.fixture
+def matrix():
+    """A 400-feature matrix of 6 control and 5 treated samples, 40 of them shifted."""
+    rng = np.random.default_rng(1)
+    control, treated = rng.normal(size=(400, 6)), rng.normal(size=(400, 5))
+    treated[:40] += 3
+    control[7, 2] = np.nan
+    return control, treated
+
+
+def write_tsv(path, control, treated):
+    """Writes the matrix as a tab-separated file with feature ids and sample names."""
+    columns = ([f'control_{index}' for index in range(control.shape[1])]
+               + [f'treated_{index}' for index in range(treated.shape[1])])
+    frame = pd.DataFrame(np.hstack([control, treated]), columns=columns,
+                         index=[f'gene{index}' for index in range(len(control))])
+    frame.to_csv(path, sep='\t')
+
+
+class TestPipeline:
+    """Tests for the two passes of the pipeline."""
+
+    def test_welch_matches_scipy_and_statsmodels(self, tmp_path, matrix):
+        """Test that the p-values and both corrections match scipy and statsmodels."""
+        control, treated = matrix
+        write_tsv(tmp_path / 'matrix.tsv', control, treated)
+        # A small budget so the matrix is read in many blocks
+        output, summary = differential.run_pipeline(
+            str(tmp_path / 'matrix.tsv'), 'control_*', 'treated_*',
+            output=str(tmp_path / 'results'), memory_budget=11 * differential.BYTES_PER_CELL * 30)
+
+        expected = stats.ttest_ind(control, treated, axis=1, equal_var=False,
+                                   nan_policy='omit').pvalue
+        p_values = 10 ** -differential.load_array(output, 'neg_log10_p').astype(float)
+        bh = 10 ** -differential.load_array(output, 'neg_log10_bh').astype(float)
+        bonferroni = 10 ** -differential.load_array(output, 'neg_log10_bonferroni').astype(float)
+
+        assert summary['features'] == summary['tests'] == 400
+        assert np.allclose(p_values, expected, rtol=1e-5)
+        expected_bh = multipletests(expected, method='fdr_bh')[1]
+        assert np.allclose(bh, expected_bh, rtol=1e-5)
+        assert np.allclose(bonferroni, multipletests(expected, method='bonferroni')[1], rtol=1e-5)
+        assert summary['significant']['bh'] == int((expected_bh < 0.05).sum())
+        assert np.allclose(differential.load_array(output, 'difference'),
+                           np.nanmean(control, axis=1) - treated.mean(axis=1), atol=1e-5)
+
+    def test_ztest_from_npy_matches_statsmodels(self, tmp_path, matrix):
+        """Test the z-test of a .npy matrix, with samples chosen by position."""
+        control, treated = matrix
+        control = np.nan_to_num(control)
+        np.save(tmp_path / 'matrix.npy', np.hstack([control, treated]))
+
+        output, summary = differential.run_pipeline(
+            str(tmp_path / 'matrix.npy'), '0,1,2,3,4,5', '[6-9],10', test='ztest',
+            output=str(tmp_path / 'results'))
+
+        expected = [ztest(control[row], treated[row])[1] for row in range(0, 400, 37)]
+        p_values = 10 ** -differential.load_array(output, 'neg_log10_p').astype(float)
+        assert np.allclose(p_values[::37], expected, rtol=1e-5)
+        assert summary['group2'] == ['6', '7', '8', '9', '10']
+        assert differential.read_features(output, [3, 1]) == ['3', '1']
+
+    def test_group_columns_in_any_file_order(self, tmp_path, matrix):
+        """Test that a text file with group 2 columns before group 1 gives the same results as .npy."""
+        control, treated = matrix
+        control = np.nan_to_num(control)
+        columns = ([f'treated_{index}' for index in range(treated.shape[1])]
+                   + [f'control_{index}' for index in range(control.shape[1])])
+        pd.DataFrame(np.hstack([treated, control]), columns=columns).to_csv(
+            tmp_path / 'matrix.tsv', sep='\t')
+        np.save(tmp_path / 'matrix.npy', np.hstack([treated, control]))
+
+        text_output, _ = differential.run_pipeline(
+            str(tmp_path / 'matrix.tsv'), 'control_*', 'treated_*',
+            output=str(tmp_path / 'text'))
+        npy_output, _ = differential.run_pipeline(
+            str(tmp_path / 'matrix.npy'), '[5-9],10', '[0-4]', output=str(tmp_path / 'npy'))
+
+        difference = differential.load_array(text_output, 'difference')
+        assert np.allclose(difference, control.mean(axis=1) - treated.mean(axis=1), atol=1e-5)
+        assert np.allclose(differential.load_array(npy_output, 'difference'), difference)
+
+    def test_adjust_p_values_below_smallest_double(self, tmp_path):
+        """Test that BH values stay exact for p-values too small for a double."""
+        scores = np.array([0.5, 400.0, np.nan, 2.0, 350.0, 2.0], dtype='<f4')
+        scores.tofile(tmp_path / 'neg_log10_p.f4')
+        differential._write_summary(str(tmp_path), {})
+
+        summary = differential.adjust_p_values(str(tmp_path), chunk_rows=4)
+        bh = differential.load_array(str(tmp_path), 'neg_log10_bh')
+
+        # Five tests, ranked from the smallest p-value
+        expected = [0.5, 400 - np.log10(5), np.nan, 2 - np.log10(5 / 4),
+                    350 - np.log10(5 / 2), 2 - np.log10(5 / 4)]
+        assert np.allclose(bh, expected, equal_nan=True), \
+            "-log10 BH values should not be capped at the smallest double"
+        assert summary['tests'] == 5
+        assert summary['significant']['bh'] == 4
+
+    def test_results_directory_depends_on_options(self, tmp_path, matrix):
+        """Test that the results directory depends on the file and the options."""
+        write_tsv(tmp_path / 'matrix.tsv', *matrix)
+        path = str(tmp_path / 'matrix.tsv')
+
+        first = differential.results_directory(path, 'control_*', 'treated_*', 'welch',
+                                               root=str(tmp_path))
+        again = differential.results_directory(path, 'control_*', 'treated_*', 'welch',
+                                               root=str(tmp_path))
+        other_test = differential.results_directory(path, 'control_*', 'treated_*', 'ztest',
+                                                    root=str(tmp_path))
+
+        assert first == again
+        assert first != other_test
+
+    def test_volcano_points(self, tmp_path, matrix):
+        """Test that significant features are kept and the rest are thinned."""
+        write_tsv(tmp_path / 'matrix.tsv', *matrix)
+        output, summary = differential.run_pipeline(
+            str(tmp_path / 'matrix.tsv'), 'control_*', 'treated_*',
+            output=str(tmp_path / 'results'))
+
+        points = differential.volcano_points(output, max_points=100, top=3)
+
+        assert points['significant'].sum() == summary['significant']['bh']
+        assert len(points['index']) <= 100
+        assert len(points['top']) == 3
+        scores = differential.load_array(output, 'neg_log10_p')
+        assert points['top'][0][2] == pytest.approx(float(np.nanmax(scores)))
+        assert points['id'][0] == f"gene{points['index'][0]}"
+
+    def test_invalid_groups(self, tmp_path, matrix):
+        """Test that unknown or overlapping samples and unknown tests raise errors."""
+        write_tsv(tmp_path / 'matrix.tsv', *matrix)
+        path, output = str(tmp_path / 'matrix.tsv'), str(tmp_path / 'results')
+
+        with pytest.raises(ValueError):
+            differential.score_matrix(path, 'control_*', 'missing_*', output)
+        with pytest.raises(ValueError):
+            differential.score_matrix(path, 'control_*', 'control_1,treated_*', output)
+        with pytest.raises(ValueError):
+            differential.score_matrix(path, 'control_*', 'treated_*', output, test='anova')
+        assert not (tmp_path / 'results').exists()
+
+    def test_concurrent_runs_share_results(self, tmp_path, matrix):
+        """Test that runs writing the same results directory at once all succeed."""
+        write_tsv(tmp_path / 'matrix.tsv', *matrix)
+        output = str(tmp_path / 'results')
+        summaries, errors = [], []
+
+        def run():
+            try:
+                summaries.append(differential.run_pipeline(
+                    str(tmp_path / 'matrix.tsv'), 'control_*', 'treated_*', output=output)[1])
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert all(summary == summaries[0] for summary in summaries)
+        assert sorted(os.listdir(tmp_path)) == ['matrix.tsv', 'results'], \
+            "No staging directories should be left behind"
+
+    def test_replace_directory_keeps_finished_results(self, tmp_path):
+        """Test that results put in place by another process are kept, not mixed."""
+        staging, output = tmp_path / 'staging', tmp_path / 'results'
+        staging.mkdir()
+        (staging / 'summary.json').write_text('{"run": 1}')
+        differential._replace_directory(str(staging), str(output))
+        assert (output / 'summary.json').read_text() == '{"run": 1}'
+
+        staging.mkdir()
+        (staging / 'summary.json').write_text('{"run": 2}')
+        differential._replace_directory(str(staging), str(output))
+        assert (output / 'summary.json').read_text() == '{"run": 2}'
+        assert sorted(os.listdir(tmp_path)) == ['results']
+
+
+class TestPipelineJobs:
+    """Tests for the background runs of the pipeline."""
+
+    @staticmethod
+    def wait(jobs, job_id):
+        """Waits for a job to finish and returns its state."""
+        deadline = time.monotonic() + 30
+        while not jobs.get(job_id)['done']:
+            assert time.monotonic() < deadline, "The job did not finish"
+            time.sleep(0.01)
+        return jobs.get(job_id)
+
+    def test_job_runs_in_background(self, tmp_path, matrix):
+        """Test that a job reports the features tested and the summary once done."""
+        write_tsv(tmp_path / 'matrix.tsv', *matrix)
+        jobs = differential.PipelineJobs(root=str(tmp_path / 'results'))
+
+        job_id = jobs.start(str(tmp_path / 'matrix.tsv'), 'control_*', 'treated_*')
+        job = self.wait(jobs, job_id)
+
+        assert job['error'] is None
+        assert job['rows'] == job['summary']['features'] == 400
+        assert job['source'] == 'matrix.tsv'
+        assert differential.read_summary(job['output']) == job['summary']
+        assert jobs.get('unknown') is None
+
+    def test_job_errors_are_reported(self, tmp_path, matrix):
+        """Test that bad groups and unparsable files end the job with a message."""
+        write_tsv(tmp_path / 'matrix.tsv', *matrix)
+        (tmp_path / 'broken.csv').write_bytes(b'id,a,b\n"x,1,2\n')
+        jobs = differential.PipelineJobs(root=str(tmp_path / 'results'))
+
+        job = self.wait(jobs, jobs.start(str(tmp_path / 'matrix.tsv'), 'control_*', 'missing_*'))
+        assert 'missing_*' in job['error']
+        job = self.wait(jobs, jobs.start(str(tmp_path / 'broken.csv'), 'a', 'b'))
+        assert job['error'] and job['summary'] is None
+        with pytest.raises(OSError):
+            jobs.start(str(tmp_path / 'absent.tsv'), 'a', 'b')
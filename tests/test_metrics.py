@@ -0,0 +1,162 @@
+"""This module tests the metrics module."""
+
+import json
+import os
+import pytest
+from flask import Flask, request
+import metrics
+
+
+@pytest.fixture
+def registry():
+    """A registry of its own for each test."""
+    return metrics.MetricsRegistry()
+
+
+@pytest.fixture
+def client(registry):
+    """A test client for a small instrumented Flask app."""
+    server = Flask(__name__)
+
+    @server.route('/echo', methods=['POST'])
+    def echo():
+        return request.get_data()
+
+    @server.route('/fail')
+    def fail():
+        raise RuntimeError("failed on purpose")
+
+    metrics.instrument_flask(server, registry)
+    with server.test_client() as test_client:
+        yield test_client
+
+
+class TestHistogram:
+    """Tests for the Histogram class."""
+
+    def test_values_land_in_cumulative_buckets(self):
+        """Test that values are counted in the right buckets."""
+        histogram = metrics.Histogram((1.0, 5.0))
+        for value in (0.5, 1.0, 3.0, 10.0):
+            histogram.observe(value)
+
+        buckets, total, count = histogram.snapshot()
+        assert buckets == [('1.0', 2), ('5.0', 3), ('+Inf', 4)]
+        assert total == 14.5
+        assert count == 4
+
+
+class TestInstrumentFlask:
+    """Tests for the request hooks."""
+
+    def test_route_is_recorded(self, client, registry):
+        """Test that a request's latency and payload sizes are recorded."""
+        client.post('/echo', data=b'x' * 300)
+
+        snapshot = registry.series('route', route='/echo').snapshot()
+        assert snapshot['duration_seconds'][2] == 1
+        assert snapshot['request_bytes'][1] == 300
+        assert snapshot['response_bytes'][1] == 300
+        assert snapshot['errors'] == 0
+        assert snapshot['in_flight'] == 0, "Finished requests should not stay in flight"
+
+    def test_errors_are_counted(self, client, registry):
+        """Test that failing requests are counted as errors."""
+        assert client.get('/fail').status_code == 500
+
+        snapshot = registry.series('route', route='/fail').snapshot()
+        assert snapshot['errors'] == 1
+        assert snapshot['in_flight'] == 0
+
+    def test_unmatched_requests_share_a_series(self, client, registry):
+        """Test that 404s do not make a series per path."""
+        client.get('/missing-1')
+        client.get('/missing-2')
+        snapshot = registry.series('route', route=metrics.UNMATCHED_ROUTE).snapshot()
+        assert snapshot['duration_seconds'][2] == 2
+
+
+class TestRender:
+    """Tests for the Prometheus text output."""
+
+    def test_render_prometheus_text(self, client, registry):
+        """Test that the output has the histogram, counter and gauge lines."""
+        client.post('/echo', data=b'abc')
+        text = registry.render()
+
+        assert '# TYPE statsapp_route_duration_seconds histogram' in text
+        assert 'statsapp_route_duration_seconds_bucket{route="/echo",le="+Inf"} 1' in text
+        assert 'statsapp_route_request_bytes_sum{route="/echo"} 3' in text
+        assert 'statsapp_route_errors_total{route="/echo"} 0' in text
+        assert '# TYPE statsapp_route_in_flight gauge' in text
+
+    def test_label_values_are_escaped(self, registry):
+        """Test that quotes in label values cannot break the format."""
+        registry.series('callback', output='a"b')
+        assert 'output="a\\"b"' in registry.render()
+
+
+class TestWorkerSnapshots:
+    """Tests for adding up the metrics of several worker processes."""
+
+    def test_render_adds_up_workers(self, tmp_path):
+        """Test that the snapshots of other workers are added to this process's numbers."""
+        worker = metrics.MetricsRegistry(directory=str(tmp_path))
+        worker.series('route', route='/a').observe(0.002, 10, 20, False)
+        worker.series('route', route='/a').observe(0.002, 10, 20, True)
+        worker.write_snapshot()
+        # Pretend the file came from another, still running, worker
+        os.replace(tmp_path / f'{os.getpid()}.json', tmp_path / f'{os.getppid()}.json')
+
+        local = metrics.MetricsRegistry(directory=str(tmp_path))
+        local.series('route', route='/a').observe(0.002, 10, 20, False)
+        text = local.render()
+
+        assert 'statsapp_route_duration_seconds_count{route="/a"} 3' in text
+        assert 'statsapp_route_errors_total{route="/a"} 1' in text
+        assert 'statsapp_route_request_bytes_sum{route="/a"} 30' in text
+
+    def test_exited_workers_keep_counts_but_not_in_flight(self, tmp_path):
+        """Test that a dead worker's counts are kept and its in-flight gauge is dropped."""
+        snapshot = metrics.MetricsRegistry()
+        series = snapshot.series('route', route='/a')
+        series.start()
+        series.observe(0.002, 10, 20, True)
+        # No process has this id (above the largest pid Linux allows)
+        with open(tmp_path / '99999999.json', 'w', encoding='utf-8') as handle:
+            json.dump(snapshot.snapshot(), handle)
+
+        text = metrics.MetricsRegistry(directory=str(tmp_path)).render()
+
+        assert 'statsapp_route_errors_total{route="/a"} 1' in text
+        assert 'statsapp_route_in_flight{route="/a"} 0' in text
+
+class TestInstrumentDash:
+    """Tests for recording Dash callbacks."""
+
+    def test_callback_is_named(self, registry):
+        """Test that a callback request is recorded under its function name."""
+        import dash
+        from dash import html
+        from dash.dependencies import Input, Output
+
+        dash_app = dash.Dash(__name__, server=Flask(__name__), url_base_pathname='/dash_demo/')
+        dash_app.layout = html.Div([html.Button(id='button'), html.Div(id='label')])
+
+        @dash_app.callback(Output('label', 'children'), Input('button', 'n_clicks'))
+        def show_clicks(n_clicks):
+            return str(n_clicks)
+
+        metrics.instrument_dash(dash_app, registry)
+        response = dash_app.server.test_client().post('/dash_demo/_dash-update-component', json={
+            'output': 'label.children',
+            'outputs': {'id': 'label', 'property': 'children'},
+            'inputs': [{'id': 'button', 'property': 'n_clicks', 'value': 2}],
+            'changedPropIds': ['button.n_clicks'],
+        })
+
+        assert response.status_code == 200
+        snapshot = registry.series('callback', app='dash_demo', callback='show_clicks',
+                                   output='label.children').snapshot()
+        assert snapshot['duration_seconds'][2] == 1
+        assert snapshot['response_bytes'][1] == len(response.data)
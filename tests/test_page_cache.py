@@ -0,0 +1,71 @@
+"""This module tests the page_cache module."""
+
+import dash
+from dash import html
+from flask import Flask
+import page_cache
+
+
+class TestPageCache:
+    """Tests for the PageCache class."""
+
+    def test_page_is_rendered_once(self):
+        """Test that a page is only rendered the first time."""
+        cache = page_cache.PageCache()
+        calls = []
+
+        def render():
+            calls.append(1)
+            return '<p>Hello</p>'
+
+        first = cache.get_or_render('hello', render)
+        second = cache.get_or_render('hello', render)
+
+        assert first is second
+        assert len(calls) == 1
+        assert first.body == b'<p>Hello</p>'
+
+    def test_response_and_not_modified(self):
+        """Test that a request with the page's ETag gets an empty 304."""
+        page = page_cache.CachedPage(b'<p>Hello</p>', 'text/html')
+        server = Flask(__name__)
+
+        with server.test_request_context('/'):
+            response = page.response()
+            assert response.status_code == 200
+            assert response.get_etag() == (page.etag, False)
+
+        with server.test_request_context('/', headers={'If-None-Match': f'"{page.etag}"'}):
+            assert page.response().status_code == 304
+
+
+class TestCacheDashResponses:
+    """Tests for caching the Dash layout and callback list."""
+
+    def test_layout_is_serialized_once(self):
+        """Test that later layout requests reuse the first response."""
+        dash_app = dash.Dash(__name__, server=Flask(__name__), url_base_pathname='/dash_demo/')
+        dash_app.layout = html.Div('First layout')
+        page_cache.cache_dash_responses(dash_app)
+        client = dash_app.server.test_client()
+
+        first = client.get('/dash_demo/_dash-layout')
+        dash_app.layout = html.Div('Second layout')  # Not seen: the first response is kept
+        second = client.get('/dash_demo/_dash-layout')
+
+        assert first.data == second.data
+        assert b'First layout' in second.data
+        assert client.get('/dash_demo/_dash-layout', headers={
+            'If-None-Match': first.headers['ETag']}).status_code == 304
+        assert client.get('/dash_demo/_dash-dependencies').status_code == 200
+
+    def test_layout_function_is_not_cached(self):
+        """Test that a layout made by a function is still made per request."""
+        dash_app = dash.Dash(__name__, server=Flask(__name__), url_base_pathname='/dash_demo/')
+        counter = iter(range(100))
+        dash_app.layout = lambda: html.Div(f'Visit {next(counter)}')
+        page_cache.cache_dash_responses(dash_app)
+        client = dash_app.server.test_client()
+
+        assert client.get('/dash_demo/_dash-layout').data != \
+            client.get('/dash_demo/_dash-layout').data
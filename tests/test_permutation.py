@@ -0,0 +1,123 @@
+"""This module tests the permutation module."""
+
+import pytest
+import numpy as np
+from scipy import stats
+import parallel
+import permutation
+
+
+class TestPermutationTest:
+    """Tests for the permutation_test function."""
+
+    def test_exact_two_sample_matches_scipy(self):
+        """Test that small samples are tested over every split, as scipy does."""
+        values1, values2 = [1.0, 2.0, 3.0, 4.0], [5.0, 6.0, 7.5, 8.0]
+        expected = stats.permutation_test(
+            (values1, values2), lambda x, y: np.mean(x) - np.mean(y),
+            permutation_type='independent').pvalue
+
+        observed, p_value = permutation.two_sample_test(values1, values2, statistic='mean_diff')
+
+        assert observed == pytest.approx(np.mean(values1) - np.mean(values2))
+        assert p_value == pytest.approx(expected), "Exact p-value should match scipy"
+
+    def test_observed_statistics_match_scipy(self):
+        """Test that the observed Welch t and F statistics match scipy's."""
+        rng = np.random.default_rng(3)
+        groups = [rng.normal(0, 1, 40), rng.normal(0.5, 2, 55), rng.normal(0.2, 1, 30)]
+
+        t_stat, _ = permutation.two_sample_test(groups[0], groups[1], permutations=100)
+        f_stat, _ = permutation.anova_test(*groups, permutations=100)
+
+        assert t_stat == pytest.approx(stats.ttest_ind(groups[0], groups[1],
+                                                       equal_var=False).statistic)
+        assert f_stat == pytest.approx(stats.f_oneway(*groups).statistic)
+
+    def test_p_value_close_to_parametric(self):
+        """Test that the permutation p-value of normal data is close to the t-test's."""
+        rng = np.random.default_rng(5)
+        values1, values2 = rng.normal(0, 1, 200), rng.normal(0.2, 1, 200)
+
+        _, p_value = permutation.two_sample_test(values1, values2, permutations=20000)
+
+        expected = stats.ttest_ind(values1, values2, equal_var=False).pvalue
+        assert p_value == pytest.approx(expected, abs=0.01)
+
+    def test_anova_p_value_close_to_parametric(self):
+        """Test that the ANOVA permutation p-value is close to the F-test's."""
+        rng = np.random.default_rng(6)
+        groups = [rng.normal(mean, 1, 60) for mean in (0.0, 0.2, 0.35)]
+
+        _, p_value = permutation.anova_test(*groups, permutations=20000)
+
+        assert p_value == pytest.approx(stats.f_oneway(*groups).pvalue, abs=0.01)
+
+    def test_deterministic_and_independent_of_blocks_per_worker(self):
+        """Test that the same seed gives the same p-value, however the blocks are run."""
+        rng = np.random.default_rng(7)
+        values1, values2 = rng.normal(0, 1, 300), rng.normal(0.15, 1, 300)
+        options = {'permutations': 5000, 'memory_budget': 600 * 24 * 500}
+
+        first = permutation.two_sample_test(values1, values2, **options)
+        again = permutation.two_sample_test(values1, values2, **options)
+        other_seed = permutation.two_sample_test(values1, values2, seed=1, **options)
+
+        assert permutation.block_rows(600, options['memory_budget']) == 500
+        assert first == again, "The same seed should give the same p-value"
+        assert first[1] != other_seed[1], "Another seed should draw other resamples"
+
+    def test_process_pool_matches_single_process(self):
+        """Test that spreading the blocks over worker processes gives the same p-value."""
+        rng = np.random.default_rng(8)
+        values1, values2 = rng.normal(0, 1, 300), rng.normal(0.15, 1, 300)
+        options = {'permutations': 4000, 'memory_budget': 600 * 24 * 500}
+        try:
+            pooled = permutation.two_sample_test(values1, values2, workers=2, **options)
+        finally:
+            parallel.shutdown_pool()
+
+        assert pooled == permutation.two_sample_test(values1, values2, workers=1, **options)
+
+    def test_one_sided_alternatives(self):
+        """Test that the one-sided p-values point the right way."""
+        values1, values2 = np.arange(10.0), np.arange(10.0) + 4
+
+        _, less = permutation.two_sample_test(values1, values2, alternative='less',
+                                              permutations=2000)
+        _, greater = permutation.two_sample_test(values1, values2, alternative='greater',
+                                                 permutations=2000)
+
+        assert less < 0.05, "Group 1 is smaller, so 'less' should be significant"
+        assert greater > 0.95, "'greater' should not be significant"
+
+    def test_identical_groups_give_nan(self):
+        """Test that constant data (no defined t-statistic) gives NaN."""
+        observed, p_value = permutation.two_sample_test([1.0, 1.0, 1.0], [1.0, 1.0, 1.0])
+
+        assert np.isnan(observed) and np.isnan(p_value)
+
+    def test_invalid_arguments(self):
+        """Test that unknown statistics, alternatives and too-small groups raise errors."""
+        with pytest.raises(ValueError):
+            permutation.permutation_test([[1, 2], [3, 4]], statistic='median')
+        with pytest.raises(ValueError):
+            permutation.two_sample_test([1, 2], [3, 4], alternative='sideways')
+        with pytest.raises(ValueError):
+            permutation.two_sample_test([1.0], [3.0, 4.0])
+        with pytest.raises(ValueError):
+            permutation.anova_test([1.0], [2.0])
+
+
+class TestWorkerCount:
+    """Tests for the worker_count function."""
+
+    def test_small_jobs_run_in_process(self, monkeypatch):
+        """Test that the worker count grows with the work, up to the limit."""
+        monkeypatch.setattr(parallel, 'RESAMPLE_WORKERS', 4)
+
+        assert parallel.worker_count(10_000, 50) == 1, "Small jobs should skip the pool"
+        assert parallel.worker_count(10_000, 300) == 3
+        assert parallel.worker_count(10_000, 100_000) == 4
+        assert parallel.worker_count(10_000, 100_000, workers=8) == 8
+        assert parallel.worker_count(0, 100) == 1
@@ -4,6 +4,7 @@ import pytest
 import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
+from scipy import stats
 import plots
 
 class TestGenerateTTestData:
@@ -109,6 +110,53 @@ class TestGenerateTTestPlot:
         assert "T-Statistic:" in t_test_result_text
         assert "P-Value:" in t_test_result_text
 
+    def test_generate_ttest_plot_numpy_columns(self):
+        """Test with numpy columns read from the dataset store."""
+        values1 = np.array([10.0, 15.0, np.nan, 17.0, 19.0])
+        values2 = np.array([12.0, 14.0, 11.0, 20.0, 18.0])
+
+        figure, t_test_result_text = plots.generate_ttest_plot(values1, values2)
+
+        # Ensure the NaN value is dropped and the test still runs
+        assert len(figure.data) == 2, "Figure should plot two datasets"
+        assert figure.data[0].median == (16.0,), "NaN values should be dropped"
+        assert "T-Statistic:" in t_test_result_text
+
+    def test_generate_ttest_plot_permutation_p_value(self):
+        """Test that a permutation p-value is reported when asked for."""
+        values1 = np.array([10.0, 15.0, 13.0, 17.0, 19.0, 14.0, 16.0])
+        values2 = np.array([12.0, 14.0, 11.0, 20.0, 18.0, 21.0, 22.0])
+
+        _, plain_text = plots.generate_ttest_plot(values1, values2)
+        _, text = plots.generate_ttest_plot(values1, values2, permutations=2000)
+
+        assert "Permutation" not in plain_text
+        assert text.startswith(plain_text), "The parametric result should be unchanged"
+        assert "Permutation P-Value:" in text
+
+    def test_generate_ttest_plot_bootstrap_interval(self):
+        """Test that a bootstrap interval for the mean difference is reported when asked for."""
+        values1 = np.array([10.0, 15.0, 13.0, 17.0, 19.0, 14.0, 16.0])
+        values2 = np.array([12.0, 14.0, 11.0, 20.0, 18.0, 21.0, 22.0])
+
+        _, text = plots.generate_ttest_plot(values1, values2, bootstrap_resamples=2000)
+
+        assert f"Mean Difference: {values1.mean() - values2.mean():.2f} (95% CI:" in text
+
+    def test_generate_ttest_plot_resampling_workers(self, monkeypatch):
+        """Test that large resampling jobs are spread over the configured worker processes."""
+        rng = np.random.default_rng(3)
+        values1, values2 = rng.normal(0, 1, 400), rng.normal(0.2, 1, 400)
+        used = []
+        map_blocks = plots.parallel.map_blocks
+        monkeypatch.setattr(plots.parallel, 'RESAMPLE_WORKERS', 3)
+        monkeypatch.setattr(plots.parallel, 'map_blocks', lambda function, args, blocks, workers:
+                            used.append(workers) or map_blocks(function, args, blocks, 1))
+
+        plots.generate_ttest_plot(values1, values2, permutations=2500, bootstrap_resamples=1000)
+
+        assert used == [2, 1], "2,000,000 cells should use two workers, 800,000 only one"
+
     def test_generate_ttest_plot_insufficient_sample_size(self):
         """Test with insufficient sample size for t-test."""
         data1 = [{'X Values': 1, 'Population 1': 10}]
@@ -122,6 +170,132 @@ class TestGenerateTTestPlot:
         assert t_test_result_text == "T-Test: Insufficient data for calculation."
 
 
+class TestBatchTTest:
+    """Tests for the batch_ttest function."""
+
+    def test_batch_ttest_matches_scipy(self):
+        """Test that each row matches scipy's Welch t-test, including NaN handling."""
+        rng = np.random.default_rng(0)
+        matrix1 = rng.normal(0, 1, size=(50, 8))
+        matrix2 = rng.normal(0.5, 2, size=(50, 12))
+        matrix1[3, :2] = np.nan
+
+        t_stats, dfs, p_values = plots.batch_ttest(matrix1, matrix2)
+
+        for row in (0, 3, 49):
+            values1 = matrix1[row][~np.isnan(matrix1[row])]
+            expected = stats.ttest_ind(values1, matrix2[row], equal_var=False)
+            assert t_stats[row] == pytest.approx(expected.statistic)
+            assert p_values[row] == pytest.approx(expected.pvalue)
+            assert dfs[row] == pytest.approx(expected.df)
+
+    def test_batch_ttest_insufficient_data(self):
+        """Test that rows with fewer than two values give NaN."""
+        matrix1 = np.array([[1.0, np.nan, np.nan], [1.0, 2.0, 3.0]])
+        matrix2 = np.array([[2.0, 3.0, 4.0], [2.0, 3.0, 5.0]])
+
+        t_stats, _, p_values = plots.batch_ttest(matrix1, matrix2)
+
+        assert np.isnan(t_stats[0]) and np.isnan(p_values[0])
+        assert not np.isnan(t_stats[1])
+
+    def test_batch_ttest_mismatched_rows(self):
+        """Test that groups with different numbers of features raise an error."""
+        with pytest.raises(ValueError):
+            plots.batch_ttest(np.zeros((3, 4)), np.zeros((2, 4)))
+
+
+class TestBoxSummary:
+    """Tests for the box_summary and box_trace functions."""
+
+    def test_box_summary_statistics(self):
+        """Test the quartiles, fences and outliers."""
+        values = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 100.0, np.nan])
+
+        summary = plots.box_summary(values)
+
+        assert summary['q1'] == pytest.approx(3.0)
+        assert summary['median'] == pytest.approx(5.0)
+        assert summary['q3'] == pytest.approx(7.0)
+        assert summary['lowerfence'] == 1.0
+        assert summary['upperfence'] == 8.0, "The fence is the largest value within 1.5 IQR"
+        assert summary['outliers'].tolist() == [100.0]
+        assert summary['n'] == 9
+
+    def test_box_summary_caps_outliers(self):
+        """Test that a large set of outliers is sampled down, keeping the extremes."""
+        values = np.concatenate([np.zeros(1000), np.arange(100.0, 200.0)])
+        summary = plots.box_summary(values, max_outliers=50)
+
+        assert len(summary['outliers']) == 50
+        assert summary['outliers'][0] == 100.0
+        assert summary['outliers'][-1] == 199.0
+
+    def test_box_trace_size_independent_of_n(self):
+        """Test that the trace holds no raw values, however large the group."""
+        values = np.random.default_rng(0).normal(size=100_000)
+        trace = plots.box_trace(values, 'Population 1')
+
+        assert trace.q1 is not None and trace.upperfence is not None
+        assert len(trace.y[0]) <= plots.MAX_BOX_OUTLIERS
+
+    def test_box_summary_empty(self):
+        """Test that an empty group gives an empty summary and an empty trace."""
+        assert plots.box_summary([]) == {}
+        assert plots.box_trace([], 'Population 1').q1 is None
+
+    def test_group_box_summaries_match_box_summary(self):
+        """Test that the per-group statistics match box_summary of each group."""
+        rng = np.random.default_rng(1)
+        codes = rng.integers(0, 5, 2000)
+        values = rng.standard_t(3, 2000)
+
+        summaries = plots.group_box_summaries(codes, values, 5, max_outliers=10)
+
+        for code in range(5):
+            expected = plots.box_summary(values[codes == code], max_outliers=10)
+            for statistic in ('q1', 'median', 'q3', 'lowerfence', 'upperfence'):
+                assert summaries[statistic][code] == pytest.approx(expected[statistic])
+            assert summaries['outliers'][code].tolist() == expected['outliers'].tolist()
+
+
+class TestGenerateGroupAnovaPlot:
+    """Tests for the generate_group_anova_plot function."""
+
+    def test_group_anova_plot(self):
+        """Test the F-test, the Tukey HSD pairs and the one-trace box plot."""
+        rng = np.random.default_rng(2)
+        groups = np.repeat(['control', 'low', 'high'], 40)
+        values = np.concatenate([rng.normal(0, 1, 40), rng.normal(0.1, 1, 40),
+                                 rng.normal(2, 1, 40)])
+        expected = stats.f_oneway(values[:40], values[40:80], values[80:])
+
+        figure, text = plots.generate_group_anova_plot(groups, values)
+
+        assert f"F-statistic = {expected.statistic:.2f}" in text
+        assert "Tukey HSD: 2 of 3 pairs" in text
+        assert "control vs high" in text and "control vs low" not in text
+        assert len(figure.data) == 1, "All groups should be drawn by one trace"
+        assert list(figure.data[0].x) == ['control', 'high', 'low']
+
+    def test_group_codes_with_names(self):
+        """Test that integer group codes are shown with the given names."""
+        codes = np.array([0.0, 0.0, 0.0, 1.0, 1.0, 1.0])
+        values = np.array([1.0, 2.0, 3.0, 7.0, 8.0, 9.0])
+
+        figure, text = plots.generate_group_anova_plot(codes, values, names=['before', 'after'])
+
+        assert list(figure.data[0].x) == ['before', 'after']
+        assert "before vs after" in text
+
+    def test_too_few_groups(self):
+        """Test that a single group gives an empty figure and a message."""
+        figure, text = plots.generate_group_anova_plot(['a', 'a', 'a'], [1.0, 2.0, 3.0])
+
+        assert len(figure.data) == 0
+        assert "at least two groups" in text
+
+
 class TestInitializeRandomData:
     """Tests for the initialize_random_data function."""
 
@@ -253,6 +427,27 @@ class TestGenerateZTestPlot:
         assert "P-value:" in z_test_result_text
 
 
+class TestGeneratePowerPlot:
+    """Tests for the generate_power_plot function."""
+
+    def test_generate_power_plot(self):
+        """Test that the curves and the needed sample size are returned."""
+        figure, text = plots.generate_power_plot('ttest', 0.5)
+
+        assert isinstance(figure, go.Figure), "Output should be a Plotly Figure"
+        assert len(figure.data) == 3, "The chosen effect size is one of the conventional ones"
+        assert all(np.all(np.diff(trace.y) >= 0) for trace in figure.data), \
+            "Power should grow with the sample size"
+        assert text.endswith(": 64")
+
+    def test_generate_power_plot_custom_effect(self):
+        """Test that a custom effect size gets its own curve."""
+        figure, text = plots.generate_power_plot('anova', 0.3, sd_ratio=2.0)
+
+        assert len(figure.data) == 4
+        assert "effect size 0.3" in text
+
+
 class TestGenerateDistributionPlot:
     """This class holds the tests for the
     generate_distribution_plot function in the plots module. 
@@ -268,9 +463,10 @@ class TestGenerateDistributionPlot:
         assert 'data' in figure, "'data' key should be present in the returned figure"
         assert 'layout' in figure, "'layout' key should be present in the returned figure"
 
-        # Check if the 'data' part contains a histogram
+        # Check if the 'data' part contains a histogram binned on the server
         assert len(figure['data']) == 1, "'data' should contain only one histogram"
-        assert figure['data'][0]['type'] == 'histogram', "'data' should contain a histogram"
+        assert figure['data'][0]['type'] == 'bar', "'data' should contain a bar trace of bin counts"
+        assert sum(figure['data'][0]['y']) == 20, "Bin counts should add up to the number of values"
 
         # Check if the layout contains the expected titles
         assert figure['layout']['title'] == 'Histogram of Data', "Title must be 'Histogram of Data'"
@@ -295,6 +491,38 @@ class TestGenerateDistributionPlot:
         assert 'data' in result, "'data' key should be present in the returned figure"
         assert len(result['data'][0]['x']) == 0, "'data' histogram should have no values"
 
+    def test_generate_distribution_plot_size_independent_of_n(self):
+        """Test that the figure only holds the bins, however many values there are."""
+        values = np.random.default_rng(0).normal(size=100_000)
+
+        figure = plots.generate_distribution_plot({'Values': values})
+
+        # Sturges' rule: ceil(log2(100000)) + 1 bins
+        assert len(figure['data'][0]['y']) == 18
+        assert sum(figure['data'][0]['y']) == 100_000
+
+    def test_histogram_bin_edges_rules(self):
+        """Test the Freedman-Diaconis and fixed-width bin rules."""
+        values = np.arange(0.0, 100.0)
+
+        fd_edges = plots.histogram_bin_edges(values, 'fd')
+        assert np.diff(fd_edges)[0] == pytest.approx(99 / np.ceil(99 / (2 * 49.5 / 100 ** (1 / 3))))
+
+        fixed_edges = plots.histogram_bin_edges(values, 'fixed', bin_width=10)
+        assert fixed_edges.tolist() == [float(edge) for edge in range(0, 101, 10)]
+
+        # Very narrow bins are capped
+        capped_edges = plots.histogram_bin_edges(values, 'fixed', bin_width=1e-6)
+        assert len(capped_edges) == plots.MAX_BINS + 1
+
+    def test_histogram_bin_edges_invalid(self):
+        """Test that an unknown rule or a bad fixed width raises ValueError."""
+        values = np.arange(10.0)
+        with pytest.raises(ValueError):
+            plots.histogram_bin_edges(values, 'square-root')
+        with pytest.raises(ValueError):
+            plots.histogram_bin_edges(values, 'fixed', bin_width=0)
+
     def test_generate_distribution_plot_missing_values_column(self):
         """Negative test for generate_distribution_plot with missing 'Values' column"""
         missing_column_data = {'SomeOtherColumn': [1, 2, 3, 4, 5]}
@@ -336,6 +564,40 @@ class TestGenerateRegressionPlot:
         assert figure.data[0].name == "Data Points", "First trace should represent data points"
         assert figure.data[1].name == "Regression Line", "Second trace should represent the regression line"
 
+    def test_generate_linear_regression_plot_bootstrap_intervals(self):
+        """Test that bootstrap intervals are added to the equation when asked for."""
+        data = [{'X Values': x, 'Y Values': 2 * x + 1 + (-1) ** x * 0.5} for x in range(1, 21)]
+
+        _, plain_equation, _ = plots.generate_linear_regression_plot(data)
+        _, equation, _ = plots.generate_linear_regression_plot(data, bootstrap_resamples=2000)
+
+        assert equation.startswith(plain_equation + " (95% CI: slope ")
+        assert "intercept" in equation
+
+    def test_generate_linear_regression_plot_numpy_columns(self):
+        """Test generate_linear_regression_plot with columns from the dataset store."""
+        data = {'X Values': np.array([1.0, 2.0, 3.0, 4.0, np.nan]),
+                'Y Values': np.array([3.0, 5.0, 7.0, 9.0, 11.0])}
+
+        _, equation, r2_value = plots.generate_linear_regression_plot(data)
+
+        assert equation == "y = 2.00x + 1.00"
+        assert r2_value == pytest.approx(1.0)
+
+    def test_generate_linear_regression_plot_large_data(self):
+        """Test that large data is decimated and drawn with WebGL, with statistics on all of it."""
+        rng = np.random.default_rng(0)
+        x_values = rng.uniform(0, 100, 50_000)
+        data = {'X Values': x_values, 'Y Values': 2 * x_values + 1}
+
+        figure, equation, r2_value = plots.generate_linear_regression_plot(data, max_points=3000)
+
+        assert equation == "y = 2.00x + 1.00"
+        assert r2_value == pytest.approx(1.0)
+        assert figure.data[0].type == 'scattergl', "Large scatters should use WebGL"
+        assert len(figure.data[0].x) <= 3000
+        assert len(figure.data[1].x) == 2, "The regression line only needs its end points"
+
     def test_generate_linear_regression_plot_empty_data(self):
         """Test generate_linear_regression_plot with no data."""
         empty_data = []
@@ -370,3 +632,115 @@ class TestGenerateRegressionPlot:
         # Expect the function to raise a ValueError when non-numeric data is present
         with pytest.raises(ValueError, match="Data contains no valid numeric values after cleaning"):
             plots.generate_linear_regression_plot(non_numeric_data)
+
+
+class TestDecimate:
+    """Tests for the lttb_downsample, minmax_downsample and decimate functions."""
+
+    def test_lttb_downsample(self):
+        """Test that LTTB keeps the target count, the end points and a spike."""
+        x_values = np.arange(1000.0)
+        y_values = np.zeros(1000)
+        y_values[500] = 50.0
+
+        plot_x, plot_y = plots.lttb_downsample(x_values[::-1].copy(), y_values[::-1].copy(), 20)
+
+        assert len(plot_x) == 20
+        assert plot_x[0] == 0.0 and plot_x[-1] == 999.0, "End points should be kept"
+        assert 50.0 in plot_y, "The spike should be kept"
+
+    def test_minmax_downsample(self):
+        """Test that min/max decimation keeps each bucket's extremes."""
+        x_values = np.arange(1000.0)
+        y_values = np.sin(x_values / 10)
+        y_values[123] = -5.0
+
+        plot_x, plot_y = plots.minmax_downsample(x_values, y_values, 100)
+
+        assert len(plot_x) <= 100
+        assert np.all(np.diff(plot_x) >= 0), "Points should be sorted by x"
+        assert -5.0 in plot_y
+
+    def test_lttb_downsample_largest_triangles(self):
+        """Test that LTTB keeps, from each bucket, the point making the largest
+        triangle with the point kept before it and the next bucket's average."""
+        rng = np.random.default_rng(0)
+        x_values, y_values = np.sort(rng.uniform(0, 100, 500)), rng.normal(size=500)
+
+        plot_x, plot_y = plots.lttb_downsample(x_values, y_values, 12)
+
+        edges = np.linspace(1, 499, 11).astype(int)
+        for bucket in range(10):
+            start, end = edges[bucket], edges[bucket + 1]
+            if bucket == 9:
+                next_x, next_y = x_values[-1], y_values[-1]
+            else:
+                next_x = x_values[end:edges[bucket + 2]].mean()
+                next_y = y_values[end:edges[bucket + 2]].mean()
+            areas = [abs((plot_x[bucket] - next_x) * (y - plot_y[bucket])
+                         - (plot_x[bucket] - x) * (next_y - plot_y[bucket]))
+                     for x, y in zip(x_values[start:end], y_values[start:end])]
+            assert plot_x[bucket + 1] == x_values[start + int(np.argmax(areas))]
+
+    def test_minmax_downsample_bucket_extremes(self):
+        """Test that min/max decimation keeps exactly the first lowest and
+        the last highest point of every bucket."""
+        rng = np.random.default_rng(0)
+        x_values = rng.integers(0, 100, 2000).astype(float)
+        y_values = rng.integers(0, 5, 2000).astype(float)
+
+        plot_x, plot_y = plots.minmax_downsample(x_values, y_values, 20)
+
+        ids = np.minimum((x_values / 99 * 10).astype(int), 9)
+        expected = set()
+        for bucket in range(10):
+            members = np.flatnonzero(ids == bucket)
+            expected.add(members[np.argmin(y_values[members])])
+            expected.add(members[::-1][np.argmax(y_values[members][::-1])])
+        expected = list(expected)
+        assert sorted(zip(plot_x, plot_y)) == sorted(zip(x_values[expected], y_values[expected]))
+
+    def test_decimate_defaults_to_minmax(self):
+        """Test that decimate uses the vectorized min/max method by default."""
+        x_values = np.arange(1000.0)
+        y_values = np.cos(x_values)
+        plot_x, plot_y = plots.decimate(x_values, y_values, 50)
+        expected_x, expected_y = plots.minmax_downsample(x_values, y_values, 50)
+        assert np.array_equal(plot_x, expected_x) and np.array_equal(plot_y, expected_y)
+
+    def test_decimate_small_data_unchanged(self):
+        """Test that data smaller than the target is kept whole."""
+        plot_x, _ = plots.decimate(np.array([3.0, 1.0, 2.0]), np.array([1.0, 2.0, 3.0]), 10)
+        assert plot_x.tolist() == [1.0, 2.0, 3.0]
+
+    def test_decimate_unknown_method(self):
+        """Test that an unknown method raises ValueError."""
+        with pytest.raises(ValueError):
+            plots.decimate(np.arange(10.0), np.arange(10.0), 5, method='random')
+
+
+class TestGenerateVolcanoPlot:
+    """Tests for the generate_volcano_plot function."""
+
+    def test_volcano_plot(self):
+        """Test the traces by significance and direction, and the summary text."""
+        points = {
+            'index': np.arange(4),
+            'id': ['a', 'b', 'c', 'd'],
+            'difference': np.array([2.0, -1.5, 0.1, -0.2]),
+            'neg_log10_p': np.array([6.0, 5.0, 0.5, 0.2]),
+            'significant': np.array([True, True, False, False]),
+            'top': [('a', 2.0, 6.0), ('b', -1.5, 5.0)],
+        }
+        summary = {'test': 'welch', 'tests': 4, 'alpha': 0.05, 'group1': ['x', 'y'],
+                   'group2': ['z', 'w', 'v'], 'significant': {'p': 2, 'bh': 2, 'bonferroni': 1}}
+
+        figure, text = plots.generate_volcano_plot(points, summary)
+
+        assert [trace.name for trace in figure.data] == [
+            'Not significant', 'Higher in group 1', 'Higher in group 2']
+        assert list(figure.data[1].hovertext) == ['a']
+        assert list(figure.data[2].x) == [-1.5]
+        assert "Welch t-test of 4 features (2 vs 3 samples)" in text
+        assert "1 after Bonferroni" in text
+        assert "a (difference 2, P-value 1e-06)" in text
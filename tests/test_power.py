@@ -0,0 +1,104 @@
+"""This module tests the power module."""
+
+import pytest
+import numpy as np
+from statsmodels.stats.power import FTestAnovaPower, NormalIndPower, TTestIndPower
+import power
+
+
+class TestPowerGrid:
+    """Tests for the power_grid function."""
+
+    def test_ttest_matches_statsmodels(self):
+        """Test that the closed-form t-test power matches statsmodels."""
+        effects, sizes = [0.2, 0.5, 0.8], [10, 20, 50, 100]
+
+        grid = power.power_grid('ttest', effects, sizes)
+
+        expected = [[TTestIndPower().power(effect, size, 0.05) for size in sizes]
+                    for effect in effects]
+        assert grid.shape == (3, 4)
+        assert np.allclose(grid, expected)
+
+    def test_ztest_and_anova_match_statsmodels(self):
+        """Test that the closed-form z-test and ANOVA power match statsmodels."""
+        ztest = power.power_grid('ztest', [0.5], [20, 50])
+        anova = power.power_grid('anova', [0.25], [20, 50], groups=3)
+
+        assert np.allclose(ztest[0], [NormalIndPower().power(0.5, size, 0.05)
+                                      for size in (20, 50)])
+        assert np.allclose(anova[0], [FTestAnovaPower().power(0.25, 3 * size, 0.05, k_groups=3)
+                                      for size in (20, 50)])
+
+    @pytest.mark.parametrize('test', ['ttest', 'ztest', 'anova'])
+    def test_monte_carlo_close_to_analytic(self, test):
+        """Test that the simulated power is close to the closed form."""
+        effects = power.EFFECT_SIZES[test]
+        sizes = [10, 40, 100]
+
+        analytic = power.power_grid(test, effects, sizes, method='analytic')
+        simulated = power.power_grid(test, effects, sizes, method='monte_carlo',
+                                     simulations=4000)
+
+        assert np.allclose(simulated, analytic, atol=0.04)
+
+    def test_monte_carlo_reproducible_per_sample_size(self):
+        """Test that a sample size gets the same simulated power in any grid."""
+        small = power.power_grid('ttest', [0.5], [30], sd_ratio=2.0)
+        large = power.power_grid('ttest', [0.5], [10, 30, 60], sd_ratio=2.0)
+
+        assert small[0, 0] == large[0, 1]
+
+    def test_unequal_sd_uses_simulation(self):
+        """Test that unequal standard deviations are simulated, and lower the power."""
+        equal = power.power_grid('ttest', [0.5], [50])
+        unequal = power.power_grid('ttest', [0.5], [50], sd_ratio=2.0)
+
+        assert not power.has_closed_form('ttest', 2.0)
+        assert unequal[0, 0] < equal[0, 0]
+        with pytest.raises(ValueError):
+            power.power_grid('ttest', [0.5], [50], sd_ratio=2.0, method='analytic')
+
+    def test_grid_is_cached_and_copied(self):
+        """Test that a cached grid cannot be changed through the returned array."""
+        grid = power.power_grid('ztest', [0.3], [25])
+        grid[0, 0] = -1.0
+
+        assert power.power_grid('ztest', [0.3], [25])[0, 0] > 0
+
+    def test_invalid_arguments(self):
+        """Test that unknown tests and methods and tiny samples raise errors."""
+        with pytest.raises(ValueError):
+            power.power_grid('chi2', [0.5], [10])
+        with pytest.raises(ValueError):
+            power.power_grid('ttest', [0.5], [10], method='exact')
+        with pytest.raises(ValueError):
+            power.power_grid('ttest', [0.5], [1])
+
+
+class TestSampleSize:
+    """Tests for the sample_size function."""
+
+    def test_ttest_matches_statsmodels(self):
+        """Test that the sample size is statsmodels' answer rounded up."""
+        expected = TTestIndPower().solve_power(0.5, power=0.8, alpha=0.05)
+
+        assert power.sample_size('ttest', 0.5) == int(np.ceil(expected))
+
+    def test_anova_matches_statsmodels(self):
+        """Test the ANOVA sample size per group."""
+        expected = FTestAnovaPower().solve_power(0.25, power=0.8, alpha=0.05, k_groups=3) / 3
+
+        assert power.sample_size('anova', 0.25, groups=3) == int(np.ceil(expected))
+
+    def test_monte_carlo_sample_size(self):
+        """Test that the simulated sample size reaches the power and is close to the closed form."""
+        needed = power.sample_size('ttest', 0.5, method='monte_carlo')
+
+        assert abs(needed - power.sample_size('ttest', 0.5)) <= 5
+        assert power.power_grid('ttest', [0.5], [needed], method='monte_carlo')[0, 0] >= 0.8
+
+    def test_out_of_range(self):
+        """Test that an effect too small to detect gives None."""
+        assert power.sample_size('ttest', 0.0) is None
+        assert power.sample_size('ttest', 0.001, sd_ratio=2.0) is None
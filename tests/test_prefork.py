@@ -0,0 +1,238 @@
+"""This module tests the prefork module."""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+import pytest
+import prefork
+
+# The repository root, where the modules live
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs a small app with two workers and prints the port it listens on
+SERVER_SCRIPT = """
+import os, sys
+import prefork
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    return [('{"pid": %d}' % os.getpid()).encode()]
+
+listener = prefork.create_listener('127.0.0.1', 0)
+print(listener.getsockname()[1], flush=True)
+prefork.CHECK_INTERVAL = 0.1
+prefork.PreforkServer(app, workers=2, threads=2, listener=listener, graceful_timeout=5).run()
+"""
+
+# One worker with one thread whose /slow requests take longer than the health timeout
+SLOW_SCRIPT = """
+import os, sys, time
+import prefork
+
+def app(environ, start_response):
+    if environ['PATH_INFO'] == '/slow':
+        time.sleep(3)
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    return [('{"pid": %d}' % os.getpid()).encode()]
+
+listener = prefork.create_listener('127.0.0.1', 0)
+print(listener.getsockname()[1], flush=True)
+prefork.CHECK_INTERVAL = 0.1
+prefork.PreforkServer(app, workers=1, threads=1, listener=listener, health_timeout=1,
+                      graceful_timeout=1).run()
+"""
+
+# Two workers, with the /pinned requests all served by the same one
+PINNED_SCRIPT = """
+import json, os, sys
+import prefork
+
+def app(environ, start_response):
+    body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    return [json.dumps({'pid': os.getpid(), 'path': environ['PATH_INFO'],
+                        'query': environ['QUERY_STRING'], 'body': body.decode()}).encode()]
+
+listener = prefork.create_listener('127.0.0.1', 0)
+print(listener.getsockname()[1], flush=True)
+prefork.CHECK_INTERVAL = 0.1
+prefork.PreforkServer(app, workers=2, threads=2, listener=listener, graceful_timeout=5,
+                      pinned=lambda environ: environ['PATH_INFO'] == '/pinned').run()
+"""
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="Pre-forking needs os.fork")
+
+
+def start_server(script):
+    """Starts a server script in its own process and returns (process, port)."""
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=ROOT,
+                               stdout=subprocess.PIPE, text=True)
+    return process, int(process.stdout.readline())
+
+
+@pytest.fixture
+def server():
+    """Starts the server in its own process and yields (process, port)."""
+    process, port = start_server(SERVER_SCRIPT)
+    yield process, port
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+
+def worker_pids(port, requests=40, path='/', until=2):
+    """Returns the process ids of the workers that answered some requests,
+    sending more until `until` workers have answered or 10 seconds pass."""
+    pids = set()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and len(pids) < until:
+        for _ in range(requests):
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}',
+                                            timeout=5) as response:
+                    pids.add(json.load(response)['pid'])
+            except OSError:
+                time.sleep(0.05)  # Workers still starting
+    return pids
+
+
+class TestPreforkServer:
+    """Tests for the PreforkServer class."""
+
+    def test_workers_share_the_socket(self, server):
+        """Test that the requests are answered by separate worker processes."""
+        process, port = server
+        pids = worker_pids(port)
+        assert len(pids) == 2, "Both workers should answer requests"
+        assert process.pid not in pids, "The master should not serve requests"
+
+    def test_restart_replaces_workers(self, server):
+        """Test that SIGHUP swaps every worker for a new one."""
+        process, port = server
+        old_pids = worker_pids(port)
+        process.send_signal(signal.SIGHUP)
+
+        deadline = time.monotonic() + 10
+        new_pids = set()
+        while time.monotonic() < deadline and (not new_pids or new_pids & old_pids):
+            time.sleep(0.2)
+            new_pids = worker_pids(port)
+        assert new_pids and not new_pids & old_pids, "Old workers should have been replaced"
+
+    def test_dead_worker_is_replaced(self, server):
+        """Test that a worker that dies is started again."""
+        _, port = server
+        victim = worker_pids(port).pop()
+        os.kill(victim, signal.SIGKILL)
+
+        deadline = time.monotonic() + 10
+        pids = set()
+        while time.monotonic() < deadline and (len(pids) < 2 or victim in pids):
+            pids = worker_pids(port)
+        assert len(pids) == 2 and victim not in pids
+
+    def test_stop(self, server):
+        """Test that SIGTERM stops the master and its workers."""
+        process, port = server
+        pids = worker_pids(port)
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
+        for pid in pids:
+            with pytest.raises(ProcessLookupError):
+                os.kill(pid, 0)
+
+    def test_needs_a_worker(self):
+        """Test that a server without workers is rejected."""
+        listener = prefork.create_listener('127.0.0.1', 0)
+        with pytest.raises(ValueError):
+            prefork.PreforkServer(lambda environ, start_response: [], workers=0,
+                                  listener=listener)
+        listener.close()
+
+    def test_slow_request_is_finished(self):
+        """Test that a worker whose threads are all busy for longer than the
+        health timeout is left to finish its request."""
+        process, port = start_server(SLOW_SCRIPT)
+        try:
+            old_pids = worker_pids(port, requests=1, until=1)
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/slow', timeout=10) as response:
+                assert {json.load(response)['pid']} == old_pids, "The worker should be kept"
+        finally:
+            process.kill()
+            process.wait()
+
+    def test_stuck_worker_is_replaced(self):
+        """Test that a worker that stops sending heartbeats is replaced."""
+        process, port = start_server(SLOW_SCRIPT)
+        try:
+            old_pids = worker_pids(port, requests=1, until=1)
+            os.kill(next(iter(old_pids)), signal.SIGSTOP)
+
+            deadline = time.monotonic() + 15
+            new_pids = set()
+            while time.monotonic() < deadline and (not new_pids or new_pids & old_pids):
+                time.sleep(0.5)
+                new_pids = worker_pids(port, requests=1, until=1)
+            assert new_pids and not new_pids & old_pids, "The hung worker should be replaced"
+        finally:
+            process.kill()
+            process.wait()
+
+
+class TestPinnedRequests:
+    """Tests for the requests pinned to one worker."""
+
+    def test_pinned_requests_go_to_one_worker(self):
+        """Test that pinned requests are all served by one worker, with their body and query."""
+        process, port = start_server(PINNED_SCRIPT)
+        try:
+            assert len(worker_pids(port)) == 2, "Other requests should use both workers"
+            assert len(worker_pids(port, path='/pinned', until=1)) == 1
+
+            request = urllib.request.Request(f'http://127.0.0.1:{port}/pinned?seq=2',
+                                             data=b'{"edit": 1}', method='POST')
+            with urllib.request.urlopen(request, timeout=5) as response:
+                answer = json.load(response)
+            assert answer['path'] == '/pinned' and answer['query'] == 'seq=2'
+            assert answer['body'] == '{"edit": 1}'
+        finally:
+            process.kill()
+            process.wait()
+
+    def test_pinned_worker_is_replaced(self):
+        """Test that the pinned requests move to a new worker when the pinned one dies."""
+        process, port = start_server(PINNED_SCRIPT)
+        try:
+            victim = worker_pids(port, path='/pinned', until=1).pop()
+            os.kill(victim, signal.SIGKILL)
+
+            deadline = time.monotonic() + 10
+            pids = {victim}
+            while time.monotonic() < deadline and victim in pids:
+                time.sleep(0.2)
+                pids = worker_pids(port, requests=5, path='/pinned', until=1)
+            assert len(pids) == 1 and victim not in pids
+        finally:
+            process.kill()
+            process.wait()
+
+
+class TestGracefulDispatcher:
+    """Tests for the GracefulDispatcher class."""
+
+    def test_shutdown_waits_for_the_set_time(self):
+        """Test that shutting down waits the dispatcher's timeout, not waitress' 5 seconds."""
+        dispatcher = prefork.GracefulDispatcher(timeout=0.2)
+        dispatcher.set_thread_count(1)
+        task = type('SlowTask', (), {'service': lambda self: time.sleep(2),
+                                     'cancel': lambda self: None})()
+        dispatcher.add_task(task)
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        dispatcher.shutdown()
+        assert time.monotonic() - start < 1.0
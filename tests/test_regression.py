@@ -0,0 +1,77 @@
+"""This module tests the regression module."""
+
+import pytest
+import numpy as np
+from scipy import stats
+from regression import SimpleRegression
+
+
+class TestSimpleRegression:
+    """Tests for the SimpleRegression class."""
+
+    x_values = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0])
+    y_values = np.array([2.1, 3.9, 6.2, 8.1, 9.8, 12.3, 13.9])
+
+    def test_summary_matches_scipy(self):
+        """Test the fit, standard errors and p-values against scipy's linregress."""
+        summary = SimpleRegression.from_arrays(self.x_values, self.y_values).summary()
+        expected = stats.linregress(self.x_values, self.y_values)
+
+        assert summary['n'] == 7
+        assert summary['slope'] == pytest.approx(expected.slope)
+        assert summary['intercept'] == pytest.approx(expected.intercept)
+        assert summary['r_squared'] == pytest.approx(expected.rvalue ** 2)
+        assert summary['slope_se'] == pytest.approx(expected.stderr)
+        assert summary['intercept_se'] == pytest.approx(expected.intercept_stderr)
+        assert summary['slope_p_value'] == pytest.approx(expected.pvalue)
+
+    def test_merge_chunks(self):
+        """Test that merging chunk statistics matches fitting all the data at once."""
+        whole = SimpleRegression.from_arrays(self.x_values, self.y_values)
+        merged = (SimpleRegression.from_arrays(self.x_values[:3], self.y_values[:3])
+                  + SimpleRegression.from_arrays(self.x_values[3:], self.y_values[3:]))
+
+        assert merged.n == whole.n
+        assert merged.slope == pytest.approx(whole.slope)
+        assert merged.intercept == pytest.approx(whole.intercept)
+
+    def test_add_and_remove_points(self):
+        """Test that single points can be added and removed."""
+        model = SimpleRegression.from_arrays(self.x_values, self.y_values)
+        model.add(8.0, 100.0)
+        model.remove(8.0, 100.0)
+        expected = SimpleRegression.from_arrays(self.x_values, self.y_values)
+
+        assert model.slope == pytest.approx(expected.slope)
+        assert model.r_squared == pytest.approx(expected.r_squared)
+
+    def test_nan_pairs_are_skipped(self):
+        """Test that pairs with a missing value are left out."""
+        model = SimpleRegression.from_arrays([1.0, 2.0, np.nan, 3.0], [3.0, 5.0, 6.0, np.nan])
+        assert model.n == 2
+        assert model.slope == pytest.approx(2.0)
+
+    def test_too_few_points(self):
+        """Test that standard errors are NaN without enough points."""
+        summary = SimpleRegression.from_arrays([1.0, 2.0], [3.0, 5.0]).summary()
+        assert summary['slope'] == pytest.approx(2.0)
+        assert np.isnan(summary['slope_se'])
+        assert np.isnan(summary['slope_p_value'])
+
+    def test_large_offset(self):
+        """Test that x values far from zero with little spread are fit accurately."""
+        x_values = 1.7e9 + np.arange(100.0)
+        y_values = 2 * (x_values - 1.7e9) + 1
+        model = SimpleRegression.from_arrays(x_values, y_values)
+        _, expected_intercept = np.polyfit(x_values, y_values, 1)
+
+        assert model.slope == pytest.approx(2.0)
+        assert model.intercept == pytest.approx(expected_intercept, rel=1e-6)
+        assert model.r_squared == pytest.approx(1.0)
+
+        merged = (SimpleRegression.from_arrays(x_values[:40], y_values[:40])
+                  + SimpleRegression.from_arrays(x_values[40:], y_values[40:]))
+        merged.add(1.7e9 + 100, 201.0)
+        merged.remove(1.7e9 + 100, 201.0)
+        assert merged.slope == pytest.approx(2.0)
+        assert merged.intercept == pytest.approx(expected_intercept, rel=1e-6)
@@ -0,0 +1,125 @@
+"""This module tests the serialization module."""
+
+import base64
+import numpy as np
+import plotly.graph_objs as go
+import serialization
+
+
+def decode(encoded):
+    """Decodes a typed array back into a numpy array."""
+    dtypes = {short: name for name, short in serialization.TYPED_ARRAY_DTYPES.items()}
+    values = np.frombuffer(base64.b64decode(encoded['bdata']), dtype=dtypes[encoded['dtype']])
+    if 'shape' in encoded:
+        values = values.reshape([int(size) for size in encoded['shape'].split(',')])
+    return values
+
+
+class TestTypedArray:
+    """Tests for the typed_array function."""
+
+    def test_float_round_trip(self):
+        """Test that floats, including NaN, decode to the same values."""
+        values = np.array([1.5, np.nan, -3.25])
+        encoded = serialization.typed_array(values)
+
+        assert encoded['dtype'] == 'f8'
+        np.testing.assert_array_equal(decode(encoded), values)
+
+    def test_int64_is_narrowed(self):
+        """Test that 64-bit integers use the smallest type that holds them."""
+        assert serialization.typed_array(np.array([0, 200]))['dtype'] == 'u1'
+        assert serialization.typed_array(np.array([-5, 1000]))['dtype'] == 'i2'
+        assert serialization.typed_array(np.array([2 ** 40]))['dtype'] == 'f8'
+
+    def test_two_dimensional_shape(self):
+        """Test that 2-D arrays record their shape."""
+        values = np.arange(6.0).reshape(3, 2)
+        encoded = serialization.typed_array(values)
+
+        assert encoded['shape'] == '3, 2'
+        np.testing.assert_array_equal(decode(encoded), values)
+
+
+class TestPackFigure:
+    """Tests for the pack_figure function."""
+
+    def test_trace_arrays_become_typed_arrays(self):
+        """Test that numeric trace arrays and lists are encoded, and text is not."""
+        figure = go.Figure(go.Scatter(x=np.arange(10.0), y=list(range(10)), text=['a'] * 10))
+        packed = serialization.pack_figure(figure)
+        trace = packed['data'][0]
+
+        np.testing.assert_array_equal(decode(trace['x']), np.arange(10.0))
+        np.testing.assert_array_equal(decode(trace['y']), np.arange(10))
+        assert trace['text'] == ['a'] * 10
+        assert packed['layout']['template'], "The layout should be kept"
+
+    def test_short_lists_stay_json(self):
+        """Test that short lists are not worth encoding."""
+        packed = serialization.pack_figure({'data': [go.Bar(x=['x', 'y'], y=[1, 2])],
+                                            'layout': {'title': 'Bars'}})
+        assert packed['data'][0]['y'] == [1, 2]
+        assert packed['layout'] == {'title': 'Bars'}
+
+    def test_nested_arrays_stay_json(self):
+        """Test that arrays inside lists (e.g. box samples) are sent as lists."""
+        figure = go.Figure(go.Box(q1=[1], median=[2], q3=[3], y=[np.arange(10.0)]))
+        trace = serialization.pack_figure(figure)['data'][0]
+        assert trace['y'] == [list(np.arange(10.0))]
+
+    def test_packed_figures_are_reused(self):
+        """Test that packing the same figure object twice reuses the result."""
+        figure = go.Figure(go.Scatter(x=np.arange(100.0), y=np.arange(100.0)))
+        assert serialization.pack_figure(figure) is serialization.pack_figure(figure)
+
+    def test_packed_figure_is_smaller(self):
+        """Test that a large figure from a list of numbers shrinks when packed."""
+        from dash._utils import to_json
+
+        values = list(np.random.default_rng(0).normal(size=5000))
+        figure = {'data': [go.Scatter(x=values, y=values)], 'layout': {}}
+        assert len(to_json(serialization.pack_figure(figure))) < len(to_json(figure))
+
+
+class TestFigureUpdate:
+    """Tests for the figure_patch and figure_update functions."""
+
+    @staticmethod
+    def box_figure(second, title):
+        """Two box traces with 1000 values each, the second one given."""
+        first = np.arange(1000.0)
+        return go.Figure([go.Box(y=first, name='A'), go.Box(y=second, name='B')],
+                         layout={'title': {'text': title}})
+
+    def test_patch_holds_only_changes(self):
+        """Test that only the changed trace array and title are in the patch."""
+        previous = serialization.pack_figure(self.box_figure(np.zeros(1000), 'Before'))
+        current = serialization.pack_figure(self.box_figure(np.ones(1000), 'After'))
+
+        operations = serialization.figure_patch(previous, current).to_plotly_json()['operations']
+
+        locations = sorted(tuple(operation['location']) for operation in operations)
+        assert locations == [('data', 1, 'y'), ('layout', 'title', 'text')]
+
+    def test_different_traces_need_whole_figure(self):
+        """Test that no patch is made when the number of traces changes."""
+        previous = serialization.pack_figure(self.box_figure(np.zeros(1000), 'Before'))
+        current = serialization.pack_figure(go.Figure(go.Box(y=np.ones(10))))
+
+        assert serialization.figure_patch(previous, current) is None
+
+    def test_second_update_is_a_smaller_patch(self):
+        """Test that the first update sends the figure and the next one a smaller patch."""
+        from dash import Patch
+        from dash._utils import to_json
+
+        first, shown = serialization.figure_update(self.box_figure(np.zeros(1000), 'Before'))
+        second, again = serialization.figure_update(self.box_figure(np.ones(1000), 'After'), shown)
+        unknown, _ = serialization.figure_update(self.box_figure(np.ones(1000), 'After'), 'gone')
+
+        assert isinstance(first, dict)
+        assert isinstance(second, Patch)
+        assert again != shown
+        assert len(to_json(second)) < len(to_json(first)) / 1.5
+        assert isinstance(unknown, dict), "An unknown key should send the whole figure"
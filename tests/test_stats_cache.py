@@ -0,0 +1,73 @@
+"""This module tests the stats_cache module."""
+
+import numpy as np
+import plots
+import stats_cache
+
+
+class TestHashArrays:
+    """Tests for the hash_arrays function."""
+
+    def test_hash_arrays_same_content(self):
+        """Test that equal data gives the same hash, whatever the input type."""
+        first = stats_cache.hash_arrays(np.array([1.0, 2.0, 3.0]), options=('ttest',))
+        second = stats_cache.hash_arrays([1, 2, 3], options=('ttest',))
+        assert first == second
+
+    def test_hash_arrays_different_content(self):
+        """Test that different data or options change the hash."""
+        base = stats_cache.hash_arrays([1, 2, 3], [4, 5], options=('ttest',))
+        assert base != stats_cache.hash_arrays([1, 2, 4], [4, 5], options=('ttest',))
+        assert base != stats_cache.hash_arrays([1, 2, 3], [4, 5], options=('ztest',))
+        # Moving a value between arrays must not collide
+        assert base != stats_cache.hash_arrays([1, 2], [3, 4, 5], options=('ttest',))
+
+
+class TestLRUCache:
+    """Tests for the LRUCache class."""
+
+    def test_hits_misses_and_evictions(self):
+        """Test that the counters track cache use."""
+        cache = stats_cache.LRUCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1      # hit, 'a' becomes most recent
+        assert cache.get('c') is None   # miss
+        cache.put('c', 3)               # evicts 'b'
+
+        assert 'b' not in cache
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1,
+                                 'size': 2, 'max_entries': 2}
+
+    def test_get_or_compute(self):
+        """Test that a value is only computed once."""
+        cache = stats_cache.LRUCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return None  # None should still count as a cached value
+
+        assert cache.get_or_compute('key', compute) is None
+        assert cache.get_or_compute('key', compute) is None
+        assert len(calls) == 1
+
+
+class TestPlotsMemoization:
+    """Tests that the plots module reuses cached statistics and figures."""
+
+    def test_generate_ttest_plot_cache_hit(self):
+        """Test that the same data reuses the cached result and figure."""
+        stats_cache.clear_caches()
+        data1 = [{'X Values': 1, 'Population 1': 10}, {'X Values': 2, 'Population 1': 15},
+                 {'X Values': 3, 'Population 1': 13}]
+        data2 = [{'X Values': 1, 'Population 2': 12}, {'X Values': 2, 'Population 2': 14},
+                 {'X Values': 3, 'Population 2': 19}]
+
+        figure1, text1 = plots.generate_ttest_plot(data1, data2)
+        figure2, text2 = plots.generate_ttest_plot(data1, data2)
+
+        assert text1 == text2
+        assert figure1 is figure2, "The cached figure should be reused"
+        assert stats_cache.RESULTS.stats()['hits'] == 1
+        assert stats_cache.FIGURES.stats()['hits'] == 1
@@ -0,0 +1,126 @@
+"""This module tests the upload module."""
+
+import base64
+import io
+import pytest
+import numpy as np
+import anova
+import upload
+
+
+def make_contents(text):
+    """Encodes text the way dcc.Upload sends a file."""
+    return "data:text/csv;base64," + base64.b64encode(text.encode()).decode()
+
+
+class TestParseUpload:
+    """Tests for the parse_upload function."""
+
+    def test_parse_upload_csv(self):
+        """Test that a CSV upload becomes typed numpy columns."""
+        contents = make_contents("Population 1,Population 2,Group\n1,4.5,a\n2,,b\n3,6,c\n")
+
+        columns = upload.parse_upload(contents, 'data.csv')
+
+        assert list(columns) == ['Population 1', 'Population 2', 'Group']
+        assert columns['Population 1'].dtype == float
+        assert columns['Population 1'].tolist() == [1.0, 2.0, 3.0]
+        assert np.isnan(columns['Population 2'][1]), "Empty cells should become NaN"
+        assert columns['Group'].tolist() == ['a', 'b', 'c']
+
+    def test_parse_upload_tsv_in_chunks(self):
+        """Test that a TSV file is read in chunks and progress is reported."""
+        text = "Values\n" + "\n".join(str(value) for value in range(1000)) + "\n"
+        contents = make_contents(text.replace(",", "\t"))
+        progress = []
+
+        columns = upload.parse_upload(contents, 'data.tsv', chunksize=300,
+                                      progress=lambda fraction, rows: progress.append(rows))
+
+        assert columns['Values'].tolist() == [float(value) for value in range(1000)]
+        assert progress == [300, 600, 900, 1000]
+
+    def test_parse_upload_not_base64(self):
+        """Test that contents that are not base64 are rejected."""
+        with pytest.raises(ValueError):
+            upload.parse_upload("data:text/csv,1,2,3", 'data.csv')
+
+    def test_parse_upload_empty_file(self):
+        """Test that an empty file is rejected."""
+        with pytest.raises(ValueError):
+            upload.parse_upload(make_contents(""), 'data.csv')
+
+
+class TestReadColumns:
+    """Tests for the read_columns function."""
+
+    def test_read_columns_mixed_chunks(self):
+        """Test that a column with text in a later chunk is kept as text."""
+        source = io.BytesIO(b"Values\n1\n2\nabc\n")
+        columns = upload.read_columns(source, chunksize=2)
+        assert columns['Values'].tolist() == ['1', '2', 'abc']
+
+    def test_read_columns_blank_label(self):
+        """Test that a blank group label stays missing and its row is dropped."""
+        source = io.BytesIO(b"Group,Value\na,1\n,2\nb,3\nnan,4\n")
+        columns = upload.read_columns(source, chunksize=2)
+        assert columns['Group'].tolist() == ['a', None, 'b', None], \
+            "Blank labels should not become the string 'nan'"
+
+        codes, labels, values = anova.factorize_groups(*upload.select_group_columns(columns))
+        assert labels.tolist() == ['a', 'b']
+        assert codes.tolist() == [0, 1]
+        assert values.tolist() == [1.0, 3.0]
+
+
+class TestSelectColumns:
+    """Tests for the select_columns function."""
+
+    def test_select_columns_by_name(self):
+        """Test that columns with the expected names are used."""
+        columns = {'Y Values': np.array([2.0]), 'X Values': np.array([1.0])}
+        selected = upload.select_columns(columns, ['X Values', 'Y Values'])
+        assert selected['X Values'].tolist() == [1.0]
+        assert selected['Y Values'].tolist() == [2.0]
+
+    def test_select_columns_by_position(self):
+        """Test that the first numeric columns are used when the names differ."""
+        columns = {'label': np.array(['a']), 'height': np.array([1.0]),
+                   'weight': np.array([2.0])}
+        selected = upload.select_columns(columns, ['X Values', 'Y Values'])
+        assert selected['X Values'].tolist() == [1.0]
+        assert selected['Y Values'].tolist() == [2.0]
+
+    def test_select_columns_not_enough(self):
+        """Test that a file without enough numeric columns is rejected."""
+        with pytest.raises(ValueError):
+            upload.select_columns({'height': np.array([1.0])}, ['X Values', 'Y Values'])
+
+
+class TestSelectGroupColumns:
+    """Tests for the select_group_columns function."""
+
+    def test_select_group_columns_by_name(self):
+        """Test that the Group and Value columns are used when present."""
+        columns = {'Value': np.array([1.0, 2.0]), 'Site': np.array(['x', 'y']),
+                   'Group': np.array(['a', 'b'])}
+        groups, values = upload.select_group_columns(columns)
+        assert groups.tolist() == ['a', 'b']
+        assert values.tolist() == [1.0, 2.0]
+
+    def test_select_group_columns_by_type(self):
+        """Test that the first text column and first numeric column are used otherwise."""
+        columns = {'height': np.array([1.0, 2.0]), 'clinic': np.array(['a', 'b'])}
+        groups, values = upload.select_group_columns(columns)
+        assert groups.tolist() == ['a', 'b']
+        assert values.tolist() == [1.0, 2.0]
+
+        numeric = {'dose': np.array([1.0, 2.0]), 'response': np.array([5.0, 6.0])}
+        groups, values = upload.select_group_columns(numeric)
+        assert groups.tolist() == [1.0, 2.0], "All-numeric files use the first column as groups"
+        assert values.tolist() == [5.0, 6.0]
+
+    def test_select_group_columns_no_values(self):
+        """Test that a file without a numeric value column is rejected."""
+        with pytest.raises(ValueError):
+            upload.select_group_columns({'Group': np.array(['a', 'b'])})
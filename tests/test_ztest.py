@@ -0,0 +1,95 @@
+"""This module tests the ztest module."""
+
+import pytest
+import numpy as np
+from scipy import stats
+from statsmodels.stats.weightstats import ztest as statsmodels_ztest
+import ztest
+
+
+@pytest.fixture
+def samples():
+    """Two samples of different sizes and spreads."""
+    rng = np.random.default_rng(0)
+    return rng.normal(0, 1, 30), rng.normal(0.5, 2, 25)
+
+
+class TestZtest:
+    """Tests for the ztest function on raw values."""
+
+    @pytest.mark.parametrize('alternative', ztest.ALTERNATIVES)
+    @pytest.mark.parametrize('usevar', ztest.USEVAR)
+    def test_two_samples_match_statsmodels(self, samples, alternative, usevar):
+        """Test the two-sample test against statsmodels for every option."""
+        expected = statsmodels_ztest(*samples, value=0.1, alternative=alternative, usevar=usevar)
+
+        z_stat, p_value = ztest.ztest(*samples, value=0.1, alternative=alternative,
+                                      usevar=usevar)
+
+        assert z_stat == pytest.approx(expected[0])
+        assert p_value == pytest.approx(expected[1])
+
+    def test_one_sample_matches_statsmodels(self, samples):
+        """Test the one-sample test of a mean against a null value."""
+        expected = statsmodels_ztest(samples[0], value=0.2, alternative='smaller')
+        assert ztest.ztest(samples[0], value=0.2, alternative='smaller') == \
+            pytest.approx(expected)
+
+    def test_rows_are_separate_tests(self):
+        """Test that each row of 2-D samples is tested on its own, ignoring NaN values."""
+        rng = np.random.default_rng(1)
+        matrix1, matrix2 = rng.normal(size=(50, 8)), rng.normal(0.3, 1, size=(50, 6))
+        matrix1[4, 2] = np.nan
+
+        z_stats, p_values = ztest.ztest(matrix1, matrix2)
+
+        assert z_stats.shape == p_values.shape == (50,)
+        for row in (0, 4, 49):
+            expected = statsmodels_ztest(matrix1[row][~np.isnan(matrix1[row])], matrix2[row])
+            assert z_stats[row] == pytest.approx(expected[0])
+            assert p_values[row] == pytest.approx(expected[1])
+
+
+class TestZtestFromStats:
+    """Tests for the summary-statistics functions."""
+
+    def test_known_population(self):
+        """Test a sample mean against a known population mean and standard deviation."""
+        z_stat, p_value = ztest.ztest_from_stats(92, 5, 30, value=90)
+
+        assert z_stat == pytest.approx(2 / (5 / np.sqrt(30)))
+        assert p_value == pytest.approx(2 * stats.norm.sf(z_stat))
+        assert isinstance(p_value, float), "Scalar arguments should give floats"
+
+    def test_batch_broadcasts(self):
+        """Test that arrays of statistics run one test per element, as single calls do."""
+        rng = np.random.default_rng(2)
+        means, stds = rng.normal(size=1000), rng.uniform(1, 2, 1000)
+        nobs = rng.integers(5, 50, 1000)
+
+        z_stats, p_values = ztest.ztest_from_stats(means, stds, nobs, 0.1, 1.5, 20,
+                                                   alternative='larger')
+
+        assert z_stats.shape == (1000,)
+        single = ztest.ztest_from_stats(means[7], stds[7], nobs[7], 0.1, 1.5, 20,
+                                        alternative='larger')
+        assert (z_stats[7], p_values[7]) == pytest.approx(single)
+
+    def test_summary_statistics(self):
+        """Test the mean, standard deviation and size of samples with missing values."""
+        means, stds, nobs = ztest.summary_statistics([[1.0, 2.0, 3.0], [4.0, np.nan, 8.0],
+                                                      [5.0, np.nan, np.nan]])
+
+        assert means.tolist() == [2.0, 6.0, 5.0]
+        assert stds[:2] == pytest.approx([1.0, np.sqrt(8.0)])
+        assert np.isnan(stds[2]), "One value has no standard deviation"
+        assert nobs.tolist() == [3, 2, 1]
+
+    def test_invalid_options(self):
+        """Test that unknown options and a partly given sample 2 raise errors."""
+        with pytest.raises(ValueError):
+            ztest.ztest_from_stats(1.0, 1.0, 10, alternative='both')
+        with pytest.raises(ValueError):
+            ztest.ztest_from_stats(1.0, 1.0, 10, 2.0, 1.0, 10, usevar='welch')
+        with pytest.raises(ValueError):
+            ztest.ztest_from_stats(1.0, 1.0, 10, mean2=2.0)
@@ -0,0 +1,242 @@
+"""This module reads uploaded CSV/TSV files into numpy columns. Files
+are decoded and parsed in fixed-size chunks, so large uploads never
+have to exist as a list of row dictionaries, and the progress of the
+parse is recorded so the page can show it while the file loads."""
+
+import base64
+import io
+import threading
+import numpy as np
+import pandas as pd
+
+# Rows parsed per chunk
+DEFAULT_CHUNKSIZE = 100_000
+
+# Characters of base64 decoded at a time (must be a multiple of 4)
+_DECODE_BLOCK = 4 * 1024 * 1024
+
+
+class _Base64Reader(io.RawIOBase):
+    """
+    A file-like object that decodes a base64 string a block at a time.
+
+    Args:
+        - encoded (str): The base64 text.
+    """
+
+    def __init__(self, encoded):
+        super().__init__()
+        self._encoded = encoded
+        self._position = 0
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    @property
+    def fraction_read(self):
+        """How much of the encoded text has been decoded, from 0 to 1."""
+        return self._position / len(self._encoded) if self._encoded else 1.0
+
+    def readinto(self, buffer):
+        while len(self._buffer) < len(buffer) and self._position < len(self._encoded):
+            end = self._position + _DECODE_BLOCK
+            self._buffer += base64.b64decode(self._encoded[self._position:end])
+            self._position = end
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class ProgressTracker:
+    """
+    Thread-safe record of how far along each upload is.
+    Keys are chosen by the caller (e.g. the upload's file name and time stamp).
+    """
+
+    def __init__(self):
+        self._progress = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, fraction, rows):
+        """Records that `rows` rows (`fraction` of the file) have been parsed."""
+        with self._lock:
+            self._progress[key] = {'fraction': fraction, 'rows': rows}
+
+    def get(self, key):
+        """
+        Returns the progress of an upload.
+
+        Returns:
+            - dict or None: 'fraction' and 'rows', or None if unknown.
+        """
+        with self._lock:
+            return self._progress.get(key)
+
+    def finish(self, key):
+        """Forgets an upload once it is done."""
+        with self._lock:
+            self._progress.pop(key, None)
+
+
+# Progress of the uploads in flight, shared by all the Dash apps
+PROGRESS = ProgressTracker()
+
+
+def separator_for(filename):
+    """
+    Picks the column separator from the file name.
+
+    Args:
+        - filename (str): The uploaded file name.
+
+    Returns:
+        - str: A tab for .tsv/.tab/.txt files, otherwise a comma.
+    """
+    if filename and filename.lower().endswith(('.tsv', '.tab', '.txt')):
+        return '\t'
+    return ','
+
+
+def read_columns(source, sep=',', chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    """
+    Reads a delimited text file into numpy columns, a chunk of rows at a time.
+
+    Columns where every value is numeric (or empty) become float64 arrays,
+    with empty cells as NaN; other columns are kept as object arrays of
+    strings, with empty cells as None.
+
+    Args:
+        - source (str or file-like): Path or binary file object to read.
+        - sep (str): The column separator.
+        - chunksize (int): Number of rows parsed at a time.
+        - progress (callable): Called after each chunk with the total
+            number of rows parsed so far.
+
+    Returns:
+        - dict: Column name -> numpy array, in file order.
+
+    Raises:
+        ValueError: If the file has no columns.
+    """
+    chunks = {}
+    rows = 0
+    try:
+        reader = pd.read_csv(source, sep=sep, chunksize=chunksize, skipinitialspace=True)
+        for chunk in reader:
+            for column in chunk.columns:
+                chunks.setdefault(str(column).strip(), []).append(chunk[column].to_numpy())
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows)
+    except pd.errors.EmptyDataError as error:
+        raise ValueError("The file has no columns") from error
+
+    columns = {}
+    for name, parts in chunks.items():
+        values = np.concatenate(parts) if parts else np.array([])
+        if values.dtype.kind in 'biuf':
+            columns[name] = values.astype(float, copy=False)
+            continue
+        numeric = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+        # Keep it numeric only if every non-empty cell parsed as a number
+        if np.isnan(numeric).sum() == pd.isna(values).sum():
+            columns[name] = numeric
+        else:
+            # Keep empty cells missing rather than turning them into 'nan'
+            text = values.astype(object)
+            missing = pd.isna(text)
+            text[~missing] = [str(value) for value in text[~missing]]
+            text[missing] = None
+            columns[name] = text
+    return columns
+
+
+def parse_upload(contents, filename, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    """
+    Parses the contents of a `dcc.Upload` into numpy columns.
+
+    Args:
+        - contents (str): The data URL sent by `dcc.Upload`
+            ("data:<type>;base64,<data>").
+        - filename (str): The uploaded file name (used to pick the separator).
+        - chunksize (int): Number of rows parsed at a time.
+        - progress (callable): Called after each chunk with the fraction of
+            the file read (0 to 1) and the number of rows parsed so far.
+
+    Returns:
+        - dict: Column name -> numpy array, as from `read_columns`.
+
+    Raises:
+        ValueError: If the upload is not base64 encoded or has no columns.
+    """
+    header, _, encoded = (contents or '').partition(',')
+    if not header.endswith(';base64'):
+        raise ValueError("Upload must be a base64-encoded file")
+
+    raw = _Base64Reader(encoded)
+    chunk_progress = None
+    if progress is not None:
+        def chunk_progress(rows):
+            progress(raw.fraction_read, rows)
+    return read_columns(io.BufferedReader(raw), sep=separator_for(filename),
+                        chunksize=chunksize, progress=chunk_progress)
+
+
+def select_columns(columns, wanted):
+    """
+    Picks the columns a page needs from an uploaded file. Columns with the
+    expected names are used if they are all there; otherwise the first
+    numeric columns of the file are used, in order.
+
+    Args:
+        - columns (dict): Column name -> numpy array, as from `read_columns`.
+        - wanted (list of str): The column names the page uses.
+
+    Returns:
+        - dict: Each wanted name -> float numpy array.
+
+    Raises:
+        ValueError: If the file does not have enough numeric columns.
+    """
+    numeric = [name for name, values in columns.items() if values.dtype.kind == 'f']
+    if all(name in numeric for name in wanted):
+        return {name: columns[name] for name in wanted}
+    if len(numeric) < len(wanted):
+        raise ValueError(f"The file needs {len(wanted)} numeric column(s) "
+                         f"({', '.join(wanted)})")
+    return {name: columns[source] for name, source in zip(wanted, numeric)}
+
+
+def select_group_columns(columns, group='Group', value='Value'):
+    """
+    Picks the group label and value columns of a long-format file (one
+    row per value). Columns with the expected names are used if they are
+    there; otherwise the first text column (or, if every column is
+    numeric, the first column) holds the groups and the first other
+    numeric column holds the values.
+
+    Args:
+        - columns (dict): Column name -> numpy array, as from `read_columns`.
+        - group (str): The name of the group label column.
+        - value (str): The name of the value column.
+
+    Returns:
+        - np.ndarray: The group label of each row.
+        - np.ndarray: The value of each row (float).
+
+    Raises:
+        ValueError: If the file does not have a group column and a numeric
+            value column.
+    """
+    if group in columns and value in columns and columns[value].dtype.kind == 'f':
+        return columns[group], columns[value]
+    text = [name for name, values in columns.items() if values.dtype.kind != 'f']
+    group_source = text[0] if text else next(iter(columns), None)
+    numeric = [name for name, values in columns.items()
+               if values.dtype.kind == 'f' and name != group_source]
+    if group_source is None or not numeric:
+        raise ValueError(f"The file needs a group column ({group}) "
+                         f"and a numeric value column ({value})")
+    return columns[group_source], columns[numeric[0]]
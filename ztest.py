@@ -0,0 +1,177 @@
+"""This module is a vectorized z-test engine.
+
+A z-test only needs the mean, standard deviation and size of each
+sample, so the tests can be run from summary statistics (e.g. a sample
+mean compared to a known population mean and standard deviation) or
+from raw values, which are first reduced to those statistics. Every
+argument is broadcast with numpy, so one call runs a single comparison
+or a whole table of them (one per element) with no Python loop.
+
+The conventions follow statsmodels' `ztest`: `value` is the mean (or
+difference of the means) under the null hypothesis, the alternatives
+are 'two-sided', 'larger' and 'smaller', and two samples of raw values
+use the pooled variance by default."""
+
+import numpy as np
+
+# Alternative hypotheses the p-values can be worked out for
+ALTERNATIVES = ('two-sided', 'larger', 'smaller')
+
+# Ways of combining the standard deviations of two samples
+USEVAR = ('pooled', 'unequal')
+
+
+def summary_statistics(values, axis=-1):
+    """
+    Reduces raw values to the statistics a z-test needs, ignoring NaN values.
+
+    Args:
+        - values (array-like): The values. With more than one dimension,
+            each slice along `axis` is one sample.
+        - axis (int): The axis the samples lie along.
+
+    Returns:
+        - np.ndarray: The mean of each sample (NaN for empty samples).
+        - np.ndarray: The sample standard deviation (ddof=1) of each sample
+            (NaN for samples with fewer than two values).
+        - np.ndarray: The number of non-NaN values in each sample.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if valid.all():
+            # No missing values, so skip the masking
+            nobs = np.full(np.delete(values.shape, axis % values.ndim), values.shape[axis])
+            mean = values.mean(axis=axis)
+            squares = ((values - np.expand_dims(mean, axis)) ** 2).sum(axis=axis)
+        else:
+            nobs = valid.sum(axis=axis)
+            mean = np.where(valid, values, 0.0).sum(axis=axis) / nobs
+            deviations = np.where(valid, values - np.expand_dims(mean, axis), 0.0)
+            squares = (deviations ** 2).sum(axis=axis)
+        std = np.sqrt(squares / (nobs - 1))
+    std = np.where(nobs < 2, np.nan, std)
+    return mean, std, nobs
+
+
+def z_statistic(mean1, std1, nobs1, mean2=None, std2=None, nobs2=None, value=0.0,
+                usevar='unequal'):
+    """
+    Works out the z-statistic of a one-sample or two-sample z-test.
+
+    Args:
+        - mean1 (array-like): The mean of sample 1.
+        - std1 (array-like): The standard deviation of population 1 (or
+            the sample standard deviation used in its place).
+        - nobs1 (array-like): The size of sample 1.
+        - mean2, std2, nobs2 (array-like): The same for sample 2, or None
+            for a one-sample test of mean1 against `value`.
+        - value (array-like): The mean (one sample) or difference of the
+            means (two samples) under the null hypothesis.
+        - usevar (str): 'unequal' to use each sample's own standard
+            deviation, or 'pooled' to pool them (two samples only).
+
+    Returns:
+        - np.ndarray or float: The z-statistic, with the broadcast shape
+            of the arguments (a float for scalar arguments).
+
+    Raises:
+        ValueError: If `usevar` is unknown or sample 2 is only partly given.
+    """
+    if usevar not in USEVAR:
+        raise ValueError(f"Unknown variance option '{usevar}'")
+    mean1, std1, nobs1 = (np.asarray(stat, dtype=float) for stat in (mean1, std1, nobs1))
+    value = np.asarray(value, dtype=float)
+    if mean2 is None and std2 is None and nobs2 is None:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return ((mean1 - value) / (std1 / np.sqrt(nobs1)))[()]
+    if mean2 is None or std2 is None or nobs2 is None:
+        raise ValueError("Sample 2 needs its mean, standard deviation and size")
+
+    mean2, std2, nobs2 = (np.asarray(stat, dtype=float) for stat in (mean2, std2, nobs2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if usevar == 'pooled':
+            pooled = ((nobs1 - 1) * std1 ** 2 + (nobs2 - 1) * std2 ** 2) / (nobs1 + nobs2 - 2)
+            std_diff = np.sqrt(pooled * (1 / nobs1 + 1 / nobs2))
+        else:
+            std_diff = np.sqrt(std1 ** 2 / nobs1 + std2 ** 2 / nobs2)
+        return ((mean1 - mean2 - value) / std_diff)[()]
+
+
+def p_value(z_stat, alternative='two-sided'):
+    """
+    Works out the p-value of z-statistics from the standard normal distribution.
+
+    Args:
+        - z_stat (array-like): The z-statistics.
+        - alternative (str): 'two-sided', 'larger' (the mean is above the
+            null value) or 'smaller'.
+
+    Returns:
+        - np.ndarray or float: The p-values (a float for a scalar z_stat).
+
+    Raises:
+        ValueError: If the alternative is unknown.
+    """
+    from scipy import special
+    if alternative not in ALTERNATIVES:
+        raise ValueError(f"Unknown alternative '{alternative}'")
+    z_stat = np.asarray(z_stat, dtype=float)
+    if alternative == 'two-sided':
+        return (2 * special.ndtr(-np.abs(z_stat)))[()]
+    if alternative == 'larger':
+        return special.ndtr(-z_stat)[()]
+    return special.ndtr(z_stat)[()]
+
+
+def ztest_from_stats(mean1, std1, nobs1, mean2=None, std2=None, nobs2=None, value=0.0,
+                     alternative='two-sided', usevar='unequal'):
+    """
+    Runs one-sample or two-sample z-tests from summary statistics, e.g.
+    a sample mean against a known population mean and standard deviation.
+
+    Args:
+        - mean1, std1, nobs1, mean2, std2, nobs2, value, usevar: As for
+            `z_statistic`. Arrays run one test per element.
+        - alternative (str): 'two-sided', 'larger' or 'smaller'.
+
+    Returns:
+        - np.ndarray or float: The z-statistics.
+        - np.ndarray or float: The p-values.
+
+    Raises:
+        ValueError: If an option is unknown or sample 2 is only partly given.
+    """
+    z_stat = z_statistic(mean1, std1, nobs1, mean2, std2, nobs2, value=value, usevar=usevar)
+    return z_stat, p_value(z_stat, alternative)
+
+
+def ztest(x1, x2=None, value=0.0, alternative='two-sided', usevar='pooled', axis=-1):
+    """
+    Runs one-sample or two-sample z-tests of raw values, using the sample
+    standard deviations (as statsmodels' `ztest` does). NaN values are
+    ignored.
+
+    Args:
+        - x1 (array-like): Sample 1. With more than one dimension, each
+            slice along `axis` is a separate test, e.g. a (tests, values)
+            array runs one test per row.
+        - x2 (array-like): Sample 2, or None for a one-sample test of x1's
+            mean against `value`.
+        - value (array-like): The mean or difference of the means under
+            the null hypothesis.
+        - alternative (str): 'two-sided', 'larger' or 'smaller'.
+        - usevar (str): 'pooled' or 'unequal' (two samples only).
+        - axis (int): The axis the values of each sample lie along.
+
+    Returns:
+        - np.ndarray or float: The z-statistics.
+        - np.ndarray or float: The p-values.
+
+    Raises:
+        ValueError: If an option is unknown.
+    """
+    stats1 = summary_statistics(x1, axis=axis)
+    stats2 = (None, None, None) if x2 is None else summary_statistics(x2, axis=axis)
+    return ztest_from_stats(*stats1, *stats2, value=value, alternative=alternative,
+                            usevar=usevar)